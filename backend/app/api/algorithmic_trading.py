@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.algorithmic_trading_service import AlgorithmicTradingEngine
 from pydantic import BaseModel
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,7 @@ router = APIRouter(prefix="/algorithmic-trading", tags=["Algorithmic Trading"])
 # Pydantic schemas
 class StartStrategyRequest(BaseModel):
     portfolio_id: int
+    symbols: Optional[List[str]] = None  # targets untuk rules tanpa symbol parameter
 
 class StartStrategyResponse(BaseModel):
     success: bool
@@ -56,7 +58,7 @@ async def start_strategy(
 ):
     """Start algorithmic trading strategy"""
     try:
-        result = await engine.start_strategy(strategy_id, request.portfolio_id)
+        result = await engine.start_strategy(strategy_id, request.portfolio_id, request.symbols)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -133,7 +135,8 @@ async def get_engine_status(
             "total_strategies": running_strategies["total"],
             "running_strategies": running_strategies["running_strategies"],
             "uptime": "N/A",  # Would need to track engine start time
-            "last_update": "N/A"
+            "last_update": engine.tick_stats["last_tick_at"].isoformat() if engine.tick_stats["last_tick_at"] else "N/A",
+            "tick_loop": engine.get_tick_stats()
         }
         
     except Exception as e:
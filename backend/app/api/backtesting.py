@@ -3,9 +3,11 @@ Backtesting Framework API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import date
 from app.database import get_db
+from app.models.backtesting import StrategyType
+from app.services.strategy_optimization_service import StrategyOptimizationService
 from sqlalchemy import text
 from pydantic import BaseModel
 import logging
@@ -69,6 +71,22 @@ class BacktestMetricsResponse(BaseModel):
     avg_win: float
     avg_loss: float
 
+class StartOptimizationRequest(BaseModel):
+    strategy_type: str  # moving_average, rsi, macd, bollinger_bands
+    symbol: str
+    timeframe: str = "1D"
+    start_date: date
+    end_date: date
+    parameter_space: Dict[str, Any]
+    search_type: str = "grid"  # grid, random
+    num_samples: int = 100
+    optimization_metric: str = "sharpe_ratio"
+    initial_capital: float = 100000000.0
+    commission_rate: float = 0.001
+    slippage_rate: float = 0.0005
+    max_workers: Optional[int] = None
+    seed: Optional[int] = None
+
 @router.get("/backtests")
 async def get_backtests(
     strategy_name: Optional[str] = Query(None, description="Filter by strategy name"),
@@ -318,4 +336,111 @@ async def run_backtest(
         
     except Exception as e:
         logger.error(f"Error running backtest: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/optimizations")
+async def start_optimization(
+    optimization_request: StartOptimizationRequest,
+    db: Session = Depends(get_db)
+):
+    """Start a parallel parameter sweep (grid or random search)"""
+    try:
+        valid_types = [t.value for t in StrategyType if t != StrategyType.CUSTOM]
+        if optimization_request.strategy_type not in valid_types:
+            raise HTTPException(status_code=400, detail=f"Invalid strategy type. Valid options: {valid_types}")
+        
+        if optimization_request.search_type not in ("grid", "random"):
+            raise HTTPException(status_code=400, detail="Invalid search type. Valid options: ['grid', 'random']")
+        
+        optimization_service = StrategyOptimizationService(db)
+        result = optimization_service.start_optimization(
+            strategy_type=StrategyType(optimization_request.strategy_type),
+            symbol=optimization_request.symbol,
+            timeframe=optimization_request.timeframe,
+            start_date=optimization_request.start_date,
+            end_date=optimization_request.end_date,
+            parameter_space=optimization_request.parameter_space,
+            search_type=optimization_request.search_type,
+            num_samples=optimization_request.num_samples,
+            optimization_metric=optimization_request.optimization_metric,
+            initial_capital=optimization_request.initial_capital,
+            commission_rate=optimization_request.commission_rate,
+            slippage_rate=optimization_request.slippage_rate,
+            max_workers=optimization_request.max_workers,
+            seed=optimization_request.seed
+        )
+        
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting optimization: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/optimizations/{optimization_id}")
+async def get_optimization_status(
+    optimization_id: str,
+    db: Session = Depends(get_db)
+):
+    """Poll optimization progress"""
+    try:
+        optimization_service = StrategyOptimizationService(db)
+        result = optimization_service.get_optimization_status(optimization_id)
+        
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=result["error"])
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting optimization status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/optimizations/{optimization_id}/results")
+async def get_optimization_results(
+    optimization_id: str,
+    limit: int = Query(50, description="Maximum number of ranked results"),
+    db: Session = Depends(get_db)
+):
+    """Get ranked optimization results"""
+    try:
+        optimization_service = StrategyOptimizationService(db)
+        result = optimization_service.get_optimization_results(optimization_id, limit)
+        
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=result["error"])
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting optimization results: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/optimizations/{optimization_id}/cancel")
+async def cancel_optimization(
+    optimization_id: str,
+    db: Session = Depends(get_db)
+):
+    """Cancel a running optimization"""
+    try:
+        optimization_service = StrategyOptimizationService(db)
+        result = optimization_service.cancel_optimization(optimization_id)
+        
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=result["error"])
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling optimization: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
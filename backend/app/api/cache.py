@@ -24,6 +24,7 @@ class CacheStatsResponse(BaseModel):
     cache_keys: int
     memory_usage: str
     database_stats: Dict
+    tiers: Dict = {}
 
 @router.get("/stats", response_model=CacheStatsResponse)
 async def get_cache_stats(db: Session = Depends(get_db)):
@@ -1,7 +1,7 @@
 """
 Dashboard API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Header, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from app.database import get_db
@@ -48,6 +48,9 @@ class CacheWidgetDataRequest(BaseModel):
     data_value: Dict
     expires_in: int = 300  # seconds
 
+class DashboardSnapshotRequest(BaseModel):
+    versions: Dict[str, str] = {}  # widget_id -> version yang sudah dimiliki client
+
 class CreatePresetRequest(BaseModel):
     name: str
     description: Optional[str] = None
@@ -222,6 +225,39 @@ async def get_dashboard_data(
         logger.error(f"Error getting dashboard data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/{dashboard_id}/snapshot")
+async def get_dashboard_snapshot(
+    dashboard_id: str,
+    response: Response,
+    snapshot_request: DashboardSnapshotRequest = Body(default=DashboardSnapshotRequest()),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all visible widgets with their cached payloads in one call.
+    Widgets whose version matches snapshot_request.versions are returned without data;
+    If-None-Match with the snapshot ETag returns 304 when nothing changed.
+    """
+    try:
+        dashboard_service = DashboardService(db)
+        result = dashboard_service.get_dashboard_snapshot(dashboard_id, snapshot_request.versions)
+        
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=result["error"])
+        
+        etag = f'"{result["version"]}"'
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        response.headers["ETag"] = etag
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting dashboard snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/widget/{widget_id}")
 async def get_widget_data(
     widget_id: str,
@@ -34,6 +34,7 @@ class DataUpdateResponse(BaseModel):
     status: str
     message: str
     records_saved: int
+    records_updated: int = 0
     date_range: Optional[str] = None
 
 class SymbolListResponse(BaseModel):
@@ -41,6 +41,12 @@ class CreateAlertRuleRequest(BaseModel):
     message_template: Optional[str] = None
     cooldown_minutes: int = 60
 
+class AlertTick(BaseModel):
+    symbol: str
+    price: Optional[float] = None
+    volume: Optional[float] = None
+    rsi: Optional[float] = None
+
 class NotificationResponse(BaseModel):
     id: str
     type: str
@@ -366,6 +372,26 @@ async def get_alert_rules(
         logger.error(f"Error getting alert rules: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/alert-rules/check")
+async def check_alert_rules(
+    ticks: List[AlertTick],
+    db: Session = Depends(get_db)
+):
+    """Check batch market ticks terhadap semua active alert rules"""
+    try:
+        notification_service = NotificationService(db)
+        triggered = notification_service.check_alerts([tick.dict() for tick in ticks])
+        
+        return {
+            "triggered": triggered,
+            "total_triggered": len(triggered),
+            "ticks_checked": len(ticks)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking alert rules: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/cleanup")
 async def cleanup_notifications(db: Session = Depends(get_db)):
     """Clean up expired and old notifications"""
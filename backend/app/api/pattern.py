@@ -2,11 +2,16 @@
 Pattern Recognition API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from app.database import get_db
 from app.services.pattern_service import PatternRecognitionService
 from pydantic import BaseModel
+from datetime import datetime, timedelta
+from scipy.stats import linregress
+import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,6 +22,13 @@ class PatternDetectionRequest(BaseModel):
     symbol: str
     timeframes: Optional[List[str]] = None
 
+class PatternScanRequest(BaseModel):
+    symbols: Optional[List[str]] = None  # None = semua symbols di bar store
+    timeframes: Optional[List[str]] = None
+    pattern_types: Optional[List[str]] = None
+    lookback_days: int = 365
+    max_workers: Optional[int] = None
+
 class PatternResponse(BaseModel):
     symbol: str
     timeframes_analyzed: List[str]
@@ -83,12 +95,13 @@ async def detect_patterns_simple(
 async def get_support_resistance_levels(
     symbol: str,
     timeframe: str = Query('1D', description="Timeframe for analysis"),
+    volume_weighted: bool = Query(False, description="Weight level strength by volume profile"),
     db: Session = Depends(get_db)
 ):
     """Get support and resistance levels for a symbol"""
     try:
         pattern_service = PatternRecognitionService(db)
-        result = pattern_service.get_support_resistance_levels(symbol, timeframe)
+        result = pattern_service.get_support_resistance_levels(symbol, timeframe, volume_weighted)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -306,6 +319,52 @@ async def scan_multiple_symbols(
         logger.error(f"Error scanning multiple symbols: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/scan")
+async def scan_universe(
+    scan_request: PatternScanRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Batch scan symbols x timeframes (worker processes, data dari bar store).
+
+    Response adalah NDJSON stream: satu line per symbol saat selesai,
+    diakhiri satu summary line.
+    """
+    try:
+        pattern_service = PatternRecognitionService(db)
+        
+        unknown = set(scan_request.pattern_types or []) - set(pattern_service.patterns)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown pattern types: {', '.join(sorted(unknown))}")
+        
+        results = pattern_service.scan_symbols(
+            symbols=scan_request.symbols,
+            timeframes=scan_request.timeframes,
+            pattern_types=scan_request.pattern_types,
+            lookback_days=scan_request.lookback_days,
+            max_workers=scan_request.max_workers
+        )
+        
+        def stream():
+            started = time.perf_counter()
+            summary = {"total_symbols": 0, "successful_scans": 0, "total_patterns": 0}
+            for result in results:
+                summary["total_symbols"] += 1
+                summary["successful_scans"] += result["status"] == "success"
+                summary["total_patterns"] += result["total_patterns"]
+                yield json.dumps(result, default=str) + "\n"
+            summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+            summary["scan_date"] = datetime.now().isoformat()
+            yield json.dumps({"summary": summary}) + "\n"
+        
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error scanning patterns: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/confidence/{symbol}")
 async def get_pattern_confidence_scores(
     symbol: str,
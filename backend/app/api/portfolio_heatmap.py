@@ -38,6 +38,7 @@ class PerformanceHeatmapResponse(BaseModel):
 class CorrelationHeatmapResponse(BaseModel):
     portfolio_id: int
     period_days: int
+    mode: str = 'full'
     correlation_matrix: dict
     high_correlation_pairs: list
     diversification_analysis: dict
@@ -112,12 +113,15 @@ async def get_performance_heatmap(
 async def get_correlation_heatmap(
     portfolio_id: int,
     days: int = Query(90, description="Number of days to look back"),
+    mode: str = Query('full', description="Correlation mode: full, rolling, ewma"),
+    window: int = Query(60, description="Rolling window (days) untuk mode rolling"),
+    halflife: float = Query(20.0, description="EWMA halflife (days) untuk mode ewma"),
     db: Session = Depends(get_db)
 ):
     """Get correlation heatmap untuk portfolio"""
     try:
         service = PortfolioHeatMapService(db)
-        result = service.calculate_correlation_heatmap(portfolio_id, days)
+        result = service.calculate_correlation_heatmap(portfolio_id, days, mode, window, halflife)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
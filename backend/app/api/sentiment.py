@@ -7,6 +7,7 @@ from typing import List, Optional
 from datetime import date
 from app.database import get_db
 from app.core.sentiment import SentimentAnalysisEngine
+from app.core.sentiment_rollup import SentimentRollups
 from pydantic import BaseModel
 import logging
 
@@ -212,33 +213,19 @@ async def get_sentiment_dashboard(
         symbol_list = [s.strip().upper() for s in symbols.split(",")]
         engine = SentimentAnalysisEngine(db)
         
-        dashboard_data = []
+        # Semua symbols dalam satu batch (rollups + satu market lookup)
+        composites = engine.calculate_composite_sentiment_batch(symbol_list, days)
         
+        dashboard_data = []
         for symbol in symbol_list:
-            try:
-                # Get composite sentiment for each symbol
-                sentiment = engine.calculate_composite_sentiment(symbol, days)
-                
-                if "error" not in sentiment:
-                    dashboard_data.append({
-                        "symbol": symbol,
-                        "composite_score": sentiment["composite_score"],
-                        "sentiment_class": sentiment["sentiment_class"],
-                        "confidence": sentiment["confidence"],
-                        "components": sentiment["components"]
-                    })
-                else:
-                    dashboard_data.append({
-                        "symbol": symbol,
-                        "error": sentiment["error"]
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
-                dashboard_data.append({
-                    "symbol": symbol,
-                    "error": str(e)
-                })
+            sentiment = composites[symbol]
+            dashboard_data.append({
+                "symbol": symbol,
+                "composite_score": sentiment["composite_score"],
+                "sentiment_class": sentiment["sentiment_class"],
+                "confidence": sentiment["confidence"],
+                "components": sentiment["components"]
+            })
         
         return {
             "period_days": days,
@@ -263,44 +250,36 @@ async def sentiment_screener(
 ):
     """Screen stocks based on sentiment criteria"""
     try:
-        from app.models.sentiment import SentimentAggregation
-        
-        # Build query
-        query = db.query(SentimentAggregation).filter(
-            SentimentAggregation.timeframe == "daily"
-        )
-        
-        if min_sentiment is not None:
-            query = query.filter(SentimentAggregation.composite_sentiment >= min_sentiment)
-        
-        if max_sentiment is not None:
-            query = query.filter(SentimentAggregation.composite_sentiment <= max_sentiment)
-        
-        if sentiment_class:
-            query = query.filter(SentimentAggregation.sentiment_trend == sentiment_class)
-        
-        if min_confidence is not None:
-            query = query.filter(SentimentAggregation.sentiment_confidence >= min_confidence)
-        
-        # Get latest data for each symbol
-        results = query.order_by(
-            SentimentAggregation.symbol,
-            SentimentAggregation.date.desc()
-        ).limit(limit).all()
+        engine = SentimentAnalysisEngine(db)
+        composites = engine.calculate_composite_sentiment_batch(None, days)
+        today = date.today().isoformat()
         
-        # Format response
         screened_stocks = []
-        for sentiment in results:
+        for symbol, sentiment in composites.items():
+            score = sentiment["composite_score"]
+            if min_sentiment is not None and score < min_sentiment:
+                continue
+            if max_sentiment is not None and score > max_sentiment:
+                continue
+            if sentiment_class and sentiment["sentiment_class"] != sentiment_class:
+                continue
+            if min_confidence is not None and sentiment["confidence"] < min_confidence:
+                continue
+            
+            components = sentiment["components"]
             screened_stocks.append({
-                "symbol": sentiment.symbol,
-                "composite_sentiment": sentiment.composite_sentiment,
-                "sentiment_trend": sentiment.sentiment_trend,
-                "sentiment_confidence": sentiment.sentiment_confidence,
-                "news_sentiment_avg": sentiment.news_sentiment_avg,
-                "social_sentiment_avg": sentiment.social_sentiment_avg,
-                "date": sentiment.date.isoformat()
+                "symbol": symbol,
+                "composite_sentiment": score,
+                "sentiment_trend": sentiment["sentiment_class"],
+                "sentiment_confidence": sentiment["confidence"],
+                "news_sentiment_avg": components.get("news", {}).get("score"),
+                "social_sentiment_avg": components.get("social", {}).get("score"),
+                "date": today
             })
         
+        screened_stocks.sort(key=lambda stock: stock["composite_sentiment"], reverse=True)
+        screened_stocks = screened_stocks[:limit]
+        
         return {
             "total_results": len(screened_stocks),
             "criteria": {
@@ -316,3 +295,51 @@ async def sentiment_screener(
     except Exception as e:
         logger.error(f"Error in sentiment screener: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/universe")
+async def get_universe_sentiment(
+    days: int = Query(7, description="Number of days to analyze"),
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols (default: all with sentiment data)"),
+    db: Session = Depends(get_db)
+):
+    """Composite sentiment untuk seluruh universe dalam satu call (screener / heatmap)"""
+    try:
+        symbol_list = [s.strip().upper() for s in symbols.split(",")] if symbols else None
+        engine = SentimentAnalysisEngine(db)
+        composites = engine.calculate_composite_sentiment_batch(symbol_list, days)
+        
+        return {
+            "period_days": days,
+            "symbols_analyzed": len(composites),
+            "scores": {
+                symbol: {
+                    "composite_score": sentiment["composite_score"],
+                    "sentiment_class": sentiment["sentiment_class"],
+                    "confidence": sentiment["confidence"]
+                }
+                for symbol, sentiment in composites.items()
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Error calculating universe sentiment: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rollups/refresh")
+async def refresh_sentiment_rollups(
+    rebuild: bool = Query(False, description="Drop and rebuild all rollups from raw rows"),
+    db: Session = Depends(get_db)
+):
+    """Update daily sentiment rollups dengan rows baru (atau rebuild penuh)"""
+    try:
+        rollups = SentimentRollups(db)
+        processed = rollups.rebuild() if rebuild else rollups.refresh()
+        
+        return {
+            "mode": "rebuild" if rebuild else "incremental",
+            "rows_processed": processed
+        }
+        
+    except Exception as e:
+        logger.error(f"Error refreshing sentiment rollups: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,13 +1,15 @@
 """
 Technical Analysis API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, datetime
 from app.database import get_db
 from app.models.market_data import TechnicalIndicators
+from app.services.indicator_service import IndicatorMaterializer
 from pydantic import BaseModel
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,6 +45,11 @@ class TechnicalIndicatorsResponse(BaseModel):
     ai_mean_reversion_score: Optional[float] = None
     ai_overall_score: Optional[float] = None
 
+class MaterializeIndicatorsRequest(BaseModel):
+    symbols: Optional[List[str]] = None
+    timeframe: str = "1D"
+    full: bool = False
+
 class TechnicalSummaryResponse(BaseModel):
     symbol: str
     trend: str
@@ -72,6 +79,15 @@ async def get_technical_indicators(
         
         indicators = query.order_by(TechnicalIndicators.date.desc()).limit(limit).all()
         
+        if not indicators:
+            # Belum di-materialize: hitung dari historical_data (di executor, bukan
+            # di event loop) lalu baca ulang
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, IndicatorMaterializer(db).materialize_symbol, symbol
+            )
+            if result.get("bars_updated"):
+                indicators = query.order_by(TechnicalIndicators.date.desc()).limit(limit).all()
+        
         if not indicators:
             raise HTTPException(status_code=404, detail="No technical indicators found for symbol")
         
@@ -117,10 +133,35 @@ async def get_technical_indicators(
             "indicators": results
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting technical indicators: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/indicators/materialize")
+async def materialize_indicators(
+    request: MaterializeIndicatorsRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Materialize indicator columns (incremental) in the background"""
+    try:
+        materializer = IndicatorMaterializer(db)
+        symbols = [symbol.upper() for symbol in request.symbols] if request.symbols else None
+        background_tasks.add_task(materializer.materialize, symbols, request.timeframe, request.full)
+        
+        return {
+            "status": "started",
+            "symbols": symbols or "all",
+            "timeframe": request.timeframe,
+            "mode": "full" if request.full else "incremental"
+        }
+        
+    except Exception as e:
+        logger.error(f"Error starting indicator materialization: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/summary/{symbol}")
 async def get_technical_summary(
     symbol: str,
@@ -7,8 +7,10 @@ from typing import List, Optional, Dict
 from datetime import date, timedelta
 from app.database import get_db
 from app.services.watchlist_service import WatchlistService
+from app.services.watchlist_refresh_service import get_watchlist_refresh_job
 from app.models.watchlist import WatchlistType
 from pydantic import BaseModel
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,6 +48,38 @@ class WatchlistResponse(BaseModel):
     last_updated: Optional[str]
     items: List[Dict]
 
+@router.post("/refresh")
+async def refresh_all_watchlists():
+    """Batch refresh semua auto-update watchlists (unique symbols, satu bulk update)"""
+    try:
+        job = get_watchlist_refresh_job()
+        return await asyncio.get_running_loop().run_in_executor(None, job.run_once)
+        
+    except Exception as e:
+        logger.error(f"Error refreshing watchlists: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/refresh/schedule")
+async def schedule_watchlist_refresh(
+    interval: float = Query(..., gt=0, description="Seconds between batch refreshes")
+):
+    """Start (atau ubah interval) scheduled watchlist refresh"""
+    job = get_watchlist_refresh_job()
+    job.start(interval)
+    return job.get_status()
+
+@router.delete("/refresh/schedule")
+async def stop_watchlist_refresh():
+    """Stop scheduled watchlist refresh"""
+    job = get_watchlist_refresh_job()
+    await job.stop()
+    return job.get_status()
+
+@router.get("/refresh/status")
+async def get_watchlist_refresh_status():
+    """Status scheduled watchlist refresh"""
+    return get_watchlist_refresh_job().get_status()
+
 @router.post("/create")
 async def create_watchlist(
     watchlist_request: CreateWatchlistRequest,
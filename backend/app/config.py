@@ -24,6 +24,70 @@ class Settings(BaseSettings):
     REDDIT_CLIENT_ID: Optional[str] = None
     REDDIT_CLIENT_SECRET: Optional[str] = None
     
+    # Data Ingestion
+    BULK_INSERT_CHUNK_SIZE: int = 1000  # rows per multi-row INSERT statement
+    INGESTION_MAX_WORKERS: int = 4  # concurrent source requests
+    INGESTION_MAX_RETRIES: int = 3
+    INGESTION_RATE_PER_SECOND: float = 1.0  # token bucket refill per source
+    INGESTION_RATE_BURST: int = 2
+    BAR_STORE_PATH: str = "data/bars"  # columnar OHLCV store (memory-mapped)
+    
+    # Caching
+    CACHE_L1_MAX_ENTRIES: int = 10000  # in-process LRU tier in front of Redis
+    CACHE_L1_TTL: float = 30.0  # max seconds a value lives in the in-process tier
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_KEY_PREFIX: str = "cache:"  # clear() deletes only keys under this prefix
+    
+    # Pattern Scanning
+    PATTERN_SCAN_MAX_WORKERS: int = 0  # 0 = os.cpu_count()
+    PATTERN_EXTREMA_CACHE_TTL: int = 604800  # 7 days; keys include the last bar timestamp
+    
+    # Portfolio Optimization
+    PORTFOLIO_OPTIMIZER_MAX_WORKERS: int = 2  # threads for solver work off the event loop
+    PORTFOLIO_COVARIANCE_CACHE_SIZE: int = 256  # cached estimates per (symbols, date, lookback)
+    
+    # Algorithmic Trading
+    ALGO_TICK_INTERVAL: float = 0.5  # seconds between shared market-data ticks
+    ALGO_WARMUP_BARS: int = 300  # max market_data rows replayed to seed indicators
+    
+    # Order Execution
+    ORDER_EXECUTION_MAX_CONCURRENCY: int = 8  # symbols executing concurrently
+    ORDER_EXECUTION_TICK: float = 0.05  # seconds between batched fill/trade/position writes
+    ORDER_EXECUTION_MAX_BATCH: int = 500  # flush early when this many results are buffered
+    ORDER_PRIORITY_AGING_RATE: float = 1.0  # priority points gained per second waiting
+    
+    # Alerts
+    ALERT_INDEX_REFRESH_SECONDS: float = 5.0  # incremental alert rule sync interval
+    ALERT_INDEX_FULL_RELOAD_SECONDS: float = 600.0  # full reload (picks up deleted rules)
+    ALERT_INDEX_COMMIT_LAG_SECONDS: float = 120.0  # incremental sync re-reads this overlap (late commits)
+    
+    # Notification Filtering
+    NOTIFICATION_COUNTER_BUCKETS: int = 60  # buckets per sliding window (hour/day)
+    NOTIFICATION_COUNTER_MAX_KEYS: int = 100000  # (user, type) counters kept in memory
+    NOTIFICATION_DUPLICATE_WINDOW_SECONDS: float = 300.0  # same type for same user
+    NOTIFICATION_CONTENT_DEDUP_SECONDS: float = 3600.0  # same title/message for same user
+    
+    # Notification Delivery
+    NOTIFICATION_DELIVERY_REDIS_URL: str = "redis://localhost:6379/1"  # own db: never touched by cache clears
+    NOTIFICATION_DELIVERY_MAX_ATTEMPTS: int = 5  # then moved to the dead-letter stream
+    NOTIFICATION_DELIVERY_BACKOFF_BASE: float = 2.0  # seconds, doubled per attempt
+    NOTIFICATION_DELIVERY_BACKOFF_MAX: float = 300.0
+    NOTIFICATION_DELIVERY_CLAIM_IDLE_MS: int = 60000  # reclaim unacked entries from dead workers
+    
+    # Watchlist Refresh
+    WATCHLIST_REFRESH_INTERVAL: float = 60.0  # seconds between batch refreshes (0 = disabled)
+    WATCHLIST_HISTORY_DAYS: int = 400  # calendar days loaded for indicators (covers sma_200)
+    
+    # Sentiment Rollups
+    SENTIMENT_ROLLUP_REFRESH_INTERVAL: float = 60.0  # seconds between incremental rollup refreshes (0 = disabled)
+    
+    # Sentiment Models
+    SENTIMENT_FINBERT_PATH: str = "models/sentiment/finbert"  # local ProsusAI/finbert weights (missing = skipped)
+    SENTIMENT_ROBERTA_PATH: str = "models/sentiment/twitter-roberta"  # local cardiffnlp/twitter-roberta-base-sentiment-latest
+    SENTIMENT_BATCH_SIZE: int = 32  # texts per padded CPU inference batch
+    SENTIMENT_BATCH_WAIT_MS: float = 10.0  # max wait for a batch to fill
+    SENTIMENT_SCORE_CACHE_SIZE: int = 50000  # (model, text hash) scores kept in memory
+    
     # Trading Configuration
     PAPER_TRADING_MODE: bool = True
     VIRTUAL_BALANCE: float = 10000000.0  # 10M IDR
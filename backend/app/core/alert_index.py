@@ -0,0 +1,291 @@
+"""
+Alert Index
+In-memory index untuk alert rules: per (symbol, metric) sorted threshold
+arrays untuk above/below/equals, dicocokkan terhadap batch ticks dengan bisect
+"""
+import heapq
+import itertools
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS = ('above', 'below', 'equals')
+METRICS = ('price', 'volume', 'rsi')
+EQUALS_TOLERANCE = 0.01
+
+@dataclass
+class AlertEntry:
+    """Satu rule di index; payload dibawa apa adanya ke hasil match"""
+    key: str
+    symbol: str
+    metric: str
+    condition: str
+    threshold: float
+    cooldown: timedelta = timedelta(0)
+    one_shot: bool = False
+    owner: Optional[str] = None
+    last_triggered: Optional[datetime] = None
+    payload: Dict[str, Any] = field(default_factory=dict)
+    seq: int = 0
+
+@dataclass
+class AlertMatch:
+    entry: AlertEntry
+    value: float
+    tick: Dict[str, Any]
+
+class _Book:
+    """Sorted (threshold, seq, key) arrays untuk satu (symbol, metric)"""
+
+    __slots__ = ('above', 'below', 'equals')
+
+    def __init__(self):
+        self.above: List[Tuple[float, int, str]] = []
+        self.below: List[Tuple[float, int, str]] = []
+        self.equals: List[Tuple[float, int, str]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.above or self.below or self.equals)
+
+class AlertIndex:
+    """
+    Alert rules yang siap trigger, di-index per (symbol, metric).
+
+    match() hanya menyentuh rules yang terpenuhi: above = prefix dengan
+    threshold < value, below = suffix dengan threshold > value, equals =
+    range |value - threshold| < tolerance. Rule yang trigger dikeluarkan
+    dari arrays: one-shot rules dibuang, rules lain masuk cooldown heap dan
+    kembali aktif setelah cooldown habis. Dengan begitu rule yang tetap
+    terpenuhi tidak di-scan ulang setiap tick.
+    """
+
+    def __init__(self, tolerance: float = EQUALS_TOLERANCE):
+        self.tolerance = tolerance
+        self._entries: Dict[str, AlertEntry] = {}
+        self._books: Dict[Tuple[str, str], _Book] = {}
+        self._cooling: List[Tuple[datetime, int, str]] = []
+        self._seq = itertools.count(1)
+        self._lock = threading.RLock()
+        self.stats = {'matched': 0, 'suppressed': 0, 'ticks': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def upsert(self, entry: AlertEntry, now: Optional[datetime] = None):
+        if entry.condition not in CONDITIONS or not entry.symbol:
+            self.remove(entry.key)
+            return
+        with self._lock:
+            self._detach(entry.key)
+            entry.seq = next(self._seq)
+            self._entries[entry.key] = entry
+            now = now or datetime.now()
+            if entry.last_triggered and entry.cooldown and entry.last_triggered + entry.cooldown > now:
+                heapq.heappush(self._cooling, (entry.last_triggered + entry.cooldown, entry.seq, entry.key))
+            else:
+                self._arm(entry)
+
+    def remove(self, key: str):
+        with self._lock:
+            self._detach(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._books.clear()
+            self._cooling.clear()
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def _array(self, entry: AlertEntry, create: bool = False) -> Optional[List]:
+        book_key = (entry.symbol, entry.metric)
+        book = self._books.get(book_key)
+        if book is None:
+            if not create:
+                return None
+            book = self._books[book_key] = _Book()
+        return getattr(book, entry.condition)
+
+    def _arm(self, entry: AlertEntry):
+        insort(self._array(entry, create=True), (entry.threshold, entry.seq, entry.key))
+
+    def _disarm(self, entry: AlertEntry):
+        array = self._array(entry)
+        if not array:
+            return
+        item = (entry.threshold, entry.seq, entry.key)
+        i = bisect_left(array, item)
+        if i < len(array) and array[i] == item:
+            del array[i]
+            if not self._books[(entry.symbol, entry.metric)]:
+                del self._books[(entry.symbol, entry.metric)]
+
+    def _detach(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            # Cooling heap entries di-skip lazily lewat seq mismatch
+            self._disarm(entry)
+
+    def _release_cooldowns(self, now: datetime):
+        while self._cooling and self._cooling[0][0] <= now:
+            _, seq, key = heapq.heappop(self._cooling)
+            entry = self._entries.get(key)
+            if entry is not None and entry.seq == seq:
+                self._arm(entry)
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def _satisfied(self, book: _Book, value: float) -> List[str]:
+        keys = [item[2] for item in book.above[:bisect_left(book.above, (value, -1))]]
+        keys += [item[2] for item in book.below[bisect_right(book.below, (value, float('inf'))):]]
+        if book.equals:
+            lo = bisect_right(book.equals, (value - self.tolerance, float('inf')))
+            hi = bisect_left(book.equals, (value + self.tolerance, -1))
+            keys += [item[2] for item in book.equals[lo:hi]]
+        return keys
+
+    def match(self,
+              ticks: Iterable[Dict[str, Any]],
+              now: Optional[datetime] = None,
+              accept: Optional[Callable[[AlertEntry], bool]] = None) -> List[AlertMatch]:
+        """
+        Semua rules yang terpenuhi oleh ticks (urut sesuai ticks).
+
+        Tick = {'symbol': ..., 'price': ..., 'volume': ..., 'rsi': ...};
+        metric yang None/tidak ada di-skip. Rules yang tidak lolos accept()
+        tetap aktif di index.
+        """
+        now = now or datetime.now()
+        matches: List[AlertMatch] = []
+        with self._lock:
+            self._release_cooldowns(now)
+            for tick in ticks:
+                self.stats['ticks'] += 1
+                symbol = tick.get('symbol')
+                for metric in METRICS:
+                    value = tick.get(metric)
+                    book = self._books.get((symbol, metric))
+                    if value is None or not book:
+                        continue
+                    for key in self._satisfied(book, float(value)):
+                        entry = self._entries[key]
+                        if accept is not None and not accept(entry):
+                            self.stats['suppressed'] += 1
+                            continue
+                        self._fire(entry, now)
+                        matches.append(AlertMatch(entry, float(value), tick))
+        self.stats['matched'] += len(matches)
+        return matches
+
+    def _fire(self, entry: AlertEntry, now: datetime):
+        self._disarm(entry)
+        entry.last_triggered = now
+        if entry.one_shot:
+            del self._entries[entry.key]
+        elif entry.cooldown:
+            heapq.heappush(self._cooling, (now + entry.cooldown, entry.seq, entry.key))
+        else:
+            self._arm(entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rules': len(self._entries),
+                'books': len(self._books),
+                'cooling': len(self._cooling),
+                **self.stats
+            }
+
+class AlertIndexSync:
+    """
+    Incremental loader database -> AlertIndex.
+
+    Full load mengambil rows aktif; refresh berikutnya hanya rows dengan
+    coalesce(updated_at, created_at) >= high-water mark - commit_lag (rows
+    yang menjadi non-aktif dikeluarkan dari index). Overlap commit_lag
+    menangkap rows dari transaksi yang commit setelah row yang lebih baru
+    terbaca; upsert idempotent sehingga re-read aman. Full reload berkala menangkap rows
+    yang dihapus. record(row) memberi model instance jika query juga
+    mengambil kolom lain (mis. join symbol).
+    """
+
+    def __init__(self,
+                 index: AlertIndex,
+                 model,
+                 query: Callable[[Session], Any],
+                 active: Callable[[], Any],
+                 key: Callable[[Any], str],
+                 to_entry: Callable[[Any], Optional[AlertEntry]],
+                 record: Callable[[Any], Any] = lambda row: row,
+                 refresh_interval: float = 5.0,
+                 full_reload_interval: float = 600.0,
+                 commit_lag: float = 120.0):
+        self.index = index
+        self.record = record
+        self.model = model
+        self.query = query
+        self.active = active
+        self.key = key
+        self.to_entry = to_entry
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.commit_lag = timedelta(seconds=commit_lag)
+        self.high_water: Optional[datetime] = None
+        self._last_refresh: Optional[datetime] = None
+        self._last_full: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Sync index jika refresh_interval sudah lewat; returns rows processed"""
+        now = datetime.now()
+        with self._lock:
+            if not force and self._last_refresh and (now - self._last_refresh).total_seconds() < self.refresh_interval:
+                return 0
+            full = (force or self._last_full is None or self.high_water is None
+                    or (now - self._last_full).total_seconds() >= self.full_reload_interval)
+
+            query = self.query(db)
+            if full:
+                rows = query.filter(self.active()).all()
+            else:
+                changed_at = func.coalesce(self.model.updated_at, self.model.created_at)
+                rows = query.filter(changed_at >= self.high_water - self.commit_lag).all()
+
+            seen = set()
+            for row in rows:
+                entry = self.to_entry(row)
+                if entry is None:
+                    self.index.remove(self.key(row))
+                    continue
+                seen.add(entry.key)
+                self.index.upsert(entry, now)
+            if full:
+                for key in set(self.index.keys()) - seen:
+                    self.index.remove(key)
+                self._last_full = now
+
+            records = [self.record(row) for row in rows]
+            stamps = [stamp for rec in records for stamp in (rec.updated_at, rec.created_at) if stamp is not None]
+            if stamps:
+                latest = max(stamp.replace(tzinfo=None) for stamp in stamps)
+                self.high_water = max(self.high_water, latest) if self.high_water else latest
+            self._last_refresh = now
+            return len(rows)
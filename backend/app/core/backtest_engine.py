@@ -0,0 +1,399 @@
+"""
+Vectorized Backtest Engine
+"""
+import numpy as np
+from typing import Dict, List, Optional
+from datetime import datetime
+from scipy.signal import lfilter
+from app.models.backtesting import StrategyType
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Signal codes
+HOLD = 0
+BUY = 1
+SELL = -1
+
+class VectorizedBacktestEngine:
+    """
+    Bar-at-a-time backtest engine computed on NumPy arrays.
+
+    Semua indicator series dihitung sekali untuk seluruh history, signal
+    dihasilkan dengan array operations, dan equity curve diisi dalam satu
+    pass. Hasilnya identik dengan loop di
+    BacktestingService._run_strategy_simulation (trades, equity curve dan
+    metrics), tetapi O(n) terhadap jumlah bar.
+    """
+
+    # Minimum bars sebelum indicator dihitung (sama dengan _calculate_indicators)
+    MIN_BARS = 20
+
+    def __init__(self, commission_rate: float = 0.001, slippage_rate: float = 0.0005):
+        self.commission_rate = commission_rate
+        self.slippage_rate = slippage_rate
+
+    # ------------------------------------------------------------------
+    # Indicator series
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+        """
+        Rolling sum over the trailing `period` values (NaN until window is full).
+
+        Window dijumlahkan kolom demi kolom dari kiri ke kanan, sama seperti
+        sum() di loop engine, sehingga perbandingan threshold tidak bergeser.
+        """
+        n = len(values)
+        out = np.full(n, np.nan)
+        if period <= 0 or n < period:
+            return out
+
+        width = n - period + 1
+        acc = np.zeros(width)
+        for k in range(period):
+            acc += values[k:k + width]
+        out[period - 1:] = acc
+        return out
+
+    def sma_series(self, close: np.ndarray, period: int) -> np.ndarray:
+        """Simple Moving Average series (0 until enough data, like _calculate_sma)"""
+        sma = self.rolling_sum(close, period) / period
+        return np.nan_to_num(sma, nan=0.0)
+
+    def ema_series(self, close: np.ndarray, period: int) -> np.ndarray:
+        """Exponential Moving Average series seeded from the first price"""
+        n = len(close)
+        if n == 0:
+            return np.array([])
+
+        multiplier = 2 / (period + 1)
+        ema = np.empty(n)
+        ema[0] = close[0]
+        if n > 1:
+            ema[1:], _ = lfilter(
+                [multiplier], [1, -(1 - multiplier)], close[1:],
+                zi=[(1 - multiplier) * close[0]]
+            )
+
+        # _calculate_ema returns the last price until `period` bars are available
+        bars = np.arange(1, n + 1)
+        return np.where(bars < period, close, ema)
+
+    def rsi_series(self, close: np.ndarray, period: int) -> np.ndarray:
+        """RSI series (simple average of gains/losses, 50 until enough data)"""
+        n = len(close)
+        rsi = np.full(n, 50.0)
+        if n < period + 1:
+            return rsi
+
+        changes = np.diff(close)
+        gains = np.maximum(changes, 0)
+        losses = np.maximum(-changes, 0)
+
+        avg_gain = self.rolling_sum(gains, period)[period - 1:] / period
+        avg_loss = self.rolling_sum(losses, period)[period - 1:] / period
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            values = 100 - (100 / (1 + rs))
+        values = np.where(avg_loss == 0, 100.0, values)
+
+        rsi[period:] = values
+        return rsi
+
+    def bollinger_series(self, close: np.ndarray, period: int, std_dev: float) -> Dict[str, np.ndarray]:
+        """Bollinger Bands series (NaN until enough data)"""
+        n = len(close)
+        middle = self.rolling_sum(close, period) / period
+        upper = np.full(n, np.nan)
+        lower = np.full(n, np.nan)
+        if period <= 0 or n < period:
+            return {'upper': upper, 'middle': middle, 'lower': lower}
+
+        width = n - period + 1
+        mean = middle[period - 1:]
+        acc = np.zeros(width)
+        for k in range(period):
+            acc += (close[k:k + width] - mean) ** 2
+        std = (acc / period) ** 0.5
+
+        upper[period - 1:] = mean + (std * std_dev)
+        lower[period - 1:] = mean - (std * std_dev)
+        return {'upper': upper, 'middle': middle, 'lower': lower}
+
+    def calculate_indicator_arrays(self, close: np.ndarray, strategy_type: StrategyType, params: Dict) -> Dict[str, np.ndarray]:
+        """Calculate every indicator series needed by the strategy once"""
+        indicators = {}
+
+        if strategy_type == StrategyType.MOVING_AVERAGE:
+            period = params.get('period', 20)
+            sma = self.sma_series(close, period)
+            sma_prev = np.full(len(close), np.nan)
+            sma_prev[1:] = sma[:-1]
+            # sma_prev hanya tersedia jika len(prices) > period
+            sma_prev[:period] = np.nan
+            indicators['sma'] = sma
+            indicators['sma_prev'] = sma_prev
+
+        elif strategy_type == StrategyType.RSI:
+            period = params.get('period', 14)
+            indicators['rsi'] = self.rsi_series(close, period)
+
+        elif strategy_type == StrategyType.MACD:
+            fast = params.get('fast', 12)
+            slow = params.get('slow', 26)
+            macd = self.ema_series(close, fast) - self.ema_series(close, slow)
+            macd[:slow - 1] = np.nan
+            # Signal line mengikuti _calculate_macd (simplified: signal = macd)
+            indicators['macd'] = macd
+            indicators['signal'] = macd
+            indicators['macd_prev'] = macd
+            indicators['signal_prev'] = macd
+
+        elif strategy_type == StrategyType.BOLLINGER_BANDS:
+            period = params.get('period', 20)
+            std_dev = params.get('std_dev', 2)
+            indicators.update(self.bollinger_series(close, period, std_dev))
+
+        return indicators
+
+    # ------------------------------------------------------------------
+    # Signals
+    # ------------------------------------------------------------------
+
+    def generate_signals(self, close: np.ndarray, indicators: Dict[str, np.ndarray], strategy_type: StrategyType) -> np.ndarray:
+        """Generate BUY/SELL/HOLD signal codes for every bar"""
+        n = len(close)
+        buy = np.zeros(n, dtype=bool)
+        sell = np.zeros(n, dtype=bool)
+
+        with np.errstate(invalid='ignore'):
+            if strategy_type == StrategyType.MOVING_AVERAGE and 'sma' in indicators:
+                sma = indicators['sma']
+                sma_prev = indicators['sma_prev']
+                valid = ~np.isnan(sma_prev)
+                buy = valid & (close > sma) & (close <= sma_prev)
+                sell = valid & ~buy & (close < sma) & (close >= sma_prev)
+
+            elif strategy_type == StrategyType.RSI and 'rsi' in indicators:
+                rsi = indicators['rsi']
+                buy = rsi < 30
+                sell = rsi > 70
+
+            elif strategy_type == StrategyType.MACD and 'macd' in indicators:
+                macd = indicators['macd']
+                signal_line = indicators['signal']
+                valid = ~np.isnan(macd)
+                buy = valid & (macd > signal_line) & (indicators['macd_prev'] <= indicators['signal_prev'])
+                sell = valid & ~buy & (macd < signal_line) & (indicators['macd_prev'] >= indicators['signal_prev'])
+
+            elif strategy_type == StrategyType.BOLLINGER_BANDS and 'upper' in indicators:
+                buy = close < indicators['lower']
+                sell = close > indicators['upper']
+
+        signals = np.where(buy, BUY, np.where(sell, SELL, HOLD)).astype(np.int8)
+        # Indicators tidak dihitung sebelum MIN_BARS
+        signals[:self.MIN_BARS - 1] = HOLD
+        return signals
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+
+    def simulate(self,
+                 close: np.ndarray,
+                 initial_capital: float,
+                 strategy_type: StrategyType,
+                 params: Optional[Dict] = None) -> Dict:
+        """
+        Run simulation on a close array without timestamps.
+
+        Trades refer to bars by 'bar_index'; dipakai langsung oleh parameter
+        sweep yang hanya membutuhkan metrics.
+        """
+        close = np.asarray(close, dtype=float)
+        params = params or {}
+        n = len(close)
+
+        indicators = self.calculate_indicator_arrays(close, strategy_type, params)
+        signals = self.generate_signals(close, indicators, strategy_type)
+
+        # Position state hanya berubah pada bar dengan signal, jadi trade
+        # execution cukup mengunjungi bar tersebut
+        capital = initial_capital
+        position = 0
+        trades = []
+        event_index = [0]
+        event_capital = [initial_capital]
+        event_position = [0]
+
+        signal_index = np.flatnonzero(signals)
+        signal_values = signals[signal_index].tolist()
+        signal_prices = close[signal_index].tolist()
+
+        for i, action, price in zip(signal_index.tolist(), signal_values, signal_prices):
+            if action == BUY and position == 0:
+                shares = int(capital / price)
+                if shares > 0:
+                    position = shares
+                    capital -= shares * price
+
+                    commission = shares * price * self.commission_rate
+                    slippage = shares * price * self.slippage_rate
+                    capital -= commission + slippage
+
+                    trades.append({
+                        'bar_index': i,
+                        'action': 'buy',
+                        'price': price,
+                        'shares': shares,
+                        'commission': commission,
+                        'slippage': slippage
+                    })
+                else:
+                    continue
+
+            elif action == SELL and position > 0:
+                capital += position * price
+
+                commission = position * price * self.commission_rate
+                slippage = position * price * self.slippage_rate
+                capital -= commission + slippage
+
+                trades.append({
+                    'bar_index': i,
+                    'action': 'sell',
+                    'price': price,
+                    'shares': position,
+                    'commission': commission,
+                    'slippage': slippage
+                })
+
+                position = 0
+            else:
+                continue
+
+            event_index.append(i)
+            event_capital.append(capital)
+            event_position.append(position)
+
+        # Equity curve dalam satu pass: state terakhir yang berlaku di setiap bar
+        equity = np.array([])
+        if n > 0:
+            state = np.searchsorted(np.array(event_index), np.arange(n), side='right') - 1
+            cash = np.array(event_capital)[state]
+            held = np.array(event_position)[state]
+            equity = cash + (held * close)
+
+        # Close any remaining position
+        if position > 0:
+            final_price = close[-1].item()
+            capital += position * final_price
+            commission = position * final_price * self.commission_rate
+            slippage = position * final_price * self.slippage_rate
+            capital -= commission + slippage
+
+            trades.append({
+                'bar_index': n - 1,
+                'action': 'sell',
+                'price': final_price,
+                'shares': position,
+                'commission': commission,
+                'slippage': slippage
+            })
+
+        metrics = self.calculate_performance_metrics(initial_capital, capital, equity, trades)
+
+        return {
+            'final_capital': capital,
+            'total_trades': len(trades),
+            'trades': trades,
+            'equity': equity,
+            'metrics': metrics
+        }
+
+    def run(self,
+            timestamps: List[datetime],
+            close: np.ndarray,
+            initial_capital: float,
+            strategy_type: StrategyType,
+            params: Optional[Dict] = None) -> Dict:
+        """Run full simulation and return the same structure as the loop engine"""
+        results = self.simulate(close, initial_capital, strategy_type, params)
+
+        trades = []
+        for trade in results['trades']:
+            trade = dict(trade)
+            trades.append({'timestamp': timestamps[trade.pop('bar_index')], **trade})
+
+        equity_curve = [
+            {'date': ts.date(), 'equity': value}
+            for ts, value in zip(timestamps, results['equity'].tolist())
+        ]
+
+        return {
+            'final_capital': results['final_capital'],
+            'total_trades': results['total_trades'],
+            'trades': trades,
+            'equity_curve': equity_curve,
+            'metrics': results['metrics']
+        }
+
+    def calculate_performance_metrics(self, initial_capital: float, final_capital: float,
+                                      equity: np.ndarray, trades: List[Dict]) -> Dict:
+        """Calculate performance metrics from the equity array"""
+        try:
+            total_return = (final_capital - initial_capital) / initial_capital
+
+            daily_returns = (equity[1:] - equity[:-1]) / equity[:-1]
+
+            # Sharpe ratio
+            if len(daily_returns):
+                avg_return = np.mean(daily_returns)
+                std_return = np.std(daily_returns)
+                sharpe_ratio = (avg_return / std_return) * np.sqrt(252) if std_return > 0 else 0
+            else:
+                sharpe_ratio = 0
+
+            # Sortino ratio
+            negative_returns = daily_returns[daily_returns < 0]
+            if len(negative_returns):
+                downside_std = np.std(negative_returns)
+                sortino_ratio = (avg_return / downside_std) * np.sqrt(252) if downside_std > 0 else 0
+            else:
+                sortino_ratio = 0
+
+            # Maximum drawdown (peak dimulai dari initial capital)
+            max_drawdown = 0
+            if len(equity):
+                peak = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))[1:]
+                max_drawdown = max(max_drawdown, float(np.max((peak - equity) / peak)))
+
+            # Win rate
+            winning_trades = len([t for t in trades if t.get('pnl', 0) > 0])
+            total_trades = len(trades)
+            win_rate = winning_trades / total_trades if total_trades > 0 else 0
+
+            # Profit factor
+            gross_profit = sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) > 0)
+            gross_loss = abs(sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) < 0))
+            profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
+
+            return {
+                'total_return': total_return,
+                'annualized_return': total_return * (252 / len(equity)) if len(equity) else 0,
+                'sharpe_ratio': sharpe_ratio,
+                'sortino_ratio': sortino_ratio,
+                'max_drawdown': max_drawdown,
+                'win_rate': win_rate,
+                'profit_factor': profit_factor,
+                'total_trades': total_trades,
+                'winning_trades': winning_trades,
+                'losing_trades': total_trades - winning_trades
+            }
+
+        except Exception as e:
+            logger.error(f"Error calculating performance metrics: {e}")
+            return {}
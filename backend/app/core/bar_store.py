@@ -0,0 +1,400 @@
+"""
+Columnar OHLCV Bar Store
+Memory-mapped NumPy column files, dipartisi per timeframe/symbol
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.market_data import HistoricalData
+from app.config import settings
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime, date
+import threading
+import json
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Column name -> on-disk dtype (volume float64 supaya NULL bisa jadi NaN)
+COLUMNS = {
+    'timestamp': np.dtype('datetime64[ns]'),
+    'open': np.dtype('float64'),
+    'high': np.dtype('float64'),
+    'low': np.dtype('float64'),
+    'close': np.dtype('float64'),
+    'volume': np.dtype('float64'),
+    'adj_close': np.dtype('float64'),
+}
+
+# Accepted source column names -> store column
+SOURCE_COLUMNS = {
+    'open_price': 'open', 'high_price': 'high', 'low_price': 'low', 'close_price': 'close',
+    'adjusted_close': 'adj_close',
+    'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close',
+    'Volume': 'volume', 'Adj Close': 'adj_close',
+}
+
+class BarStore:
+    """
+    Columnar bar store, dioptimalkan untuk append.
+
+    Layout: {root}/{timeframe}/{symbol}/{column}[.{generation}].bin +
+    meta.json. Setiap column file adalah raw native-endian array; meta.json
+    (ditulis terakhir, atomic) menentukan generation dan jumlah rows yang
+    valid.
+
+    - Append (semua bar baru setelah bar terakhir) ditulis setelah rows yang
+      valid, jadi reader tidak pernah melihat append yang belum selesai.
+    - Revisi tail (bar baru mencakup semua stored bars dari titik overlap)
+      ditimpa in place; reader yang membaca bersamaan bisa melihat bar yang
+      sedang direvisi setengah tertulis.
+    - Backfill / partial rewrite di-merge dengan stored rows per timestamp ke
+      generation baru lalu di-swap lewat meta.json; memmap lama tetap valid.
+
+    Satu writer per partition.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: Dict[tuple, tuple] = {}
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _partition_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, timeframe, symbol.upper().replace(os.sep, '_'))
+
+    def _lock(self, symbol: str, timeframe: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((symbol.upper(), timeframe), threading.Lock())
+
+    def _read_meta(self, partition: str) -> Dict:
+        try:
+            with open(os.path.join(partition, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, "first_timestamp": None, "last_timestamp": None}
+
+    @staticmethod
+    def _column_path(partition: str, name: str, generation: int = 0) -> str:
+        return os.path.join(partition, f"{name}.bin" if not generation else f"{name}.{generation}.bin")
+
+    def _write_meta(self, partition: str, meta: Dict):
+        path = os.path.join(partition, 'meta.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def symbols(self, timeframe: str) -> List[str]:
+        """Symbols stored for a timeframe"""
+        directory = os.path.join(self.root, timeframe)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name for name in os.listdir(directory)
+            if os.path.exists(os.path.join(directory, name, 'meta.json'))
+        )
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[datetime]:
+        """Latest stored bar timestamp (None if the partition is empty)"""
+        last = self._read_meta(self._partition_dir(symbol, timeframe))["last_timestamp"]
+        return datetime.fromisoformat(last) if last else None
+
+    def _normalize(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Map a DataFrame (HistoricalData / yfinance / ohlcv_daily names) to store columns"""
+        frame = data.rename(columns=SOURCE_COLUMNS)
+
+        for column in ('timestamp', 'Datetime', 'Date', 'date'):
+            if column in frame.columns:
+                timestamps = pd.to_datetime(frame[column])
+                break
+        else:
+            raise ValueError("DataFrame has no timestamp/date column")
+
+        if getattr(timestamps.dt, 'tz', None) is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+
+        columns = {'timestamp': timestamps.to_numpy(dtype='datetime64[ns]')}
+        for column, dtype in COLUMNS.items():
+            if column == 'timestamp':
+                continue
+            if column in frame.columns:
+                columns[column] = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=dtype, na_value=np.nan)
+            else:
+                columns[column] = np.full(len(frame), np.nan, dtype=dtype)
+
+        # Sorted, unique timestamps (last duplicate wins)
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+        timestamps = columns['timestamp']
+        keep = np.append(timestamps[1:] != timestamps[:-1], True) if len(timestamps) else np.ones(0, dtype=bool)
+        return {name: values[keep] for name, values in columns.items()}
+
+    def write(self, symbol: str, timeframe: str, data: pd.DataFrame) -> int:
+        """
+        Write bars to a partition; returns rows written.
+
+        Bar dengan timestamp yang sudah tersimpan diganti oleh bar baru
+        (revisi), stored bars lain tidak pernah dibuang.
+        """
+        if data is None or data.empty:
+            return 0
+
+        columns = self._normalize(data)
+        incoming = columns['timestamp']
+        if not len(incoming):
+            return 0
+
+        partition = self._partition_dir(symbol, timeframe)
+        with self._lock(symbol, timeframe):
+            os.makedirs(partition, exist_ok=True)
+            meta = self._read_meta(partition)
+            rows = meta["rows"]
+            generation = meta.get("generation", 0)
+
+            if rows:
+                stored = np.memmap(self._column_path(partition, 'timestamp', generation),
+                                   dtype=COLUMNS['timestamp'], mode='r', shape=(rows,))
+                overlap = int(np.searchsorted(stored, incoming[0], side='left'))
+            else:
+                stored = np.empty(0, dtype=COLUMNS['timestamp'])
+                overlap = 0
+
+            if overlap == rows or np.isin(stored[overlap:], incoming).all():
+                # Append / tail revision: stored[overlap:] semuanya diganti oleh incoming
+                for name, dtype in COLUMNS.items():
+                    path = self._column_path(partition, name, generation)
+                    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                        f.seek(overlap * dtype.itemsize)
+                        f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                total = overlap + len(incoming)
+                first = stored[0] if overlap else incoming[0]
+                last = incoming[-1]
+                new_generation = generation
+            else:
+                # Backfill / partial rewrite: merge per timestamp ke generation baru
+                merged = {
+                    name: np.concatenate([
+                        np.fromfile(self._column_path(partition, name, generation), dtype=dtype, count=rows),
+                        np.asarray(columns[name], dtype=dtype)
+                    ])
+                    for name, dtype in COLUMNS.items()
+                }
+                order = np.argsort(merged['timestamp'], kind='stable')
+                timestamps = merged['timestamp'][order]
+                # Incoming di belakang stored rows, jadi duplicate terakhir = bar baru
+                keep = order[np.append(timestamps[1:] != timestamps[:-1], True)]
+                new_generation = generation + 1
+                for name, dtype in COLUMNS.items():
+                    merged[name][keep].tofile(self._column_path(partition, name, new_generation))
+                total = len(keep)
+                first = merged['timestamp'][keep[0]]
+                last = merged['timestamp'][keep[-1]]
+
+            self._write_meta(partition, {
+                "rows": total,
+                "generation": new_generation,
+                "first_timestamp": pd.Timestamp(first).isoformat(),
+                "last_timestamp": pd.Timestamp(last).isoformat(),
+                "updated_at": datetime.now().isoformat()
+            })
+            if new_generation != generation:
+                # Reader yang masih memegang memmap lama tidak terpengaruh unlink
+                for name in COLUMNS:
+                    try:
+                        os.remove(self._column_path(partition, name, generation))
+                    except FileNotFoundError:
+                        pass
+
+        return len(incoming)
+
+    def _open_partition(self, symbol: str, timeframe: str) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-map a partition (cached until meta.json changes)"""
+        partition = self._partition_dir(symbol, timeframe)
+        meta_path = os.path.join(partition, 'meta.json')
+        try:
+            stat = os.stat(meta_path)
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+        key = (symbol.upper(), timeframe)
+        cached = self._maps.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        meta = self._read_meta(partition)
+        if not meta["rows"]:
+            return None
+
+        try:
+            arrays = {
+                # Plain ndarray views of the mapping (memmap subclass slicing is slow)
+                name: np.memmap(self._column_path(partition, name, meta.get("generation", 0)), dtype=dtype,
+                                mode='r', shape=(meta["rows"],)).view(np.ndarray)
+                for name, dtype in COLUMNS.items()
+            }
+        except FileNotFoundError:
+            # Generation di-swap oleh writer di antara baca meta dan open; coba lagi
+            return self._open_partition(symbol, timeframe)
+        self._maps[key] = (version, arrays)
+        return arrays
+
+    def load_bars(self,
+                  symbols: Iterable[str],
+                  timeframe: str,
+                  start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Load bars for many symbols as read-only memory-mapped array views.
+
+        Returns {symbol: {'timestamp', 'open', 'high', 'low', 'close', 'volume',
+        'adj_close'}}; range dipotong dengan searchsorted (tanpa copy). Symbols
+        tanpa data di range tidak dimasukkan.
+        """
+        start64 = np.datetime64(pd.Timestamp(start), 'ns') if start is not None else None
+        end64 = np.datetime64(pd.Timestamp(end), 'ns') if end is not None else None
+        if isinstance(end, date) and not isinstance(end, datetime):
+            # Date end is inclusive of the whole day
+            end64 = end64 + np.timedelta64(1, 'D') - np.timedelta64(1, 'ns')
+
+        bars = {}
+        for symbol in symbols:
+            arrays = self._open_partition(symbol, timeframe)
+            if arrays is None:
+                continue
+
+            timestamps = arrays['timestamp']
+            lo = int(np.searchsorted(timestamps, start64, side='left')) if start64 is not None else 0
+            hi = int(np.searchsorted(timestamps, end64, side='right')) if end64 is not None else len(timestamps)
+            if hi <= lo:
+                continue
+            bars[symbol.upper()] = {name: values[lo:hi] for name, values in arrays.items()}
+
+        return bars
+
+    @staticmethod
+    def to_frame(bars: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """One symbol's arrays as a DataFrame indexed by timestamp (copies)"""
+        frame = pd.DataFrame({name: np.asarray(values) for name, values in bars.items() if name != 'timestamp'})
+        frame.index = pd.DatetimeIndex(np.asarray(bars['timestamp']), name='timestamp')
+        return frame
+
+    def sync_from_db(self,
+                     db: Session,
+                     timeframe: str,
+                     symbols: Optional[List[str]] = None,
+                     chunk_size: int = 200) -> Dict:
+        """
+        Incrementally copy historical_data into the store.
+
+        Satu query per chunk of symbols, mulai dari last_timestamp terkecil
+        di chunk tersebut (bar terakhir di-reload untuk menangkap revisi).
+        """
+        if symbols is None:
+            symbols = [row[0] for row in db.query(HistoricalData.symbol).filter(
+                HistoricalData.timeframe == timeframe
+            ).distinct().all()]
+
+        columns = [
+            HistoricalData.symbol, HistoricalData.timestamp,
+            HistoricalData.open_price, HistoricalData.high_price, HistoricalData.low_price,
+            HistoricalData.close_price, HistoricalData.volume, HistoricalData.adjusted_close
+        ]
+        names = ['symbol', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'adj_close']
+
+        symbols_written = 0
+        rows_written = 0
+        for i in range(0, len(symbols), chunk_size):
+            chunk = [symbol.upper() for symbol in symbols[i:i + chunk_size]]
+            since = {symbol: self.last_timestamp(symbol, timeframe) for symbol in chunk}
+
+            query = select(*columns).where(
+                HistoricalData.symbol.in_(chunk),
+                HistoricalData.timeframe == timeframe
+            )
+            if all(since.values()):
+                query = query.where(HistoricalData.timestamp >= min(since.values()))
+            query = query.order_by(HistoricalData.symbol, HistoricalData.timestamp)
+
+            frame = pd.DataFrame(db.execute(query).all(), columns=names)
+            if frame.empty:
+                continue
+
+            for symbol, group in frame.groupby('symbol', sort=False):
+                if since.get(symbol):
+                    group = group[group['timestamp'] >= since[symbol]]
+                written = self.write(symbol, timeframe, group)
+                if written:
+                    symbols_written += 1
+                    rows_written += written
+
+        return {"timeframe": timeframe, "symbols": symbols_written, "rows": rows_written}
+
+    def sync_from_ohlcv_daily(self, connection, symbols: Optional[List[str]] = None,
+                              timeframe: str = '1D') -> Dict:
+        """Incrementally copy the Kulamagi historical_ohlcv_daily table (pymysql connection)"""
+        sql = "SELECT symbol, date, open, high, low, close, volume, adj_close FROM historical_ohlcv_daily"
+        stored = symbols if symbols else self.symbols(timeframe)
+        watermarks = {symbol: self.last_timestamp(symbol, timeframe) for symbol in stored}
+
+        # Watermark per symbol: symbols dengan last date yang sama dikelompokkan,
+        # symbols yang belum ada di store di-load tanpa date bound
+        by_date: Dict[date, List[str]] = {}
+        for symbol, last in watermarks.items():
+            if last:
+                by_date.setdefault(last.date(), []).append(symbol)
+        new_symbols = [symbol for symbol, last in watermarks.items() if not last]
+
+        clauses, params = [], []
+        for since, group in sorted(by_date.items()):
+            clauses.append(f"(symbol IN ({', '.join(['%s'] * len(group))}) AND date >= %s)")
+            params.extend(group)
+            params.append(since)
+        if symbols:
+            if new_symbols:
+                clauses.append(f"symbol IN ({', '.join(['%s'] * len(new_symbols))})")
+                params.extend(new_symbols)
+        elif by_date:
+            # Semua symbols di table yang belum ada di store
+            known = [symbol for group in by_date.values() for symbol in group]
+            clauses.append(f"symbol NOT IN ({', '.join(['%s'] * len(known))})")
+            params.extend(known)
+        if clauses:
+            sql += " WHERE " + " OR ".join(clauses)
+        sql += " ORDER BY symbol, date"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+        frame = pd.DataFrame(rows, columns=names if rows and not isinstance(rows[0], dict) else None)
+        if frame.empty:
+            return {"timeframe": timeframe, "symbols": 0, "rows": 0}
+
+        symbols_written = 0
+        rows_written = 0
+        for symbol, group in frame.groupby('symbol', sort=False):
+            last = watermarks.get(symbol)
+            if last:
+                group = group[pd.to_datetime(group['date']) >= last]
+            written = self.write(symbol, timeframe, group)
+            if written:
+                symbols_written += 1
+                rows_written += written
+
+        return {"timeframe": timeframe, "symbols": symbols_written, "rows": rows_written}
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_bar_store() -> BarStore:
+    """Process-wide store at settings.BAR_STORE_PATH (shared memory-map cache)"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = BarStore(settings.BAR_STORE_PATH)
+        return _default_store
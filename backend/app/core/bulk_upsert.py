@@ -0,0 +1,77 @@
+"""
+Bulk Upsert Helpers untuk ingest DataFrame ke MySQL
+"""
+import numpy as np
+import pandas as pd
+from typing import Iterator, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def _to_python(value):
+    """Convert numpy/pandas scalars to plain Python values for the DB driver"""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def frame_to_records(data: pd.DataFrame, columns: Sequence[str]) -> List[tuple]:
+    """Convert DataFrame columns to DB-API tuples (NaN/NaT -> None) without iterrows"""
+    frame = data.loc[:, list(columns)]
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [
+        tuple(_to_python(value) for value in row)
+        for row in frame.itertuples(index=False, name=None)
+    ]
+
+def iter_chunks(records: Sequence, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Sequence]:
+    """Yield consecutive slices of at most chunk_size records"""
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(records), chunk_size):
+        yield records[start:start + chunk_size]
+
+def build_upsert_sql(table: str,
+                     columns: Sequence[str],
+                     update_columns: Optional[Sequence[str]] = None,
+                     num_rows: int = 1) -> str:
+    """
+    Multi-row INSERT ... ON DUPLICATE KEY UPDATE statement (format paramstyle).
+
+    Satu statement untuk num_rows rows, sehingga satu chunk = satu round-trip.
+    """
+    if update_columns is None:
+        update_columns = list(columns)
+
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    values = ", ".join([placeholders] * num_rows)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values}"
+
+    if update_columns:
+        updates = ", ".join(f"{col} = VALUES({col})" for col in update_columns)
+        sql += f" ON DUPLICATE KEY UPDATE {updates}"
+    return sql
+
+def bulk_upsert(cursor,
+                table: str,
+                columns: Sequence[str],
+                records: Sequence[tuple],
+                update_columns: Optional[Sequence[str]] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[int, int]:
+    """
+    Upsert records through a DB-API cursor in chunked multi-row statements.
+
+    Returns (statements executed, affected rows as reported by MySQL: 1 per
+    inserted row, 2 per updated row).
+    """
+    statements = 0
+    affected = 0
+    for chunk in iter_chunks(records, chunk_size):
+        sql = build_upsert_sql(table, columns, update_columns, len(chunk))
+        params = [value for record in chunk for value in record]
+        cursor.execute(sql, params)
+        statements += 1
+        affected += max(cursor.rowcount, 0)
+    return statements, affected
@@ -0,0 +1,402 @@
+"""
+Delivery Queue
+Durable notification delivery: Redis stream per channel, per-channel worker
+pools dengan micro-batching, retry dengan exponential backoff dan dead-letter
+stream
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SendFn = Callable[[List[Dict[str, Any]]], Awaitable[Optional[Sequence[Optional[str]]]]]
+HookFn = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+class DeliveryChannel:
+    """
+    Satu delivery channel (email, sms, push, webhook, ...).
+
+    send(events) menerima satu micro-batch dan mengembalikan None (semua
+    sukses) atau list error per event (None = sukses). Exception dianggap
+    gagal untuk seluruh batch.
+    """
+
+    def __init__(self,
+                 name: str,
+                 send: SendFn,
+                 batch_size: int = 1,
+                 concurrency: int = 1,
+                 timeout: float = 30.0):
+        self.name = name
+        self.send = send
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+
+class _ChannelMetrics:
+    __slots__ = ('delivered', 'failed', 'retried', 'dead', 'batches', 'batched_events', 'latencies', 'started_at')
+
+    def __init__(self):
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead = 0
+        self.batches = 0
+        self.batched_events = 0
+        self.latencies: Deque[float] = deque(maxlen=10000)
+        self.started_at = time.monotonic()
+
+# ZREM + XADD per due retry dalam satu script: crash di tengah tidak bisa
+# menghilangkan retry, dan dua workers tidak bisa memindahkan member yang sama
+PROMOTE_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(members) do
+    local item = cjson.decode(member)
+    redis.call('XADD', ARGV[3] .. ':' .. item['channel'], 'MAXLEN', '~', ARGV[4], '*',
+               'event', item['event'], 'attempt', tostring(item['attempt']),
+               'enqueued_at', tostring(item['enqueued_at']))
+    redis.call('ZREM', KEYS[1], member)
+end
+return #members
+"""
+
+class DeliveryQueue:
+    """
+    Persistent queue di Redis (redis.asyncio client, decode_responses=True).
+
+    - {prefix}:{channel}  stream per channel, consumer group `group`
+    - {prefix}:retry      sorted set (score = due timestamp) untuk retries
+    - {prefix}:dead       dead-letter stream
+
+    Entry = {'event': json, 'attempt': n, 'enqueued_at': ts}.
+    """
+
+    def __init__(self, redis_client, prefix: str = "notifications:delivery", group: str = "delivery",
+                 maxlen: int = 1000000):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.group = group
+        self.maxlen = maxlen
+        self.retry_key = f"{prefix}:retry"
+        self.dead_key = f"{prefix}:dead"
+
+    def stream(self, channel: str) -> str:
+        return f"{self.prefix}:{channel}"
+
+    async def ensure_group(self, channel: str):
+        try:
+            await self.redis.xgroup_create(self.stream(channel), self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @staticmethod
+    def _fields(event: Dict[str, Any], attempt: int, enqueued_at: Optional[float]) -> Dict[str, Any]:
+        return {
+            "event": json.dumps(event, default=str),
+            "attempt": attempt,
+            "enqueued_at": enqueued_at if enqueued_at is not None else time.time(),
+        }
+
+    async def enqueue_many(self, items: Sequence[Tuple[str, Dict[str, Any]]], deliver_at: Optional[float] = None) -> int:
+        """Enqueue (channel, event) pairs dalam satu pipeline; deliver_at di masa depan lewat retry set"""
+        if not items:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for channel, event in items:
+            if deliver_at is not None and deliver_at > time.time():
+                pipe.zadd(self.retry_key, {self._retry_member(channel, event, 0, None): deliver_at})
+            else:
+                pipe.xadd(self.stream(channel), self._fields(event, 0, None), maxlen=self.maxlen, approximate=True)
+        await pipe.execute()
+        return len(items)
+
+    def _retry_member(self, channel: str, event: Dict[str, Any], attempt: int, enqueued_at: Optional[float]) -> str:
+        return json.dumps({"id": uuid.uuid4().hex, "channel": channel, **self._fields(event, attempt, enqueued_at)})
+
+    async def _grouped(self, channel: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Jalankan group command; jika stream/group hilang (NOGROUP) buat ulang lalu coba sekali lagi"""
+        try:
+            return await call()
+        except Exception as e:
+            if "NOGROUP" not in str(e):
+                raise
+            logger.warning(f"Delivery group missing on {self.stream(channel)}, recreating")
+            await self.ensure_group(channel)
+            return await call()
+
+    async def read(self, channel: str, consumer: str, count: int, block_ms: int) -> List[Tuple[str, Dict]]:
+        reply = await self._grouped(channel, lambda: self.redis.xreadgroup(
+            self.group, consumer, {self.stream(channel): ">"}, count=count, block=block_ms
+        ))
+        return [entry for _, entries in reply or [] for entry in entries]
+
+    async def claim_stale(self, channel: str, consumer: str, idle_ms: int, count: int) -> List[Tuple[str, Dict]]:
+        """Ambil alih entries yang di-read consumer lain tapi tidak pernah di-ack (crash/restart)"""
+        reply = await self._grouped(channel, lambda: self.redis.xautoclaim(
+            self.stream(channel), self.group, consumer, idle_ms, start_id="0-0", count=count
+        ))
+        return [entry for entry in reply[1] if entry[1]]
+
+    async def settle(self,
+                     channel: str,
+                     ack_ids: List[str],
+                     retries: List[Tuple[Dict, int, float, float]],
+                     dead: List[Tuple[Dict, int, float, str]]):
+        """
+        Retry/dead-letter writes lalu ack + delete dalam satu pipeline.
+
+        Urutan ini at-least-once: crash di tengah menghasilkan duplicate
+        delivery, bukan event yang hilang.
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        for event, attempt, enqueued_at, due in retries:
+            pipe.zadd(self.retry_key, {self._retry_member(channel, event, attempt, enqueued_at): due})
+        for event, attempt, enqueued_at, error in dead:
+            fields = self._fields(event, attempt, enqueued_at)
+            pipe.xadd(self.dead_key, {**fields, "channel": channel, "error": error[:500], "dead_at": time.time()},
+                      maxlen=self.maxlen, approximate=True)
+        if ack_ids:
+            pipe.xack(self.stream(channel), self.group, *ack_ids)
+            pipe.xdel(self.stream(channel), *ack_ids)
+        await pipe.execute()
+
+    async def promote_due(self, limit: int = 500) -> int:
+        """Pindahkan retries yang sudah due kembali ke channel streams (atomic, lihat PROMOTE_SCRIPT)"""
+        return int(await self.redis.eval(PROMOTE_SCRIPT, 1, self.retry_key,
+                                         time.time(), limit, self.prefix, self.maxlen))
+
+    async def depth(self, channels: Sequence[str]) -> Dict[str, Any]:
+        pipe = self.redis.pipeline(transaction=False)
+        for channel in channels:
+            pipe.xlen(self.stream(channel))
+        pipe.zcard(self.retry_key)
+        pipe.xlen(self.dead_key)
+        replies = await pipe.execute()
+        return {
+            "streams": dict(zip(channels, replies[:len(channels)])),
+            "retry": replies[-2],
+            "dead": replies[-1],
+        }
+
+class DeliveryWorkerPool:
+    """
+    Per-channel worker pools di atas DeliveryQueue.
+
+    Setiap channel punya `concurrency` workers; setiap worker membaca sampai
+    batch_size events per XREADGROUP dan memanggil channel.send() sekali per
+    batch. Event gagal di-retry dengan exponential backoff (+ jitter) sampai
+    max_attempts, lalu masuk dead-letter stream. Entries yang tertinggal di
+    pending list consumer yang mati di-claim ulang setelah claim_idle_ms.
+    """
+
+    def __init__(self,
+                 queue: DeliveryQueue,
+                 channels: Sequence[DeliveryChannel],
+                 max_attempts: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 300.0,
+                 block_ms: int = 1000,
+                 claim_idle_ms: int = 60000,
+                 retry_poll_interval: float = 1.0,
+                 on_delivered: Optional[HookFn] = None,
+                 on_dead: Optional[HookFn] = None):
+        self.queue = queue
+        self.channels = {channel.name: channel for channel in channels}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.retry_poll_interval = retry_poll_interval
+        self.on_delivered = on_delivered
+        self.on_dead = on_dead
+
+        self.consumer_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.metrics = {name: _ChannelMetrics() for name in self.channels}
+        self._tasks: List[asyncio.Task] = []
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._running = False
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._running:
+                return
+            for name in self.channels:
+                await self.queue.ensure_group(name)
+            self._running = True
+            for name, channel in self.channels.items():
+                for i in range(channel.concurrency):
+                    consumer = f"{self.consumer_prefix}-{name}-{i}"
+                    self._tasks.append(asyncio.create_task(self._worker(channel, consumer)))
+            self._tasks.append(asyncio.create_task(self._retry_loop()))
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop menerima batch baru; batch yang sedang dikirim diberi waktu selesai"""
+        self._running = False
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, channel: str, event: Dict[str, Any], deliver_at: Optional[float] = None) -> int:
+        return await self.enqueue_many([(channel, event)], deliver_at)
+
+    async def enqueue_many(self, items: Sequence[Tuple[str, Dict[str, Any]]], deliver_at: Optional[float] = None) -> int:
+        unknown = {channel for channel, _ in items if channel not in self.channels}
+        if unknown:
+            raise ValueError(f"Unknown delivery channels: {sorted(unknown)}")
+        if not self._running:
+            await self.start()
+        return await self.queue.enqueue_many(items, deliver_at)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    async def _worker(self, channel: DeliveryChannel, consumer: str):
+        # Recovery dulu: entries milik consumer yang mati
+        next_claim = 0.0
+        while self._running:
+            try:
+                entries = []
+                if time.monotonic() >= next_claim:
+                    entries = await self.queue.claim_stale(channel.name, consumer, self.claim_idle_ms,
+                                                           channel.batch_size)
+                    next_claim = time.monotonic() + self.claim_idle_ms / 1000
+                if not entries:
+                    entries = await self.queue.read(channel.name, consumer, channel.batch_size, self.block_ms)
+                if entries:
+                    await self._deliver(channel, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Delivery worker {consumer} error: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _deliver(self, channel: DeliveryChannel, entries: List[Tuple[str, Dict]]):
+        metrics = self.metrics[channel.name]
+        ids, events, attempts, enqueued = [], [], [], []
+        for entry_id, fields in entries:
+            ids.append(entry_id)
+            try:
+                events.append(json.loads(fields["event"]))
+            except (KeyError, ValueError, TypeError):
+                events.append(None)
+            attempts.append(int(fields.get("attempt", 0)))
+            enqueued.append(float(fields.get("enqueued_at", time.time())))
+
+        valid = [i for i, event in enumerate(events) if event is not None]
+        errors: List[Optional[str]] = ["invalid event payload"] * len(entries)
+        if valid:
+            try:
+                result = await asyncio.wait_for(channel.send([events[i] for i in valid]), channel.timeout)
+                for position, i in enumerate(valid):
+                    errors[i] = result[position] if result is not None else None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                for i in valid:
+                    errors[i] = error
+        metrics.batches += 1
+        metrics.batched_events += len(valid)
+
+        now = time.time()
+        delivered, retries, dead = [], [], []
+        for i, error in enumerate(errors):
+            if error is None:
+                delivered.append(events[i])
+                metrics.latencies.append(now - enqueued[i])
+                continue
+            metrics.failed += 1
+            attempt = attempts[i] + 1
+            if events[i] is None or attempt >= self.max_attempts:
+                dead.append((events[i] or {}, attempt, enqueued[i], error))
+            else:
+                retries.append((events[i], attempt, enqueued[i], now + self._backoff(attempt)))
+
+        await self.queue.settle(channel.name, ids, retries, dead)
+        metrics.delivered += len(delivered)
+        metrics.retried += len(retries)
+        metrics.dead += len(dead)
+
+        await self._call_hook(self.on_delivered, delivered)
+        await self._call_hook(self.on_dead, [event for event, *_ in dead if event])
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _call_hook(self, hook: Optional[HookFn], events: List[Dict]):
+        if hook is None or not events:
+            return
+        try:
+            await hook(events)
+        except Exception as e:
+            logger.error(f"Delivery hook error: {e}")
+
+    async def _retry_loop(self):
+        while self._running:
+            try:
+                moved = await self.queue.promote_due()
+                if moved:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Delivery retry loop error: {e}")
+            await asyncio.sleep(self.retry_poll_interval)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    async def get_stats(self) -> Dict[str, Any]:
+        try:
+            depth = await self.queue.depth(list(self.channels))
+        except Exception as e:
+            depth = {"error": str(e)}
+
+        channels = {}
+        for name, metrics in self.metrics.items():
+            latencies = sorted(metrics.latencies)
+
+            def percentile(q: float) -> float:
+                return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+
+            elapsed = time.monotonic() - metrics.started_at
+            channels[name] = {
+                "delivered": metrics.delivered,
+                "failed": metrics.failed,
+                "retried": metrics.retried,
+                "dead": metrics.dead,
+                "batches": metrics.batches,
+                "avg_batch_size": round(metrics.batched_events / metrics.batches, 2) if metrics.batches else 0,
+                "events_per_second": round(metrics.delivered / elapsed, 2) if elapsed else 0.0,
+                "latency_p50_ms": round(percentile(0.5) * 1000, 3),
+                "latency_p99_ms": round(percentile(0.99) * 1000, 3),
+                "concurrency": self.channels[name].concurrency,
+                "batch_size": self.channels[name].batch_size,
+            }
+        return {"running": self._running, "queue": depth, "channels": channels}
@@ -0,0 +1,206 @@
+"""
+Incremental Technical Indicator Engine
+Vectorized indicator passes dengan carried-forward EMA/Wilder state
+"""
+import numpy as np
+from typing import Dict, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from app.core.backtest_engine import VectorizedBacktestEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bars of history needed before the first new bar (longest window: sma_200)
+LOOKBACK = 250
+
+# Recursive state carried between runs
+STATE_KEYS = ('ema_12', 'ema_26', 'macd_signal', 'avg_gain', 'avg_loss',
+              'atr', 'plus_dm', 'minus_dm', 'adx', 'obv')
+
+rolling_sum = VectorizedBacktestEngine.rolling_sum
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    return rolling_sum(values, period) / period
+
+def _rolling_window(values: np.ndarray, period: int, func) -> np.ndarray:
+    """Apply func(axis=1) over trailing windows (NaN until window is full)"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = func(sliding_window_view(values, period), axis=1)
+    return out
+
+def ema(values: np.ndarray, period: int, prev: Optional[float] = None) -> np.ndarray:
+    """EMA (alpha = 2/(period+1)); tanpa prev di-seed dari value pertama"""
+    return _smooth(values, 2 / (period + 1), prev, seed_period=1)
+
+def wilder(values: np.ndarray, period: int, prev: Optional[float] = None) -> np.ndarray:
+    """Wilder smoothing (alpha = 1/period); tanpa prev di-seed dengan SMA pertama"""
+    return _smooth(values, 1 / period, prev, seed_period=period)
+
+def _smooth(values: np.ndarray, alpha: float, prev: Optional[float], seed_period: int) -> np.ndarray:
+    """
+    First-order recursive filter y[i] = alpha * x[i] + (1 - alpha) * y[i-1].
+
+    Dengan prev, filter dilanjutkan dari state tersebut; tanpa prev, leading
+    NaN di-skip dan y di-seed dengan mean seed_period value pertama.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    if prev is not None:
+        out[:], _ = lfilter([alpha], [1, -(1 - alpha)], values, zi=[(1 - alpha) * prev])
+        return out
+
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return out
+    seed_at = valid[0] + seed_period - 1
+    if seed_at >= n:
+        return out
+
+    out[seed_at] = values[valid[0]:seed_at + 1].mean()
+    if seed_at + 1 < n:
+        out[seed_at + 1:], _ = lfilter(
+            [alpha], [1, -(1 - alpha)], values[seed_at + 1:], zi=[(1 - alpha) * out[seed_at]]
+        )
+    return out
+
+def _last(values: np.ndarray) -> Optional[float]:
+    return float(values[-1]) if len(values) and np.isfinite(values[-1]) else None
+
+def is_complete(state: Optional[Dict]) -> bool:
+    """True jika semua recursive state tersedia (incremental run bisa dipakai)"""
+    return bool(state) and all(state.get(key) is not None for key in STATE_KEYS)
+
+def compute_indicators(high: np.ndarray,
+                       low: np.ndarray,
+                       close: np.ndarray,
+                       volume: np.ndarray,
+                       start: int = 0,
+                       state: Optional[Dict] = None) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Compute indicators for bars[start:].
+
+    bars[:start] adalah context yang sudah di-materialize (untuk rolling
+    windows dan previous close); recursive indicators dilanjutkan dari state.
+    Tanpa state, start harus 0 (full recompute). Returns (columns for
+    bars[start:], new state).
+    """
+    if start and not is_complete(state):
+        raise ValueError("Incremental indicator run requires a complete state")
+    if not start:
+        state = {}
+
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    volume = np.nan_to_num(np.asarray(volume, dtype=float))
+    new = slice(start, None)
+
+    prev_close = np.empty_like(close)
+    prev_close[1:] = close[:-1]
+    prev_close[0] = np.nan
+
+    # Window-based (exact over context + new bars)
+    sma_20 = rolling_mean(close, 20)
+    std_20 = _rolling_window(close, 20, np.std)
+    highest_14 = _rolling_window(high, 14, np.max)
+    lowest_14 = _rolling_window(low, 14, np.min)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stochastic_k = 100 * (close - lowest_14) / (highest_14 - lowest_14)
+        williams_r = -100 * (highest_14 - close) / (highest_14 - lowest_14)
+
+    typical = (high + low + close) / 3
+    typical_sma = rolling_mean(typical, 20)
+    mean_deviation = np.full(len(close), np.nan)
+    if len(close) >= 20:
+        windows = sliding_window_view(typical, 20)
+        mean_deviation[19:] = np.abs(windows - typical_sma[19:, None]).mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cci = (typical - typical_sma) / (0.015 * mean_deviation)
+
+    columns = {
+        'sma_20': sma_20,
+        'sma_50': rolling_mean(close, 50),
+        'sma_200': rolling_mean(close, 200),
+        'bollinger_upper': sma_20 + 2 * std_20,
+        'bollinger_middle': sma_20,
+        'bollinger_lower': sma_20 - 2 * std_20,
+        'stochastic_k': stochastic_k,
+        'stochastic_d': rolling_mean(stochastic_k, 3),
+        'williams_r': williams_r,
+        'cci': cci,
+        'volume_sma': rolling_mean(volume, 20),
+    }
+    columns = {name: values[new] for name, values in columns.items()}
+
+    # Recursive (continued from state on the new bars only)
+    c, pc, h, l = close[new], prev_close[new], high[new], low[new]
+
+    ema_12 = ema(c, 12, state.get('ema_12'))
+    ema_26 = ema(c, 26, state.get('ema_26'))
+    macd = ema_12 - ema_26
+    macd_signal = ema(macd, 9, state.get('macd_signal'))
+
+    change = c - pc
+    avg_gain = wilder(np.where(np.isnan(change), np.nan, np.maximum(change, 0)), 14, state.get('avg_gain'))
+    avg_loss = wilder(np.where(np.isnan(change), np.nan, np.maximum(-change, 0)), 14, state.get('avg_loss'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    rsi[np.isnan(avg_gain)] = np.nan
+
+    true_range = np.fmax(h - l, np.fmax(np.abs(h - pc), np.abs(l - pc)))
+    atr = wilder(true_range, 14, state.get('atr'))
+
+    prev_high = np.concatenate(([np.nan], high[:-1]))[new]
+    prev_low = np.concatenate(([np.nan], low[:-1]))[new]
+    up_move = h - prev_high
+    down_move = prev_low - l
+    plus_dm = np.where(np.isnan(up_move), np.nan, np.where((up_move > down_move) & (up_move > 0), up_move, 0.0))
+    minus_dm = np.where(np.isnan(down_move), np.nan, np.where((down_move > up_move) & (down_move > 0), down_move, 0.0))
+    plus_dm_smooth = wilder(plus_dm, 14, state.get('plus_dm'))
+    minus_dm_smooth = wilder(minus_dm, 14, state.get('minus_dm'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100 * plus_dm_smooth / atr
+        minus_di = 100 * minus_dm_smooth / atr
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum == 0, 0.0, 100 * np.abs(plus_di - minus_di) / di_sum)
+    dx[np.isnan(di_sum)] = np.nan
+    adx = wilder(dx, 14, state.get('adx'))
+
+    direction = np.nan_to_num(np.sign(change))
+    obv = state.get('obv', 0.0) + np.cumsum(direction * volume[new])
+
+    columns.update({
+        'ema_12': ema_12,
+        'ema_26': ema_26,
+        'macd': macd,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd - macd_signal,
+        'rsi_14': rsi,
+        'atr': atr,
+        'adx': adx,
+        'obv': obv,
+    })
+
+    new_state = {
+        'ema_12': _last(ema_12),
+        'ema_26': _last(ema_26),
+        'macd_signal': _last(macd_signal),
+        'avg_gain': _last(avg_gain),
+        'avg_loss': _last(avg_loss),
+        'atr': _last(atr),
+        'plus_dm': _last(plus_dm_smooth),
+        'minus_dm': _last(minus_dm_smooth),
+        'adx': _last(adx),
+        'obv': _last(obv),
+    }
+    return columns, new_state
+
+def classify_trend(sma_20: np.ndarray, sma_50: np.ndarray, sma_200: np.ndarray) -> np.ndarray:
+    """BULLISH / BEARISH / NEUTRAL per bar (None sebelum sma_200 tersedia)"""
+    trend = np.where((sma_20 > sma_50) & (sma_50 > sma_200), 'BULLISH',
+                     np.where((sma_20 < sma_50) & (sma_50 < sma_200), 'BEARISH', 'NEUTRAL')).astype(object)
+    trend[np.isnan(sma_200)] = None
+    return trend
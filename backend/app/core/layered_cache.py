@@ -0,0 +1,393 @@
+"""
+Layered Cache
+In-process LRU/TTL tier di depan Redis, dengan pub/sub invalidation dan single-flight loads
+"""
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LocalLRUCache:
+    """Bounded in-process cache; entries expire after their own TTL"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys: Iterable[str]) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def delete_pattern(self, pattern: str) -> int:
+        with self._lock:
+            matched = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+            for key in matched:
+                del self._data[key]
+            return len(matched)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class _Flight:
+    """One in-progress load shared by concurrent callers"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+class LayeredCache:
+    """
+    Two-tier cache: L1 = per-process LRU (decoded values), L2 = Redis (JSON).
+
+    get_or_load() mencoba L1, lalu L2, lalu loader; concurrent misses untuk
+    key yang sama menunggu satu loader (single-flight). Setiap delete/set
+    dipublish ke invalidation channel sehingga L1 worker lain ikut dibuang.
+    L1 TTL dibatasi l1_ttl agar staleness tetap terbatas jika pub/sub
+    message terlewat. Values di L1 di-share antar caller: jangan dimutasi.
+    """
+
+    def __init__(self,
+                 redis_client=None,
+                 max_entries: int = 10000,
+                 l1_ttl: float = 30.0,
+                 channel: str = "cache:invalidate",
+                 key_prefix: str = "cache:",
+                 scan_count: int = 1000,
+                 load_timeout: float = 30.0):
+        self.redis = redis_client
+        self.local = LocalLRUCache(max_entries)
+        self.l1_ttl = l1_ttl
+        self.channel = channel
+        self.key_prefix = key_prefix
+        self.scan_count = scan_count
+        self.load_timeout = load_timeout
+        self.node_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self.stats = {
+            "l1_hits": 0, "l1_misses": 0,
+            "l2_hits": 0, "l2_misses": 0, "l2_errors": 0,
+            "loads": 0, "coalesced": 0, "sets": 0,
+            "invalidations_sent": 0, "invalidations_received": 0,
+        }
+
+    def _rkey(self, key: str) -> str:
+        """Redis key: semua entries di bawah key_prefix (Redis db di-share dengan queue/state lain)"""
+        return f"{self.key_prefix}{key}"
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    # ------------------------------------------------------------------
+    # Reads / writes
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Any]:
+        """L1 then L2 lookup; an L2 hit is promoted to L1"""
+        found, value = self.local.get(key)
+        if found:
+            self._count("l1_hits")
+            return value
+        self._count("l1_misses")
+
+        if self.redis is None:
+            return None
+        self._ensure_listener()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(self._rkey(key))
+            pipe.pttl(self._rkey(key))
+            raw, pttl = pipe.execute()
+        except Exception as e:
+            self._count("l2_errors")
+            logger.warning(f"Redis cache error: {e}")
+            return None
+
+        if raw is None:
+            self._count("l2_misses")
+            return None
+        self._count("l2_hits")
+        value = json.loads(raw)
+        ttl = self.l1_ttl if pttl is None or pttl < 0 else min(self.l1_ttl, pttl / 1000)
+        if ttl > 0:
+            self.local.set(key, value, ttl)
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Batch get: L1 per key, sisanya dalam satu Redis pipeline; missing keys tidak di-return"""
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            hit, value = self.local.get(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        self._count("l1_hits", len(found))
+        self._count("l1_misses", len(missing))
+
+        if self.redis is None or not missing:
+            return found
+        self._ensure_listener()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in missing:
+                pipe.get(self._rkey(key))
+                pipe.pttl(self._rkey(key))
+            replies = pipe.execute()
+        except Exception as e:
+            self._count("l2_errors")
+            logger.warning(f"Redis cache error: {e}")
+            return found
+
+        for i, key in enumerate(missing):
+            raw, pttl = replies[2 * i], replies[2 * i + 1]
+            if raw is None:
+                self._count("l2_misses")
+                continue
+            self._count("l2_hits")
+            value = found[key] = json.loads(raw)
+            ttl = self.l1_ttl if pttl is None or pttl < 0 else min(self.l1_ttl, pttl / 1000)
+            if ttl > 0:
+                self.local.set(key, value, ttl)
+        return found
+
+    def set(self, key: str, value: Any, ttl: int):
+        """Write both tiers and tell other workers to drop their L1 copy"""
+        self.local.set(key, value, min(self.l1_ttl, ttl))
+        self._count("sets")
+        if self.redis is None:
+            return
+        self._ensure_listener()
+        try:
+            self.redis.setex(self._rkey(key), ttl, json.dumps(value, default=str))
+            self._broadcast({"keys": [key]})
+        except Exception as e:
+            self._count("l2_errors")
+            logger.warning(f"Redis cache set error: {e}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: int, force_refresh: bool = False) -> Any:
+        """
+        Cached value for key, else loader() (cached when truthy).
+
+        Hanya satu thread per process yang menjalankan loader untuk key yang
+        sama; yang lain menunggu hasilnya (fallback ke loader sendiri setelah
+        load_timeout).
+        """
+        if not force_refresh:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._count("coalesced")
+            if flight.done.wait(self.load_timeout):
+                return flight.value
+            return loader()
+
+        try:
+            self._count("loads")
+            value = loader()
+            if value:
+                self.set(key, value, ttl)
+            flight.value = value
+            return value
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def delete(self, *keys: str) -> int:
+        self.local.delete(keys)
+        if self.redis is None or not keys:
+            return 0
+        try:
+            deleted = self.redis.delete(*(self._rkey(key) for key in keys))
+            self._broadcast({"keys": list(keys)})
+            return deleted
+        except Exception as e:
+            self._count("l2_errors")
+            logger.warning(f"Redis cache delete error: {e}")
+            return 0
+
+    def invalidate_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Delete keys matching a glob pattern via SCAN (non-blocking for Redis)"""
+        self.local.delete_pattern(pattern)
+        if self.redis is None:
+            return 0
+
+        deleted = 0
+        batch: List[str] = []
+        for key in self.redis.scan_iter(match=self._rkey(pattern), count=self.scan_count):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += self.redis.unlink(*batch)
+
+        self._broadcast({"pattern": pattern})
+        return deleted
+
+    def clear_local(self):
+        self.local.clear()
+
+    def clear(self) -> int:
+        """Delete this cache's Redis keys (key_prefix only, bukan flushdb) and every worker's L1"""
+        self.local.clear()
+        if self.redis is None:
+            return 0
+        # invalidate_pattern juga mem-broadcast pattern "*" ke L1 workers lain
+        return self.invalidate_pattern("*")
+
+    def _broadcast(self, message: Dict):
+        try:
+            self.redis.publish(self.channel, json.dumps({"node": self.node_id, **message}))
+            self._count("invalidations_sent")
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish error: {e}")
+
+    def _apply(self, message: Dict):
+        if message.get("node") == self.node_id:
+            return
+        self._count("invalidations_received")
+        if message.get("clear"):
+            self.local.clear()
+        if message.get("keys"):
+            self.local.delete(message["keys"])
+        if message.get("pattern"):
+            self.local.delete_pattern(message["pattern"])
+
+    def _ensure_listener(self):
+        if self._listener is None and self.redis is not None:
+            with self._flights_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+                    self._listener.start()
+
+    def _listen(self):
+        """Apply invalidations from other workers; reconnects forever"""
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Invalidations bisa terlewat selama disconnected
+                self.local.clear()
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._apply(json.loads(message["data"]))
+                    except (ValueError, TypeError):
+                        continue
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}; retrying")
+                time.sleep(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+
+        def ratio(hits: int, misses: int) -> float:
+            return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+        return {
+            "l1": {
+                "hits": stats["l1_hits"],
+                "misses": stats["l1_misses"],
+                "hit_ratio": ratio(stats["l1_hits"], stats["l1_misses"]),
+                "entries": len(self.local),
+                "max_entries": self.local.max_entries,
+                "evictions": self.local.evictions,
+                "expirations": self.local.expirations,
+            },
+            "l2": {
+                "hits": stats["l2_hits"],
+                "misses": stats["l2_misses"],
+                "hit_ratio": ratio(stats["l2_hits"], stats["l2_misses"]),
+                "errors": stats["l2_errors"],
+            },
+            "loads": stats["loads"],
+            "coalesced": stats["coalesced"],
+            "sets": stats["sets"],
+            "invalidations_sent": stats["invalidations_sent"],
+            "invalidations_received": stats["invalidations_received"],
+        }
+
+_default_cache: Optional[LayeredCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_layered_cache() -> LayeredCache:
+    """Process-wide cache on the shared Redis client (L1 shared by all requests)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            from app.database import redis_client
+            _default_cache = LayeredCache(
+                redis_client,
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                l1_ttl=settings.CACHE_L1_TTL,
+                channel=settings.CACHE_INVALIDATION_CHANNEL,
+                key_prefix=settings.CACHE_KEY_PREFIX
+            )
+        return _default_cache
@@ -0,0 +1,245 @@
+"""
+Support/Resistance Level Engine
+Price-level clustering dari extrema, touch counts via searchsorted, opsional volume profile
+"""
+import numpy as np
+import pandas as pd
+import threading
+from scipy import signal
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def price_bins(prices: np.ndarray, tolerance: float) -> np.ndarray:
+    """Log-price histogram bins; setiap bin selebar tolerance (relative)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.floor(np.log(np.maximum(prices, 1e-12)) / np.log1p(tolerance)).astype(np.int64)
+
+def cluster_levels(prices: np.ndarray, tolerance: float):
+    """
+    Cluster prices into price bands (log-price bins). Returns (band per
+    price, band count) untuk np.bincount-style aggregation.
+    """
+    bands, inverse = np.unique(price_bins(prices, tolerance), return_inverse=True)
+    return inverse.ravel(), len(bands)
+
+def count_touches(sorted_values: np.ndarray, levels: np.ndarray, tolerance: float) -> np.ndarray:
+    """Bars with |value - level| <= level * tolerance, for every level at once"""
+    band = levels * tolerance
+    lo = np.searchsorted(sorted_values, levels - band, side='left')
+    hi = np.searchsorted(sorted_values, levels + band, side='right')
+    return hi - lo
+
+def merge_sorted(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return np.insert(sorted_values, np.searchsorted(sorted_values, values), values)
+
+def remove_sorted(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Remove one occurrence per value (values must be present)"""
+    values = np.sort(values)
+    positions = np.searchsorted(sorted_values, values, side='left')
+    # Duplicate values -> consecutive positions
+    positions += np.arange(len(values)) - np.searchsorted(values, values, side='left')
+    return np.delete(sorted_values, positions)
+
+class SupportResistanceEngine:
+    """
+    Support/resistance levels untuk satu series.
+
+    Extrema (find_peaks) di-cluster ke log-price bands (lebar = tolerance);
+    level = rata-rata extrema di band. Touches dihitung
+    dengan searchsorted di sorted lows/highs (O(levels x log bars), bukan
+    O(extrema x bars)). volume_weighted memakai volume profile: histogram
+    volume per log-price bin (lebar = tolerance); volume di band level
+    ikut menentukan strength.
+
+    update() menambahkan bar baru tanpa fit ulang: sorted arrays di-merge,
+    histogram di-increment, dan bars di luar lookback dibuang dari depan.
+    Extrema hanya dievaluasi ulang di region yang prominence-nya bisa berubah
+    (lihat _extend_extrema/_trim); hasilnya sama dengan fit() atas window yang
+    sama.
+    """
+
+    def __init__(self,
+                 tolerance: float = 0.02,
+                 prominence: float = 0.02,
+                 lookback: Optional[pd.Timedelta] = None,
+                 min_touches: int = 2,
+                 max_levels: int = 5,
+                 volume_weighted: bool = False):
+        self.tolerance = tolerance
+        self.prominence = prominence
+        self.lookback = pd.Timedelta(lookback) if lookback is not None else None
+        self.min_touches = min_touches
+        self.max_levels = max_levels
+        self.volume_weighted = volume_weighted
+        self.lock = threading.Lock()  # untuk engine yang di-share antar threads
+        self._reset()
+
+    def _reset(self):
+        self.timestamps = np.array([], dtype='datetime64[ns]')
+        self.high = np.array([])
+        self.low = np.array([])
+        self.typical = np.array([])
+        self.volume = np.array([])
+        self.peaks = np.array([], dtype=np.int64)
+        self.troughs = np.array([], dtype=np.int64)
+        self.sorted_high = np.array([])
+        self.sorted_low = np.array([])
+        self.profile = pd.Series(dtype=float)  # log-price bin -> volume
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.timestamps[-1]) if len(self.timestamps) else None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def _columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        timestamps = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.to_datetime(df['timestamp'])
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float) if 'close' in df.columns else (high + low) / 2
+        volume = df['volume'].to_numpy(dtype=float) if 'volume' in df.columns else np.zeros(len(df))
+        return {
+            'timestamp': np.asarray(timestamps, dtype='datetime64[ns]'),
+            'high': high,
+            'low': low,
+            'typical': (high + low + close) / 3,
+            'volume': np.nan_to_num(volume)
+        }
+
+    def _add_profile(self, typical: np.ndarray, volume: np.ndarray, sign: float = 1.0):
+        delta = pd.Series(volume * sign).groupby(price_bins(typical, self.tolerance)).sum()
+        self.profile = self.profile.add(delta, fill_value=0.0).sort_index()
+
+    def fit(self, df: pd.DataFrame) -> "SupportResistanceEngine":
+        """Full computation from a bar frame (indexed by timestamp atau dengan timestamp column)"""
+        self._reset()
+        return self.update(df)
+
+    def update(self, df: pd.DataFrame) -> "SupportResistanceEngine":
+        """Append bars newer than last_timestamp and refresh state incrementally"""
+        if df is None or len(df) == 0:
+            return self
+        columns = self._columns(df)
+        if len(self.timestamps):
+            new = columns['timestamp'] > self.timestamps[-1]
+            columns = {name: values[new] for name, values in columns.items()}
+        if len(columns['timestamp']) == 0:
+            return self
+
+        previous = len(self.timestamps)
+        self.timestamps = np.concatenate([self.timestamps, columns['timestamp']])
+        self.high = np.concatenate([self.high, columns['high']])
+        self.low = np.concatenate([self.low, columns['low']])
+        self.typical = np.concatenate([self.typical, columns['typical']])
+        self.volume = np.concatenate([self.volume, columns['volume']])
+        self.sorted_high = merge_sorted(self.sorted_high, columns['high'])
+        self.sorted_low = merge_sorted(self.sorted_low, columns['low'])
+        self._add_profile(columns['typical'], columns['volume'])
+
+        self.peaks = self._extend_extrema(self.peaks, self.high, previous)
+        self.troughs = self._extend_extrema(self.troughs, -self.low, previous)
+
+        self._trim()
+        return self
+
+    def _refit_extrema(self, extrema: np.ndarray, values: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        """
+        Ganti extrema di [lo, hi) dengan local maxima yang prominence-nya
+        (dihitung atas seluruh window) >= self.prominence; sisanya dipertahankan
+        """
+        maxima, _ = signal.find_peaks(values)
+        candidates = maxima[(maxima >= lo) & (maxima < hi)]
+        if len(candidates):
+            prominences = signal.peak_prominences(values, candidates)[0]
+            candidates = candidates[prominences >= self.prominence]
+        return np.concatenate([extrema[extrema < lo], candidates, extrema[extrema >= hi]]).astype(np.int64)
+
+    def _extend_extrema(self, extrema: np.ndarray, values: np.ndarray, previous: int) -> np.ndarray:
+        """
+        Extrema setelah append. Data baru di kanan hanya mengubah peaks yang
+        right base-nya mencapai ujung data lama, yaitu peaks mulai dari first
+        argmax data lama (peaks sebelumnya dibatasi bar yang lebih tinggi).
+        """
+        start = int(np.argmax(values[:previous])) if previous else 0
+        return self._refit_extrema(extrema, values, start, len(values))
+
+    def _trim(self):
+        """Drop bars older than last_timestamp - lookback"""
+        if self.lookback is None:
+            return
+        cutoff = self.timestamps[-1] - np.timedelta64(self.lookback.value, 'ns')
+        drop = int(np.searchsorted(self.timestamps, cutoff, side='left'))
+        if drop == 0:
+            return
+
+        self.sorted_high = remove_sorted(self.sorted_high, self.high[:drop])
+        self.sorted_low = remove_sorted(self.sorted_low, self.low[:drop])
+        self._add_profile(self.typical[:drop], self.volume[:drop], sign=-1.0)
+
+        self.timestamps = self.timestamps[drop:]
+        self.high = self.high[drop:]
+        self.low = self.low[drop:]
+        self.typical = self.typical[drop:]
+        self.volume = self.volume[drop:]
+        # Membuang bars kiri hanya mengubah peaks yang left base-nya mencapai
+        # bar pertama, yaitu peaks sampai last argmax window baru
+        self.peaks = self._refit_extrema(self.peaks[self.peaks >= drop] - drop, self.high,
+                                         0, len(self.high) - int(np.argmax(self.high[::-1])))
+        self.troughs = self._refit_extrema(self.troughs[self.troughs >= drop] - drop, -self.low,
+                                           0, len(self.low) - int(np.argmax(-self.low[::-1])))
+
+    def band_volume(self, levels: np.ndarray) -> np.ndarray:
+        """Volume profile: traded volume with typical price within tolerance of each level"""
+        if self.profile.empty:
+            return np.zeros(len(levels))
+        bins = self.profile.index.to_numpy()
+        cumulative = np.concatenate([[0.0], np.cumsum(self.profile.to_numpy())])
+        lo = np.searchsorted(bins, price_bins(levels * (1 - self.tolerance), self.tolerance), side='left')
+        hi = np.searchsorted(bins, price_bins(levels * (1 + self.tolerance), self.tolerance), side='right')
+        return cumulative[hi] - cumulative[lo]
+
+    def _levels(self, points: np.ndarray, prices: np.ndarray, sorted_values: np.ndarray) -> List[Dict]:
+        if len(points) == 0:
+            return []
+        values = prices[points]
+        band, n_bands = cluster_levels(values, self.tolerance)
+        counts = np.bincount(band, minlength=n_bands)
+        levels = np.bincount(band, weights=values, minlength=n_bands) / counts
+        latest = np.zeros(n_bands, dtype=np.int64)
+        np.maximum.at(latest, band, points)
+
+        touches = count_touches(sorted_values, levels, self.tolerance)
+        strength = np.minimum(touches / 5, 1.0)
+        volume = None
+        if self.volume_weighted:
+            volume = self.band_volume(levels)
+            if volume.max() > 0:
+                strength = 0.5 * strength + 0.5 * volume / volume.max()
+
+        selected = np.flatnonzero(touches >= self.min_touches)
+        selected = selected[np.argsort(-strength[selected], kind='stable')][:self.max_levels]
+        result = []
+        for i in selected:
+            level = {
+                'price': float(levels[i]),
+                'date': pd.Timestamp(self.timestamps[latest[i]]).isoformat(),
+                'touches': int(touches[i]),
+                'extrema': int(counts[i]),
+                'strength': float(strength[i])
+            }
+            if volume is not None:
+                level['volume'] = float(volume[i])
+            result.append(level)
+        return result
+
+    def support_levels(self) -> List[Dict]:
+        return self._levels(self.troughs, self.low, self.sorted_low)
+
+    def resistance_levels(self) -> List[Dict]:
+        return self._levels(self.peaks, self.high, self.sorted_high)
@@ -0,0 +1,134 @@
+"""
+Batched Monte Carlo Engine
+"""
+import numpy as np
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BatchedMonteCarloEngine:
+    """
+    Monte Carlo simulation on a (simulations x horizon) return matrix.
+
+    Paths diproses per chunk berukuran tetap sehingga memory tetap
+    O(chunk_size x horizon) berapapun jumlah simulasi.
+    """
+
+    METHODS = ("bootstrap", "block_bootstrap", "normal")
+
+    def __init__(self,
+                 returns: np.ndarray,
+                 initial_capital: float,
+                 seed: Optional[int] = None,
+                 chunk_size: int = 2000):
+        self.returns = np.asarray(returns, dtype=float)
+        self.initial_capital = initial_capital
+        self.rng = np.random.default_rng(seed)
+        self.chunk_size = max(1, chunk_size)
+
+    def _draw_returns(self, size: int, horizon: int, method: str, block_size: int) -> np.ndarray:
+        """Draw one chunk of return paths"""
+        n = len(self.returns)
+
+        if method == "normal":
+            return self.rng.normal(self.returns.mean(), self.returns.std(), (size, horizon))
+
+        if method == "block_bootstrap":
+            # Circular block bootstrap: blok berurutan menjaga autocorrelation
+            block_size = max(1, min(block_size, n))
+            num_blocks = -(-horizon // block_size)
+            starts = self.rng.integers(0, n, (size, num_blocks))
+            index = (starts[:, :, None] + np.arange(block_size)) % n
+            return self.returns[index.reshape(size, -1)[:, :horizon]]
+
+        index = self.rng.integers(0, n, (size, horizon))
+        return self.returns[index]
+
+    def _path_statistics(self, paths: np.ndarray) -> Dict[str, np.ndarray]:
+        """Final equity and max drawdown for every path in the chunk"""
+        peaks = np.maximum.accumulate(paths, axis=1)
+        peaks = np.maximum(peaks, self.initial_capital)
+        drawdowns = (peaks - paths) / peaks
+        return {
+            "final": paths[:, -1],
+            "max_drawdown": drawdowns.max(axis=1)
+        }
+
+    @staticmethod
+    def _moments(data: np.ndarray) -> Dict[str, float]:
+        """Mean, std, skewness and excess kurtosis of a sample"""
+        mean = np.mean(data)
+        std = np.std(data)
+        if std == 0:
+            return {"mean": mean, "std": std, "skewness": 0, "kurtosis": 0}
+        z = (data - mean) / std
+        return {
+            "mean": mean,
+            "std": std,
+            "skewness": np.mean(z ** 3),
+            "kurtosis": np.mean(z ** 4) - 3
+        }
+
+    def run(self,
+            num_simulations: int,
+            horizon: int = 252,
+            method: str = "bootstrap",
+            block_size: int = 20,
+            sample_paths: int = 100) -> Dict:
+        """Run all simulations chunk by chunk"""
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown Monte Carlo method: {method}")
+        if len(self.returns) == 0:
+            raise ValueError("No returns to sample from")
+
+        final_values = np.empty(num_simulations)
+        max_drawdowns = np.empty(num_simulations)
+        paths_sample = []
+
+        for start in range(0, num_simulations, self.chunk_size):
+            size = min(self.chunk_size, num_simulations - start)
+
+            returns = self._draw_returns(size, horizon, method, block_size)
+            paths = self.initial_capital * np.cumprod(1 + returns, axis=1)
+
+            stats = self._path_statistics(paths)
+            final_values[start:start + size] = stats["final"]
+            max_drawdowns[start:start + size] = stats["max_drawdown"]
+
+            if len(paths_sample) < sample_paths:
+                take = min(sample_paths - len(paths_sample), size)
+                initial = np.full((take, 1), self.initial_capital)
+                paths_sample.extend(np.hstack((initial, paths[:take])).tolist())
+
+        p5, p1 = np.percentile(final_values, [5, 1])
+        drawdown_percentiles = np.percentile(max_drawdowns, [50, 95, 99])
+
+        return {
+            'confidence_levels': {
+                '95': p5,
+                '99': p1
+            },
+            'worst_case': np.min(final_values),
+            'best_case': np.max(final_values),
+            'expected_value': np.mean(final_values),
+            'var_95': p5,
+            'var_99': p1,
+            'cvar_95': np.mean(final_values[final_values <= p5]),
+            'cvar_99': np.mean(final_values[final_values <= p1]),
+            'paths': paths_sample,
+            'stats': {
+                **self._moments(final_values),
+                'probability_of_loss': np.mean(final_values < self.initial_capital),
+                'max_drawdown': {
+                    'mean': np.mean(max_drawdowns),
+                    'median': drawdown_percentiles[0],
+                    'p95': drawdown_percentiles[1],
+                    'p99': drawdown_percentiles[2],
+                    'worst': np.max(max_drawdowns)
+                },
+                'method': method,
+                'horizon': horizon,
+                'block_size': block_size if method == "block_bootstrap" else None
+            }
+        }
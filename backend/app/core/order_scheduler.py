@@ -0,0 +1,276 @@
+"""
+Order Execution Scheduler
+Priority heap dengan per-symbol queues, bounded concurrency antar symbols
+dan batched result flush per tick
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ExecuteFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+FlushFn = Callable[[List[Tuple[Dict[str, Any], Dict[str, Any]]]], Awaitable[None]]
+
+class _SymbolQueue:
+    """Pending orders untuk satu symbol (min-heap by scheduling key)"""
+
+    __slots__ = ('heap', 'busy', 'version')
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, Dict]] = []
+        self.busy = False
+        self.version = 0
+
+class OrderScheduler:
+    """
+    Execution scheduler untuk pending orders.
+
+    Scheduling key = aging_rate * enqueued_at - priority: order yang menunggu
+    lebih lama naik prioritasnya secara kontinu tanpa re-sort (urutan relatif
+    antar keys tidak berubah terhadap waktu). Orders untuk symbol yang sama
+    dieksekusi berurutan; symbols berbeda berjalan concurrent sampai
+    max_concurrency. Hasil execution dikumpulkan dan diteruskan ke flush()
+    sekali per tick (atau saat max_batch tercapai) untuk batched DB writes.
+    """
+
+    def __init__(self,
+                 execute: ExecuteFn,
+                 flush: FlushFn,
+                 max_concurrency: int = 8,
+                 tick_interval: float = 0.05,
+                 aging_rate: float = 1.0,
+                 max_batch: int = 500):
+        self.execute = execute
+        self.flush = flush
+        self.max_concurrency = max(1, max_concurrency)
+        self.tick_interval = tick_interval
+        self.aging_rate = aging_rate
+        self.max_batch = max_batch
+
+        self._symbols: Dict[str, _SymbolQueue] = {}
+        self._ready: List[Tuple[float, int, str, int]] = []  # (head key, seq, symbol, version)
+        self._pending: Dict[Any, Dict] = {}
+        self._seq = itertools.count()
+        self._in_flight: Dict[asyncio.Task, Dict] = {}
+        self._results: List[Tuple[Dict, Dict]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'submitted': 0, 'dispatched': 0, 'executed': 0, 'cancelled': 0, 'errors': 0,
+            'flushes': 0, 'flushed': 0, 'queue_latency_sum': 0.0, 'queue_latency_max': 0.0,
+        }
+        self._latencies: Deque[float] = deque(maxlen=10000)
+        self._started_at: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Queue operations
+    # ------------------------------------------------------------------
+
+    def submit(self, order_id: Any, symbol: str, task: Dict[str, Any], priority: float = 0.0):
+        """Enqueue order (O(log n)); runner di-start jika belum berjalan"""
+        now = time.monotonic()
+        entry = {'order_id': order_id, 'symbol': symbol, 'task': task, 'enqueued_at': now}
+        key = self.aging_rate * now - priority
+        queue = self._symbols.get(symbol)
+        if queue is None:
+            queue = self._symbols[symbol] = _SymbolQueue()
+
+        improves_head = not queue.heap or key < queue.heap[0][0]
+        heapq.heappush(queue.heap, (key, next(self._seq), entry))
+        self._pending[order_id] = entry
+        self.stats['submitted'] += 1
+
+        if not queue.busy and improves_head:
+            self._push_ready(symbol, queue)
+        self._ensure_runner()
+        self._notify()
+
+    def cancel(self, order_id: Any) -> bool:
+        """Lazy removal: entry di-skip saat sampai di head queue"""
+        entry = self._pending.pop(order_id, None)
+        if entry is None:
+            return False
+        entry['cancelled'] = True
+        self.stats['cancelled'] += 1
+        return True
+
+    def set_concurrency(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self._notify()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _push_ready(self, symbol: str, queue: _SymbolQueue):
+        queue.version += 1
+        heapq.heappush(self._ready, (queue.heap[0][0], next(self._seq), symbol, queue.version))
+
+    def _clean_head(self, queue: _SymbolQueue):
+        while queue.heap and queue.heap[0][2].get('cancelled'):
+            heapq.heappop(queue.heap)
+
+    def _next_entry(self) -> Optional[Dict]:
+        """Pop order dengan key terkecil di antara symbols yang tidak busy"""
+        while self._ready:
+            key, _, symbol, version = heapq.heappop(self._ready)
+            queue = self._symbols.get(symbol)
+            if queue is None or queue.busy or version != queue.version:
+                continue
+            self._clean_head(queue)
+            if not queue.heap:
+                del self._symbols[symbol]
+                continue
+            if queue.heap[0][0] != key:
+                # Head berubah karena cancellations; antri ulang dengan key baru
+                self._push_ready(symbol, queue)
+                continue
+            entry = heapq.heappop(queue.heap)[2]
+            queue.busy = True
+            del self._pending[entry['order_id']]
+            return entry
+        return None
+
+    # ------------------------------------------------------------------
+    # Runner
+    # ------------------------------------------------------------------
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_runner(self):
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._started_at = time.monotonic()
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_flush = loop.time() + self.tick_interval
+        try:
+            while True:
+                self._dispatch()
+                if not (self._pending or self._in_flight):
+                    if self._results:
+                        await self._flush()
+                        continue
+                    # Tidak ada await setelah check ini: submit() berikutnya start runner baru
+                    break
+
+                now = loop.time()
+                if self._results and (now >= next_flush or len(self._results) >= self.max_batch):
+                    await self._flush()
+                    next_flush = loop.time() + self.tick_interval
+                    continue
+
+                self._wakeup.clear()
+                timeout = max(next_flush - now, 0) if self._results else self.tick_interval
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            for task in self._in_flight:
+                task.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error in order scheduler: {e}")
+
+    def _dispatch(self):
+        while len(self._in_flight) < self.max_concurrency:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            latency = time.monotonic() - entry['enqueued_at']
+            self.stats['dispatched'] += 1
+            self._latencies.append(latency)
+            self.stats['queue_latency_sum'] += latency
+            self.stats['queue_latency_max'] = max(self.stats['queue_latency_max'], latency)
+
+            task = asyncio.create_task(self.execute(entry['task']))
+            self._in_flight[task] = entry
+            task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        entry = self._in_flight.pop(task)
+        symbol = entry['symbol']
+        queue = self._symbols.get(symbol)
+        if queue is not None:
+            queue.busy = False
+            self._clean_head(queue)
+            if queue.heap:
+                self._push_ready(symbol, queue)
+            else:
+                del self._symbols[symbol]
+
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.stats['errors'] += 1
+            result = {'success': False, 'reason': str(error)}
+        else:
+            result = task.result()
+        self.stats['executed'] += 1
+        self._results.append((entry['task'], result))
+        self._notify()
+
+    async def _flush(self):
+        batch, self._results = self._results, []
+        try:
+            await self.flush(batch)
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} order results: {e}")
+        self.stats['flushes'] += 1
+        self.stats['flushed'] += len(batch)
+
+    async def drain(self):
+        """Tunggu sampai semua pending orders dieksekusi dan di-flush"""
+        if self._runner is not None:
+            await self._runner
+
+    async def stop(self):
+        if self._runner is not None and not self._runner.done():
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        executed = stats['executed']
+        latencies = sorted(self._latencies)
+
+        def percentile(q: float) -> float:
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'pending': len(self._pending),
+            'in_flight': len(self._in_flight),
+            'symbols_queued': len(self._symbols),
+            'max_concurrency': self.max_concurrency,
+            'submitted': stats['submitted'],
+            'executed': executed,
+            'cancelled': stats['cancelled'],
+            'errors': stats['errors'],
+            'flushes': stats['flushes'],
+            'avg_flush_size': round(stats['flushed'] / stats['flushes'], 2) if stats['flushes'] else 0,
+            'orders_per_second': round(executed / elapsed, 2) if elapsed else 0.0,
+            'queue_latency_avg_ms': (round(stats['queue_latency_sum'] / stats['dispatched'] * 1000, 3)
+                                     if stats['dispatched'] else 0.0),
+            'queue_latency_p50_ms': round(percentile(0.5) * 1000, 3),
+            'queue_latency_p99_ms': round(percentile(0.99) * 1000, 3),
+            'queue_latency_max_ms': round(stats['queue_latency_max'] * 1000, 3),
+        }
@@ -0,0 +1,488 @@
+"""
+Portfolio Optimizer
+Shrinkage covariance cache, Cholesky-based solvers (mean-variance, minimum
+variance, risk parity), warm starts, batched efficient frontier dan worker pool
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve, LinAlgError
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PERIODS_PER_YEAR = 252
+METHODS = ('markowitz', 'black_litterman', 'minimum_variance', 'risk_parity')
+
+# ----------------------------------------------------------------------
+# Covariance estimation
+# ----------------------------------------------------------------------
+
+def ledoit_wolf_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf (2004) shrinkage ke scaled identity untuk (rows x assets)
+    returns tanpa NaN. Returns (covariance, shrinkage intensity).
+    """
+    x = returns - returns.mean(axis=0)
+    rows, assets = x.shape
+    sample = x.T @ x / rows
+    scale = np.trace(sample) / assets
+    target = scale * np.eye(assets)
+
+    dispersion = ((sample - target) ** 2).sum() / assets
+    if dispersion <= 0:
+        return target, 1.0
+    # sum_t ||x_t x_t' - S||^2 = sum_t ||x_t||^4 - rows * ||S||^2
+    row_norms = (x * x).sum(axis=1)
+    noise = ((row_norms ** 2).sum() / rows - (sample ** 2).sum()) / (rows * assets)
+    shrinkage = float(np.clip(noise / dispersion, 0.0, 1.0))
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+def _cholesky(matrix: np.ndarray):
+    """cho_factor dengan ridge kecil jika matrix hampir singular"""
+    try:
+        return cho_factor(matrix, lower=True)
+    except LinAlgError:
+        ridge = 1e-10 * max(np.trace(matrix) / len(matrix), 1e-12)
+        return cho_factor(matrix + ridge * np.eye(len(matrix)), lower=True)
+
+class CovarianceEstimate:
+    """Annualized expected returns dan shrinkage covariance (+ Cholesky factor) untuk satu symbol set"""
+
+    def __init__(self, symbols: List[str], returns: pd.DataFrame, periods_per_year: int = PERIODS_PER_YEAR):
+        symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol in returns.columns]
+        complete = returns[symbols].dropna()
+        if len(complete) < 2:
+            raise ValueError("Insufficient overlapping returns for covariance estimate")
+        values = complete.to_numpy()
+        covariance, shrinkage = ledoit_wolf_covariance(values)
+
+        self.symbols = symbols
+        self.observations = len(values)
+        self.shrinkage = shrinkage
+        self.expected_returns = values.mean(axis=0) * periods_per_year
+        self.covariance = covariance * periods_per_year
+        self.factor = _cholesky(self.covariance)
+
+# ----------------------------------------------------------------------
+# Solvers
+# ----------------------------------------------------------------------
+
+def project_to_budget(x: np.ndarray, lower: float, upper: float, total: float = 1.0) -> np.ndarray:
+    """Euclidean projection ke {lower <= w <= upper, sum(w) = total} (bisection pada shift)"""
+    lo, hi = x.min() - upper, x.max() - lower
+    for _ in range(100):
+        shift = 0.5 * (lo + hi)
+        if np.clip(x - shift, lower, upper).sum() > total:
+            lo = shift
+        else:
+            hi = shift
+    return np.clip(x - 0.5 * (lo + hi), lower, upper)
+
+def _check_budget(assets: int, lower: float, upper: float):
+    if assets * lower > 1 + 1e-12 or assets * upper < 1 - 1e-12:
+        raise ValueError(f"Weight bounds [{lower}, {upper}] infeasible for {assets} assets")
+
+def solve_budget_qp(covariance: np.ndarray,
+                    linear: np.ndarray,
+                    lower: float,
+                    upper: float,
+                    x0: Optional[np.ndarray] = None,
+                    tol: float = 1e-10) -> np.ndarray:
+    """
+    min 0.5 w'Cw - linear'w  s.t.  sum(w) = 1, lower <= w <= upper.
+
+    Primal active-set: setiap iteration menyelesaikan KKT system untuk
+    free weights dengan satu Cholesky factor dari C[free, free]. Warm start
+    dari x0 (diproyeksikan ke feasible set) biasanya selesai dalam beberapa
+    iteration.
+    """
+    assets = len(linear)
+    _check_budget(assets, lower, upper)
+    start = np.full(assets, 1.0 / assets) if x0 is None else np.asarray(x0, dtype=float)
+    w = project_to_budget(start, lower, upper)
+
+    bound = np.zeros(assets, dtype=np.int8)  # -1 di lower, +1 di upper, 0 free
+    ones = np.ones(assets)
+    for _ in range(10 * assets + 50):
+        gradient = covariance @ w - linear
+        free = bound == 0
+        step = np.zeros(assets)
+        multiplier = None
+        if free.any():
+            factor = _cholesky(covariance[np.ix_(free, free)])
+            solved = cho_solve(factor, np.column_stack([gradient[free], ones[free]]))
+            multiplier = -solved[:, 0].sum() / solved[:, 1].sum()
+            step[free] = -solved[:, 0] - solved[:, 1] * multiplier
+
+        if np.abs(step).max() <= tol * (1 + np.abs(w).max()):
+            if multiplier is None:
+                # Semua weights di bounds: pilih multiplier budget yang paling konsisten
+                at_lower = -gradient[bound < 0]
+                multiplier = at_lower.max() if len(at_lower) else (-gradient[bound > 0]).min()
+            reduced = gradient + multiplier
+            violation = np.where(bound < 0, -reduced, np.where(bound > 0, reduced, 0.0))
+            worst = int(np.argmax(violation))
+            if violation[worst] <= 1e-10 * (1 + np.abs(gradient).max()):
+                return w
+            bound[worst] = 0
+            continue
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(step < 0, (lower - w) / step, np.where(step > 0, (upper - w) / step, np.inf))
+        ratios[~free] = np.inf
+        blocking = int(np.argmin(ratios))
+        alpha = min(1.0, max(ratios[blocking], 0.0))
+        w = w + alpha * step
+        if alpha < 1.0:
+            bound[blocking] = -1 if step[blocking] < 0 else 1
+            w[blocking] = lower if step[blocking] < 0 else upper
+
+    logger.warning("Active-set QP hit iteration limit")
+    return w
+
+def extreme_return_weights(expected_returns: np.ndarray, lower: float, upper: float,
+                           maximize: bool = True) -> np.ndarray:
+    """Budget-feasible weights dengan return tertinggi (atau terendah): greedy fill"""
+    assets = len(expected_returns)
+    _check_budget(assets, lower, upper)
+    w = np.full(assets, lower)
+    remaining = 1.0 - w.sum()
+    order = np.argsort(-expected_returns if maximize else expected_returns, kind='stable')
+    for i in order:
+        add = min(upper - lower, remaining)
+        w[i] += add
+        remaining -= add
+        if remaining <= 0:
+            break
+    return w
+
+def solve_target_return(covariance: np.ndarray,
+                        expected_returns: np.ndarray,
+                        target: float,
+                        lower: float,
+                        upper: float,
+                        x0: Optional[np.ndarray] = None,
+                        t0: float = 0.0) -> Tuple[np.ndarray, float]:
+    """
+    Minimum variance dengan mu'w = target.
+
+    Solusi mean-variance w(t) (min 0.5 w'Cw - t mu'w) piecewise linear dan
+    return-nya monoton dalam t, jadi t dicari dengan bisection (warm-started)
+    lalu w diinterpolasi exact di dalam bracket terakhir. Returns (w, t).
+    """
+    r_max = expected_returns @ extreme_return_weights(expected_returns, lower, upper, True)
+    r_min = expected_returns @ extreme_return_weights(expected_returns, lower, upper, False)
+    tolerance = 1e-10 * (1 + abs(target))
+    if target > r_max + tolerance or target < r_min - tolerance:
+        raise ValueError(f"Target return {target:.4f} not attainable in [{r_min:.4f}, {r_max:.4f}]")
+
+    def solve(t, start):
+        w = solve_budget_qp(covariance, t * expected_returns, lower, upper, start)
+        return w, float(expected_returns @ w)
+
+    w0, r0 = solve(t0, x0)
+    if abs(r0 - target) <= tolerance:
+        return w0, t0
+
+    # Bracket t: langkah awal di skala variance / return spread
+    spread = max(np.ptp(expected_returns), 1e-12)
+    step = np.trace(covariance) / len(covariance) / spread
+    direction = 1.0 if r0 < target else -1.0
+    t_a, w_a, r_a = t0, w0, r0
+    for _ in range(200):
+        t_b = t_a + direction * step
+        w_b, r_b = solve(t_b, w_a)
+        if (r_b - target) * direction >= -tolerance:
+            break
+        t_a, w_a, r_a = t_b, w_b, r_b
+        step *= 2
+    else:
+        # Target di ujung frontier (mis. r_max): return extreme portfolio
+        return extreme_return_weights(expected_returns, lower, upper, direction > 0), t_a
+
+    for _ in range(100):
+        if abs(r_b - r_a) <= tolerance:
+            break
+        # w(t) linear di dalam bracket jika active set sama: coba interpolasi exact
+        fraction = (target - r_a) / (r_b - r_a)
+        candidate = w_a + fraction * (w_b - w_a)
+        t_candidate = t_a + fraction * (t_b - t_a)
+        check, _ = solve(t_candidate, candidate)
+        if np.abs(check - candidate).max() <= 1e-9:
+            return candidate, t_candidate
+
+        t_mid = 0.5 * (t_a + t_b)
+        w_mid, r_mid = solve(t_mid, w_a)
+        if (r_mid - target) * direction < 0:
+            t_a, w_a, r_a = t_mid, w_mid, r_mid
+        else:
+            t_b, w_b, r_b = t_mid, w_mid, r_mid
+
+    return (w_a if abs(r_a - target) <= abs(r_b - target) else w_b), t_a
+
+def risk_parity_weights(covariance: np.ndarray,
+                        x0: Optional[np.ndarray] = None,
+                        budgets: Optional[np.ndarray] = None,
+                        tol: float = 1e-12) -> np.ndarray:
+    """
+    Equal (atau budgeted) risk contribution, long-only.
+
+    Newton pada convex form min 0.5 y'Cy - b'log(y) (Spinu); setiap step
+    memakai Cholesky dari Hessian C + diag(b / y^2). w = y / sum(y).
+    """
+    assets = len(covariance)
+    b = np.full(assets, 1.0 / assets) if budgets is None else np.asarray(budgets, dtype=float)
+    if x0 is not None and np.all(np.asarray(x0) > 0):
+        y = np.asarray(x0, dtype=float)
+        # Skala warm start ke minimizer sepanjang ray y
+        y = y * np.sqrt(b.sum() / (y @ covariance @ y))
+    else:
+        y = 1.0 / np.sqrt(np.diag(covariance))
+        y = y * np.sqrt(b.sum() / (y @ covariance @ y))
+
+    def objective(v):
+        return 0.5 * v @ covariance @ v - b @ np.log(v)
+
+    value = objective(y)
+    for _ in range(100):
+        gradient = covariance @ y - b / y
+        if np.abs(gradient).max() <= tol * (1 + np.abs(b / y).max()):
+            break
+        hessian = covariance + np.diag(b / (y * y))
+        direction = -cho_solve(_cholesky(hessian), gradient)
+        alpha = 1.0
+        negative = direction < 0
+        if negative.any():
+            alpha = min(1.0, 0.99 * np.min(-y[negative] / direction[negative]))
+        while True:
+            candidate = y + alpha * direction
+            candidate_value = objective(candidate)
+            if candidate_value <= value + 1e-4 * alpha * (gradient @ direction) or alpha < 1e-12:
+                break
+            alpha *= 0.5
+        y, value = candidate, candidate_value
+    return y / y.sum()
+
+def black_litterman_returns(prior: np.ndarray,
+                            covariance: np.ndarray,
+                            pick: np.ndarray,
+                            views: np.ndarray,
+                            omega: np.ndarray,
+                            tau: float = 0.05) -> np.ndarray:
+    """
+    Posterior expected returns: prior + tC P'(P tC P' + Omega)^-1 (Q - P prior).
+
+    Sama dengan bentuk (M1 + M2)^-1 (M1 prior + M3), tapi hanya satu
+    Cholesky solve dari (views x views) matrix, tanpa explicit inverse.
+    """
+    scaled = tau * covariance
+    projected = scaled @ pick.T
+    factor = _cholesky(pick @ projected + omega)
+    return prior + projected @ cho_solve(factor, views - pick @ prior)
+
+# ----------------------------------------------------------------------
+# Optimizer (shared state: caches + worker pool)
+# ----------------------------------------------------------------------
+
+class PortfolioOptimizer:
+    """
+    Process-wide optimizer: covariance estimates di-cache per (symbol set,
+    as-of date, lookback), solusi terakhir per problem dipakai sebagai warm
+    start, dan perhitungan berat berjalan di thread pool (LAPACK melepas GIL)
+    sehingga event loop tidak terblokir.
+    """
+
+    def __init__(self, max_workers: int = 2, cache_size: int = 256, risk_free_rate: float = 0.02):
+        self.risk_free_rate = risk_free_rate
+        self.cache_size = cache_size
+        self._estimates: "OrderedDict[tuple, CovarianceEstimate]" = OrderedDict()
+        self._warm_starts: "OrderedDict[tuple, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix='portfolio-optimizer')
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Jalankan fn di worker pool dan await hasilnya"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    def _remember(self, store: OrderedDict, key: tuple, value):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > self.cache_size:
+                store.popitem(last=False)
+
+    def _recall(self, store: OrderedDict, key: tuple):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def estimate(self,
+                 symbols: List[str],
+                 loader: Callable[[], pd.DataFrame],
+                 as_of: Optional[date] = None,
+                 lookback_days: int = 365) -> CovarianceEstimate:
+        """
+        Cached CovarianceEstimate; loader() (returns frame, columns = symbols)
+        hanya dipanggil saat cache miss.
+        """
+        key = (tuple(symbols), as_of or date.today(), lookback_days)
+        estimate = self._recall(self._estimates, key)
+        if estimate is None:
+            estimate = CovarianceEstimate(list(symbols), loader())
+            self._remember(self._estimates, key, estimate)
+        return estimate
+
+    def invalidate(self, symbols: Optional[List[str]] = None):
+        """Drop cached estimates dan warm starts (semua, atau yang memuat salah satu symbols)"""
+        with self._lock:
+            for store in (self._estimates, self._warm_starts):
+                for key in list(store):
+                    if symbols is None or set(symbols) & set(key[0]):
+                        del store[key]
+
+    def _summary(self, weights: np.ndarray, expected_returns: np.ndarray,
+                 covariance: np.ndarray, method: str) -> Dict:
+        portfolio_return = float(weights @ expected_returns)
+        portfolio_volatility = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+        sharpe_ratio = ((portfolio_return - self.risk_free_rate) / portfolio_volatility
+                        if portfolio_volatility > 0 else 0.0)
+        return {
+            'weights': weights,
+            'expected_return': portfolio_return,
+            'expected_volatility': portfolio_volatility,
+            'sharpe_ratio': sharpe_ratio,
+            'method': method
+        }
+
+    @staticmethod
+    def _minimum_variance(estimate: CovarianceEstimate, min_weight: float, max_weight: float,
+                          x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """Closed form C^-1 1 / 1'C^-1 1 dari cached Cholesky factor; active-set jika bounds binding"""
+        weights = cho_solve(estimate.factor, np.ones(len(estimate.symbols)))
+        weights = weights / weights.sum()
+        if weights.min() >= min_weight - 1e-12 and weights.max() <= max_weight + 1e-12:
+            return weights
+        start = weights if x0 is None else x0
+        return solve_budget_qp(estimate.covariance, np.zeros(len(weights)), min_weight, max_weight, start)
+
+    def optimize(self,
+                 estimate: CovarianceEstimate,
+                 method: str = 'markowitz',
+                 risk_tolerance: float = 0.5,
+                 target_return: Optional[float] = None,
+                 min_weight: float = 0.0,
+                 max_weight: float = 1.0,
+                 tau: float = 0.05) -> Dict:
+        """
+        Solve satu optimization problem; warm start dari solusi sebelumnya
+        untuk symbols/method/bounds yang sama.
+
+        markowitz / black_litterman: min 0.5 w'Cw - risk_tolerance mu'w, atau
+        minimum variance pada target_return jika diberikan.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown optimization method: {method}")
+        covariance = estimate.covariance
+        expected_returns = estimate.expected_returns
+        if method == 'black_litterman':
+            assets = len(expected_returns)
+            # Views = historical returns pada setiap asset (pick matrix identity)
+            expected_returns = black_litterman_returns(
+                expected_returns, covariance, np.eye(assets), estimate.expected_returns,
+                np.diag(np.diag(covariance)) * tau, tau
+            )
+
+        key = (tuple(estimate.symbols), method, min_weight, max_weight)
+        previous = self._recall(self._warm_starts, key)
+        x0, t0 = previous if previous is not None else (None, 0.0)
+
+        t = 0.0
+        if method == 'risk_parity':
+            weights = risk_parity_weights(covariance, x0)
+            if weights.max() > max_weight or weights.min() < min_weight:
+                weights = project_to_budget(weights, min_weight, max_weight)
+        elif method == 'minimum_variance':
+            weights = self._minimum_variance(estimate, min_weight, max_weight, x0)
+        elif target_return is not None:
+            weights, t = solve_target_return(covariance, expected_returns, target_return,
+                                             min_weight, max_weight, x0, t0)
+        else:
+            t = risk_tolerance
+            weights = solve_budget_qp(covariance, t * expected_returns, min_weight, max_weight, x0)
+
+        self._remember(self._warm_starts, key, (weights.copy(), t))
+        result = self._summary(weights, expected_returns, covariance, method)
+        if method in ('risk_parity', 'minimum_variance'):
+            # Risk parity / minimum variance doesn't optimize for return
+            result['expected_return'] = 0
+            result['sharpe_ratio'] = 0
+        return result
+
+    def efficient_frontier(self,
+                           estimate: CovarianceEstimate,
+                           points: int = 20,
+                           min_weight: float = 0.0,
+                           max_weight: float = 1.0) -> Dict:
+        """
+        Seluruh frontier dalam satu call: target returns berjarak sama dari
+        minimum-variance sampai maximum-return portfolio, setiap point
+        warm-started dari point sebelumnya.
+        """
+        covariance = estimate.covariance
+        expected_returns = estimate.expected_returns
+        points = max(2, points)
+
+        weights = self._minimum_variance(estimate, min_weight, max_weight)
+        r_low = float(expected_returns @ weights)
+        r_high = float(expected_returns @ extreme_return_weights(expected_returns, min_weight, max_weight))
+        targets = np.linspace(r_low, max(r_high, r_low), points)
+
+        frontier = np.empty((points, len(expected_returns)))
+        frontier[0] = weights
+        t = 0.0
+        for i, target in enumerate(targets[1:], start=1):
+            weights, t = solve_target_return(covariance, expected_returns, target,
+                                             min_weight, max_weight, weights, t)
+            frontier[i] = weights
+
+        variances = np.einsum('ij,jk,ik->i', frontier, covariance, frontier)
+        volatilities = np.sqrt(np.maximum(variances, 0.0))
+        returns = frontier @ expected_returns
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(volatilities > 0, (returns - self.risk_free_rate) / volatilities, 0.0)
+        best = int(np.argmax(sharpe))
+        return {
+            'symbols': estimate.symbols,
+            'returns': returns,
+            'volatilities': volatilities,
+            'sharpe_ratios': sharpe,
+            'weights': frontier,
+            'max_sharpe_index': best
+        }
+
+_default_optimizer: Optional[PortfolioOptimizer] = None
+_default_optimizer_lock = threading.Lock()
+
+def get_portfolio_optimizer() -> PortfolioOptimizer:
+    """Process-wide optimizer (shared covariance cache, warm starts dan worker pool)"""
+    global _default_optimizer
+    with _default_optimizer_lock:
+        if _default_optimizer is None:
+            _default_optimizer = PortfolioOptimizer(
+                max_workers=settings.PORTFOLIO_OPTIMIZER_MAX_WORKERS,
+                cache_size=settings.PORTFOLIO_COVARIANCE_CACHE_SIZE
+            )
+        return _default_optimizer
@@ -0,0 +1,182 @@
+"""
+Rate Counter
+Sliding-window event counters per key (bucketed, O(1) amortized) dan
+content-hash deduplication untuk rate limiting tanpa COUNT queries
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+class SlidingWindowCounter:
+    """
+    Approximate sliding window: window dibagi menjadi `buckets` buckets.
+
+    count() menjumlah buckets yang overlap dengan [now - window, now]; bucket
+    tertua dihitung penuh, jadi hasilnya tidak pernah lebih kecil dari count
+    exact (error maksimal satu bucket = window / buckets).
+    """
+
+    __slots__ = ('window', 'bucket_size', '_buckets', '_total')
+
+    def __init__(self, window: float, buckets: int = 60):
+        self.window = window
+        self.bucket_size = window / max(1, buckets)
+        self._buckets: Deque[List] = deque()  # [bucket index, count]
+        self._total = 0
+
+    def add(self, timestamp: float, n: int = 1):
+        index = int(timestamp // self.bucket_size)
+        if self._buckets and self._buckets[-1][0] >= index:
+            # Event di bucket terakhir (atau clock mundur): gabung ke bucket terbaru
+            self._buckets[-1][1] += n
+        else:
+            self._buckets.append([index, n])
+        self._total += n
+
+    def count(self, now: float) -> int:
+        oldest = int((now - self.window) // self.bucket_size)
+        while self._buckets and self._buckets[0][0] < oldest:
+            self._total -= self._buckets.popleft()[1]
+        return self._total
+
+class _KeyState:
+    __slots__ = ('windows', 'last_seen')
+
+    def __init__(self, windows: Dict[str, float], buckets: int):
+        self.windows = {name: SlidingWindowCounter(seconds, buckets) for name, seconds in windows.items()}
+        self.last_seen: Optional[float] = None
+
+class RateCounterStore:
+    """
+    Per-key counters untuk beberapa windows sekaligus (mis. hour + day).
+
+    Keys yang belum ada dianggap "cold": caller me-rebuild dari sumber
+    persisten lewat warm() sekali per process, selanjutnya semua checks
+    in-memory. Keys di-evict LRU setelah max_keys; key yang ter-evict
+    menjadi cold lagi.
+    """
+
+    def __init__(self, windows: Dict[str, float], buckets: int = 60, max_keys: int = 100000):
+        self.windows = dict(windows)
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[Hashable, _KeyState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'events': 0, 'warms': 0, 'evictions': 0}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _state(self, key: Hashable) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState(self.windows, self.buckets)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+                self.stats['evictions'] += 1
+        else:
+            self._keys.move_to_end(key)
+        return state
+
+    def warm(self, key: Hashable, timestamps: List[float]):
+        """Seed key dari event timestamps historis (mis. created_at dari database)"""
+        with self._lock:
+            if key in self._keys:
+                # Sudah di-warm oleh caller lain
+                return
+            state = self._state(key)
+            for timestamp in sorted(timestamps):
+                for counter in state.windows.values():
+                    counter.add(timestamp)
+                state.last_seen = max(state.last_seen or timestamp, timestamp)
+            self.stats['warms'] += 1
+
+    def add(self, key: Hashable, timestamp: Optional[float] = None, n: int = 1):
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            state = self._state(key)
+            for counter in state.windows.values():
+                counter.add(timestamp, n)
+            state.last_seen = max(state.last_seen or timestamp, timestamp)
+            self.stats['events'] += n
+
+    def counts(self, key: Hashable, now: Optional[float] = None) -> Dict[str, int]:
+        now = now if now is not None else time.time()
+        with self._lock:
+            self.stats['checks'] += 1
+            state = self._keys.get(key)
+            if state is None:
+                return {name: 0 for name in self.windows}
+            return {name: counter.count(now) for name, counter in state.windows.items()}
+
+    def last_seen(self, key: Hashable) -> Optional[float]:
+        state = self._keys.get(key)
+        return state.last_seen if state is not None else None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'keys': len(self._keys), 'windows': self.windows, **self.stats}
+
+def content_hash(*parts) -> str:
+    """Stable hash untuk deduplication (None diperlakukan sebagai string kosong)"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part if part is not None else '').encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class ContentDeduper:
+    """
+    Exact dedup: hash -> last seen timestamp dalam window.
+
+    Entries disimpan urut insertion (OrderedDict, move_to_end saat re-add)
+    jadi expiry cukup pop dari depan. Timestamps lama dari rebuild bisa
+    tertahan di belakang entry yang lebih baru; seen() tetap membandingkan
+    timestamp sehingga hasilnya exact, hanya memory yang lebih lambat turun.
+    """
+
+    def __init__(self, window: float, max_entries: int = 200000):
+        self.window = window
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'duplicates': 0}
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if seen_at >= cutoff and len(self._seen) <= self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def seen(self, key: Tuple, now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+        with self._lock:
+            self.stats['checks'] += 1
+            self._expire(now)
+            seen_at = self._seen.get(key)
+            duplicate = seen_at is not None and seen_at >= now - self.window
+            if duplicate:
+                self.stats['duplicates'] += 1
+            return duplicate
+
+    def add(self, key: Tuple, timestamp: Optional[float] = None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            if self._seen.get(key, float('-inf')) > timestamp:
+                return
+            self._seen[key] = timestamp
+            self._seen.move_to_end(key)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._seen), 'window': self.window, **self.stats}
@@ -0,0 +1,233 @@
+"""
+Aligned Returns Panel
+Close/return matrix (date x symbol) dari satu query atau bar store, dengan
+vectorized pairwise correlation dan incremental rolling/EWMA correlation
+"""
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.market_data import HistoricalData
+
+logger = logging.getLogger(__name__)
+
+CORRELATION_MODES = ('full', 'rolling', 'ewma')
+
+def pairwise_moments(returns: np.ndarray, weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+    """
+    Pairwise-complete sums untuk (rows x symbols) returns dengan NaN gaps.
+
+    Returns (N, Sx, Sxx, Sxy): N[i, j] = (weighted) jumlah rows di mana i
+    dan j sama-sama ada, Sx[i, j] = sum x_i di rows itu, Sxx[i, j] = sum
+    x_i^2, Sxy[i, j] = sum x_i x_j.
+    """
+    mask = ~np.isnan(returns)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(float)
+    if weights is not None:
+        m = m * weights[:, None]
+        xw = x * weights[:, None]
+    else:
+        xw = x
+    return m.T @ mask, x.T @ m, (x * x).T @ m, xw.T @ x
+
+def moments_to_correlation(n: np.ndarray, sx: np.ndarray, sxx: np.ndarray, sxy: np.ndarray,
+                           min_periods: float = 2) -> np.ndarray:
+    """Correlation matrix dari pairwise_moments (NaN jika overlap < min_periods atau variance 0)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_i = sx / n
+        mean_j = sx.T / n
+        cov = sxy / n - mean_i * mean_j
+        var_i = sxx / n - mean_i ** 2
+        var_j = sxx.T / n - mean_j ** 2
+        corr = cov / np.sqrt(var_i * var_j)
+    corr[(n < min_periods) | ~(var_i > 1e-18) | ~(var_j > 1e-18)] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(n) >= min_periods, 1.0, np.nan))
+    return corr
+
+class IncrementalCorrelation:
+    """
+    Rolling (window rows) atau EWMA (halflife rows) correlation yang
+    di-update satu hari sekali: update(row) adalah O(symbols^2), tanpa
+    menghitung ulang seluruh history.
+    """
+
+    def __init__(self, symbols: List[str], window: Optional[int] = None,
+                 halflife: Optional[float] = None, min_periods: int = 2):
+        if (window is None) == (halflife is None):
+            raise ValueError("Specify exactly one of window or halflife")
+        self.symbols = list(symbols)
+        self.window = window
+        self.decay = 0.5 ** (1.0 / halflife) if halflife is not None else None
+        self.min_periods = min_periods
+        size = len(self.symbols)
+        self._moments = [np.zeros((size, size)) for _ in range(4)]
+        self._rows: deque = deque()
+        self.last_date = None
+
+    def update(self, row, date=None) -> "IncrementalCorrelation":
+        """Add one day of returns (array aligned to symbols, NaN = no bar)"""
+        row = np.asarray(row, dtype=float)
+        moments = pairwise_moments(row[None, :])
+        if self.decay is not None:
+            self._moments = [self.decay * total + new for total, new in zip(self._moments, moments)]
+        else:
+            self._moments = [total + new for total, new in zip(self._moments, moments)]
+            self._rows.append(moments)
+            if len(self._rows) > self.window:
+                dropped = self._rows.popleft()
+                self._moments = [total - old for total, old in zip(self._moments, dropped)]
+        self.last_date = date
+        return self
+
+    def correlation(self) -> pd.DataFrame:
+        n, sx, sxx, sxy = self._moments
+        # EWMA: effective observations berbobot; min_periods tetap dalam rows
+        min_periods = self.min_periods if self.decay is None else min(self.min_periods, 1.0)
+        corr = moments_to_correlation(n, sx, sxx, sxy, min_periods)
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+class ReturnsPanel:
+    """
+    Close dan log-return matrix, semua symbols di-align ke satu date index.
+
+    Return di date D hanya ada jika symbol punya bar di D dan di session
+    sebelumnya pada index yang sama, jadi gap tidak pernah menghasilkan
+    return yang dipasangkan dengan tanggal yang salah. Correlation dihitung
+    pairwise-complete (rows di mana kedua symbols ada) dalam satu matrix op.
+    """
+
+    def __init__(self, closes: pd.DataFrame):
+        closes = closes.sort_index()
+        closes = closes.loc[:, closes.notna().any()].astype(float)
+        self.closes = closes.where(closes > 0)
+        self.returns = np.log(self.closes).diff().iloc[1:]
+        self.symbols = list(self.closes.columns)
+        self.dates = self.closes.index
+
+    # ------------------------------------------------------------------
+    # Builders
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, date_column: str = 'date',
+                   symbol_column: str = 'symbol', close_column: str = 'close') -> "ReturnsPanel":
+        """Long format (date, symbol, close) rows; duplicate (date, symbol) -> last close"""
+        if data is None or data.empty:
+            return cls(pd.DataFrame())
+        frame = data[[date_column, symbol_column, close_column]].copy()
+        frame[date_column] = pd.to_datetime(frame[date_column])
+        closes = frame.pivot_table(index=date_column, columns=symbol_column, values=close_column, aggfunc='last')
+        return cls(closes)
+
+    @classmethod
+    def from_bar_store(cls, symbols: Iterable[str], timeframe: str = '1D',
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       store=None) -> "ReturnsPanel":
+        """Closes dari columnar bar store (memory-mapped, tanpa query)"""
+        if store is None:
+            from app.core.bar_store import get_bar_store
+            store = get_bar_store()
+        bars = store.load_bars(symbols, timeframe, start, end)
+        series = {
+            symbol: pd.Series(np.asarray(b['close']), index=pd.DatetimeIndex(np.asarray(b['timestamp'])))
+            for symbol, b in bars.items()
+        }
+        return cls(pd.DataFrame(series))
+
+    @classmethod
+    def from_db(cls, db: Session, symbols: Iterable[str], start: datetime, end: datetime,
+                timeframe: str = '1D') -> "ReturnsPanel":
+        """Closes untuk semua symbols dalam satu historical_data query"""
+        rows = db.execute(
+            select(HistoricalData.date, HistoricalData.symbol, HistoricalData.close_price)
+            .where(
+                HistoricalData.symbol.in_(list(symbols)),
+                HistoricalData.timeframe == timeframe,
+                HistoricalData.date >= start,
+                HistoricalData.date <= end
+            )
+        ).all()
+        return cls.from_frame(pd.DataFrame(rows, columns=['date', 'symbol', 'close']))
+
+    @classmethod
+    def load(cls, db: Session, symbols: Iterable[str], start: datetime, end: datetime,
+             timeframe: str = '1D') -> "ReturnsPanel":
+        """Bar store jika semua symbols tersedia di sana, selain itu satu DB query"""
+        symbols = list(dict.fromkeys(symbols))
+        try:
+            panel = cls.from_bar_store(symbols, timeframe, start, end)
+            names = {symbol.upper(): symbol for symbol in symbols}
+            if set(panel.symbols) == set(names):
+                return cls(panel.closes.rename(columns=names))
+        except Exception as e:
+            logger.warning(f"Bar store unavailable for returns panel: {e}")
+        return cls.from_db(db, symbols, start, end, timeframe)
+
+    # ------------------------------------------------------------------
+    # Analytics
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def symbol_returns(self, symbol: str) -> np.ndarray:
+        """Returns satu symbol tanpa gaps"""
+        if symbol not in self.returns.columns:
+            return np.array([])
+        return self.returns[symbol].dropna().to_numpy()
+
+    def volatility(self, periods_per_year: int = 252) -> pd.Series:
+        """Annualized volatility per symbol (population std, sama dengan np.std)"""
+        return self.returns.std(ddof=0) * np.sqrt(periods_per_year)
+
+    def correlation(self, mode: str = 'full', window: int = 60, halflife: float = 20.0,
+                    min_periods: int = 2) -> pd.DataFrame:
+        """
+        Correlation matrix as of the last date.
+
+        full: seluruh panel; rolling: last `window` rows; ewma: exponentially
+        weighted dengan halflife (rows).
+        """
+        if mode not in CORRELATION_MODES:
+            raise ValueError(f"Unknown correlation mode: {mode}")
+        values = self.returns.to_numpy()
+        weights = None
+        if mode == 'rolling':
+            values = values[-window:]
+        elif mode == 'ewma':
+            weights = 0.5 ** (np.arange(len(values))[::-1] / halflife)
+            min_periods = min(min_periods, 1)
+
+        corr = moments_to_correlation(*pairwise_moments(values, weights), min_periods)
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    def tracker(self, window: Optional[int] = None, halflife: Optional[float] = None,
+                min_periods: int = 2) -> IncrementalCorrelation:
+        """IncrementalCorrelation seeded dengan panel; lanjutkan dengan tracker.update(row)"""
+        tracker = IncrementalCorrelation(self.symbols, window, halflife, min_periods)
+        rows = self.returns.to_numpy()
+        if window is not None:
+            rows = rows[-window:]
+        for date, row in zip(self.returns.index[-len(rows):], rows):
+            tracker.update(row, date)
+        return tracker
+
+def correlation_to_dict(corr: pd.DataFrame, decimals: int = 4) -> Dict[str, Dict[str, float]]:
+    """Nested {symbol: {symbol: corr}}; pairs tanpa overlap dilewati"""
+    values = corr.to_numpy()
+    result = {}
+    for i, symbol1 in enumerate(corr.index):
+        result[symbol1] = {
+            symbol2: round(float(values[i, j]), decimals)
+            for j, symbol2 in enumerate(corr.columns)
+            if not np.isnan(values[i, j])
+        }
+    return result
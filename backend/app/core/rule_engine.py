@@ -0,0 +1,551 @@
+"""
+Strategy Rule Engine
+Rule conditions di-compile sekali menjadi expression tree (closures) yang
+dievaluasi terhadap incremental indicators per symbol
+"""
+import math
+import re
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+class RuleSyntaxError(ValueError):
+    """Condition string tidak bisa di-parse"""
+
+class IndicatorSpec(NamedTuple):
+    kind: str
+    params: Tuple
+
+# ----------------------------------------------------------------------
+# Incremental indicators (O(1) per bar)
+# ----------------------------------------------------------------------
+
+class _SMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.window: deque = deque(maxlen=period)
+        self.total = 0.0
+        self.since_resum = 0
+
+    def update(self, x: float):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        # Re-sum berkala agar floating-point drift tidak menumpuk
+        self.since_resum += 1
+        if self.since_resum >= self.period:
+            self.total = math.fsum(self.window)
+            self.since_resum = 0
+
+    def values(self) -> Optional[Dict[str, float]]:
+        if len(self.window) < self.period:
+            return None
+        return {'value': self.total / self.period}
+
+class _EMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value: Optional[float] = None
+        self.count = 0
+
+    def update(self, x: float):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        self.count += 1
+
+    def values(self) -> Optional[Dict[str, float]]:
+        if self.count < self.period:
+            return None
+        return {'value': self.value}
+
+class _RSI:
+    """Wilder RSI; di-seed dengan mean dari period changes pertama"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.prev: Optional[float] = None
+        self.seed_gains: List[float] = []
+        self.seed_losses: List[float] = []
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+
+    def update(self, x: float):
+        if self.prev is None:
+            self.prev = x
+            return
+        change = x - self.prev
+        self.prev = x
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.avg_gain is None:
+            self.seed_gains.append(gain)
+            self.seed_losses.append(loss)
+            if len(self.seed_gains) == self.period:
+                self.avg_gain = sum(self.seed_gains) / self.period
+                self.avg_loss = sum(self.seed_losses) / self.period
+            return
+        self.avg_gain += (gain - self.avg_gain) / self.period
+        self.avg_loss += (loss - self.avg_loss) / self.period
+
+    def values(self) -> Optional[Dict[str, float]]:
+        if self.avg_gain is None:
+            return None
+        if self.avg_loss == 0:
+            return {'value': 100.0}
+        return {'value': 100 - 100 / (1 + self.avg_gain / self.avg_loss)}
+
+class _Bollinger:
+    """SMA +/- k * population std (sama dengan indicators.compute_indicators)"""
+
+    def __init__(self, period: int, k: float):
+        self.period = period
+        self.k = k
+        self.window: deque = deque(maxlen=period)
+
+    def update(self, x: float):
+        self.window.append(x)
+
+    def values(self) -> Optional[Dict[str, float]]:
+        if len(self.window) < self.period:
+            return None
+        mean = math.fsum(self.window) / self.period
+        std = math.sqrt(max(math.fsum((v - mean) ** 2 for v in self.window) / self.period, 0.0))
+        return {'middle': mean, 'upper': mean + self.k * std, 'lower': mean - self.k * std}
+
+class _MACD:
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.fast = _EMA(fast)
+        self.slow = _EMA(slow)
+        self.signal = _EMA(signal)
+
+    def update(self, x: float):
+        self.fast.update(x)
+        self.slow.update(x)
+        if self.slow.count >= self.slow.period:
+            self.signal.update(self.fast.value - self.slow.value)
+
+    def values(self) -> Optional[Dict[str, float]]:
+        signal = self.signal.values()
+        if signal is None:
+            return None
+        line = self.fast.value - self.slow.value
+        return {'line': line, 'signal': signal['value'], 'histogram': line - signal['value']}
+
+def _make_indicator(spec: IndicatorSpec):
+    if spec.kind == 'sma':
+        return _SMA(int(spec.params[0]))
+    if spec.kind == 'ema':
+        return _EMA(int(spec.params[0]))
+    if spec.kind == 'rsi':
+        return _RSI(int(spec.params[0]))
+    if spec.kind == 'bb':
+        return _Bollinger(int(spec.params[0]), float(spec.params[1]))
+    if spec.kind == 'macd':
+        return _MACD(int(spec.params[0]), int(spec.params[1]), int(spec.params[2]))
+    raise ValueError(f"Unknown indicator: {spec.kind}")
+
+def warmup_bars(spec: IndicatorSpec) -> int:
+    """Bars yang dibutuhkan sampai indicator menghasilkan value"""
+    if spec.kind == 'macd':
+        return int(spec.params[1]) + int(spec.params[2])
+    if spec.kind in ('ema', 'rsi'):
+        return 3 * int(spec.params[0])  # extra bars agar recursive state konvergen
+    return int(spec.params[0])
+
+# Bar fields yang bisa direferensikan langsung (close/price = last traded price)
+FIELDS = ('open', 'high', 'low', 'close', 'volume', 'change', 'change_percent')
+FIELD_ALIASES = {'price': 'close', 'last': 'close', 'last_price': 'close'}
+
+class IndicatorBook:
+    """
+    Shared indicator state per (symbol, IndicatorSpec).
+
+    Strategies yang memakai indicator yang sama (mis. RSI(BBCA,14)) berbagi
+    satu instance; require()/release() menghitung references. update()
+    hanya memproses bar dengan timestamp baru.
+    """
+
+    def __init__(self):
+        self._indicators: Dict[str, Dict[IndicatorSpec, Any]] = {}
+        self._values: Dict[str, Dict[IndicatorSpec, Optional[Dict[str, float]]]] = {}
+        self._refs: Counter = Counter()
+        self._bars: Dict[str, Dict] = {}
+        self._last_ts: Dict[str, Any] = {}
+        self.stale: Set[str] = set()
+
+    def require(self, symbol: str, spec: Optional[IndicatorSpec] = None):
+        """Register symbol (dan indicator); indicator baru perlu warmup dari history"""
+        self._refs[(symbol, spec)] += 1
+        indicators = self._indicators.setdefault(symbol, {})
+        if spec is not None and spec not in indicators:
+            indicators[spec] = _make_indicator(spec)
+            self.stale.add(symbol)
+
+    def release(self, symbol: str, spec: Optional[IndicatorSpec] = None):
+        key = (symbol, spec)
+        self._refs[key] -= 1
+        if self._refs[key] > 0:
+            return
+        del self._refs[key]
+        if spec is not None:
+            self._indicators.get(symbol, {}).pop(spec, None)
+            self._values.get(symbol, {}).pop(spec, None)
+        if not any(sym == symbol for sym, _ in self._refs):
+            for store in (self._indicators, self._values, self._bars, self._last_ts):
+                store.pop(symbol, None)
+            self.stale.discard(symbol)
+
+    def symbols(self) -> List[str]:
+        return list(self._indicators)
+
+    def lookback(self, symbol: str) -> int:
+        return max((warmup_bars(spec) for spec in self._indicators.get(symbol, {})), default=1)
+
+    def warm(self, symbol: str, bars: List[Dict]):
+        """Reset indicators untuk symbol lalu replay history bars (urut waktu)"""
+        indicators = self._indicators.get(symbol)
+        if indicators is None:
+            return
+        for spec in list(indicators):
+            indicators[spec] = _make_indicator(spec)
+        self._last_ts.pop(symbol, None)
+        self.stale.discard(symbol)
+        for bar in bars:
+            self.update(symbol, bar, refresh=False)
+        self._refresh(symbol)
+
+    def update(self, symbol: str, bar: Dict, refresh: bool = True) -> bool:
+        """Feed bar terbaru; False jika bar bukan bar baru untuk symbol ini"""
+        if symbol not in self._indicators:
+            return False
+        ts = bar.get('timestamp')
+        last = self._last_ts.get(symbol)
+        if last is not None and ts is not None and ts <= last:
+            return False
+        self._last_ts[symbol] = ts
+        self._bars[symbol] = bar
+        close = bar.get('close')
+        if close is not None:
+            for indicator in self._indicators[symbol].values():
+                indicator.update(float(close))
+        if refresh:
+            self._refresh(symbol)
+        return True
+
+    def _refresh(self, symbol: str):
+        self._values[symbol] = {spec: ind.values() for spec, ind in self._indicators[symbol].items()}
+
+    def value(self, symbol: str, spec: IndicatorSpec, output: str) -> Optional[float]:
+        values = self._values.get(symbol, {}).get(spec)
+        return values.get(output) if values else None
+
+    def field(self, symbol: str, name: str) -> Optional[float]:
+        bar = self._bars.get(symbol)
+        value = bar.get(name) if bar else None
+        return float(value) if value is not None else None
+
+    def snapshot(self, symbol: str) -> Optional[Dict]:
+        return self._bars.get(symbol)
+
+# ----------------------------------------------------------------------
+# Parser / compiler
+# ----------------------------------------------------------------------
+
+# name -> (indicator kind, output, default params); argumen pertama boleh symbol
+FUNCTIONS = {
+    'SMA': ('sma', 'value', (20,)),
+    'MA': ('sma', 'value', (20,)),
+    'EMA': ('ema', 'value', (20,)),
+    'RSI': ('rsi', 'value', (14,)),
+    'BB_UPPER': ('bb', 'upper', (20, 2)),
+    'BB_MIDDLE': ('bb', 'middle', (20, 2)),
+    'BB_LOWER': ('bb', 'lower', (20, 2)),
+    'MACD': ('macd', 'line', (12, 26, 9)),
+    'MACD_SIGNAL': ('macd', 'signal', (12, 26, 9)),
+    'MACD_HIST': ('macd', 'histogram', (12, 26, 9)),
+}
+
+# Bare identifiers dari strategy templates -> (function, [(rule parameter, default)])
+ALIASES = {
+    'rsi': ('RSI', [('rsi_period', 14)]),
+    'sma': ('SMA', [('period', 20)]),
+    'ema': ('EMA', [('period', 20)]),
+    'short_ma': ('SMA', [('short_period', 20)]),
+    'long_ma': ('SMA', [('long_period', 50)]),
+    'upper_band': ('BB_UPPER', [('period', 20), ('std_dev', 2)]),
+    'middle_band': ('BB_MIDDLE', [('period', 20), ('std_dev', 2)]),
+    'lower_band': ('BB_LOWER', [('period', 20), ('std_dev', 2)]),
+    'macd': ('MACD', [('fast_period', 12), ('slow_period', 26), ('signal_period', 9)]),
+    'macd_line': ('MACD', [('fast_period', 12), ('slow_period', 26), ('signal_period', 9)]),
+    'macd_signal': ('MACD_SIGNAL', [('fast_period', 12), ('slow_period', 26), ('signal_period', 9)]),
+    'macd_histogram': ('MACD_HIST', [('fast_period', 12), ('slow_period', 26), ('signal_period', 9)]),
+}
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d*)?|\.\d+)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<op><=|>=|==|!=|&&|\|\||[<>()+\-*/,!])
+)""", re.VERBOSE)
+
+_COMPARE = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+_ARITH = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b if b else None,
+}
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise RuleSyntaxError(f"Unexpected character at {pos}: {text[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.lower() in ('and', 'or', 'not'):
+            kind, value = 'op', value.lower()
+        elif kind == 'op':
+            value = {'&&': 'and', '||': 'or', '!': 'not'}.get(value, value)
+        elif kind == 'string':
+            kind, value = 'name', value[1:-1]
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+# Node = callable(book, symbol) -> float | bool | None (None = belum tersedia)
+Node = Callable[[IndicatorBook, str], Any]
+
+class CompiledRule:
+    """
+    Hasil compile satu condition string.
+
+    Indicator tanpa explicit symbol di-bind ke target symbol saat evaluate;
+    requirements() menghasilkan (symbol, spec) yang harus di-register di
+    IndicatorBook untuk target tersebut.
+    """
+
+    def __init__(self, condition: str, node: Node,
+                 specs: Set[Tuple[Optional[str], IndicatorSpec]], symbols: Set[str]):
+        self.condition = condition
+        self._node = node
+        self.specs = specs
+        self.symbols = symbols  # symbols yang disebut eksplisit di condition
+
+    def requirements(self, target: str) -> Set[Tuple[str, Optional[IndicatorSpec]]]:
+        required = {(symbol or target, spec) for symbol, spec in self.specs}
+        required.add((target, None))
+        required.update((symbol, None) for symbol in self.symbols)
+        return required
+
+    def evaluate(self, book: IndicatorBook, target: str) -> bool:
+        return self._node(book, target) is True
+
+class _Parser:
+    def __init__(self, text: str, parameters: Dict):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.parameters = parameters or {}
+        self.specs: Set[Tuple[Optional[str], IndicatorSpec]] = set()
+        self.symbols: Set[str] = set()
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, value: Optional[str] = None) -> Tuple[str, str]:
+        token = self.peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise RuleSyntaxError(f"Expected {value or 'token'}, got {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise RuleSyntaxError("Empty condition")
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise RuleSyntaxError(f"Unexpected token {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self) -> Node:
+        nodes = [self.parse_and()]
+        while self.peek() == ('op', 'or'):
+            self.take()
+            nodes.append(self.parse_and())
+        if len(nodes) == 1:
+            return nodes[0]
+
+        def any_of(book, symbol):
+            unknown = False
+            for node in nodes:
+                result = node(book, symbol)
+                if result is None:
+                    unknown = True
+                elif result:
+                    return True
+            return None if unknown else False
+        return any_of
+
+    def parse_and(self) -> Node:
+        nodes = [self.parse_not()]
+        while self.peek() == ('op', 'and'):
+            self.take()
+            nodes.append(self.parse_not())
+        if len(nodes) == 1:
+            return nodes[0]
+
+        def all_of(book, symbol):
+            unknown = False
+            for node in nodes:
+                result = node(book, symbol)
+                if result is None:
+                    unknown = True
+                elif not result:
+                    return False
+            return None if unknown else True
+        return all_of
+
+    def parse_not(self) -> Node:
+        if self.peek() == ('op', 'not'):
+            self.take()
+            inner = self.parse_not()
+
+            def negate(book, symbol):
+                result = inner(book, symbol)
+                return None if result is None else not result
+            return negate
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> Node:
+        left = self.parse_sum()
+        kind, op = self.peek()
+        if kind != 'op' or op not in _COMPARE:
+            return left
+        self.take()
+        right = self.parse_sum()
+        compare = _COMPARE[op]
+
+        def comparison(book, symbol):
+            a, b = left(book, symbol), right(book, symbol)
+            return None if a is None or b is None else compare(a, b)
+        return comparison
+
+    def _binary(self, operand: Callable[[], Node], ops: Tuple[str, ...]) -> Node:
+        node = operand()
+        while self.peek()[0] == 'op' and self.peek()[1] in ops:
+            func = _ARITH[self.take()[1]]
+            node = self._arith(node, operand(), func)
+        return node
+
+    @staticmethod
+    def _arith(left: Node, right: Node, func) -> Node:
+        def arith(book, symbol):
+            a, b = left(book, symbol), right(book, symbol)
+            return None if a is None or b is None else func(a, b)
+        return arith
+
+    def parse_sum(self) -> Node:
+        return self._binary(self.parse_term, ('+', '-'))
+
+    def parse_term(self) -> Node:
+        return self._binary(self.parse_unary, ('*', '/'))
+
+    def parse_unary(self) -> Node:
+        if self.peek() == ('op', '-'):
+            self.take()
+            inner = self.parse_unary()
+
+            def neg(book, symbol):
+                value = inner(book, symbol)
+                return None if value is None else -value
+            return neg
+        return self.parse_primary()
+
+    def parse_primary(self) -> Node:
+        kind, value = self.take()
+        if kind == 'number':
+            constant = float(value)
+            return lambda book, symbol: constant
+        if (kind, value) == ('op', '('):
+            node = self.parse_or()
+            self.take(')')
+            return node
+        if kind != 'name':
+            raise RuleSyntaxError(f"Unexpected token {value!r}")
+        if self.peek() == ('op', '('):
+            return self.parse_call(value)
+
+        name = value.lower()
+        name = FIELD_ALIASES.get(name, name)
+        if name in FIELDS:
+            return lambda book, symbol: book.field(symbol, name)
+        if name in ALIASES:
+            func, params = ALIASES[name]
+            args = tuple(self.parameters.get(param, default) for param, default in params)
+            return self._indicator(func, None, args)
+        raise RuleSyntaxError(f"Unknown identifier: {value}")
+
+    def parse_call(self, name: str) -> Node:
+        func = name.upper()
+        self.take('(')
+        symbol = None
+        args: List[float] = []
+        while self.peek() != ('op', ')'):
+            if args or symbol is not None:
+                self.take(',')
+            kind, value = self.take()
+            if kind == 'name' and symbol is None and not args:
+                symbol = value
+            elif kind == 'number':
+                args.append(float(value))
+            else:
+                raise RuleSyntaxError(f"Invalid argument {value!r} for {name}")
+        self.take(')')
+
+        field = FIELD_ALIASES.get(func.lower(), func.lower())
+        if field in FIELDS:
+            if symbol is None or args:
+                raise RuleSyntaxError(f"{name}() expects a single symbol argument")
+            self.symbols.add(symbol)
+            return lambda book, _: book.field(symbol, field)
+        return self._indicator(func, symbol, tuple(args))
+
+    def _indicator(self, func: str, symbol: Optional[str], args: Tuple) -> Node:
+        if func not in FUNCTIONS:
+            raise RuleSyntaxError(f"Unknown function: {func}")
+        kind, output, defaults = FUNCTIONS[func]
+        if len(args) > len(defaults):
+            raise RuleSyntaxError(f"{func}() takes at most {len(defaults)} parameters")
+        params = tuple(args) + defaults[len(args):]
+        params = tuple(float(p) if kind == 'bb' and i == 1 else int(p) for i, p in enumerate(params))
+        if any(p <= 0 for p in params):
+            raise RuleSyntaxError(f"{func}() parameters must be positive")
+        spec = IndicatorSpec(kind, params)
+        self.specs.add((symbol, spec))
+        if symbol is not None:
+            self.symbols.add(symbol)
+            return lambda book, _: book.value(symbol, spec, output)
+        return lambda book, target: book.value(target, spec, output)
+
+def compile_condition(condition: str, parameters: Optional[Dict] = None) -> CompiledRule:
+    """
+    Parse condition sekali menjadi CompiledRule.
+
+    Grammar: or/and/not (juga ||, &&, !), comparisons, + - * /, numbers,
+    bar fields (close, price, volume, ...), template identifiers (rsi,
+    short_ma, lower_band, macd_line, ...; periods dari rule parameters) dan
+    functions seperti RSI(BBCA,14), SMA(50), BB_LOWER(20,2), CLOSE(TLKM).
+    """
+    parser = _Parser(condition, parameters)
+    node = parser.parse()
+    return CompiledRule(condition, node, parser.specs, parser.symbols)
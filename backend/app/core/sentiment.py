@@ -5,175 +5,131 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.sentiment import (
     NewsSentiment, SocialSentiment, MarketSentiment, 
     InsiderTrading, SentimentAggregation, SentimentAlerts
 )
+from app.core.sentiment_rollup import SentimentRollups, summarize
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _classify_polarity(polarity: float) -> str:
+    if polarity > 0.1:
+        return "positive"
+    elif polarity < -0.1:
+        return "negative"
+    return "neutral"
+
+def _window(days: int) -> Tuple[date, date]:
+    """Rollup day range untuk 'last N days' (hari pertama dihitung penuh)"""
+    end_date = datetime.now()
+    return (end_date - timedelta(days=days)).date(), end_date.date()
+
 class SentimentAnalysisEngine:
     """Core engine for sentiment analysis"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.rollups = SentimentRollups(db)  # read-only; di-refresh oleh SentimentRollupJob
+        self._market_cache: Dict[date, Dict] = {}
     
     def aggregate_news_sentiment(self, symbol: str, days: int = 7) -> Dict:
-        """Aggregate news sentiment for a symbol"""
+        """Aggregate news sentiment for a symbol (dari daily rollups)"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get news sentiment data
-            news_data = self.db.query(NewsSentiment).filter(
-                NewsSentiment.symbol == symbol,
-                NewsSentiment.news_date >= start_date,
-                NewsSentiment.news_date <= end_date
-            ).all()
-            
-            if not news_data:
-                return {"error": "No news sentiment data found"}
-            
-            # Calculate aggregated metrics
-            polarities = [n.polarity for n in news_data if n.polarity is not None]
-            confidences = [n.confidence for n in news_data if n.confidence is not None]
-            impact_scores = [n.impact_score for n in news_data if n.impact_score is not None]
-            
-            if not polarities:
-                return {"error": "No valid sentiment scores found"}
-            
-            # Basic statistics
-            avg_polarity = np.mean(polarities)
-            std_polarity = np.std(polarities)
-            median_polarity = np.median(polarities)
-            
-            # Weighted by confidence and impact
-            if confidences and impact_scores:
-                weights = [c * i for c, i in zip(confidences, impact_scores)]
-                weighted_polarity = np.average(polarities, weights=weights)
-            else:
-                weighted_polarity = avg_polarity
-            
-            # Sentiment classification
-            if weighted_polarity > 0.1:
-                sentiment_class = "positive"
-            elif weighted_polarity < -0.1:
-                sentiment_class = "negative"
-            else:
-                sentiment_class = "neutral"
-            
-            # Volume metrics
-            total_news = len(news_data)
-            positive_news = len([p for p in polarities if p > 0.1])
-            negative_news = len([p for p in polarities if p < -0.1])
-            neutral_news = total_news - positive_news - negative_news
-            
-            return {
-                "symbol": symbol,
-                "period_days": days,
-                "total_news": total_news,
-                "avg_polarity": avg_polarity,
-                "weighted_polarity": weighted_polarity,
-                "std_polarity": std_polarity,
-                "sentiment_class": sentiment_class,
-                "positive_news": positive_news,
-                "negative_news": negative_news,
-                "neutral_news": neutral_news,
-                "confidence_avg": np.mean(confidences) if confidences else 0,
-                "impact_avg": np.mean(impact_scores) if impact_scores else 0
-            }
+            start_day, end_day = _window(days)
+            totals = self.rollups.window('news', start_day, end_day, [symbol]).get(symbol)
+            return self._news_summary(symbol, days, summarize(totals))
             
         except Exception as e:
             logger.error(f"Error aggregating news sentiment for {symbol}: {e}")
             return {"error": str(e)}
     
+    def _news_summary(self, symbol: str, days: int, summary: Optional[Dict]) -> Dict:
+        if summary is None:
+            return {"error": "No news sentiment data found"}
+        if not summary["polarity_count"]:
+            return {"error": "No valid sentiment scores found"}
+        
+        weighted_polarity = summary["weighted_polarity"]
+        total_news = summary["row_count"]
+        return {
+            "symbol": symbol,
+            "period_days": days,
+            "total_news": total_news,
+            "avg_polarity": summary["avg_polarity"],
+            "weighted_polarity": weighted_polarity,
+            "std_polarity": summary["std_polarity"],
+            "sentiment_class": _classify_polarity(weighted_polarity),
+            "positive_news": summary["positive_count"],
+            "negative_news": summary["negative_count"],
+            "neutral_news": total_news - summary["positive_count"] - summary["negative_count"],
+            "confidence_avg": summary["confidence_avg"],
+            "impact_avg": summary["impact_avg"]
+        }
+    
     def aggregate_social_sentiment(self, symbol: str, days: int = 7) -> Dict:
-        """Aggregate social media sentiment for a symbol"""
+        """Aggregate social media sentiment for a symbol (dari daily rollups)"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get social sentiment data
-            social_data = self.db.query(SocialSentiment).filter(
-                SocialSentiment.symbol == symbol,
-                SocialSentiment.post_date >= start_date,
-                SocialSentiment.post_date <= end_date
-            ).all()
-            
-            if not social_data:
-                return {"error": "No social sentiment data found"}
-            
-            # Calculate aggregated metrics
-            polarities = [s.polarity for s in social_data if s.polarity is not None]
-            engagement_scores = [s.engagement_score for s in social_data if s.engagement_score is not None]
-            influence_scores = [s.influence_score for s in social_data if s.influence_score is not None]
-            
-            if not polarities:
-                return {"error": "No valid sentiment scores found"}
-            
-            # Basic statistics
-            avg_polarity = np.mean(polarities)
-            std_polarity = np.std(polarities)
-            
-            # Weighted by engagement and influence
-            if engagement_scores and influence_scores:
-                weights = [e * i for e, i in zip(engagement_scores, influence_scores)]
-                weighted_polarity = np.average(polarities, weights=weights)
-            else:
-                weighted_polarity = avg_polarity
-            
-            # Sentiment classification
-            if weighted_polarity > 0.1:
-                sentiment_class = "positive"
-            elif weighted_polarity < -0.1:
-                sentiment_class = "negative"
-            else:
-                sentiment_class = "neutral"
-            
-            # Volume and engagement metrics
-            total_posts = len(social_data)
-            total_engagement = sum([s.likes or 0 + s.retweets or 0 + s.replies or 0 for s in social_data])
-            avg_engagement = total_engagement / total_posts if total_posts > 0 else 0
-            
-            # Platform breakdown
-            platforms = {}
-            for post in social_data:
-                platform = post.platform
-                if platform not in platforms:
-                    platforms[platform] = {"count": 0, "avg_sentiment": 0}
-                platforms[platform]["count"] += 1
-                if post.polarity is not None:
-                    platforms[platform]["avg_sentiment"] += post.polarity
-            
-            for platform in platforms:
-                platforms[platform]["avg_sentiment"] /= platforms[platform]["count"]
-            
-            return {
-                "symbol": symbol,
-                "period_days": days,
-                "total_posts": total_posts,
-                "avg_polarity": avg_polarity,
-                "weighted_polarity": weighted_polarity,
-                "std_polarity": std_polarity,
-                "sentiment_class": sentiment_class,
-                "total_engagement": total_engagement,
-                "avg_engagement": avg_engagement,
-                "platforms": platforms
+            start_day, end_day = _window(days)
+            totals = self.rollups.window('social', start_day, end_day, [symbol]).get(symbol)
+            platforms = {
+                platform: platform_totals
+                for (_, platform), platform_totals in self.rollups.window(
+                    'social', start_day, end_day, [symbol], by_channel=True
+                ).items()
             }
+            return self._social_summary(symbol, days, summarize(totals), platforms)
             
         except Exception as e:
             logger.error(f"Error aggregating social sentiment for {symbol}: {e}")
             return {"error": str(e)}
     
+    def _social_summary(self, symbol: str, days: int, summary: Optional[Dict],
+                        platform_totals: Optional[Dict[str, Dict]] = None) -> Dict:
+        if summary is None:
+            return {"error": "No social sentiment data found"}
+        if not summary["polarity_count"]:
+            return {"error": "No valid sentiment scores found"}
+        
+        weighted_polarity = summary["weighted_polarity"]
+        total_posts = summary["row_count"]
+        total_engagement = summary["engagement_sum"]
+        
+        # Platform breakdown
+        platforms = {}
+        for platform, totals in (platform_totals or {}).items():
+            platforms[platform] = {
+                "count": int(totals["row_count"]),
+                "avg_sentiment": totals["polarity_sum"] / totals["row_count"] if totals["row_count"] else 0
+            }
+        
+        return {
+            "symbol": symbol,
+            "period_days": days,
+            "total_posts": total_posts,
+            "avg_polarity": summary["avg_polarity"],
+            "weighted_polarity": weighted_polarity,
+            "std_polarity": summary["std_polarity"],
+            "sentiment_class": _classify_polarity(weighted_polarity),
+            "total_engagement": total_engagement,
+            "avg_engagement": total_engagement / total_posts if total_posts > 0 else 0,
+            "platforms": platforms
+        }
+    
     def calculate_market_sentiment(self, date: date = None) -> Dict:
         """Calculate market-wide sentiment indicators"""
         try:
             if not date:
                 date = datetime.now().date()
             
+            # Satu lookup per date per engine (batch composite memakai hasil yang sama)
+            if date in self._market_cache:
+                return self._market_cache[date]
+            
             # Get market sentiment data
             market_data = self.db.query(MarketSentiment).filter(
                 MarketSentiment.date == date
@@ -182,6 +138,15 @@ class SentimentAnalysisEngine:
             if not market_data:
                 return {"error": "No market sentiment data found"}
             
+            # News/social averages: dari rollups (semua symbols) jika belum diisi
+            news_sentiment_avg = market_data.news_sentiment_avg
+            social_sentiment_avg = market_data.social_sentiment_avg
+            if news_sentiment_avg is None or social_sentiment_avg is None:
+                if news_sentiment_avg is None:
+                    news_sentiment_avg = self.market_polarity('news', date, date)
+                if social_sentiment_avg is None:
+                    social_sentiment_avg = self.market_polarity('social', date, date)
+            
             # Fear & Greed Index interpretation
             fg_index = market_data.fear_greed_index
             if fg_index >= 80:
@@ -215,7 +180,7 @@ class SentimentAnalysisEngine:
             else:
                 market_sentiment = "neutral"
             
-            return {
+            result = {
                 "date": date.isoformat(),
                 "fear_greed_index": fg_index,
                 "fear_greed_classification": fg_classification,
@@ -228,167 +193,221 @@ class SentimentAnalysisEngine:
                 "volume_classification": volume_classification,
                 "composite_sentiment": composite_score,
                 "market_sentiment": market_sentiment,
-                "news_sentiment_avg": market_data.news_sentiment_avg,
-                "social_sentiment_avg": market_data.social_sentiment_avg
+                "news_sentiment_avg": news_sentiment_avg,
+                "social_sentiment_avg": social_sentiment_avg
             }
+            self._market_cache[date] = result
+            return result
             
         except Exception as e:
             logger.error(f"Error calculating market sentiment: {e}")
             return {"error": str(e)}
     
+    def market_polarity(self, kind: str, start_day: date, end_day: date) -> Optional[float]:
+        """Universe-wide mean polarity untuk news atau social di [start_day, end_day]"""
+        days = self.rollups.daily(kind, start_day, end_day)
+        count = sum(totals["polarity_count"] for _, totals in days)
+        if not count:
+            return None
+        return sum(totals["polarity_sum"] for _, totals in days) / count
+    
     def analyze_insider_activity(self, symbol: str, days: int = 30) -> Dict:
         """Analyze insider trading activity"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get insider trading data
-            insider_data = self.db.query(InsiderTrading).filter(
-                InsiderTrading.symbol == symbol,
-                InsiderTrading.transaction_date >= start_date.date(),
-                InsiderTrading.transaction_date <= end_date.date()
-            ).all()
-            
-            if not insider_data:
+            activity = self._insider_activity([symbol], days).get(symbol)
+            if activity is None:
                 return {"error": "No insider trading data found"}
-            
-            # Analyze buy vs sell activity
-            buy_transactions = [t for t in insider_data if t.transaction_type == 'buy']
-            sell_transactions = [t for t in insider_data if t.transaction_type == 'sell']
-            
-            buy_value = sum([t.total_value for t in buy_transactions if t.total_value])
-            sell_value = sum([t.total_value for t in sell_transactions if t.total_value])
-            
-            net_insider_activity = buy_value - sell_value
-            insider_ratio = buy_value / sell_value if sell_value > 0 else float('inf')
-            
-            # Calculate sentiment score
-            if insider_ratio > 2:
-                insider_sentiment = "very_bullish"
-                sentiment_score = 0.8
-            elif insider_ratio > 1.5:
-                insider_sentiment = "bullish"
-                sentiment_score = 0.6
-            elif insider_ratio > 1:
-                insider_sentiment = "slightly_bullish"
-                sentiment_score = 0.3
-            elif insider_ratio > 0.5:
-                insider_sentiment = "slightly_bearish"
-                sentiment_score = -0.3
-            else:
-                insider_sentiment = "bearish"
-                sentiment_score = -0.6
-            
-            return {
-                "symbol": symbol,
-                "period_days": days,
-                "total_transactions": len(insider_data),
-                "buy_transactions": len(buy_transactions),
-                "sell_transactions": len(sell_transactions),
-                "buy_value": buy_value,
-                "sell_value": sell_value,
-                "net_activity": net_insider_activity,
-                "insider_ratio": insider_ratio,
-                "insider_sentiment": insider_sentiment,
-                "sentiment_score": sentiment_score
-            }
+            return activity
             
         except Exception as e:
             logger.error(f"Error analyzing insider activity for {symbol}: {e}")
             return {"error": str(e)}
     
+    def _insider_activity(self, symbols: Optional[List[str]], days: int) -> Dict[str, Dict]:
+        """Insider buy/sell totals untuk banyak symbols dalam satu GROUP BY query"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        
+        query = self.db.query(
+            InsiderTrading.symbol,
+            InsiderTrading.transaction_type,
+            func.count(InsiderTrading.id),
+            func.sum(InsiderTrading.total_value)
+        ).filter(
+            InsiderTrading.transaction_date >= start_date.date(),
+            InsiderTrading.transaction_date <= end_date.date()
+        )
+        if symbols is not None:
+            query = query.filter(InsiderTrading.symbol.in_(symbols))
+        
+        totals: Dict[str, Dict] = {}
+        for symbol, transaction_type, count, value in query.group_by(
+            InsiderTrading.symbol, InsiderTrading.transaction_type
+        ).all():
+            entry = totals.setdefault(symbol, {"total": 0, "buy": 0, "sell": 0, "buy_value": 0, "sell_value": 0})
+            entry["total"] += count
+            if transaction_type in ("buy", "sell"):
+                entry[transaction_type] = count
+                entry[f"{transaction_type}_value"] = int(value or 0)
+        
+        return {symbol: self._insider_summary(symbol, days, entry) for symbol, entry in totals.items()}
+    
+    def _insider_summary(self, symbol: str, days: int, totals: Dict) -> Dict:
+        buy_value = totals["buy_value"]
+        sell_value = totals["sell_value"]
+        
+        net_insider_activity = buy_value - sell_value
+        insider_ratio = buy_value / sell_value if sell_value > 0 else float('inf')
+        
+        # Calculate sentiment score
+        if insider_ratio > 2:
+            insider_sentiment = "very_bullish"
+            sentiment_score = 0.8
+        elif insider_ratio > 1.5:
+            insider_sentiment = "bullish"
+            sentiment_score = 0.6
+        elif insider_ratio > 1:
+            insider_sentiment = "slightly_bullish"
+            sentiment_score = 0.3
+        elif insider_ratio > 0.5:
+            insider_sentiment = "slightly_bearish"
+            sentiment_score = -0.3
+        else:
+            insider_sentiment = "bearish"
+            sentiment_score = -0.6
+        
+        return {
+            "symbol": symbol,
+            "period_days": days,
+            "total_transactions": totals["total"],
+            "buy_transactions": totals["buy"],
+            "sell_transactions": totals["sell"],
+            "buy_value": buy_value,
+            "sell_value": sell_value,
+            "net_activity": net_insider_activity,
+            "insider_ratio": insider_ratio,
+            "insider_sentiment": insider_sentiment,
+            "sentiment_score": sentiment_score
+        }
+    
     def calculate_composite_sentiment(self, symbol: str, days: int = 7) -> Dict:
         """Calculate composite sentiment score from all sources"""
         try:
-            # Get individual sentiment components
-            news_sentiment = self.aggregate_news_sentiment(symbol, days)
-            social_sentiment = self.aggregate_social_sentiment(symbol, days)
-            insider_activity = self.analyze_insider_activity(symbol, days * 4)  # Longer period for insider data
-            market_sentiment = self.calculate_market_sentiment()
-            
-            # Initialize composite score
-            composite_score = 0
-            confidence = 0
-            components = {}
-            
-            # News sentiment (weight: 0.3)
-            if "weighted_polarity" in news_sentiment:
-                news_score = news_sentiment["weighted_polarity"]
-                composite_score += news_score * 0.3
-                confidence += 0.3
-                components["news"] = {
-                    "score": news_score,
-                    "weight": 0.3,
-                    "count": news_sentiment.get("total_news", 0)
-                }
-            
-            # Social sentiment (weight: 0.25)
-            if "weighted_polarity" in social_sentiment:
-                social_score = social_sentiment["weighted_polarity"]
-                composite_score += social_score * 0.25
-                confidence += 0.25
-                components["social"] = {
-                    "score": social_score,
-                    "weight": 0.25,
-                    "count": social_sentiment.get("total_posts", 0)
-                }
-            
-            # Insider activity (weight: 0.2)
-            if "sentiment_score" in insider_activity:
-                insider_score = insider_activity["sentiment_score"]
-                composite_score += insider_score * 0.2
-                confidence += 0.2
-                components["insider"] = {
-                    "score": insider_score,
-                    "weight": 0.2,
-                    "transactions": insider_activity.get("total_transactions", 0)
-                }
-            
-            # Market sentiment (weight: 0.25)
-            if "composite_sentiment" in market_sentiment:
-                market_score = market_sentiment["composite_sentiment"]
-                composite_score += market_score * 0.25
-                confidence += 0.25
-                components["market"] = {
-                    "score": market_score,
-                    "weight": 0.25,
-                    "fear_greed": market_sentiment.get("fear_greed_index", 50)
-                }
-            
-            # Normalize by confidence
-            if confidence > 0:
-                composite_score = composite_score / confidence
-            
-            # Determine sentiment classification
-            if composite_score > 0.3:
-                sentiment_class = "very_bullish"
-            elif composite_score > 0.1:
-                sentiment_class = "bullish"
-            elif composite_score > -0.1:
-                sentiment_class = "neutral"
-            elif composite_score > -0.3:
-                sentiment_class = "bearish"
-            else:
-                sentiment_class = "very_bearish"
-            
-            # Calculate trend
-            # This would require historical data comparison
-            trend = "stable"  # Placeholder
-            
-            return {
-                "symbol": symbol,
-                "composite_score": composite_score,
-                "sentiment_class": sentiment_class,
-                "confidence": confidence,
-                "trend": trend,
-                "components": components,
-                "period_days": days
-            }
+            return self.calculate_composite_sentiment_batch([symbol], days)[symbol]
             
         except Exception as e:
             logger.error(f"Error calculating composite sentiment for {symbol}: {e}")
             return {"error": str(e)}
     
+    def calculate_composite_sentiment_batch(self, symbols: Optional[List[str]] = None, days: int = 7) -> Dict[str, Dict]:
+        """
+        Composite sentiment untuk banyak symbols sekaligus (symbols=None: seluruh
+        universe dengan news/social rollups di window).
+
+        Satu rollup query per source, satu insider GROUP BY query dan satu
+        market sentiment lookup, berapapun jumlah symbols.
+        """
+        start_day, end_day = _window(days)
+        news = self.rollups.window('news', start_day, end_day, symbols)
+        social = self.rollups.window('social', start_day, end_day, symbols)
+        if symbols is None:
+            symbols = sorted(set(news) | set(social))
+        insider = self._insider_activity(symbols, days * 4)  # Longer period for insider data
+        market_sentiment = self.calculate_market_sentiment()
+        
+        results = {}
+        for symbol in symbols:
+            results[symbol] = self._compose(
+                symbol, days,
+                self._news_summary(symbol, days, summarize(news.get(symbol))),
+                self._social_summary(symbol, days, summarize(social.get(symbol))),
+                insider.get(symbol, {}),
+                market_sentiment
+            )
+        return results
+    
+    def _compose(self, symbol: str, days: int, news_sentiment: Dict, social_sentiment: Dict,
+                 insider_activity: Dict, market_sentiment: Dict) -> Dict:
+        """Weighted composite dari component results"""
+        # Initialize composite score
+        composite_score = 0
+        confidence = 0
+        components = {}
+        
+        # News sentiment (weight: 0.3)
+        if "weighted_polarity" in news_sentiment:
+            news_score = news_sentiment["weighted_polarity"]
+            composite_score += news_score * 0.3
+            confidence += 0.3
+            components["news"] = {
+                "score": news_score,
+                "weight": 0.3,
+                "count": news_sentiment.get("total_news", 0)
+            }
+        
+        # Social sentiment (weight: 0.25)
+        if "weighted_polarity" in social_sentiment:
+            social_score = social_sentiment["weighted_polarity"]
+            composite_score += social_score * 0.25
+            confidence += 0.25
+            components["social"] = {
+                "score": social_score,
+                "weight": 0.25,
+                "count": social_sentiment.get("total_posts", 0)
+            }
+        
+        # Insider activity (weight: 0.2)
+        if "sentiment_score" in insider_activity:
+            insider_score = insider_activity["sentiment_score"]
+            composite_score += insider_score * 0.2
+            confidence += 0.2
+            components["insider"] = {
+                "score": insider_score,
+                "weight": 0.2,
+                "transactions": insider_activity.get("total_transactions", 0)
+            }
+        
+        # Market sentiment (weight: 0.25)
+        if "composite_sentiment" in market_sentiment:
+            market_score = market_sentiment["composite_sentiment"]
+            composite_score += market_score * 0.25
+            confidence += 0.25
+            components["market"] = {
+                "score": market_score,
+                "weight": 0.25,
+                "fear_greed": market_sentiment.get("fear_greed_index", 50)
+            }
+        
+        # Normalize by confidence
+        if confidence > 0:
+            composite_score = composite_score / confidence
+        
+        # Determine sentiment classification
+        if composite_score > 0.3:
+            sentiment_class = "very_bullish"
+        elif composite_score > 0.1:
+            sentiment_class = "bullish"
+        elif composite_score > -0.1:
+            sentiment_class = "neutral"
+        elif composite_score > -0.3:
+            sentiment_class = "bearish"
+        else:
+            sentiment_class = "very_bearish"
+        
+        # Calculate trend
+        # This would require historical data comparison
+        trend = "stable"  # Placeholder
+        
+        return {
+            "symbol": symbol,
+            "composite_score": composite_score,
+            "sentiment_class": sentiment_class,
+            "confidence": confidence,
+            "trend": trend,
+            "components": components,
+            "period_days": days
+        }
+    
     def generate_sentiment_alerts(self, symbol: str, threshold: float = 0.5) -> List[Dict]:
         """Generate sentiment-based alerts"""
         try:
@@ -0,0 +1,358 @@
+"""
+Sentiment Models
+Process-wide registry untuk sentiment models: lazy load sekali per process
+dari local paths, micro-batched transformer inference dan score cache per
+text hash
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.rate_counter import content_hash
+
+logger = logging.getLogger(__name__)
+
+LEXICON_MODELS = ('vader', 'textblob')
+TRANSFORMER_MODELS = ('finbert', 'roberta')
+MAX_TEXT_CHARS = 512
+
+class ScoreCache:
+    """LRU (model, text hash) -> raw model output"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._scores.get(key)
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self._scores.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._scores[key] = value
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._scores), 'max_entries': self.max_entries, **self.stats}
+
+class MicroBatcher:
+    """
+    Mengelompokkan texts dari concurrent callers menjadi satu batch call.
+
+    Worker mengambil text pertama lalu menunggu paling lama max_wait (atau
+    sampai max_batch) sebelum menjalankan fn(texts) di executor. Texts yang
+    masuk selama inference berjalan menjadi batch berikutnya, jadi di bawah
+    load batch otomatis membesar. Worker terikat ke event loop yang aktif dan
+    dibuat ulang jika loop berganti.
+    """
+
+    def __init__(self,
+                 fn: Callable[[List[str]], List[Any]],
+                 max_batch: int = 32,
+                 max_wait: float = 0.01,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.executor = executor
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'batches': 0, 'texts': 0, 'max_batch_seen': 0, 'errors': 0}
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit_many(self, texts: List[str]) -> List[Any]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        futures = []
+        for text in texts:
+            future = self._loop.create_future()
+            self._queue.put_nowait((text, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def submit(self, text: str) -> Any:
+        return (await self.submit_many([text]))[0]
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Caller yang sudah cancel tidak perlu di-score
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [text for text, _ in batch])
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats['batches'] += 1
+            self.stats['texts'] += len(batch)
+            self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(batch))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch_size': round(self.stats['texts'] / batches, 2) if batches else 0.0,
+            'queued': self._queue.qsize() if self._queue is not None else 0
+        }
+
+def _pipeline_batch(pipe, batch_size: int) -> Callable[[List[str]], List[Dict]]:
+    """Padded CPU batch untuk satu transformers pipeline; returns [{'label', 'score'}]"""
+    def run(texts: List[str]) -> List[Dict]:
+        outputs = pipe([text[:MAX_TEXT_CHARS] for text in texts], batch_size=batch_size, truncation=True)
+        return [{'label': output['label'], 'score': float(output['score'])} for output in outputs]
+    return run
+
+class SentimentModelRegistry:
+    """
+    Sentiment models yang di-share oleh semua services dalam satu process.
+
+    Setiap model di-load sekali saat pertama dipakai (bukan per service
+    instance). Transformer weights dibaca dari local paths; jika path tidak
+    ada atau transformers/torch tidak terpasang model itu dianggap tidak
+    tersedia dan registry tetap berjalan dengan VADER/TextBlob.
+
+    predict() mengembalikan raw output per text (None jika model tidak
+    tersedia): vader = polarity_scores dict, textblob = (polarity,
+    subjectivity), finbert/roberta = {'label', 'score'}.
+    """
+
+    def __init__(self,
+                 model_paths: Dict[str, Optional[str]],
+                 batch_size: int = 32,
+                 batch_wait: float = 0.01,
+                 cache_size: int = 50000):
+        self.model_paths = dict(model_paths)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.cache = ScoreCache(cache_size)
+        # Satu inference thread: torch sudah parallel di dalam satu batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment-inference")
+        # Lexicon scoring/loading (pure Python, nltk.download) terpisah agar
+        # tidak antre di belakang transformer batches
+        self._lexicon_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sentiment-lexicon")
+        self._models: Dict[str, Any] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._locks = {name: threading.Lock() for name in LEXICON_MODELS + TRANSFORMER_MODELS}
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Any]:
+        """Scorer (lexicon) atau MicroBatcher (transformer); None jika tidak tersedia"""
+        if name not in self._locks:
+            raise ValueError(f"Unknown sentiment model: {name}")
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def available(self) -> List[str]:
+        return [name for name in LEXICON_MODELS + TRANSFORMER_MODELS if self.get(name) is not None]
+
+    def _load(self, name: str) -> Optional[Any]:
+        try:
+            if name == 'vader':
+                return self._load_vader()
+            if name == 'textblob':
+                return self._load_textblob()
+            return self._load_transformer(name)
+        except Exception as e:
+            logger.error(f"Error loading sentiment model {name}: {e}")
+            return None
+
+    def _load_vader(self) -> Callable[[str], Dict[str, float]]:
+        import nltk
+        from nltk.sentiment import SentimentIntensityAnalyzer
+
+        try:
+            analyzer = SentimentIntensityAnalyzer()
+        except LookupError:
+            nltk.download('vader_lexicon', quiet=True)
+            analyzer = SentimentIntensityAnalyzer()
+        return analyzer.polarity_scores
+
+    def _load_textblob(self) -> Callable[[str], Tuple[float, float]]:
+        from textblob import TextBlob
+
+        def score(text: str) -> Tuple[float, float]:
+            sentiment = TextBlob(text).sentiment
+            return sentiment.polarity, sentiment.subjectivity
+        return score
+
+    def _load_transformer(self, name: str) -> Optional[MicroBatcher]:
+        path = self.model_paths.get(name)
+        if not path or not Path(path).is_dir():
+            logger.info(f"Sentiment model {name} not found at {path}, using lexicon models only")
+            return None
+        try:
+            from transformers import pipeline
+        except ImportError:
+            logger.info(f"transformers not installed, sentiment model {name} disabled")
+            return None
+
+        pipe = pipeline("sentiment-analysis", model=path, tokenizer=path, device=-1)
+        logger.info(f"Loaded sentiment model {name} from {path}")
+        return MicroBatcher(
+            _pipeline_batch(pipe, self.batch_size),
+            max_batch=self.batch_size,
+            max_wait=self.batch_wait,
+            executor=self._executor
+        )
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+
+    async def predict(self, name: str, texts: List[str]) -> List[Optional[Any]]:
+        """
+        Raw output per text. Cache di-cek dulu; text yang sama hanya di-score
+        sekali (juga di dalam satu call dan antar concurrent calls yang
+        sedang in-flight), sisanya lewat micro-batcher.
+        """
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Any]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            key = content_hash(name, text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(key, []).append(i)
+        if not missing:
+            return results
+
+        # Keys yang sedang di-score caller lain cukup ditunggu
+        waiting: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, asyncio.Future] = {}
+        for key in missing:
+            inflight = self._inflight.get(key)
+            if inflight is not None and not inflight.done() and inflight.get_loop() is loop:
+                waiting[key] = inflight
+            else:
+                owned[key] = self._inflight[key] = loop.create_future()
+
+        outputs: List[Optional[Any]] = [None] * len(owned)
+        try:
+            if owned:
+                outputs = await self._score(name, [texts[missing[key][0]] for key in owned])
+        finally:
+            for (key, future), output in zip(owned.items(), outputs):
+                if output is not None:
+                    self.cache.set(key, output)
+                if not future.done():
+                    future.set_result(output)
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+        for key, future in list(owned.items()) + list(waiting.items()):
+            output = await future
+            for i in missing[key]:
+                results[i] = output
+        return results
+
+    async def _score(self, name: str, texts: List[str]) -> List[Optional[Any]]:
+        loop = asyncio.get_running_loop()
+        executor = self._executor if name in TRANSFORMER_MODELS else self._lexicon_executor
+        if not self.is_loaded(name):
+            # Load pertama (weights / nltk.download) bisa beberapa detik; jangan blok event loop
+            await loop.run_in_executor(executor, self.get, name)
+        model = self.get(name)
+        if model is None:
+            return [None] * len(texts)
+        try:
+            if isinstance(model, MicroBatcher):
+                return await model.submit_many(texts)
+            return await loop.run_in_executor(executor, lambda: [model(text) for text in texts])
+        except Exception as e:
+            logger.error(f"Error in {name} sentiment inference: {e}")
+            return [None] * len(texts)
+
+    async def predict_many(self, names: Tuple[str, ...], texts: List[str]) -> Dict[str, List[Optional[Any]]]:
+        """predict() untuk beberapa models sekaligus (transformers berjalan bergantian di executor)"""
+        outputs = await asyncio.gather(*(self.predict(name, texts) for name in names))
+        return dict(zip(names, outputs))
+
+    def get_stats(self) -> Dict:
+        return {
+            'loaded': {name: model is not None for name, model in self._models.items()},
+            'batchers': {name: model.get_stats() for name, model in self._models.items()
+                         if isinstance(model, MicroBatcher)},
+            'cache': self.cache.get_stats(),
+            'inflight': len(self._inflight)
+        }
+
+_registry: Optional[SentimentModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_sentiment_registry() -> SentimentModelRegistry:
+    """Process-wide sentiment model registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SentimentModelRegistry(
+                {'finbert': settings.SENTIMENT_FINBERT_PATH, 'roberta': settings.SENTIMENT_ROBERTA_PATH},
+                batch_size=settings.SENTIMENT_BATCH_SIZE,
+                batch_wait=settings.SENTIMENT_BATCH_WAIT_MS / 1000.0,
+                cache_size=settings.SENTIMENT_SCORE_CACHE_SIZE
+            )
+        return _registry
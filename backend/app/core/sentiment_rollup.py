@@ -0,0 +1,232 @@
+"""
+Sentiment Rollups
+Daily per-symbol sentiment sums (count, sum, sum of squares, weighted sum) yang
+di-update incremental; window stats menjadi O(days) arithmetic
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from app.models.sentiment import NewsSentiment, SocialSentiment, SentimentRollup, SentimentRollupState
+
+logger = logging.getLogger(__name__)
+
+# Polarity thresholds untuk positive / negative counts
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+ROLLUP_FIELDS = (
+    'row_count', 'polarity_count', 'polarity_sum', 'polarity_sq_sum',
+    'weight_sum', 'weighted_polarity_sum', 'positive_count', 'negative_count',
+    'confidence_count', 'confidence_sum', 'impact_count', 'impact_sum', 'engagement_sum'
+)
+
+def _sources() -> Dict[str, Dict]:
+    """Per kind: source model dan column expressions untuk rollup"""
+    return {
+        'news': {
+            'model': NewsSentiment,
+            'timestamp': NewsSentiment.news_date,
+            'channel': NewsSentiment.source,
+            'weight': NewsSentiment.confidence * NewsSentiment.impact_score,
+            'impact': NewsSentiment.impact_score,
+            'engagement': None,
+        },
+        'social': {
+            'model': SocialSentiment,
+            'timestamp': SocialSentiment.post_date,
+            'channel': SocialSentiment.platform,
+            'weight': SocialSentiment.engagement_score * SocialSentiment.influence_score,
+            'impact': SocialSentiment.influence_score,
+            'engagement': (func.coalesce(SocialSentiment.likes, 0)
+                           + func.coalesce(SocialSentiment.retweets, 0)
+                           + func.coalesce(SocialSentiment.replies, 0)),
+        },
+    }
+
+KINDS = ('news', 'social')
+
+# Source rows dengan created_at (server now() saat INSERT) lebih baru dari ini
+# belum di-rollup: transaksi yang INSERT lebih dulu bisa commit belakangan
+COMMIT_LAG = timedelta(seconds=120)
+
+def summarize(totals: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    """Window totals -> mean/std/weighted polarity dan averages (None jika tidak ada rows)"""
+    if not totals or not totals.get('row_count'):
+        return None
+    count = totals['polarity_count']
+    summary = {
+        'row_count': int(totals['row_count']),
+        'polarity_count': int(count),
+        'positive_count': int(totals['positive_count']),
+        'negative_count': int(totals['negative_count']),
+        'confidence_avg': totals['confidence_sum'] / totals['confidence_count'] if totals['confidence_count'] else 0,
+        'impact_avg': totals['impact_sum'] / totals['impact_count'] if totals['impact_count'] else 0,
+        'engagement_sum': int(totals['engagement_sum']),
+        'avg_polarity': None,
+        'std_polarity': None,
+        'weighted_polarity': None,
+    }
+    if count:
+        mean = totals['polarity_sum'] / count
+        variance = max(totals['polarity_sq_sum'] / count - mean * mean, 0.0)
+        summary['avg_polarity'] = mean
+        summary['std_polarity'] = math.sqrt(variance)
+        summary['weighted_polarity'] = (totals['weighted_polarity_sum'] / totals['weight_sum']
+                                        if totals['weight_sum'] > 0 else mean)
+    return summary
+
+class SentimentRollups:
+    """
+    Materializer dan reader untuk sentiment_rollup.
+
+    refresh() meng-aggregate hanya source rows dengan created_at di
+    (last_created_at, now() - COMMIT_LAG] per kind (GROUP BY symbol, day,
+    channel di database) lalu menambahkan deltas ke rollup rows. Watermark
+    memakai created_at, bukan id: id dialokasikan saat INSERT sehingga row
+    dengan id lebih kecil bisa commit setelah max(id) dibaca dan terlewat
+    selamanya. Window reads menjumlahkan rollup rows, bukan raw rows, dan
+    tidak pernah menulis; refresh dijalankan SentimentRollupJob.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _aggregate_query(self, kind: str, *criteria):
+        spec = _sources()[kind]
+        model = spec['model']
+        polarity = model.polarity
+        weighted = and_(polarity.isnot(None), spec['weight'].isnot(None))
+        day = func.date(spec['timestamp'])
+        engagement = func.sum(spec['engagement']) if spec['engagement'] is not None else func.sum(0)
+
+        return self.db.query(
+            model.symbol, day.label('day'), spec['channel'].label('channel'),
+            func.count(model.id).label('row_count'),
+            func.count(polarity).label('polarity_count'),
+            func.sum(polarity).label('polarity_sum'),
+            func.sum(polarity * polarity).label('polarity_sq_sum'),
+            func.sum(case((weighted, spec['weight']), else_=0)).label('weight_sum'),
+            func.sum(case((weighted, spec['weight'] * polarity), else_=0)).label('weighted_polarity_sum'),
+            func.sum(case((polarity > POSITIVE_THRESHOLD, 1), else_=0)).label('positive_count'),
+            func.sum(case((polarity < NEGATIVE_THRESHOLD, 1), else_=0)).label('negative_count'),
+            func.count(model.confidence).label('confidence_count'),
+            func.sum(model.confidence).label('confidence_sum'),
+            func.count(spec['impact']).label('impact_count'),
+            func.sum(spec['impact']).label('impact_sum'),
+            engagement.label('engagement_sum'),
+        ).filter(*criteria).group_by(model.symbol, day, spec['channel'])
+
+    def _refresh_kind(self, kind: str) -> int:
+        model = _sources()[kind]['model']
+        state = self.db.query(SentimentRollupState).filter(
+            SentimentRollupState.kind == kind
+        ).with_for_update().first()
+        if state is None:
+            state = SentimentRollupState(kind=kind)
+            self.db.add(state)
+
+        # Cutoff dari clock database (sama dengan server_default created_at)
+        cutoff = self.db.query(func.now()).scalar() - COMMIT_LAG
+        criteria = [model.created_at <= cutoff]
+        if state.last_created_at is not None:
+            # None: belum pernah di-rollup, mulai dari awal
+            if cutoff <= state.last_created_at:
+                return 0
+            criteria.append(model.created_at > state.last_created_at)
+
+        deltas = self._aggregate_query(kind, *criteria).all()
+        if deltas:
+            self._apply(kind, deltas)
+        state.last_created_at = cutoff
+        return sum(delta.row_count for delta in deltas)
+
+    def _apply(self, kind: str, deltas: List):
+        """Tambahkan aggregated deltas ke rollup rows (insert jika belum ada)"""
+        def key_of(row):
+            day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day))
+            return (row.symbol, day, row.channel or '')
+
+        keys = {key_of(delta): delta for delta in deltas}
+        symbols = {key[0] for key in keys}
+        days = [key[1] for key in keys]
+        existing = {
+            (row.symbol, row.day, row.channel): row
+            for row in self.db.query(SentimentRollup).filter(
+                SentimentRollup.kind == kind,
+                SentimentRollup.symbol.in_(symbols),
+                SentimentRollup.day >= min(days),
+                SentimentRollup.day <= max(days)
+            ).all()
+        }
+
+        for key, delta in keys.items():
+            row = existing.get(key)
+            if row is None:
+                row = SentimentRollup(symbol=key[0], day=key[1], kind=kind, channel=key[2],
+                                      **{field: 0 for field in ROLLUP_FIELDS})
+                self.db.add(row)
+            for field in ROLLUP_FIELDS:
+                setattr(row, field, (getattr(row, field) or 0) + (getattr(delta, field) or 0))
+
+    def refresh(self, kinds: Iterable[str] = KINDS) -> Dict[str, int]:
+        """Rollup source rows yang committed sejak refresh terakhir; returns rows processed per kind"""
+        try:
+            processed = {kind: self._refresh_kind(kind) for kind in kinds}
+            self.db.commit()
+            return processed
+        except Exception as e:
+            logger.error(f"Error refreshing sentiment rollups: {e}")
+            self.db.rollback()
+            raise
+
+    def rebuild(self) -> Dict[str, int]:
+        """Drop semua rollups dan hitung ulang dari raw rows (setelah source rows diubah/dihapus)"""
+        self.db.query(SentimentRollup).delete(synchronize_session=False)
+        self.db.query(SentimentRollupState).delete(synchronize_session=False)
+        self.db.flush()
+        return self.refresh()
+
+    def window(self,
+               kind: str,
+               start: date,
+               end: date,
+               symbols: Optional[Iterable[str]] = None,
+               by_channel: bool = False) -> Dict:
+        """
+        Totals per symbol (atau per (symbol, channel)) untuk day in [start, end].
+
+        Satu query SUM ... GROUP BY di atas rollup rows; symbols=None berarti
+        seluruh universe.
+        """
+        group = [SentimentRollup.symbol] + ([SentimentRollup.channel] if by_channel else [])
+        query = self.db.query(
+            *group, *[func.sum(getattr(SentimentRollup, field)).label(field) for field in ROLLUP_FIELDS]
+        ).filter(
+            SentimentRollup.kind == kind,
+            SentimentRollup.day >= start,
+            SentimentRollup.day <= end
+        )
+        if symbols is not None:
+            query = query.filter(SentimentRollup.symbol.in_(list(symbols)))
+
+        totals = {}
+        for row in query.group_by(*group).all():
+            key = (row.symbol, row.channel) if by_channel else row.symbol
+            totals[key] = {field: float(getattr(row, field) or 0) for field in ROLLUP_FIELDS}
+        return totals
+
+    def daily(self, kind: str, start: date, end: date) -> List[Tuple[date, Dict[str, float]]]:
+        """Universe-wide totals per day (market-level news/social sentiment)"""
+        rows = self.db.query(
+            SentimentRollup.day, *[func.sum(getattr(SentimentRollup, field)).label(field) for field in ROLLUP_FIELDS]
+        ).filter(
+            SentimentRollup.kind == kind,
+            SentimentRollup.day >= start,
+            SentimentRollup.day <= end
+        ).group_by(SentimentRollup.day).order_by(SentimentRollup.day).all()
+        return [(row.day, {field: float(getattr(row, field) or 0) for field in ROLLUP_FIELDS}) for row in rows]
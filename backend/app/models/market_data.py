@@ -1,7 +1,7 @@
 """
 Market Data Models untuk Real-Time dan Historical Data
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Date, BigInteger, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Date, BigInteger, Index, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -103,6 +103,22 @@ class DataUpdateLog(Base):
         Index('idx_symbol_timeframe', 'symbol', 'timeframe'),
     )
 
+class IndicatorState(Base):
+    """Carried-forward EMA/Wilder state untuk incremental indicator materialization"""
+    __tablename__ = "indicator_state"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(20), nullable=False, index=True)
+    timeframe = Column(String(10), nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)  # last materialized bar
+    checked_at = Column(DateTime, nullable=True)  # source rows changed after this are re-materialized
+    state = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('symbol', 'timeframe', name='uq_indicator_state_symbol_timeframe'),
+    )
+
 class MarketStatus(Base):
     """Market status dan trading hours"""
     __tablename__ = "market_status"
@@ -1,7 +1,7 @@
 """
 Sentiment Analysis Models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Date, JSON, BigInteger
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Date, JSON, BigInteger, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -37,7 +37,7 @@ class NewsSentiment(Base):
     impact_score = Column(Float, nullable=True)  # 0 to 1
     relevance_score = Column(Float, nullable=True)  # 0 to 1
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # rollup watermark
 
 class SocialSentiment(Base):
     """Social media sentiment analysis"""
@@ -72,7 +72,7 @@ class SocialSentiment(Base):
     hashtags = Column(JSON, nullable=True)
     mentions = Column(JSON, nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # rollup watermark
 
 class MarketSentiment(Base):
     """Market-wide sentiment indicators"""
@@ -214,3 +214,43 @@ class SentimentAlerts(Base):
     acknowledged_at = Column(DateTime, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SentimentRollup(Base):
+    """Daily per-symbol sentiment sums (news per source, social per platform), di-update incremental"""
+    __tablename__ = "sentiment_rollup"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(20), nullable=False, index=True)
+    day = Column(Date, nullable=False, index=True)
+    kind = Column(String(10), nullable=False)  # news, social
+    channel = Column(String(100), nullable=False)  # news source / social platform
+    
+    # Counts and sums (window stats = sums over days)
+    row_count = Column(Integer, nullable=False, default=0)
+    polarity_count = Column(Integer, nullable=False, default=0)
+    polarity_sum = Column(Float, nullable=False, default=0.0)
+    polarity_sq_sum = Column(Float, nullable=False, default=0.0)
+    weight_sum = Column(Float, nullable=False, default=0.0)  # confidence*impact / engagement*influence
+    weighted_polarity_sum = Column(Float, nullable=False, default=0.0)
+    positive_count = Column(Integer, nullable=False, default=0)  # polarity > 0.1
+    negative_count = Column(Integer, nullable=False, default=0)  # polarity < -0.1
+    confidence_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    impact_count = Column(Integer, nullable=False, default=0)
+    impact_sum = Column(Float, nullable=False, default=0.0)
+    engagement_sum = Column(BigInteger, nullable=False, default=0)  # likes + retweets + replies
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('symbol', 'day', 'kind', 'channel', name='uq_sentiment_rollup_key'),
+    )
+
+class SentimentRollupState(Base):
+    """High-water mark (source created_at) yang sudah masuk sentiment_rollup"""
+    __tablename__ = "sentiment_rollup_state"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(10), nullable=False, unique=True)  # news, social
+    last_created_at = Column(DateTime(timezone=True), nullable=True)  # rows dengan created_at <= ini sudah di-rollup
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
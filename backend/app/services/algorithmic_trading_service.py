@@ -4,9 +4,14 @@ Real-time strategy execution dan risk management
 """
 import asyncio
 import json
-from typing import Dict, List, Optional, Any
+from collections import defaultdict
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.rule_engine import CompiledRule, IndicatorBook, RuleSyntaxError, compile_condition
+from app.database import SessionLocal
 from app.models.trading import Strategy, StrategyRule, Order, Position, Portfolio
 from app.models.market_data import MarketData
 from app.services.strategy_builder_service import StrategyBuilderService
@@ -15,17 +20,106 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+class MarketDataFeed:
+    """
+    Batched market data reads untuk shared tick loop.
+
+    Memakai session sendiri karena fetch() dijalankan di executor thread
+    (tidak memblokir event loop dan tidak berbagi session dengan requests).
+    """
+    
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._db: Optional[Session] = None
+    
+    @staticmethod
+    def _to_bar(row: MarketData) -> Dict:
+        return {
+            "timestamp": row.timestamp,
+            "open": row.open_price,
+            "high": row.high_price,
+            "low": row.low_price,
+            "close": row.last_price if row.last_price is not None else row.close_price,
+            "volume": row.volume,
+            "change": row.change,
+            "change_percent": row.change_percent
+        }
+    
+    def fetch(self, symbols: List[str], warmup: Dict[str, int]) -> Tuple[Dict[str, List[Dict]], Dict[str, Dict]]:
+        """
+        Returns (history per symbol untuk warmup, latest bar per symbol).
+
+        Latest bars: satu query (max timestamp per symbol join market_data)
+        untuk union semua symbols; history: satu windowed query untuk symbols
+        yang indicators-nya baru.
+        """
+        if self._db is None:
+            self._db = self.session_factory()
+        try:
+            history = self._history(warmup) if warmup else {}
+            latest = self._latest(symbols) if symbols else {}
+            return history, latest
+        finally:
+            # Jangan tahan transaction (snapshot) antar ticks
+            self._db.rollback()
+    
+    def _latest(self, symbols: List[str]) -> Dict[str, Dict]:
+        newest = self._db.query(
+            MarketData.symbol, func.max(MarketData.timestamp).label("timestamp")
+        ).filter(MarketData.symbol.in_(symbols)).group_by(MarketData.symbol).subquery()
+        
+        rows = self._db.query(MarketData).join(newest, and_(
+            MarketData.symbol == newest.c.symbol,
+            MarketData.timestamp == newest.c.timestamp
+        )).order_by(MarketData.id).all()
+        # Duplicate timestamps: row dengan id terbesar menang
+        return {row.symbol: self._to_bar(row) for row in rows}
+    
+    def _history(self, warmup: Dict[str, int]) -> Dict[str, List[Dict]]:
+        ranked = self._db.query(
+            MarketData.id,
+            func.row_number().over(
+                partition_by=MarketData.symbol,
+                order_by=MarketData.timestamp.desc()
+            ).label("rank")
+        ).filter(MarketData.symbol.in_(list(warmup))).subquery()
+        
+        limit = min(max(warmup.values()), settings.ALGO_WARMUP_BARS)
+        rows = self._db.query(MarketData).join(ranked, MarketData.id == ranked.c.id).filter(
+            ranked.c.rank <= limit
+        ).order_by(MarketData.timestamp, MarketData.id).all()
+        
+        history = {symbol: [] for symbol in warmup}
+        for row in rows:
+            history[row.symbol].append(self._to_bar(row))
+        return {symbol: bars[-min(warmup[symbol], limit):] for symbol, bars in history.items()}
+
 class AlgorithmicTradingEngine:
-    """Algorithmic Trading Engine untuk real-time strategy execution"""
+    """
+    Algorithmic Trading Engine untuk real-time strategy execution.
+
+    Semua running strategies dilayani oleh satu shared tick loop: setiap
+    tick mengambil latest bars untuk union semua symbols dalam satu batched
+    query, meng-update shared incremental indicators, lalu hanya
+    mengevaluasi strategies yang symbols-nya mendapat bar baru. Rule
+    conditions di-compile sekali saat start_strategy.
+    """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, feed: MarketDataFeed = None, tick_interval: float = None):
         self.db = db
         self.strategy_service = StrategyBuilderService(db)
         self.risk_service = RiskManagementService(db)
         self.running_strategies = {}
-        self.market_data_cache = {}
+        self.indicators = IndicatorBook()
+        self.feed = feed or MarketDataFeed()
+        self.tick_interval = tick_interval or settings.ALGO_TICK_INTERVAL
+        self.symbol_index: Dict[str, Set[int]] = defaultdict(set)
+        self._rule_states: Dict[Tuple[int, int, str], bool] = {}
+        self._tick_task: Optional[asyncio.Task] = None
+        self._signal_tasks: Set[asyncio.Task] = set()
+        self.tick_stats = {"ticks": 0, "last_tick_at": None, "last_tick_ms": 0.0, "signals": 0}
     
-    async def start_strategy(self, strategy_id: int, portfolio_id: int) -> Dict:
+    async def start_strategy(self, strategy_id: int, portfolio_id: int, symbols: Optional[List[str]] = None) -> Dict:
         """Start algorithmic trading strategy"""
         try:
             # Check if strategy is already running
@@ -44,17 +138,36 @@ class AlgorithmicTradingEngine:
             if not portfolio:
                 return {"error": "Portfolio not found"}
             
-            # Start strategy execution
-            strategy_task = asyncio.create_task(
-                self._execute_strategy(strategy_id, portfolio_id, strategy_data)
-            )
+            # Compile rules sekali
+            rules = []
+            for index, rule in enumerate(strategy_data["rules"]):
+                parameters = rule.get("parameters") or {}
+                try:
+                    compiled = compile_condition(rule["condition"], parameters)
+                except RuleSyntaxError as e:
+                    return {"error": f"Invalid condition in rule {index + 1} ({rule['condition']!r}): {e}"}
+                
+                targets = self._rule_targets(parameters, symbols, compiled)
+                if not targets:
+                    return {"error": f"Rule {index + 1} has no symbols; pass symbols or set a symbol parameter"}
+                rules.append({"index": index, "rule": rule, "compiled": compiled, "targets": targets})
+            
+            requirements = [req for entry in rules for target in entry["targets"]
+                            for req in entry["compiled"].requirements(target)]
+            for symbol, spec in requirements:
+                self.indicators.require(symbol, spec)
+                self.symbol_index[symbol].add(strategy_id)
             
             self.running_strategies[strategy_id] = {
-                "task": strategy_task,
+                "name": strategy_data["name"],
                 "portfolio_id": portfolio_id,
+                "rules": rules,
+                "requirements": requirements,
+                "symbols": sorted({symbol for symbol, _ in requirements}),
                 "started_at": datetime.now(),
                 "status": "running"
             }
+            self._ensure_tick_loop()
             
             return {
                 "success": True,
@@ -67,22 +180,37 @@ class AlgorithmicTradingEngine:
             logger.error(f"Error starting strategy: {e}")
             return {"error": str(e)}
     
+    @staticmethod
+    def _rule_targets(parameters: Dict, symbols: Optional[List[str]], compiled: CompiledRule) -> List[str]:
+        """Symbols untuk evaluasi rule: rule parameters, lalu strategy symbols, lalu symbols di condition"""
+        if parameters.get("symbol"):
+            return [parameters["symbol"]]
+        if parameters.get("symbols"):
+            return list(parameters["symbols"])
+        if symbols:
+            return list(symbols)
+        return sorted(compiled.symbols)
+    
     async def stop_strategy(self, strategy_id: int) -> Dict:
         """Stop algorithmic trading strategy"""
         try:
             if strategy_id not in self.running_strategies:
                 return {"error": "Strategy is not running"}
             
-            # Cancel strategy task
-            strategy_info = self.running_strategies[strategy_id]
-            strategy_info["task"].cancel()
-            
-            # Update status
-            strategy_info["status"] = "stopped"
-            strategy_info["stopped_at"] = datetime.now()
-            
-            # Remove from running strategies
-            del self.running_strategies[strategy_id]
+            # Remove from running strategies dan lepas shared indicators
+            strategy_info = self.running_strategies.pop(strategy_id)
+            for symbol, spec in strategy_info["requirements"]:
+                self.indicators.release(symbol, spec)
+                subscribers = self.symbol_index.get(symbol)
+                if subscribers is not None:
+                    subscribers.discard(strategy_id)
+                    if not subscribers:
+                        del self.symbol_index[symbol]
+            self._rule_states = {key: state for key, state in self._rule_states.items() if key[0] != strategy_id}
+            
+            if not self.running_strategies and self._tick_task is not None:
+                self._tick_task.cancel()
+                self._tick_task = None
             
             return {
                 "success": True,
@@ -103,6 +231,7 @@ class AlgorithmicTradingEngine:
                     "strategy_id": strategy_id,
                     "portfolio_id": info["portfolio_id"],
                     "status": info["status"],
+                    "symbols": info["symbols"],
                     "started_at": info["started_at"].isoformat(),
                     "uptime": (datetime.now() - info["started_at"]).total_seconds()
                 })
@@ -116,124 +245,111 @@ class AlgorithmicTradingEngine:
             logger.error(f"Error getting running strategies: {e}")
             return {"error": str(e)}
     
-    async def _execute_strategy(self, strategy_id: int, portfolio_id: int, strategy_data: Dict):
-        """Execute strategy in real-time"""
-        try:
-            logger.info(f"Starting strategy execution: {strategy_data['name']}")
-            
-            while True:
-                try:
-                    # Get current market data
-                    market_data = await self._get_market_data(strategy_data.get("symbols", []))
-                    
-                    # Evaluate strategy rules
-                    signals = await self._evaluate_strategy_rules(
-                        strategy_id, strategy_data["rules"], market_data
-                    )
-                    
-                    # Execute trades based on signals
-                    for signal in signals:
-                        await self._execute_trade_signal(
-                            strategy_id, portfolio_id, signal
-                        )
-                    
-                    # Wait for next evaluation cycle
-                    await asyncio.sleep(60)  # Evaluate every minute
-                    
-                except asyncio.CancelledError:
-                    logger.info(f"Strategy {strategy_id} execution cancelled")
-                    break
-                except Exception as e:
-                    logger.error(f"Error in strategy execution: {e}")
-                    await asyncio.sleep(60)  # Wait before retrying
-                    
-        except Exception as e:
-            logger.error(f"Error in strategy execution loop: {e}")
+    def get_tick_stats(self) -> Dict:
+        """Shared tick loop statistics"""
+        stats = dict(self.tick_stats)
+        if stats["last_tick_at"]:
+            stats["last_tick_at"] = stats["last_tick_at"].isoformat()
+        stats["symbols"] = len(self.symbol_index)
+        stats["tick_interval"] = self.tick_interval
+        return stats
     
-    async def _get_market_data(self, symbols: List[str]) -> Dict:
-        """Get current market data for symbols"""
-        try:
-            market_data = {}
-            
-            for symbol in symbols:
-                # Get latest market data
-                latest_data = self.db.query(MarketData).filter(
-                    MarketData.symbol == symbol
-                ).order_by(MarketData.timestamp.desc()).first()
-                
-                if latest_data:
-                    market_data[symbol] = {
-                        "price": latest_data.last_price,
-                        "change": latest_data.change,
-                        "change_percent": latest_data.change_percent,
-                        "volume": latest_data.volume,
-                        "timestamp": latest_data.timestamp
-                    }
-            
-            return market_data
-            
-        except Exception as e:
-            logger.error(f"Error getting market data: {e}")
-            return {}
+    def _ensure_tick_loop(self):
+        if self._tick_task is None or self._tick_task.done():
+            self._tick_task = asyncio.create_task(self._run_tick_loop())
     
-    async def _evaluate_strategy_rules(self, strategy_id: int, rules: List[Dict], market_data: Dict) -> List[Dict]:
-        """Evaluate strategy rules and generate signals"""
-        try:
-            signals = []
-            
-            for rule in rules:
+    async def _run_tick_loop(self):
+        """Shared market data loop untuk semua running strategies"""
+        loop = asyncio.get_running_loop()
+        logger.info("Starting shared strategy tick loop")
+        
+        while self.running_strategies:
+            started = loop.time()
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                logger.info("Strategy tick loop cancelled")
+                raise
+            except Exception as e:
+                logger.error(f"Error in strategy tick: {e}")
+            
+            elapsed = loop.time() - started
+            self.tick_stats["last_tick_ms"] = round(elapsed * 1000, 2)
+            await asyncio.sleep(max(self.tick_interval - elapsed, 0))
+    
+    async def _tick(self):
+        """Satu batched fetch, indicator updates, lalu evaluasi strategies yang terdampak"""
+        symbols = list(self.symbol_index)
+        warmup = {symbol: self.indicators.lookback(symbol) for symbol in self.indicators.stale}
+        
+        loop = asyncio.get_running_loop()
+        history, latest = await loop.run_in_executor(None, self.feed.fetch, symbols, warmup)
+        
+        updated = set()
+        for symbol, bars in history.items():
+            self.indicators.warm(symbol, bars)
+            updated.add(symbol)
+        for symbol, bar in latest.items():
+            if self.indicators.update(symbol, bar):
+                updated.add(symbol)
+        
+        self.tick_stats["ticks"] += 1
+        self.tick_stats["last_tick_at"] = datetime.now()
+        
+        affected = set()
+        for symbol in updated:
+            affected.update(self.symbol_index.get(symbol, ()))
+        
+        for strategy_id in affected:
+            info = self.running_strategies.get(strategy_id)
+            if info is None:
+                continue
+            for signal in self._evaluate_strategy_rules(strategy_id, info["rules"], updated):
+                self._dispatch_signal(strategy_id, info["portfolio_id"], signal)
+    
+    def _evaluate_strategy_rules(self, strategy_id: int, rules: List[Dict], updated: Set[str]) -> List[Dict]:
+        """
+        Evaluate compiled rules and generate signals.
+
+        Edge-triggered: signal hanya saat condition berubah dari false ke true
+        untuk (rule, symbol), sehingga condition yang tetap true tidak
+        menghasilkan order di setiap tick.
+        """
+        signals = []
+        for entry in rules:
+            compiled = entry["compiled"]
+            rule = entry["rule"]
+            for target in entry["targets"]:
+                if target not in updated and not (compiled.symbols & updated):
+                    continue
                 try:
-                    # Evaluate rule condition
-                    condition_met = await self._evaluate_condition(
-                        rule["condition"], market_data
-                    )
-                    
-                    if condition_met:
-                        signal = {
-                            "strategy_id": strategy_id,
-                            "action": rule["action"],
-                            "symbol": self._extract_symbol_from_condition(rule["condition"]),
-                            "parameters": rule.get("parameters", {}),
-                            "timestamp": datetime.now(),
-                            "rule_type": rule["type"]
-                        }
-                        signals.append(signal)
-                        
+                    condition_met = compiled.evaluate(self.indicators, target)
                 except Exception as e:
-                    logger.error(f"Error evaluating rule: {e}")
+                    logger.error(f"Error evaluating rule {rule['condition']!r} for {target}: {e}")
                     continue
-            
-            return signals
-            
-        except Exception as e:
-            logger.error(f"Error evaluating strategy rules: {e}")
-            return []
-    
-    async def _evaluate_condition(self, condition: str, market_data: Dict) -> bool:
-        """Evaluate trading condition (simplified)"""
-        try:
-            # This is a simplified condition evaluator
-            # In a real implementation, you would parse the condition string
-            # and evaluate it against market data
-            
-            # For now, return random evaluation for demo
-            import random
-            return random.random() > 0.7  # 30% chance of signal
-            
-        except Exception as e:
-            logger.error(f"Error evaluating condition: {e}")
-            return False
+                
+                key = (strategy_id, entry["index"], target)
+                was_met = self._rule_states.get(key, False)
+                self._rule_states[key] = condition_met
+                if condition_met and not was_met:
+                    bar = self.indicators.snapshot(target) or {}
+                    signals.append({
+                        "strategy_id": strategy_id,
+                        "action": rule["action"],
+                        "symbol": target,
+                        "price": bar.get("close"),
+                        "parameters": rule.get("parameters", {}),
+                        "timestamp": datetime.now(),
+                        "rule_type": rule["type"]
+                    })
+        return signals
     
-    def _extract_symbol_from_condition(self, condition: str) -> str:
-        """Extract symbol from condition string"""
-        try:
-            # Simplified symbol extraction
-            # In a real implementation, you would parse the condition
-            return "AAPL"  # Default symbol for demo
-            
-        except Exception as e:
-            logger.error(f"Error extracting symbol: {e}")
-            return "AAPL"
+    def _dispatch_signal(self, strategy_id: int, portfolio_id: int, signal: Dict):
+        """Execute signal di background task agar tick loop tidak menunggu order execution"""
+        self.tick_stats["signals"] += 1
+        task = asyncio.create_task(self._execute_trade_signal(strategy_id, portfolio_id, signal))
+        self._signal_tasks.add(task)
+        task.add_done_callback(self._signal_tasks.discard)
     
     async def _execute_trade_signal(self, strategy_id: int, portfolio_id: int, signal: Dict):
         """Execute trade signal"""
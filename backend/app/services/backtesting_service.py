@@ -8,6 +8,8 @@ from app.models.backtesting import (
 )
 from app.models.trading import Strategy
 from app.services.data_service import DataService
+from app.core.backtest_engine import VectorizedBacktestEngine
+from app.core.monte_carlo import BatchedMonteCarloEngine
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
 import uuid
@@ -70,8 +72,11 @@ class BacktestingService:
             self.db.rollback()
             return {"error": str(e)}
     
-    def run_backtest(self, backtest_id: str) -> Dict:
-        """Run backtest execution"""
+    def run_backtest(self, backtest_id: str, engine: str = "vectorized") -> Dict:
+        """Run backtest execution
+
+        engine: "vectorized" (indicator arrays, O(n)) atau "loop" (bar-by-bar reference)
+        """
         try:
             # Get backtest record
             backtest = self.db.query(Backtest).filter(Backtest.backtest_id == backtest_id).first()
@@ -97,7 +102,10 @@ class BacktestingService:
                 return {"error": "No historical data available"}
             
             # Run strategy simulation
-            results = self._run_strategy_simulation(backtest, historical_data)
+            if engine == "loop":
+                results = self._run_strategy_simulation(backtest, historical_data)
+            else:
+                results = self._run_strategy_simulation_vectorized(backtest, historical_data)
             
             # Update backtest with results
             self._update_backtest_results(backtest, results)
@@ -272,6 +280,29 @@ class BacktestingService:
             logger.error(f"Error running strategy simulation: {e}")
             return {}
     
+    def _run_strategy_simulation_vectorized(self, backtest: Backtest, data: List[Dict]) -> Dict:
+        """Run strategy simulation with the vectorized engine (same trades as the loop)"""
+        try:
+            engine = VectorizedBacktestEngine(
+                commission_rate=backtest.commission_rate,
+                slippage_rate=backtest.slippage_rate
+            )
+            
+            timestamps = [bar['timestamp'] for bar in data]
+            close = np.array([bar['close'] for bar in data], dtype=float)
+            
+            return engine.run(
+                timestamps,
+                close,
+                backtest.initial_capital,
+                backtest.strategy_type,
+                backtest.strategy_params or {}
+            )
+            
+        except Exception as e:
+            logger.error(f"Error running vectorized strategy simulation: {e}")
+            return {}
+    
     def _calculate_indicators(self, data: List[Dict], strategy_type: StrategyType, params: Dict) -> Dict:
         """Calculate technical indicators"""
         if len(data) < 20:  # Need minimum data for indicators
@@ -310,7 +341,7 @@ class BacktestingService:
         signal = {'action': 'hold', 'strength': 0}
         
         if strategy_type == StrategyType.MOVING_AVERAGE:
-            if 'sma' in indicators and 'sma_prev' in indicators:
+            if 'sma' in indicators and indicators.get('sma_prev') is not None:
                 if bar['close'] > indicators['sma'] and bar['close'] <= indicators['sma_prev']:
                     signal = {'action': 'buy', 'strength': 1}
                 elif bar['close'] < indicators['sma'] and bar['close'] >= indicators['sma_prev']:
@@ -607,8 +638,18 @@ class BacktestingService:
             logger.error(f"Error listing backtests: {e}")
             return []
     
-    def run_monte_carlo_simulation(self, backtest_id: str, num_simulations: int = 1000) -> Dict:
-        """Run Monte Carlo simulation"""
+    def run_monte_carlo_simulation(self,
+                                   backtest_id: str,
+                                   num_simulations: int = 1000,
+                                   horizon: int = 252,
+                                   method: str = "bootstrap",
+                                   block_size: int = 20,
+                                   seed: Optional[int] = None,
+                                   chunk_size: int = 2000) -> Dict:
+        """Run Monte Carlo simulation
+
+        method: "bootstrap", "block_bootstrap" atau "normal"; seed membuat hasil reproducible
+        """
         try:
             # Get backtest results
             backtest = self.db.query(Backtest).filter(Backtest.backtest_id == backtest_id).first()
@@ -619,14 +660,18 @@ class BacktestingService:
             simulation_id = f"MC_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
             
             # Run Monte Carlo simulation
-            simulation_results = self._run_monte_carlo(backtest, num_simulations)
+            simulation_results = self._run_monte_carlo(
+                backtest, num_simulations, horizon, method, block_size, seed, chunk_size
+            )
+            if not simulation_results or "error" in simulation_results:
+                return {"error": simulation_results.get("error", "Monte Carlo simulation failed")}
             
             # Save simulation results
             simulation = MonteCarloSimulation(
                 simulation_id=simulation_id,
                 backtest_id=backtest_id,
                 num_simulations=num_simulations,
-                simulation_length=365,  # 1 year
+                simulation_length=horizon,
                 confidence_levels=simulation_results.get('confidence_levels', {}),
                 worst_case_scenario=simulation_results.get('worst_case', 0),
                 best_case_scenario=simulation_results.get('best_case', 0),
@@ -652,81 +697,31 @@ class BacktestingService:
             logger.error(f"Error running Monte Carlo simulation: {e}")
             return {"error": str(e)}
     
-    def _run_monte_carlo(self, backtest: Backtest, num_simulations: int) -> Dict:
-        """Run Monte Carlo simulation"""
+    def _run_monte_carlo(self,
+                         backtest: Backtest,
+                         num_simulations: int,
+                         horizon: int = 252,
+                         method: str = "bootstrap",
+                         block_size: int = 20,
+                         seed: Optional[int] = None,
+                         chunk_size: int = 2000) -> Dict:
+        """Run Monte Carlo simulation with the batched engine"""
         try:
             # Get daily returns from backtest
-            daily_returns = []
-            if backtest.equity_curve:
-                for i in range(1, len(backtest.equity_curve)):
-                    prev_equity = backtest.equity_curve[i-1]['equity']
-                    curr_equity = backtest.equity_curve[i]['equity']
-                    daily_return = (curr_equity - prev_equity) / prev_equity
-                    daily_returns.append(daily_return)
-            
-            if not daily_returns:
-                return {"error": "No daily returns data available"}
-            
-            # Calculate statistics
-            mean_return = np.mean(daily_returns)
-            std_return = np.std(daily_returns)
-            
-            # Run simulations
-            simulation_paths = []
-            final_values = []
-            
-            for _ in range(num_simulations):
-                # Generate random path
-                random_returns = np.random.normal(mean_return, std_return, 252)  # 1 year
-                path = [backtest.initial_capital]
-                
-                for ret in random_returns:
-                    new_value = path[-1] * (1 + ret)
-                    path.append(new_value)
-                
-                simulation_paths.append(path)
-                final_values.append(path[-1])
+            equity = np.array([point['equity'] for point in backtest.equity_curve or []], dtype=float)
+            daily_returns = (equity[1:] - equity[:-1]) / equity[:-1] if len(equity) > 1 else np.array([])
             
-            # Calculate statistics
-            final_values = np.array(final_values)
+            if len(daily_returns) == 0:
+                return {"error": "No daily returns data available"}
             
-            return {
-                'confidence_levels': {
-                    '95': np.percentile(final_values, 5),
-                    '99': np.percentile(final_values, 1)
-                },
-                'worst_case': np.min(final_values),
-                'best_case': np.max(final_values),
-                'expected_value': np.mean(final_values),
-                'var_95': np.percentile(final_values, 5),
-                'var_99': np.percentile(final_values, 1),
-                'cvar_95': np.mean(final_values[final_values <= np.percentile(final_values, 5)]),
-                'cvar_99': np.mean(final_values[final_values <= np.percentile(final_values, 1)]),
-                'paths': simulation_paths[:100],  # Sample of paths
-                'stats': {
-                    'mean': np.mean(final_values),
-                    'std': np.std(final_values),
-                    'skewness': self._calculate_skewness(final_values),
-                    'kurtosis': self._calculate_kurtosis(final_values)
-                }
-            }
+            engine = BatchedMonteCarloEngine(
+                daily_returns,
+                backtest.initial_capital,
+                seed=seed,
+                chunk_size=chunk_size
+            )
+            return engine.run(num_simulations, horizon, method, block_size)
             
         except Exception as e:
             logger.error(f"Error running Monte Carlo simulation: {e}")
             return {}
-    
-    def _calculate_skewness(self, data: np.ndarray) -> float:
-        """Calculate skewness"""
-        mean = np.mean(data)
-        std = np.std(data)
-        if std == 0:
-            return 0
-        return np.mean(((data - mean) / std) ** 3)
-    
-    def _calculate_kurtosis(self, data: np.ndarray) -> float:
-        """Calculate kurtosis"""
-        mean = np.mean(data)
-        std = np.std(data)
-        if std == 0:
-            return 0
-        return np.mean(((data - mean) / std) ** 4) - 3
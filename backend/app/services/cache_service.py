@@ -2,15 +2,19 @@
 Smart Data Caching Service
 Mencegah re-downloading data yang sudah ada untuk menghemat waktu dan kuota
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.market_data import MarketData, HistoricalData
 from app.services.data_service import DataService
+from app.services.ingestion_service import IngestionScheduler
+from app.core.layered_cache import LayeredCache, get_layered_cache
+from app.config import settings
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 import hashlib
-import json
 import redis
+import pandas as pd
 from functools import wraps
 
 logger = logging.getLogger(__name__)
@@ -20,7 +24,10 @@ class CacheService:
     
     def __init__(self, db: Session, redis_client: redis.Redis = None):
         self.db = db
-        self.redis = redis_client
+        # In-process LRU tier + Redis; default instance di-share oleh semua requests
+        self.cache = (LayeredCache(redis_client, key_prefix=settings.CACHE_KEY_PREFIX)
+                      if redis_client is not None else get_layered_cache())
+        self.redis = self.cache.redis
         self.data_service = DataService(db)
         
         # Cache configuration
@@ -33,11 +40,11 @@ class CacheService:
         }
     
     def get_cache_key(self, prefix: str, **kwargs) -> str:
-        """Generate cache key"""
+        """Generate cache key (prefix tetap readable untuk pattern invalidation)"""
         # Sort kwargs for consistent key generation
         sorted_kwargs = sorted(kwargs.items())
         key_string = f"{prefix}:{':'.join(f'{k}={v}' for k, v in sorted_kwargs)}"
-        return hashlib.md5(key_string.encode()).hexdigest()
+        return f"{prefix}:{hashlib.md5(key_string.encode()).hexdigest()}"
     
     def cache_wrapper(self, cache_type: str, ttl: int = None):
         """Decorator untuk caching function results"""
@@ -50,33 +57,8 @@ class CacheService:
                     **{k: v for k, v in kwargs.items() if k not in ['db', 'self']}
                 )
                 
-                # Try to get from cache
-                if self.redis:
-                    try:
-                        cached_data = self.redis.get(cache_key)
-                        if cached_data:
-                            logger.debug(f"Cache hit for {cache_key}")
-                            return json.loads(cached_data)
-                    except Exception as e:
-                        logger.warning(f"Redis cache error: {e}")
-                
-                # Execute function
-                result = func(*args, **kwargs)
-                
-                # Cache result
-                if self.redis and result:
-                    try:
-                        cache_ttl = ttl or self.cache_ttl.get(cache_type, 3600)
-                        self.redis.setex(
-                            cache_key,
-                            cache_ttl,
-                            json.dumps(result, default=str)
-                        )
-                        logger.debug(f"Cached result for {cache_key}")
-                    except Exception as e:
-                        logger.warning(f"Redis cache set error: {e}")
-                
-                return result
+                cache_ttl = ttl or self.cache_ttl.get(cache_type, 3600)
+                return self.cache.get_or_load(cache_key, lambda: func(*args, **kwargs), cache_ttl)
             return wrapper
         return decorator
     
@@ -110,37 +92,14 @@ class CacheService:
             if not external_data:
                 return []
             
-            # Store in database
-            stored_count = 0
-            for item in external_data:
-                try:
-                    # Check if already exists
-                    existing = self.db.query(HistoricalData).filter(
-                        HistoricalData.symbol == symbol.upper(),
-                        HistoricalData.timeframe == timeframe,
-                        HistoricalData.timestamp == item['timestamp']
-                    ).first()
-                    
-                    if not existing:
-                        db_candlestick = HistoricalData(
-                            symbol=symbol.upper(),
-                            timeframe=timeframe,
-                            date=item['timestamp'].date(),
-                            timestamp=item['timestamp'],
-                            open_price=item['open'],
-                            high_price=item['high'],
-                            low_price=item['low'],
-                            close_price=item['close'],
-                            volume=item['volume']
-                        )
-                        self.db.add(db_candlestick)
-                        stored_count += 1
-                except Exception as e:
-                    logger.warning(f"Error storing candlestick data: {e}")
-                    continue
-            
-            self.db.commit()
-            logger.info(f"Stored {stored_count} new candlestick data points for {symbol} {timeframe}")
+            # Store in database (bulk upsert)
+            save_result = self.data_service.bulk_save_historical_data(
+                symbol.upper(), timeframe, pd.DataFrame(external_data)
+            )
+            logger.info(
+                f"Stored {save_result.get('inserted', 0)} new and updated {save_result.get('updated', 0)} "
+                f"candlestick data points for {symbol} {timeframe}"
+            )
             
             return external_data
             
@@ -151,82 +110,79 @@ class CacheService:
     def get_realtime_price(self, symbol: str, force_refresh: bool = False) -> Optional[Dict]:
         """Get real-time price dengan caching"""
         try:
-            # Check cache first
             cache_key = self.get_cache_key("realtime_price", symbol=symbol)
-            
-            if not force_refresh and self.redis:
-                try:
-                    cached_data = self.redis.get(cache_key)
-                    if cached_data:
-                        logger.debug(f"Cache hit for realtime price {symbol}")
-                        return json.loads(cached_data)
-                except Exception as e:
-                    logger.warning(f"Redis cache error: {e}")
-            
-            # Fetch from external source
-            price_data = self.data_service.get_real_time_price(symbol)
-            
-            if price_data:
-                # Cache the result
-                if self.redis:
-                    try:
-                        self.redis.setex(
-                            cache_key,
-                            self.cache_ttl['realtime'],
-                            json.dumps(price_data, default=str)
-                        )
-                    except Exception as e:
-                        logger.warning(f"Redis cache set error: {e}")
-                
-                # Store in database
-                try:
-                    db_price = MarketData(
-                        symbol=symbol.upper(),
-                        timestamp=datetime.now(),
-                        last_price=price_data['price'],
-                        change=price_data.get('change'),
-                        change_percent=price_data.get('change_percent'),
-                        volume=price_data.get('volume')
-                    )
-                    self.db.add(db_price)
-                    self.db.commit()
-                except Exception as e:
-                    logger.warning(f"Error storing realtime price: {e}")
-            
-            return price_data
+            return self.cache.get_or_load(
+                cache_key,
+                lambda: self._fetch_realtime_price(symbol),
+                self.cache_ttl['realtime'],
+                force_refresh=force_refresh
+            )
             
         except Exception as e:
             logger.error(f"Error getting realtime price: {e}")
             return None
     
+    def _fetch_realtime_price(self, symbol: str) -> Optional[Dict]:
+        """Fetch from external source and store in database"""
+        price_data = self.data_service.get_real_time_price(symbol)
+        
+        if price_data:
+            try:
+                db_price = MarketData(
+                    symbol=symbol.upper(),
+                    timestamp=datetime.now(),
+                    last_price=price_data['price'],
+                    change=price_data.get('change'),
+                    change_percent=price_data.get('change_percent'),
+                    volume=price_data.get('volume')
+                )
+                self.db.add(db_price)
+                self.db.commit()
+            except Exception as e:
+                logger.warning(f"Error storing realtime price: {e}")
+                self.db.rollback()
+        
+        return price_data
+    
+    def preload_realtime_prices(self, symbols: List[str], chunk: int = 100) -> Dict[str, Dict]:
+        """Batch fetch realtime prices (multi-ticker per chunk), isi cache per symbol, satu commit"""
+        prices: Dict[str, Dict] = {}
+        for offset in range(0, len(symbols), chunk):
+            try:
+                prices.update(self.data_service.get_real_time_prices(symbols[offset:offset + chunk]))
+            except Exception as e:
+                logger.warning(f"Error preloading realtime prices: {e}")
+        
+        now = datetime.now()
+        for symbol, price_data in prices.items():
+            self.cache.set(
+                self.get_cache_key("realtime_price", symbol=symbol), price_data, self.cache_ttl['realtime']
+            )
+            self.db.add(MarketData(
+                symbol=symbol.upper(),
+                timestamp=now,
+                last_price=price_data['price'],
+                change=price_data.get('change'),
+                change_percent=price_data.get('change_percent'),
+                volume=price_data.get('volume')
+            ))
+        try:
+            self.db.commit()
+        except Exception as e:
+            logger.warning(f"Error storing realtime prices: {e}")
+            self.db.rollback()
+        return prices
+    
     def get_fundamental_data(self, symbol: str, force_refresh: bool = False) -> Optional[Dict]:
         """Get fundamental data dengan caching"""
         try:
             cache_key = self.get_cache_key("fundamental", symbol=symbol)
-            
-            if not force_refresh and self.redis:
-                try:
-                    cached_data = self.redis.get(cache_key)
-                    if cached_data:
-                        logger.debug(f"Cache hit for fundamental data {symbol}")
-                        return json.loads(cached_data)
-                except Exception as e:
-                    logger.warning(f"Redis cache error: {e}")
-            
-            # Fetch from external source
-            fundamental_data = self.data_service.get_fundamental_data(symbol)
-            
-            if fundamental_data and self.redis:
-                try:
-                    self.redis.setex(
-                        cache_key,
-                        self.cache_ttl['fundamental'],
-                        json.dumps(fundamental_data, default=str)
-                    )
-                except Exception as e:
-                    logger.warning(f"Redis cache set error: {e}")
-            
-            return fundamental_data
+            return self.cache.get_or_load(
+                cache_key,
+                lambda: self.data_service.get_fundamental_data(symbol),
+                self.cache_ttl['fundamental'],
+                force_refresh=force_refresh
+            )
             
         except Exception as e:
             logger.error(f"Error getting fundamental data: {e}")
@@ -236,30 +192,12 @@ class CacheService:
         """Get sentiment data dengan caching"""
         try:
             cache_key = self.get_cache_key("sentiment", symbol=symbol)
-            
-            if not force_refresh and self.redis:
-                try:
-                    cached_data = self.redis.get(cache_key)
-                    if cached_data:
-                        logger.debug(f"Cache hit for sentiment data {symbol}")
-                        return json.loads(cached_data)
-                except Exception as e:
-                    logger.warning(f"Redis cache error: {e}")
-            
-            # Fetch from external source
-            sentiment_data = self.data_service.get_sentiment_data(symbol)
-            
-            if sentiment_data and self.redis:
-                try:
-                    self.redis.setex(
-                        cache_key,
-                        self.cache_ttl['sentiment'],
-                        json.dumps(sentiment_data, default=str)
-                    )
-                except Exception as e:
-                    logger.warning(f"Redis cache set error: {e}")
-            
-            return sentiment_data
+            return self.cache.get_or_load(
+                cache_key,
+                lambda: self.data_service.get_sentiment_data(symbol),
+                self.cache_ttl['sentiment'],
+                force_refresh=force_refresh
+            )
             
         except Exception as e:
             logger.error(f"Error getting sentiment data: {e}")
@@ -346,15 +284,17 @@ class CacheService:
                 'redis_connected': False,
                 'redis_info': {},
                 'cache_keys': 0,
-                'memory_usage': 0
+                'memory_usage': '0B',
+                'tiers': self.cache.get_stats()
             }
             
             if self.redis:
                 try:
+                    redis_info = self.redis.info()
                     stats['redis_connected'] = True
-                    stats['redis_info'] = self.redis.info()
+                    stats['redis_info'] = redis_info
                     stats['cache_keys'] = self.redis.dbsize()
-                    stats['memory_usage'] = self.redis.info().get('used_memory_human', '0B')
+                    stats['memory_usage'] = redis_info.get('used_memory_human', '0B')
                 except Exception as e:
                     logger.warning(f"Redis info error: {e}")
             
@@ -380,16 +320,14 @@ class CacheService:
                 return {'error': 'Redis not available'}
             
             if cache_type:
-                # Clear specific cache type
+                # Clear specific cache type (SCAN, tidak memblokir Redis seperti KEYS)
                 pattern = f"*{cache_type}*"
-                keys = self.redis.keys(pattern)
-                if keys:
-                    self.redis.delete(*keys)
-                return {'cleared_keys': len(keys), 'pattern': pattern}
+                cleared = self.cache.invalidate_pattern(pattern)
+                return {'cleared_keys': cleared, 'pattern': pattern}
             else:
-                # Clear all cache
-                self.redis.flushdb()
-                return {'message': 'All cache cleared'}
+                # Clear all cache keys (Redis dan in-process tier semua workers)
+                cleared = self.cache.clear()
+                return {'message': 'All cache cleared', 'cleared_keys': cleared}
                 
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
@@ -414,36 +352,39 @@ class CacheService:
             
             results = {}
             
+            # Download missing bars untuk semua symbols sekaligus, lalu baca dari DB
+            ingestion = IngestionScheduler(self.db).run(symbols, timeframes, days_back=365)
+            
+            # Candlestick counts untuk semua (symbol, timeframe) dalam satu grouped query
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=365)
+            upper = {symbol: symbol.upper() for symbol in symbols}
+            counts = dict(
+                ((row.symbol, row.timeframe), row.bars)
+                for row in self.db.query(
+                    HistoricalData.symbol,
+                    HistoricalData.timeframe,
+                    func.count(HistoricalData.id).label('bars')
+                ).filter(
+                    HistoricalData.symbol.in_(list(set(upper.values()))),
+                    HistoricalData.timeframe.in_(timeframes),
+                    HistoricalData.date >= start_date.date(),
+                    HistoricalData.date <= end_date.date()
+                ).group_by(HistoricalData.symbol, HistoricalData.timeframe)
+            )
+            
+            # Realtime prices: satu multi-ticker request untuk semua symbols
+            prices = self.preload_realtime_prices(symbols)
+            
             for symbol in symbols:
-                symbol_results = {}
-                
-                # Preload candlestick data
-                for tf in timeframes:
-                    try:
-                        data = self.get_candlestick_data(
-                            symbol=symbol,
-                            timeframe=tf,
-                            start_date=datetime.now() - timedelta(days=365),
-                            end_date=datetime.now()
-                        )
-                        symbol_results[tf] = len(data)
-                    except Exception as e:
-                        logger.warning(f"Error preloading {symbol} {tf}: {e}")
-                        symbol_results[tf] = 0
-                
-                # Preload realtime price
-                try:
-                    price_data = self.get_realtime_price(symbol)
-                    symbol_results['realtime'] = 1 if price_data else 0
-                except Exception as e:
-                    logger.warning(f"Error preloading realtime {symbol}: {e}")
-                    symbol_results['realtime'] = 0
-                
+                symbol_results = {tf: counts.get((upper[symbol], tf), 0) for tf in timeframes}
+                symbol_results['realtime'] = 1 if prices.get(symbol) else 0
                 results[symbol] = symbol_results
             
             return {
                 'preloaded_symbols': len(symbols),
                 'results': results,
+                'ingestion': ingestion['summary'],
                 'timestamp': datetime.now().isoformat()
             }
             
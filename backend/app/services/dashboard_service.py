@@ -3,23 +3,38 @@ Dashboard Service untuk Widget-based Dashboard System
 """
 from sqlalchemy.orm import Session
 from app.models.dashboard import (
-    Dashboard, DashboardWidget, WidgetData, DashboardPreset, 
+    Dashboard, DashboardWidget, DashboardPreset, 
     WidgetTemplate, DashboardShare, DashboardAnalytics,
     WidgetType, DashboardLayout
 )
-from typing import Dict, List, Optional, Tuple
+from app.core.layered_cache import get_layered_cache
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
+import hashlib
 import uuid
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+WIDGET_CACHE_PREFIX = "dashboard:widget_data"
+
+# Data sources yang isinya per user (di-scope per dashboard); sources lain
+# (market data, news, indicators) di-share antar widgets dan users
+USER_SCOPED_SOURCES = ("portfolio", "positions", "orders", "trades", "performance", "alerts")
+
+def payload_version(value: Any) -> str:
+    """Content hash (ETag) untuk widget payload atau snapshot fingerprint"""
+    raw = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
+
 class DashboardService:
     """Service untuk dashboard operations"""
     
     def __init__(self, db: Session):
         self.db = db
+        # Widget payloads hidup di TTL cache (L1 + Redis), di-share antar requests
+        self.cache = get_layered_cache()
     
     def create_dashboard(self,
                         name: str,
@@ -236,23 +251,37 @@ class DashboardService:
             logger.error(f"Error getting dashboard data: {e}")
             return {"error": str(e)}
     
+    def _widget_cache_key(self, widget: DashboardWidget, data_key: Optional[str] = None) -> str:
+        """
+        Cache key untuk widget payload. Widgets (antar dashboards dan users)
+        berbagi entry jika data_source dan config (symbols, timeframe,
+        filters) sama; USER_SCOPED_SOURCES hanya di-share dalam satu dashboard
+        """
+        if widget.data_source:
+            scope = (f":dashboard:{widget.dashboard_id}"
+                     if widget.data_source.lower().startswith(USER_SCOPED_SOURCES) else "")
+            base = (f"{WIDGET_CACHE_PREFIX}{scope}:source:{widget.data_source}"
+                    f":{payload_version(widget.config or {})}")
+        else:
+            base = f"{WIDGET_CACHE_PREFIX}:widget:{widget.widget_id}"
+        return f"{base}:{data_key}" if data_key is not None else base
+
+    def _get_widget(self, widget_id: str) -> Optional[DashboardWidget]:
+        return self.db.query(DashboardWidget).filter(DashboardWidget.widget_id == widget_id).first()
+
     def get_widget_data(self, widget_id: str) -> Dict:
         """Get widget data and configuration"""
         try:
-            widget = self.db.query(DashboardWidget).filter(DashboardWidget.widget_id == widget_id).first()
+            widget = self._get_widget(widget_id)
             if not widget:
                 return {"error": "Widget not found"}
             
-            # Get cached data if available
-            cached_data = self.db.query(WidgetData).filter(
-                WidgetData.widget_id == widget_id,
-                WidgetData.is_valid == True,
-                WidgetData.expires_at > datetime.now()
-            ).order_by(WidgetData.updated_at.desc()).first()
+            # Latest payload untuk widget (dari cache, bukan widget_data table)
+            cached = self.cache.get(self._widget_cache_key(widget))
             
             return {
                 "widget_id": widget_id,
-                "dashboard_id": widget.widget_id,
+                "dashboard_id": widget.dashboard_id,
                 "widget_type": widget.widget_type.value,
                 "title": widget.title,
                 "description": widget.description,
@@ -265,8 +294,9 @@ class DashboardService:
                 "config": widget.config,
                 "data_source": widget.data_source,
                 "refresh_interval": widget.refresh_interval,
-                "cached_data": cached_data.data_value if cached_data else None,
-                "data_expires_at": cached_data.expires_at.isoformat() if cached_data and cached_data.expires_at else None,
+                "cached_data": cached["data"] if cached else None,
+                "data_version": cached["version"] if cached else None,
+                "data_expires_at": cached["expires_at"] if cached else None,
                 "created_at": widget.created_at.isoformat(),
                 "updated_at": widget.updated_at.isoformat() if widget.updated_at else None
             }
@@ -276,56 +306,126 @@ class DashboardService:
             return {"error": str(e)}
     
     def cache_widget_data(self, widget_id: str, data_type: str, data_key: str, data_value: Dict, expires_in: int = 300) -> Dict:
-        """Cache widget data"""
+        """
+        Cache widget data di TTL cache (L1 + Redis).
+
+        Payload disimpan per (widget cache key, data_key) dan sebagai latest
+        entry untuk key tersebut (lihat _widget_cache_key); version adalah
+        content hash sehingga payload yang tidak berubah tetap punya ETag yang
+        sama.
+        """
         try:
-            # Remove old data for this widget and key
-            self.db.query(WidgetData).filter(
-                WidgetData.widget_id == widget_id,
-                WidgetData.data_key == data_key
-            ).delete()
-            
-            # Create new cache entry
-            cache_entry = WidgetData(
-                widget_id=widget_id,
-                data_type=data_type,
-                data_key=data_key,
-                data_value=data_value,
-                expires_at=datetime.now() + timedelta(seconds=expires_in)
-            )
+            widget = self._get_widget(widget_id)
+            if not widget:
+                return {"error": "Widget not found"}
             
-            self.db.add(cache_entry)
-            self.db.commit()
+            expires_at = datetime.now() + timedelta(seconds=expires_in)
+            entry = {
+                "data_type": data_type,
+                "data_key": data_key,
+                "data": data_value,
+                "version": payload_version(data_value),
+                "expires_at": expires_at.isoformat()
+            }
+            self.cache.set(self._widget_cache_key(widget, data_key), entry, expires_in)
+            self.cache.set(self._widget_cache_key(widget), entry, expires_in)
             
             return {
                 "widget_id": widget_id,
                 "data_key": data_key,
+                "data_source": widget.data_source,
+                "version": entry["version"],
                 "status": "cached",
-                "expires_at": cache_entry.expires_at.isoformat()
+                "expires_at": entry["expires_at"]
             }
             
         except Exception as e:
             logger.error(f"Error caching widget data: {e}")
-            self.db.rollback()
             return {"error": str(e)}
     
     def get_cached_widget_data(self, widget_id: str, data_key: str) -> Optional[Dict]:
         """Get cached widget data"""
         try:
-            cached_data = self.db.query(WidgetData).filter(
-                WidgetData.widget_id == widget_id,
-                WidgetData.data_key == data_key,
-                WidgetData.is_valid == True,
-                WidgetData.expires_at > datetime.now()
-            ).order_by(WidgetData.updated_at.desc()).first()
-            
-            if cached_data:
-                return cached_data.data_value
-            return None
+            widget = self._get_widget(widget_id)
+            if not widget:
+                return None
+            
+            cached = self.cache.get(self._widget_cache_key(widget, data_key))
+            return cached["data"] if cached else None
             
         except Exception as e:
             logger.error(f"Error getting cached widget data: {e}")
             return None
     
+    def get_dashboard_snapshot(self, dashboard_id: str, known_versions: Dict[str, str] = None) -> Dict:
+        """
+        Semua visible widgets beserta latest payload dalam satu pass.
+
+        Satu widgets query, lalu satu batched cache lookup untuk unique widget
+        cache keys. Widgets yang version-nya sama dengan known_versions (dari
+        client) dikembalikan tanpa data. Snapshot version berubah hanya jika
+        layout atau salah satu widget payload berubah (dipakai sebagai ETag).
+        """
+        try:
+            known_versions = known_versions or {}
+            widgets = self.db.query(DashboardWidget).filter(
+                DashboardWidget.dashboard_id == dashboard_id,
+                DashboardWidget.is_visible == True
+            ).all()
+            
+            if not widgets and not self.db.query(Dashboard.id).filter(Dashboard.dashboard_id == dashboard_id).first():
+                return {"error": "Dashboard not found"}
+            
+            keys = {widget.widget_id: self._widget_cache_key(widget) for widget in widgets}
+            entries = self.cache.get_many(keys.values())
+            
+            widgets_data = []
+            fingerprint = []
+            unchanged = 0
+            for widget in widgets:
+                entry = entries.get(keys[widget.widget_id])
+                version = entry["version"] if entry else None
+                layout_stamp = widget.updated_at.isoformat() if widget.updated_at else None
+                fingerprint.append((widget.widget_id, layout_stamp, version))
+                
+                widget_data = {
+                    "widget_id": widget.widget_id,
+                    "widget_type": widget.widget_type.value,
+                    "title": widget.title,
+                    "position": {
+                        "x": widget.position_x,
+                        "y": widget.position_y,
+                        "width": widget.width,
+                        "height": widget.height
+                    },
+                    "config": widget.config,
+                    "data_source": widget.data_source,
+                    "refresh_interval": widget.refresh_interval,
+                    "version": version,
+                    "expires_at": entry["expires_at"] if entry else None
+                }
+                if version is not None and known_versions.get(widget.widget_id) == version:
+                    widget_data["changed"] = False
+                    unchanged += 1
+                else:
+                    widget_data["changed"] = True
+                    widget_data["data"] = entry["data"] if entry else None
+                widgets_data.append(widget_data)
+            
+            return {
+                "dashboard_id": dashboard_id,
+                "version": payload_version(sorted(fingerprint)),
+                "widgets": widgets_data,
+                "total_widgets": len(widgets_data),
+                "unchanged_widgets": unchanged,
+                "data_sources": len(set(keys.values())),
+                "generated_at": datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting dashboard snapshot: {e}")
+            return {"error": str(e)}
+    
     def create_dashboard_preset(self,
                               name: str,
                               description: str = None,
@@ -518,20 +618,34 @@ class DashboardService:
             logger.error(f"Error getting widget templates: {e}")
             return []
     
+    def _drop_widget_cache(self, keys: Dict[Optional[str], set]):
+        """
+        Hapus cache entries (data_source -> keys) dari deleted widgets, kecuali
+        entry yang masih dipakai widget lain dengan source/config sama
+        """
+        sources = [source for source in keys if source]
+        if sources:
+            for other in self.db.query(DashboardWidget).filter(DashboardWidget.data_source.in_(sources)).all():
+                keys[other.data_source].discard(self._widget_cache_key(other))
+        for key in set().union(*keys.values()):
+            self.cache.delete(key)
+            self.cache.invalidate_pattern(f"{key}:*")
+    
     def delete_widget(self, widget_id: str) -> Dict:
         """Delete widget from dashboard"""
         try:
-            # Delete widget
-            deleted_count = self.db.query(DashboardWidget).filter(DashboardWidget.widget_id == widget_id).delete()
-            
-            if deleted_count == 0:
+            widget = self._get_widget(widget_id)
+            if not widget:
                 return {"error": "Widget not found"}
             
-            # Delete cached data
-            self.db.query(WidgetData).filter(WidgetData.widget_id == widget_id).delete()
+            keys = {widget.data_source: {self._widget_cache_key(widget)}}
             
+            # Delete widget
+            self.db.delete(widget)
             self.db.commit()
             
+            self._drop_widget_cache(keys)
+            
             return {
                 "widget_id": widget_id,
                 "status": "deleted",
@@ -546,14 +660,14 @@ class DashboardService:
     def delete_dashboard(self, dashboard_id: str) -> Dict:
         """Delete dashboard and all widgets"""
         try:
+            widgets = self.db.query(DashboardWidget).filter(DashboardWidget.dashboard_id == dashboard_id).all()
+            keys: Dict[Optional[str], set] = {}
+            for widget in widgets:
+                keys.setdefault(widget.data_source, set()).add(self._widget_cache_key(widget))
+            
             # Delete widgets
             self.db.query(DashboardWidget).filter(DashboardWidget.dashboard_id == dashboard_id).delete()
             
-            # Delete cached data
-            self.db.query(WidgetData).filter(WidgetData.widget_id.in_(
-                self.db.query(DashboardWidget.widget_id).filter(DashboardWidget.dashboard_id == dashboard_id)
-            )).delete()
-            
             # Delete dashboard
             deleted_count = self.db.query(Dashboard).filter(Dashboard.dashboard_id == dashboard_id).delete()
             
@@ -562,6 +676,8 @@ class DashboardService:
             
             self.db.commit()
             
+            self._drop_widget_cache(keys)
+            
             return {
                 "dashboard_id": dashboard_id,
                 "status": "deleted",
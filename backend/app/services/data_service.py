@@ -9,6 +9,9 @@ from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.models.market_data import MarketData, HistoricalData, DataUpdateLog, SymbolInfo, MarketStatus
 from app.database import get_db
+from app.config import settings
+from app.core.bulk_upsert import frame_to_records, iter_chunks
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 import time
 import logging
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -24,6 +27,29 @@ logger = logging.getLogger(__name__)
 # Rate limiter setup
 limiter = Limiter(key_func=get_remote_address)
 
+# Intraday bars are keyed by timestamp, daily and above by date
+INTRADAY_TIMEFRAMES = {'1m', '5m', '15m', '30m', '1h', '4h'}
+
+# OHLCV columns written by the bulk ingest path
+OHLCV_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'adjusted_close']
+
+# Timeframe -> yfinance interval
+YFINANCE_INTERVALS = {
+    '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
+    '1h': '1h', '4h': '4h', '1D': '1d', '1W': '1wk',
+    '1M': '1mo', '3M': '3mo', '6M': '6mo', '1Y': '1y'
+}
+
+# yfinance column -> HistoricalData column
+YFINANCE_COLUMNS = {
+    'Open': 'open_price',
+    'High': 'high_price',
+    'Low': 'low_price',
+    'Close': 'close_price',
+    'Volume': 'volume',
+    'Adj Close': 'adjusted_close'
+}
+
 class DataService:
     """Service untuk fetching dan managing market data"""
     
@@ -43,7 +69,8 @@ class DataService:
         
         self.last_request_time = time.time()
     
-    def get_yfinance_symbol(self, symbol: str) -> str:
+    @staticmethod
+    def get_yfinance_symbol(symbol: str) -> str:
         """Convert IDX symbol ke yfinance format"""
         # IDX symbols biasanya sudah compatible dengan yfinance
         # Tapi kadang perlu suffix .JK untuk Jakarta
@@ -59,13 +86,7 @@ class DataService:
             yf_symbol = self.get_yfinance_symbol(symbol)
             
             # Convert timeframe ke yfinance interval
-            interval_map = {
-                '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
-                '1h': '1h', '4h': '4h', '1D': '1d', '1W': '1wk', 
-                '1M': '1mo', '3M': '3mo', '6M': '6mo', '1Y': '1y'
-            }
-            
-            interval = interval_map.get(timeframe, '1d')
+            interval = YFINANCE_INTERVALS.get(timeframe, '1d')
             
             # Fetch data
             ticker = yf.Ticker(yf_symbol)
@@ -87,16 +108,7 @@ class DataService:
             data = data.reset_index()
             
             # Rename columns untuk consistency
-            column_mapping = {
-                'Open': 'open_price',
-                'High': 'high_price', 
-                'Low': 'low_price',
-                'Close': 'close_price',
-                'Volume': 'volume',
-                'Adj Close': 'adjusted_close'
-            }
-            
-            data = data.rename(columns=column_mapping)
+            data = data.rename(columns=YFINANCE_COLUMNS)
             
             # Add timeframe column
             data['timeframe'] = timeframe
@@ -109,52 +121,124 @@ class DataService:
             return None
     
     def save_historical_data(self, symbol: str, timeframe: str, data: pd.DataFrame) -> int:
-        """Save historical data ke database dengan smart update"""
+        """Save historical data ke database dengan smart update (returns new records)"""
+        result = self.bulk_save_historical_data(symbol, timeframe, data)
+        return result.get("inserted", 0)
+    
+    def bulk_save_historical_data(self,
+                                  symbol: str,
+                                  timeframe: str,
+                                  data: pd.DataFrame,
+                                  data_source: str = "yfinance",
+                                  chunk_size: int = None) -> Dict:
+        """
+        Bulk upsert a whole OHLCV DataFrame.
+        
+        Per chunk: satu SELECT untuk existing keys dan satu multi-row
+        INSERT ... ON DUPLICATE KEY UPDATE (keyed on primary key), bukan
+        SELECT + INSERT/UPDATE per row.
+        """
         try:
-            saved_count = 0
-            
-            for _, row in data.iterrows():
-                # Check if data already exists
-                existing = self.db.query(HistoricalData).filter(
-                    HistoricalData.symbol == symbol,
-                    HistoricalData.timeframe == timeframe,
-                    HistoricalData.date == row['Date'].date()
-                ).first()
+            if data is None or data.empty:
+                return {"inserted": 0, "updated": 0, "total": 0}
+            
+            chunk_size = chunk_size or settings.BULK_INSERT_CHUNK_SIZE
+            frame = self._prepare_ohlcv_frame(data)
+            key_column = 'timestamp' if timeframe in INTRADAY_TIMEFRAMES else 'date'
+            frame = frame.drop_duplicates(subset=[key_column], keep='last').sort_values('timestamp')
+            
+            columns = ['date', 'timestamp'] + OHLCV_COLUMNS
+            records = frame_to_records(frame, columns)
+            key_index = columns.index(key_column)
+            
+            table = HistoricalData.__table__
+            is_mysql = self.db.get_bind().dialect.name == "mysql"
+            inserted = 0
+            updated = 0
+            
+            for chunk in iter_chunks(records, chunk_size):
+                existing_ids = self._get_existing_bar_ids(
+                    symbol, timeframe, key_column,
+                    min(r[0] for r in chunk), max(r[0] for r in chunk)
+                )
                 
-                if existing:
-                    # Update existing record
-                    existing.open_price = row.get('open_price')
-                    existing.high_price = row.get('high_price')
-                    existing.low_price = row.get('low_price')
-                    existing.close_price = row.get('close_price')
-                    existing.volume = row.get('volume')
-                    existing.adjusted_close = row.get('adjusted_close')
-                    existing.updated_at = datetime.now()
-                else:
-                    # Create new record
-                    new_data = HistoricalData(
-                        symbol=symbol,
-                        timeframe=timeframe,
-                        date=row['Date'].date(),
-                        timestamp=row['Date'],
-                        open_price=row.get('open_price'),
-                        high_price=row.get('high_price'),
-                        low_price=row.get('low_price'),
-                        close_price=row.get('close_price'),
-                        volume=row.get('volume'),
-                        adjusted_close=row.get('adjusted_close'),
-                        data_source="yfinance"
+                rows = []
+                for record in chunk:
+                    row = dict(zip(columns, record))
+                    row.update(symbol=symbol, timeframe=timeframe, data_source=data_source)
+                    row['id'] = existing_ids.get(record[key_index])
+                    rows.append(row)
+                
+                new_rows = [row for row in rows if row['id'] is None]
+                update_rows = [row for row in rows if row['id'] is not None]
+                
+                if is_mysql:
+                    stmt = mysql_insert(table).values(rows)
+                    stmt = stmt.on_duplicate_key_update(
+                        {**{col: stmt.inserted[col] for col in OHLCV_COLUMNS}, 'updated_at': datetime.now()}
                     )
-                    self.db.add(new_data)
-                    saved_count += 1
+                    self.db.execute(stmt)
+                else:
+                    if new_rows:
+                        self.db.bulk_insert_mappings(
+                            HistoricalData, [{k: v for k, v in row.items() if k != 'id'} for row in new_rows]
+                        )
+                    if update_rows:
+                        self.db.bulk_update_mappings(
+                            HistoricalData,
+                            [{'id': row['id'], 'updated_at': datetime.now(), **{col: row[col] for col in OHLCV_COLUMNS}}
+                             for row in update_rows]
+                        )
+                
+                inserted += len(new_rows)
+                updated += len(update_rows)
             
             self.db.commit()
-            return saved_count
+            return {"inserted": inserted, "updated": updated, "total": len(records)}
             
         except Exception as e:
             logger.error(f"Error saving historical data for {symbol}: {e}")
             self.db.rollback()
-            return 0
+            return {"inserted": 0, "updated": 0, "total": 0, "error": str(e)}
+    
+    def _prepare_ohlcv_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Normalize a fetched DataFrame to date/timestamp + OHLCV columns"""
+        frame = data.rename(columns={
+            'open': 'open_price', 'high': 'high_price', 'low': 'low_price',
+            'close': 'close_price'
+        })
+        
+        # yfinance: 'Date' (daily) atau 'Datetime' (intraday) setelah reset_index
+        for column in ('Date', 'Datetime', 'timestamp'):
+            if column in frame.columns:
+                timestamps = pd.to_datetime(frame[column])
+                break
+        else:
+            raise ValueError("DataFrame has no Date/Datetime/timestamp column")
+        
+        if getattr(timestamps.dt, 'tz', None) is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        
+        prepared = pd.DataFrame({
+            # ndarray (pandas < 2.2) atau Series dengan RangeIndex: jangan di-align ke frame.index
+            'timestamp': np.asarray(timestamps.dt.to_pydatetime(), dtype=object),
+            'date': timestamps.dt.date
+        }, index=frame.index)
+        for column in OHLCV_COLUMNS:
+            prepared[column] = frame[column] if column in frame.columns else None
+        return prepared
+    
+    def _get_existing_bar_ids(self, symbol: str, timeframe: str, key_column: str,
+                              start_date: date, end_date: date) -> Dict:
+        """Map key (date or timestamp) -> id for stored bars in a date range"""
+        key = getattr(HistoricalData, key_column)
+        rows = self.db.query(HistoricalData.id, key).filter(
+            HistoricalData.symbol == symbol,
+            HistoricalData.timeframe == timeframe,
+            HistoricalData.date >= start_date,
+            HistoricalData.date <= end_date
+        ).all()
+        return {row[1]: row[0] for row in rows}
     
     def get_latest_data_date(self, symbol: str, timeframe: str) -> Optional[date]:
         """Get latest data date untuk symbol dan timeframe"""
@@ -205,7 +289,10 @@ class DataService:
                 }
             
             # Save data
-            records_saved = self.save_historical_data(symbol, timeframe, data)
+            save_result = self.bulk_save_historical_data(symbol, timeframe, data)
+            if "error" in save_result:
+                raise Exception(save_result["error"])
+            records_saved = save_result["inserted"]
             
             # Update log
             self._update_data_log(symbol, timeframe, "success", records_saved)
@@ -214,6 +301,7 @@ class DataService:
                 "status": "success",
                 "message": f"Updated {symbol} {timeframe} with {records_saved} new records",
                 "records_saved": records_saved,
+                "records_updated": save_result["updated"],
                 "date_range": f"{start_date} to {end_date}"
             }
             
@@ -254,21 +342,12 @@ class DataService:
         ]
     
     def initialize_symbol_data(self, symbols: List[str], timeframes: List[str]) -> Dict:
-        """Initialize data untuk multiple symbols dan timeframes"""
-        results = {}
+        """Initialize data untuk multiple symbols dan timeframes (concurrent batches)"""
+        from app.services.ingestion_service import IngestionScheduler
         
-        for symbol in symbols:
-            results[symbol] = {}
-            
-            for timeframe in timeframes:
-                logger.info(f"Initializing data for {symbol} {timeframe}")
-                result = self.update_historical_data(symbol, timeframe)
-                results[symbol][timeframe] = result
-                
-                # Rate limiting between symbols
-                time.sleep(0.5)
-        
-        return results
+        run = IngestionScheduler(self.db).run(symbols, timeframes)
+        logger.info(f"Symbol data initialization finished: {run['summary']}")
+        return run["results"]
     
     def get_market_data(self, symbol: str, timeframe: str, limit: int = 100) -> List[Dict]:
         """Get market data untuk display"""
@@ -296,6 +375,57 @@ class DataService:
             logger.error(f"Error getting market data for {symbol}: {e}")
             return []
     
+    def get_real_time_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Latest prices for many symbols in one multi-ticker request.
+        
+        Dipakai oleh WebSocket price broadcaster (dijalankan di thread pool);
+        market_cap tidak tersedia dari batch download.
+        """
+        try:
+            tickers = {self.get_yfinance_symbol(symbol): symbol for symbol in symbols}
+            data = yf.download(
+                tickers=list(tickers.keys()),
+                period='5d',
+                interval='1d',
+                group_by='ticker',
+                auto_adjust=True,
+                threads=False,
+                progress=False
+            )
+            if data is None or data.empty:
+                return {}
+            
+            now = datetime.now().isoformat()
+            prices = {}
+            for ticker, symbol in tickers.items():
+                if isinstance(data.columns, pd.MultiIndex):
+                    if ticker not in data.columns.get_level_values(0):
+                        continue
+                    frame = data[ticker].dropna(subset=['Close'])
+                else:
+                    frame = data.dropna(subset=['Close'])
+                if frame.empty:
+                    continue
+                
+                close = float(frame['Close'].iloc[-1])
+                prev_close = float(frame['Close'].iloc[-2]) if len(frame) > 1 else None
+                change = close - prev_close if prev_close else None
+                prices[symbol] = {
+                    "symbol": symbol,
+                    "price": close,
+                    "change": change,
+                    "change_percent": change / prev_close * 100 if prev_close else None,
+                    "volume": int(frame['Volume'].iloc[-1]) if pd.notna(frame['Volume'].iloc[-1]) else None,
+                    "market_cap": None,
+                    "timestamp": now
+                }
+            return prices
+            
+        except Exception as e:
+            logger.error(f"Error getting real-time prices for {len(symbols)} symbols: {e}")
+            return {}
+    
     def get_real_time_price(self, symbol: str) -> Optional[Dict]:
         """Get real-time price untuk symbol"""
         try:
@@ -0,0 +1,217 @@
+"""
+Indicator Materializer
+Mengisi indicator columns HistoricalData dan tabel TechnicalIndicators secara incremental
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.market_data import HistoricalData, TechnicalIndicators, IndicatorState
+from app.core.indicators import compute_indicators, classify_trend, is_complete, LOOKBACK
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# compute_indicators column -> HistoricalData column
+HISTORICAL_COLUMNS = {
+    'sma_20': 'sma_20', 'sma_50': 'sma_50', 'sma_200': 'sma_200',
+    'ema_12': 'ema_12', 'ema_26': 'ema_26', 'rsi_14': 'rsi_14',
+    'macd': 'macd', 'macd_signal': 'macd_signal', 'macd_histogram': 'macd_histogram',
+    'bollinger_upper': 'bollinger_upper', 'bollinger_middle': 'bollinger_middle',
+    'bollinger_lower': 'bollinger_lower',
+}
+
+# compute_indicators column -> TechnicalIndicators column
+TECHNICAL_COLUMNS = {
+    **{name: name for name in HISTORICAL_COLUMNS if name != 'rsi_14'},
+    'rsi_14': 'rsi', 'atr': 'atr', 'adx': 'adx',
+    'stochastic_k': 'stochastic_k', 'stochastic_d': 'stochastic_d',
+    'williams_r': 'williams_r', 'cci': 'cci', 'obv': 'obv', 'volume_sma': 'volume_sma',
+}
+
+# TechnicalIndicators has no timeframe column; it holds daily bars
+TECHNICAL_TIMEFRAME = '1D'
+
+# Revisions yang di-commit sampai selama ini setelah run sebelumnya mulai tetap
+# terdeteksi (commit order / clock skew antara app dan database)
+REVISION_LAG = timedelta(seconds=60)
+
+def _column_values(values: np.ndarray, integer: bool = False) -> list:
+    """ndarray -> list of Python floats/ints with NaN as None"""
+    return [
+        None if not np.isfinite(value) else (int(round(value)) if integer else float(value))
+        for value in values.tolist()
+    ]
+
+class IndicatorMaterializer:
+    """
+    Background materializer untuk technical indicators.
+
+    Run pertama menghitung seluruh history; run berikutnya hanya memproses
+    bar yang ditambahkan sejak last_timestamp, dengan LOOKBACK bar context
+    untuk rolling windows dan EMA/Wilder state dari IndicatorState.
+
+    Bar lama yang direvisi atau di-backfill (coalesce(updated_at,
+    created_at) setelah checked_at - REVISION_LAG) memicu recompute dari
+    history penuh; hanya bars mulai dari bar paling awal yang berubah yang
+    ditulis ulang.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _load_bars(self, symbol: str, timeframe: str, after: Optional[datetime] = None) -> List:
+        columns = (HistoricalData.id, HistoricalData.timestamp, HistoricalData.date,
+                   HistoricalData.high_price, HistoricalData.low_price,
+                   HistoricalData.close_price, HistoricalData.volume, HistoricalData.updated_at)
+        query = self.db.query(*columns).filter(
+            HistoricalData.symbol == symbol,
+            HistoricalData.timeframe == timeframe,
+            HistoricalData.close_price.isnot(None)
+        )
+
+        if after is None:
+            return query.order_by(HistoricalData.timestamp).all()
+
+        new_bars = query.filter(HistoricalData.timestamp > after).order_by(HistoricalData.timestamp).all()
+        if not new_bars:
+            return []
+
+        context = query.filter(HistoricalData.timestamp <= after).order_by(
+            HistoricalData.timestamp.desc()
+        ).limit(LOOKBACK).all()
+        return list(reversed(context)) + new_bars
+
+    def _earliest_revision(self, symbol: str, timeframe: str, until: datetime, since: datetime) -> Optional[datetime]:
+        """Timestamp bar paling awal (<= until) yang ditulis atau diubah setelah since"""
+        return self.db.query(func.min(HistoricalData.timestamp)).filter(
+            HistoricalData.symbol == symbol,
+            HistoricalData.timeframe == timeframe,
+            HistoricalData.timestamp <= until,
+            func.coalesce(HistoricalData.updated_at, HistoricalData.created_at) > since
+        ).scalar()
+
+    def materialize_symbol(self, symbol: str, timeframe: str = '1D', full: bool = False) -> Dict:
+        """Materialize indicators for one symbol/timeframe (full=True recomputes all history)"""
+        try:
+            symbol = symbol.upper()
+            state_row = self.db.query(IndicatorState).filter(
+                IndicatorState.symbol == symbol,
+                IndicatorState.timeframe == timeframe
+            ).first()
+
+            checked_at = datetime.now()
+            incremental = not full and state_row is not None and is_complete(state_row.state)
+            revised_from = None
+            if incremental and state_row.checked_at is not None:
+                revised_from = self._earliest_revision(
+                    symbol, timeframe, state_row.last_timestamp, state_row.checked_at - REVISION_LAG
+                )
+                incremental = revised_from is None
+
+            bars = self._load_bars(symbol, timeframe, state_row.last_timestamp if incremental else None)
+            if not bars:
+                if state_row is not None:
+                    state_row.checked_at = checked_at
+                    self.db.commit()
+                return {"symbol": symbol, "timeframe": timeframe, "bars_updated": 0, "mode": "up_to_date"}
+
+            start = 0
+            if incremental:
+                start = next(i for i, bar in enumerate(bars) if bar.timestamp > state_row.last_timestamp)
+
+            def as_array(index):
+                return np.array([bar[index] for bar in bars], dtype=float)
+
+            columns, state = compute_indicators(
+                as_array(3), as_array(4), as_array(5),
+                np.array([bar.volume or 0 for bar in bars], dtype=float),
+                start=start,
+                state=state_row.state if incremental else None
+            )
+            new_bars = bars[start:]
+            trend = classify_trend(columns['sma_20'], columns['sma_50'], columns['sma_200'])
+            if revised_from is not None:
+                # Indicators causal: bars sebelum revisi tidak berubah
+                first = next((i for i, bar in enumerate(bars) if bar.timestamp >= revised_from), 0)
+                new_bars = bars[first:]
+                columns = {name: values[first:] for name, values in columns.items()}
+                trend = trend[first:]
+
+            self._write_historical(new_bars, columns)
+            if timeframe == TECHNICAL_TIMEFRAME:
+                self._write_technical(symbol, new_bars, columns, trend)
+
+            if state_row is None:
+                state_row = IndicatorState(symbol=symbol, timeframe=timeframe)
+                self.db.add(state_row)
+            state_row.last_timestamp = new_bars[-1].timestamp
+            state_row.state = state
+            state_row.checked_at = checked_at
+
+            self.db.commit()
+            return {
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "bars_updated": len(new_bars),
+                "mode": "incremental" if incremental else ("revised" if revised_from is not None else "full"),
+                "last_timestamp": new_bars[-1].timestamp.isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error materializing indicators for {symbol} {timeframe}: {e}")
+            self.db.rollback()
+            return {"symbol": symbol, "timeframe": timeframe, "error": str(e)}
+
+    def _write_historical(self, bars: List, columns: Dict[str, np.ndarray]):
+        """Bulk UPDATE indicator columns on historical_data rows (by id)"""
+        values = {target: _column_values(columns[name]) for name, target in HISTORICAL_COLUMNS.items()}
+        # updated_at ditulis ulang apa adanya: onupdate tidak boleh menandai bar sebagai revisi
+        mappings = [
+            {'id': bar.id, 'updated_at': bar.updated_at, **{target: column[i] for target, column in values.items()}}
+            for i, bar in enumerate(bars)
+        ]
+        self.db.bulk_update_mappings(HistoricalData, mappings)
+
+    def _write_technical(self, symbol: str, bars: List, columns: Dict[str, np.ndarray], trend: np.ndarray):
+        """Insert or update TechnicalIndicators rows keyed by (symbol, date)"""
+        existing = dict(self.db.query(TechnicalIndicators.date, TechnicalIndicators.id).filter(
+            TechnicalIndicators.symbol == symbol,
+            TechnicalIndicators.date >= bars[0].date,
+            TechnicalIndicators.date <= bars[-1].date
+        ).all())
+
+        values = {
+            target: _column_values(columns[name], integer=(target == 'obv'))
+            for name, target in TECHNICAL_COLUMNS.items()
+        }
+        inserts, updates = [], []
+        for i, bar in enumerate(bars):
+            row = {target: column[i] for target, column in values.items()}
+            row['trend'] = trend[i]
+            if bar.date in existing:
+                updates.append({'id': existing[bar.date], **row})
+            else:
+                inserts.append({'symbol': symbol, 'date': bar.date, **row})
+
+        if inserts:
+            self.db.bulk_insert_mappings(TechnicalIndicators, inserts)
+        if updates:
+            self.db.bulk_update_mappings(TechnicalIndicators, updates)
+
+    def materialize(self, symbols: Optional[List[str]] = None, timeframe: str = '1D', full: bool = False) -> Dict:
+        """Materialize indicators for many symbols (default: every symbol with bars)"""
+        if symbols is None:
+            symbols = [row[0] for row in self.db.query(HistoricalData.symbol).filter(
+                HistoricalData.timeframe == timeframe
+            ).distinct().all()]
+
+        results = [self.materialize_symbol(symbol, timeframe, full) for symbol in symbols]
+        return {
+            "timeframe": timeframe,
+            "symbols": len(symbols),
+            "bars_updated": sum(r.get("bars_updated", 0) for r in results),
+            "errors": [r for r in results if "error" in r],
+            "results": results
+        }
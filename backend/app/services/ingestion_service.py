@@ -0,0 +1,383 @@
+"""
+Market Data Ingestion Scheduler
+Concurrent multi-symbol downloads dengan token-bucket rate limiting per source
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.models.market_data import HistoricalData, DataUpdateLog
+from app.services.data_service import DataService, YFINANCE_INTERVALS, YFINANCE_COLUMNS
+from app.services.indicator_service import IndicatorMaterializer
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, date, timedelta
+import threading
+import random
+import zlib
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Thread-safe token bucket (rate tokens/second, up to burst tokens)"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens: int = 1):
+        """Block until tokens are available"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class MarketDataSource:
+    """
+    Pluggable OHLCV source.
+
+    Subclass dan implement fetch(); max_batch_size > 1 berarti source bisa
+    mengambil beberapa ticker dalam satu request.
+    """
+
+    name = "base"
+    max_batch_size = 1
+
+    def __init__(self, rate_per_second: float = 1.0, burst: int = 1):
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+
+    def fetch(self, symbols: List[str], timeframe: str, start_date: date, end_date: date) -> Dict[str, pd.DataFrame]:
+        """Return {symbol: DataFrame} in DataService.fetch_historical_data format"""
+        raise NotImplementedError
+
+class YFinanceSource(MarketDataSource):
+    """yfinance source using multi-ticker yf.download requests"""
+
+    name = "yfinance"
+    max_batch_size = 50
+
+    def __init__(self, rate_per_second: float = 1.0, burst: int = 2):
+        super().__init__(rate_per_second, burst)
+
+    def fetch(self, symbols: List[str], timeframe: str, start_date: date, end_date: date) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        tickers = {DataService.get_yfinance_symbol(symbol): symbol for symbol in symbols}
+        data = yf.download(
+            tickers=list(tickers.keys()),
+            start=start_date,
+            end=end_date,
+            interval=YFINANCE_INTERVALS.get(timeframe, '1d'),
+            group_by='ticker',
+            auto_adjust=True,
+            prepost=True,
+            threads=False,
+            progress=False
+        )
+
+        results = {}
+        if data is None or data.empty:
+            return results
+
+        for ticker, symbol in tickers.items():
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                frame = data[ticker]
+            else:
+                frame = data
+
+            frame = frame.dropna(how='all')
+            if frame.empty:
+                continue
+
+            frame = frame.reset_index().rename(columns=YFINANCE_COLUMNS)
+            frame['timeframe'] = timeframe
+            frame['symbol'] = symbol
+            results[symbol] = frame
+
+        return results
+
+class FakeMarketDataSource(MarketDataSource):
+    """Local synthetic source for tests and benchmarks (no network)"""
+
+    name = "fake"
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 failure_rate: float = 0.0,
+                 max_batch_size: int = 50,
+                 rate_per_second: float = 1000.0,
+                 burst: int = 100,
+                 seed: Optional[int] = None):
+        super().__init__(rate_per_second, burst)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_batch_size = max_batch_size
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, symbols: List[str], timeframe: str, start_date: date, end_date: date) -> Dict[str, pd.DataFrame]:
+        with self.lock:
+            self.requests += 1
+            failed = self.rng.random() < self.failure_rate
+
+        time.sleep(self.latency)
+        if failed:
+            raise ConnectionError("Simulated source failure")
+
+        dates = pd.bdate_range(start_date, end_date - timedelta(days=1))
+        results = {}
+        for symbol in symbols:
+            rng = np.random.default_rng(zlib.crc32(f"{symbol}:{timeframe}".encode()))
+            close = 1000.0 * np.cumprod(1 + rng.normal(0, 0.02, len(dates)))
+            results[symbol] = pd.DataFrame({
+                'Date': dates,
+                'open_price': close,
+                'high_price': close * 1.01,
+                'low_price': close * 0.99,
+                'close_price': close,
+                'volume': rng.integers(100000, 1000000, len(dates)),
+                'timeframe': timeframe,
+                'symbol': symbol
+            })
+        return results
+
+_default_source = None
+_default_source_lock = threading.Lock()
+
+def get_default_source() -> MarketDataSource:
+    """Process-wide yfinance source so every scheduler shares one rate limit"""
+    global _default_source
+    with _default_source_lock:
+        if _default_source is None:
+            _default_source = YFinanceSource(
+                rate_per_second=settings.INGESTION_RATE_PER_SECOND,
+                burst=settings.INGESTION_RATE_BURST
+            )
+        return _default_source
+
+class IngestionScheduler:
+    """Concurrent multi-symbol ingestion dengan batching, retry dan resume"""
+
+    def __init__(self,
+                 db: Session,
+                 source: MarketDataSource = None,
+                 max_workers: int = None,
+                 max_retries: int = None,
+                 backoff_base: float = 1.0,
+                 materialize_indicators: bool = True):
+        self.db = db
+        self.source = source or get_default_source()
+        self.max_workers = max_workers or settings.INGESTION_MAX_WORKERS
+        self.max_retries = settings.INGESTION_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.materialize_indicators = materialize_indicators
+        self.data_service = DataService(db)
+
+    def _latest_dates(self, symbols: List[str], timeframe: str) -> Dict[str, date]:
+        """Latest stored bar date per symbol in one grouped query"""
+        rows = self.db.query(HistoricalData.symbol, func.max(HistoricalData.date)).filter(
+            HistoricalData.timeframe == timeframe,
+            HistoricalData.symbol.in_(symbols)
+        ).group_by(HistoricalData.symbol).all()
+        return {symbol: latest for symbol, latest in rows}
+
+    def _completed_pairs(self, symbols: List[str], timeframes: List[str], resume_from: datetime) -> set:
+        """(symbol, timeframe) pairs already logged as successful since resume_from"""
+        rows = self.db.query(DataUpdateLog.symbol, DataUpdateLog.timeframe).filter(
+            DataUpdateLog.symbol.in_(symbols),
+            DataUpdateLog.timeframe.in_(timeframes),
+            DataUpdateLog.status == "success",
+            DataUpdateLog.last_update >= resume_from
+        ).all()
+        return {(symbol, timeframe) for symbol, timeframe in rows}
+
+    def plan(self,
+             symbols: List[str],
+             timeframes: List[str],
+             days_back: int = 730,
+             resume_from: Optional[datetime] = None) -> Tuple[List[Dict], Dict]:
+        """
+        Build fetch batches.
+
+        Symbols dengan timeframe dan start date yang sama digabung menjadi
+        satu multi-ticker request (hingga source.max_batch_size).
+        """
+        today = date.today()
+        skipped = {}
+        completed = self._completed_pairs(symbols, timeframes, resume_from) if resume_from else set()
+        batches = []
+
+        for timeframe in timeframes:
+            latest_dates = self._latest_dates(symbols, timeframe)
+            groups: Dict[date, List[str]] = {}
+
+            for symbol in symbols:
+                if (symbol, timeframe) in completed:
+                    skipped[(symbol, timeframe)] = "resumed"
+                    continue
+
+                latest = latest_dates.get(symbol)
+                start_date = latest + timedelta(days=1) if latest else today - timedelta(days=days_back)
+                if start_date >= today:
+                    skipped[(symbol, timeframe)] = "up_to_date"
+                    continue
+                groups.setdefault(start_date, []).append(symbol)
+
+            for start_date, group in groups.items():
+                for i in range(0, len(group), self.source.max_batch_size):
+                    batches.append({
+                        "symbols": group[i:i + self.source.max_batch_size],
+                        "timeframe": timeframe,
+                        "start_date": start_date,
+                        "end_date": today
+                    })
+
+        return batches, skipped
+
+    def _fetch_batch(self, batch: Dict) -> Dict[str, pd.DataFrame]:
+        """Fetch one batch under the source rate limit, retrying with backoff"""
+        attempt = 0
+        while True:
+            self.source.rate_limiter.acquire()
+            try:
+                return self.source.fetch(
+                    batch["symbols"], batch["timeframe"], batch["start_date"], batch["end_date"]
+                )
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** (attempt - 1)) * (1 + random.random())
+                logger.warning(
+                    f"Fetch {self.source.name} {batch['timeframe']} {batch['symbols'][:3]}... failed "
+                    f"(attempt {attempt}/{self.max_retries}): {e}; retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def _store_batch(self, batch: Dict, frames: Optional[Dict[str, pd.DataFrame]], error: Optional[str]) -> Dict:
+        """Write fetched frames and DataUpdateLog rows (caller thread owns the session)"""
+        timeframe = batch["timeframe"]
+        results = {}
+
+        for symbol in batch["symbols"]:
+            if error:
+                results[symbol] = {"status": "error", "message": error, "records_saved": 0}
+                status, saved, message = "error", 0, error
+            else:
+                frame = frames.get(symbol) if frames else None
+                if frame is None or frame.empty:
+                    results[symbol] = {"status": "no_data", "message": f"No data available for {symbol} {timeframe}", "records_saved": 0}
+                    continue
+
+                save_result = self.data_service.bulk_save_historical_data(
+                    symbol, timeframe, frame, data_source=self.source.name
+                )
+                if "error" in save_result:
+                    results[symbol] = {"status": "error", "message": save_result["error"], "records_saved": 0}
+                    status, saved, message = "error", 0, save_result["error"]
+                else:
+                    saved = save_result["inserted"]
+                    results[symbol] = {
+                        "status": "success",
+                        "message": f"Updated {symbol} {timeframe} with {saved} new records",
+                        "records_saved": saved,
+                        "records_updated": save_result["updated"],
+                        "date_range": f"{batch['start_date']} to {batch['end_date']}"
+                    }
+                    status, message = "success", None
+
+            self.db.add(DataUpdateLog(
+                symbol=symbol,
+                timeframe=timeframe,
+                last_update=datetime.now(),
+                last_data_date=date.today(),
+                total_records=saved,
+                data_source=self.source.name,
+                status=status,
+                error_message=message
+            ))
+
+        try:
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error writing data update log: {e}")
+            self.db.rollback()
+
+        return results
+
+    def run(self,
+            symbols: List[str],
+            timeframes: List[str],
+            days_back: int = 730,
+            resume_from: Optional[datetime] = None) -> Dict:
+        """
+        Download symbols x timeframes concurrently.
+
+        resume_from: skip pairs yang sudah sukses di DataUpdateLog sejak waktu
+        ini (melanjutkan run yang terputus).
+        """
+        started = time.perf_counter()
+        symbols = [symbol.upper() for symbol in symbols]
+        results: Dict[str, Dict] = {symbol: {} for symbol in symbols}
+
+        batches, skipped = self.plan(symbols, timeframes, days_back, resume_from)
+        for (symbol, timeframe), reason in skipped.items():
+            results[symbol][timeframe] = {"status": reason, "message": f"{symbol} {timeframe} skipped ({reason})", "records_saved": 0}
+
+        # Fetch di worker threads, simpan ke database di thread ini
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._fetch_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    frames, error = future.result(), None
+                except Exception as e:
+                    frames, error = None, str(e)
+                    logger.error(f"Batch {batch['timeframe']} {batch['symbols']} failed: {e}")
+
+                for symbol, result in self._store_batch(batch, frames, error).items():
+                    results[symbol][batch["timeframe"]] = result
+
+        # Incremental indicator update untuk bars yang baru masuk
+        if self.materialize_indicators:
+            materializer = IndicatorMaterializer(self.db)
+            for timeframe in timeframes:
+                updated = [s for s in symbols if results[s].get(timeframe, {}).get("records_saved")]
+                if updated:
+                    materializer.materialize(updated, timeframe)
+
+        statuses = [r["status"] for tf_results in results.values() for r in tf_results.values()]
+        return {
+            "results": results,
+            "summary": {
+                "symbols": len(symbols),
+                "timeframes": len(timeframes),
+                "requests": len(batches),
+                "success": statuses.count("success"),
+                "errors": statuses.count("error"),
+                "no_data": statuses.count("no_data"),
+                "skipped": len(skipped),
+                "records_saved": sum(
+                    r.get("records_saved", 0) for tf_results in results.values() for r in tf_results.values()
+                ),
+                "elapsed_seconds": time.perf_counter() - started
+            }
+        }
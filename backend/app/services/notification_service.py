@@ -1,20 +1,66 @@
 """
 Notification Service untuk In-App Notifications
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.notifications import (
     Notification, AlertRule, NotificationSettings,
     NotificationType, NotificationPriority, NotificationStatus
 )
 from app.services.data_service import DataService
+from app.core.alert_index import AlertEntry, AlertIndex, AlertIndexSync, METRICS
+from app.config import settings
+from collections import Counter
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+import threading
 import uuid
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+def _alert_rule_entry(rule: AlertRule) -> Optional[AlertEntry]:
+    """AlertRule -> index entry (None jika rule tidak bisa di-match)"""
+    if not rule.is_active or not rule.symbol or rule.alert_type not in METRICS:
+        return None
+    return AlertEntry(
+        key=rule.rule_id,
+        symbol=rule.symbol.upper(),
+        metric=rule.alert_type,
+        condition=rule.condition,
+        threshold=rule.threshold_value,
+        cooldown=timedelta(minutes=rule.cooldown_minutes or 0),
+        last_triggered=rule.last_triggered,
+        payload={
+            "notification_type": rule.notification_type,
+            "priority": rule.priority,
+            "title_template": rule.title_template,
+            "message_template": rule.message_template
+        }
+    )
+
+_alert_rule_sync: Optional[AlertIndexSync] = None
+_alert_rule_sync_lock = threading.Lock()
+
+def get_alert_rule_sync() -> AlertIndexSync:
+    """Process-wide alert rule index (shared oleh semua requests)"""
+    global _alert_rule_sync
+    with _alert_rule_sync_lock:
+        if _alert_rule_sync is None:
+            _alert_rule_sync = AlertIndexSync(
+                AlertIndex(),
+                AlertRule,
+                query=lambda db: db.query(AlertRule),
+                active=lambda: AlertRule.is_active == True,
+                key=lambda rule: rule.rule_id,
+                to_entry=_alert_rule_entry,
+                refresh_interval=settings.ALERT_INDEX_REFRESH_SECONDS,
+                full_reload_interval=settings.ALERT_INDEX_FULL_RELOAD_SECONDS,
+                commit_lag=settings.ALERT_INDEX_COMMIT_LAG_SECONDS
+            )
+        return _alert_rule_sync
+
 class NotificationService:
     """Service untuk notification operations"""
     
@@ -36,32 +82,12 @@ class NotificationService:
                            expires_in_hours: int = 24) -> Dict:
         """Create new notification"""
         try:
-            # Generate unique notification ID
-            notification_id = f"NOTIF_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-            
-            # Set icon and color based on type
-            icon, color = self._get_notification_style(notification_type, priority)
-            
-            # Calculate expiry time
-            expires_at = datetime.now() + timedelta(hours=expires_in_hours) if expires_in_hours > 0 else None
-            
-            # Create notification
-            notification = Notification(
-                notification_id=notification_id,
-                type=notification_type,
-                priority=priority,
-                title=title,
-                message=message,
-                icon=icon,
-                color=color,
-                symbol=symbol,
-                order_id=order_id,
-                trade_id=trade_id,
-                metadata=metadata,
-                action_url=action_url,
-                action_text=action_text,
-                expires_at=expires_at
+            notification = self._build_notification(
+                notification_type, title, message, priority, symbol=symbol, order_id=order_id,
+                trade_id=trade_id, metadata=metadata, action_url=action_url, action_text=action_text,
+                expires_in_hours=expires_in_hours
             )
+            notification_id = notification.notification_id
             
             self.db.add(notification)
             self.db.commit()
@@ -80,6 +106,35 @@ class NotificationService:
             self.db.rollback()
             return {"error": str(e)}
     
+    def _build_notification(self,
+                            notification_type: NotificationType,
+                            title: str,
+                            message: str,
+                            priority: NotificationPriority = NotificationPriority.MEDIUM,
+                            expires_in_hours: int = 24,
+                            **fields) -> Notification:
+        """Notification row (belum di-add ke session)"""
+        # Generate unique notification ID
+        notification_id = f"NOTIF_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        
+        # Set icon and color based on type
+        icon, color = self._get_notification_style(notification_type, priority)
+        
+        # Calculate expiry time
+        expires_at = datetime.now() + timedelta(hours=expires_in_hours) if expires_in_hours > 0 else None
+        
+        return Notification(
+            notification_id=notification_id,
+            type=notification_type,
+            priority=priority,
+            title=title,
+            message=message,
+            icon=icon,
+            color=color,
+            expires_at=expires_at,
+            **fields
+        )
+    
     def _get_notification_style(self, notification_type: NotificationType, priority: NotificationPriority) -> tuple:
         """Get icon and color for notification"""
         styles = {
@@ -348,6 +403,11 @@ class NotificationService:
             self.db.add(rule)
             self.db.commit()
             
+            # Langsung aktif di alert index process ini
+            entry = _alert_rule_entry(rule)
+            if entry is not None:
+                get_alert_rule_sync().index.upsert(entry)
+            
             return {
                 "rule_id": rule_id,
                 "status": "created",
@@ -361,69 +421,86 @@ class NotificationService:
     
     def check_price_alerts(self, symbol: str, current_price: float) -> List[Dict]:
         """Check price alerts for a symbol"""
+        return self.check_alerts([{"symbol": symbol, "price": current_price}])
+    
+    def check_alerts(self, ticks: List[Dict]) -> List[Dict]:
+        """
+        Check batch ticks ({symbol, price, volume, rsi}) terhadap alert rule index.
+
+        Matching lewat in-memory index (bisect per symbol/metric, cooldown
+        di index); semua notifications dan rule trigger updates ditulis
+        dalam satu commit.
+        """
+        sync = get_alert_rule_sync()
         try:
-            # Get active price alert rules for this symbol
-            rules = self.db.query(AlertRule).filter(
-                AlertRule.symbol == symbol.upper(),
-                AlertRule.alert_type == "price",
-                AlertRule.is_active == True
-            ).all()
+            sync.refresh(self.db)
+            ticks = [dict(tick, symbol=tick["symbol"].upper()) for tick in ticks if tick.get("symbol")]
+            matches = sync.index.match(ticks)
+            if not matches:
+                return []
             
+            notifications = []
             triggered_alerts = []
-            
-            for rule in rules:
-                # Check if rule should be triggered
-                should_trigger = False
-                
-                if rule.condition == "above" and current_price > rule.threshold_value:
-                    should_trigger = True
-                elif rule.condition == "below" and current_price < rule.threshold_value:
-                    should_trigger = True
-                elif rule.condition == "equals" and abs(current_price - rule.threshold_value) < 0.01:
-                    should_trigger = True
+            for match in matches:
+                entry = match.entry
+                template = entry.payload
+                symbol = entry.symbol
+                value = match.value
                 
-                if should_trigger:
-                    # Check cooldown
-                    if rule.last_triggered:
-                        time_since_last = datetime.now() - rule.last_triggered
-                        if time_since_last.total_seconds() < (rule.cooldown_minutes * 60):
-                            continue  # Skip due to cooldown
-                    
-                    # Create notification
-                    title = rule.title_template.replace("{symbol}", symbol).replace("{price}", str(current_price))
-                    message = rule.message_template.replace("{symbol}", symbol).replace("{price}", str(current_price))
-                    
-                    notification_result = self.create_notification(
-                        notification_type=rule.notification_type,
-                        title=title,
-                        message=message,
-                        priority=rule.priority,
-                        symbol=symbol,
-                        metadata={
-                            "rule_id": rule.rule_id,
-                            "threshold": rule.threshold_value,
-                            "current_price": current_price,
-                            "condition": rule.condition
-                        }
-                    )
-                    
-                    if "error" not in notification_result:
-                        # Update rule trigger info
-                        rule.last_triggered = datetime.now()
-                        rule.trigger_count += 1
-                        self.db.commit()
-                        
-                        triggered_alerts.append({
-                            "rule_id": rule.rule_id,
-                            "notification_id": notification_result["notification_id"],
-                            "threshold": rule.threshold_value,
-                            "current_price": current_price
-                        })
+                title = template["title_template"].replace("{symbol}", symbol).replace("{price}", str(value))
+                message = template["message_template"].replace("{symbol}", symbol).replace("{price}", str(value))
+                notification = self._build_notification(
+                    template["notification_type"], title, message, template["priority"],
+                    symbol=symbol,
+                    metadata={
+                        "rule_id": entry.key,
+                        "alert_type": entry.metric,
+                        "threshold": entry.threshold,
+                        "current_value": value,
+                        "current_price": match.tick.get("price"),
+                        "condition": entry.condition
+                    }
+                )
+                notifications.append(notification)
+                triggered_alerts.append({
+                    "rule_id": entry.key,
+                    "notification_id": notification.notification_id,
+                    "symbol": symbol,
+                    "alert_type": entry.metric,
+                    "threshold": entry.threshold,
+                    "current_value": value,
+                    "current_price": match.tick.get("price")
+                })
+            
+            self.db.add_all(notifications)
+            
+            # Rule trigger info: satu UPDATE per trigger count (biasanya satu)
+            now = datetime.now()
+            trigger_counts = Counter(match.entry.key for match in matches)
+            by_count = {}
+            for rule_id, count in trigger_counts.items():
+                by_count.setdefault(count, []).append(rule_id)
+            for count, rule_ids in by_count.items():
+                self.db.query(AlertRule).filter(AlertRule.rule_id.in_(rule_ids)).update({
+                    AlertRule.last_triggered: now,
+                    AlertRule.trigger_count: func.coalesce(AlertRule.trigger_count, 0) + count
+                }, synchronize_session=False)
+            
+            self.db.commit()
+            
+            for notification in notifications:
+                self._broadcast_notification(notification)
             
             return triggered_alerts
             
         except Exception as e:
             logger.error(f"Error checking price alerts: {e}")
+            self.db.rollback()
+            # Index sudah menandai rules sebagai triggered; sync ulang dari database
+            try:
+                sync.refresh(self.db, force=True)
+            except Exception as refresh_error:
+                logger.error(f"Error reloading alert index: {refresh_error}")
             return []
     
     def cleanup_expired_notifications(self) -> Dict:
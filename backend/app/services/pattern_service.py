@@ -3,8 +3,17 @@ Pattern Recognition Service untuk Multi-timeframe Analysis
 """
 from sqlalchemy.orm import Session
 from app.services.data_service import DataService
-from typing import Dict, List, Optional, Tuple
+from app.core.bar_store import get_bar_store
+from app.core.layered_cache import get_layered_cache
+from app.core.levels import SupportResistanceEngine
+from app.config import settings
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime, date, timedelta
+from collections import OrderedDict
+import threading
+import time
+import os
 import logging
 import numpy as np
 import pandas as pd
@@ -111,20 +120,30 @@ class PatternRecognitionService:
             logger.error(f"Error detecting patterns: {e}")
             return {"error": str(e)}
     
-    def _detect_patterns_for_timeframe(self, data: List[Dict], timeframe: str) -> List[Dict]:
-        """Detect patterns for a specific timeframe"""
+    def _detect_patterns_for_timeframe(self, data, timeframe: str, extrema: Optional[Dict] = None,
+                                       pattern_types: Optional[List[str]] = None) -> List[Dict]:
+        """Detect patterns for a specific timeframe (data: list of bars atau DataFrame indexed by timestamp)"""
         try:
             patterns_found = []
             
             # Convert to pandas DataFrame
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.set_index('timestamp')
+            if isinstance(data, pd.DataFrame):
+                df = data
+            else:
+                df = pd.DataFrame(data)
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+                df = df.set_index('timestamp')
+            
+            # Peaks/troughs dihitung sekali dan di-share oleh semua detectors
+            if extrema is None:
+                extrema = self._compute_extrema(df)
             
             # Detect each pattern type
             for pattern_type, pattern_info in self.patterns.items():
+                if pattern_types and pattern_type not in pattern_types:
+                    continue
                 if self._is_timeframe_suitable(timeframe, pattern_info['timeframe_min']):
-                    pattern_result = self._detect_specific_pattern(df, pattern_type, pattern_info)
+                    pattern_result = self._detect_specific_pattern(df, pattern_type, pattern_info, extrema)
                     if pattern_result:
                         patterns_found.append(pattern_result)
             
@@ -134,27 +153,28 @@ class PatternRecognitionService:
             logger.error(f"Error detecting patterns for timeframe {timeframe}: {e}")
             return []
     
-    def _detect_specific_pattern(self, df: pd.DataFrame, pattern_type: str, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_specific_pattern(self, df: pd.DataFrame, pattern_type: str, pattern_info: Dict,
+                                 extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect a specific pattern type"""
         try:
             if pattern_type == 'head_and_shoulders':
-                return self._detect_head_and_shoulders(df, pattern_info)
+                return self._detect_head_and_shoulders(df, pattern_info, extrema)
             elif pattern_type == 'double_top':
-                return self._detect_double_top(df, pattern_info)
+                return self._detect_double_top(df, pattern_info, extrema)
             elif pattern_type == 'double_bottom':
-                return self._detect_double_bottom(df, pattern_info)
+                return self._detect_double_bottom(df, pattern_info, extrema)
             elif pattern_type == 'triangle_ascending':
-                return self._detect_ascending_triangle(df, pattern_info)
+                return self._detect_ascending_triangle(df, pattern_info, extrema)
             elif pattern_type == 'triangle_descending':
-                return self._detect_descending_triangle(df, pattern_info)
+                return self._detect_descending_triangle(df, pattern_info, extrema)
             elif pattern_type == 'flag_bullish':
-                return self._detect_bullish_flag(df, pattern_info)
+                return self._detect_bullish_flag(df, pattern_info, extrema)
             elif pattern_type == 'flag_bearish':
-                return self._detect_bearish_flag(df, pattern_info)
+                return self._detect_bearish_flag(df, pattern_info, extrema)
             elif pattern_type == 'wedge_rising':
-                return self._detect_rising_wedge(df, pattern_info)
+                return self._detect_rising_wedge(df, pattern_info, extrema)
             elif pattern_type == 'wedge_falling':
-                return self._detect_falling_wedge(df, pattern_info)
+                return self._detect_falling_wedge(df, pattern_info, extrema)
             
             return None
             
@@ -162,14 +182,14 @@ class PatternRecognitionService:
             logger.error(f"Error detecting {pattern_type}: {e}")
             return None
     
-    def _detect_head_and_shoulders(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_head_and_shoulders(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Head and Shoulders pattern"""
         try:
             if len(df) < 20:
                 return None
             
             # Find peaks
-            peaks = self._find_peaks(df['high'].values)
+            peaks = (extrema or self._compute_extrema(df))['peaks']
             
             if len(peaks) < 3:
                 return None
@@ -194,17 +214,17 @@ class PatternRecognitionService:
                             'confidence': confidence,
                             'left_shoulder': {
                                 'index': left_shoulder,
-                                'price': df.iloc[left_shoulder]['high'],
+                                'price': df['high'].values[left_shoulder],
                                 'date': df.index[left_shoulder].isoformat()
                             },
                             'head': {
                                 'index': head,
-                                'price': df.iloc[head]['high'],
+                                'price': df['high'].values[head],
                                 'date': df.index[head].isoformat()
                             },
                             'right_shoulder': {
                                 'index': right_shoulder,
-                                'price': df.iloc[right_shoulder]['high'],
+                                'price': df['high'].values[right_shoulder],
                                 'date': df.index[right_shoulder].isoformat()
                             },
                             'neckline': self._calculate_neckline(df, left_shoulder, right_shoulder),
@@ -217,13 +237,13 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Head and Shoulders: {e}")
             return None
     
-    def _detect_double_top(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_double_top(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Double Top pattern"""
         try:
             if len(df) < 20:
                 return None
             
-            peaks = self._find_peaks(df['high'].values)
+            peaks = (extrema or self._compute_extrema(df))['peaks']
             
             if len(peaks) < 2:
                 return None
@@ -246,12 +266,12 @@ class PatternRecognitionService:
                             'confidence': confidence,
                             'peak1': {
                                 'index': peak1,
-                                'price': df.iloc[peak1]['high'],
+                                'price': df['high'].values[peak1],
                                 'date': df.index[peak1].isoformat()
                             },
                             'peak2': {
                                 'index': peak2,
-                                'price': df.iloc[peak2]['high'],
+                                'price': df['high'].values[peak2],
                                 'date': df.index[peak2].isoformat()
                             },
                             'trough': self._find_trough_between_peaks(df, peak1, peak2),
@@ -264,13 +284,13 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Double Top: {e}")
             return None
     
-    def _detect_double_bottom(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_double_bottom(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Double Bottom pattern"""
         try:
             if len(df) < 20:
                 return None
             
-            troughs = self._find_troughs(df['low'].values)
+            troughs = (extrema or self._compute_extrema(df))['troughs']
             
             if len(troughs) < 2:
                 return None
@@ -293,12 +313,12 @@ class PatternRecognitionService:
                             'confidence': confidence,
                             'trough1': {
                                 'index': trough1,
-                                'price': df.iloc[trough1]['low'],
+                                'price': df['low'].values[trough1],
                                 'date': df.index[trough1].isoformat()
                             },
                             'trough2': {
                                 'index': trough2,
-                                'price': df.iloc[trough2]['low'],
+                                'price': df['low'].values[trough2],
                                 'date': df.index[trough2].isoformat()
                             },
                             'peak': self._find_peak_between_troughs(df, trough1, trough2),
@@ -311,15 +331,16 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Double Bottom: {e}")
             return None
     
-    def _detect_ascending_triangle(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_ascending_triangle(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Ascending Triangle pattern"""
         try:
             if len(df) < 20:
                 return None
             
             # Find resistance and support levels
-            resistance = self._find_resistance_level(df)
-            support_trend = self._find_support_trend(df)
+            extrema = extrema or self._compute_extrema(df)
+            resistance = self._find_resistance_level(df, extrema)
+            support_trend = self._find_support_trend(df, extrema)
             
             if resistance and support_trend and support_trend['slope'] > 0:
                 confidence = self._calculate_triangle_confidence(df, resistance, support_trend)
@@ -341,15 +362,16 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Ascending Triangle: {e}")
             return None
     
-    def _detect_descending_triangle(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_descending_triangle(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Descending Triangle pattern"""
         try:
             if len(df) < 20:
                 return None
             
             # Find support and resistance levels
-            support = self._find_support_level(df)
-            resistance_trend = self._find_resistance_trend(df)
+            extrema = extrema or self._compute_extrema(df)
+            support = self._find_support_level(df, extrema)
+            resistance_trend = self._find_resistance_trend(df, extrema)
             
             if support and resistance_trend and resistance_trend['slope'] < 0:
                 confidence = self._calculate_triangle_confidence(df, support, resistance_trend)
@@ -371,7 +393,7 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Descending Triangle: {e}")
             return None
     
-    def _detect_bullish_flag(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_bullish_flag(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Bullish Flag pattern"""
         try:
             if len(df) < 10:
@@ -404,7 +426,7 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Bullish Flag: {e}")
             return None
     
-    def _detect_bearish_flag(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_bearish_flag(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Bearish Flag pattern"""
         try:
             if len(df) < 10:
@@ -437,15 +459,16 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Bearish Flag: {e}")
             return None
     
-    def _detect_rising_wedge(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_rising_wedge(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Rising Wedge pattern"""
         try:
             if len(df) < 20:
                 return None
             
             # Find support and resistance trends
-            support_trend = self._find_support_trend(df)
-            resistance_trend = self._find_resistance_trend(df)
+            extrema = extrema or self._compute_extrema(df)
+            support_trend = self._find_support_trend(df, extrema)
+            resistance_trend = self._find_resistance_trend(df, extrema)
             
             if (support_trend and resistance_trend and 
                 support_trend['slope'] > 0 and resistance_trend['slope'] > 0 and
@@ -470,15 +493,16 @@ class PatternRecognitionService:
             logger.error(f"Error detecting Rising Wedge: {e}")
             return None
     
-    def _detect_falling_wedge(self, df: pd.DataFrame, pattern_info: Dict) -> Optional[Dict]:
+    def _detect_falling_wedge(self, df: pd.DataFrame, pattern_info: Dict, extrema: Optional[Dict] = None) -> Optional[Dict]:
         """Detect Falling Wedge pattern"""
         try:
             if len(df) < 20:
                 return None
             
             # Find support and resistance trends
-            support_trend = self._find_support_trend(df)
-            resistance_trend = self._find_resistance_trend(df)
+            extrema = extrema or self._compute_extrema(df)
+            support_trend = self._find_support_trend(df, extrema)
+            resistance_trend = self._find_resistance_trend(df, extrema)
             
             if (support_trend and resistance_trend and 
                 support_trend['slope'] < 0 and resistance_trend['slope'] < 0 and
@@ -520,13 +544,32 @@ class PatternRecognitionService:
         except:
             return []
     
+    def _compute_extrema(self, df: pd.DataFrame) -> Dict[str, List[int]]:
+        """Peaks (high) dan troughs (low) untuk satu series"""
+        return {
+            'peaks': self._find_peaks(df['high'].to_numpy(dtype=float)),
+            'troughs': self._find_troughs(df['low'].to_numpy(dtype=float))
+        }
+    
+    def get_cached_extrema(self, symbol: str, timeframe: str, df: pd.DataFrame) -> Dict[str, List[int]]:
+        """
+        Extrema dari layered cache, keyed by bar terakhir dan jumlah bars.
+        
+        Bar baru mengubah key, jadi entry lama tidak pernah stale; scan
+        berikutnya atas data yang sama tidak perlu find_peaks lagi.
+        """
+        key = f"pattern:extrema:{timeframe}:{symbol}:{len(df)}:{df.index[-1].isoformat()}"
+        return get_layered_cache().get_or_load(
+            key, lambda: self._compute_extrema(df), settings.PATTERN_EXTREMA_CACHE_TTL
+        )
+    
     def _is_head_and_shoulders(self, left_shoulder: int, head: int, right_shoulder: int, df: pd.DataFrame) -> bool:
         """Check if pattern is Head and Shoulders"""
         try:
             # Head should be higher than both shoulders
-            head_price = df.iloc[head]['high']
-            left_price = df.iloc[left_shoulder]['high']
-            right_price = df.iloc[right_shoulder]['high']
+            head_price = df['high'].values[head]
+            left_price = df['high'].values[left_shoulder]
+            right_price = df['high'].values[right_shoulder]
             
             if head_price <= left_price or head_price <= right_price:
                 return False
@@ -552,8 +595,8 @@ class PatternRecognitionService:
     def _is_double_top(self, peak1: int, peak2: int, df: pd.DataFrame) -> bool:
         """Check if pattern is Double Top"""
         try:
-            peak1_price = df.iloc[peak1]['high']
-            peak2_price = df.iloc[peak2]['high']
+            peak1_price = df['high'].values[peak1]
+            peak2_price = df['high'].values[peak2]
             
             # Peaks should be roughly equal
             price_diff = abs(peak1_price - peak2_price) / peak1_price
@@ -573,8 +616,8 @@ class PatternRecognitionService:
     def _is_double_bottom(self, trough1: int, trough2: int, df: pd.DataFrame) -> bool:
         """Check if pattern is Double Bottom"""
         try:
-            trough1_price = df.iloc[trough1]['low']
-            trough2_price = df.iloc[trough2]['low']
+            trough1_price = df['low'].values[trough1]
+            trough2_price = df['low'].values[trough2]
             
             # Troughs should be roughly equal
             price_diff = abs(trough1_price - trough2_price) / trough1_price
@@ -609,9 +652,9 @@ class PatternRecognitionService:
             confidence = 0.5  # Base confidence
             
             # Head prominence
-            head_price = df.iloc[head]['high']
-            left_price = df.iloc[left_shoulder]['high']
-            right_price = df.iloc[right_shoulder]['high']
+            head_price = df['high'].values[head]
+            left_price = df['high'].values[left_shoulder]
+            right_price = df['high'].values[right_shoulder]
             
             head_prominence = (head_price - max(left_price, right_price)) / max(left_price, right_price)
             confidence += min(head_prominence * 2, 0.3)
@@ -631,15 +674,15 @@ class PatternRecognitionService:
             confidence = 0.5  # Base confidence
             
             # Price similarity
-            peak1_price = df.iloc[peak1]['high']
-            peak2_price = df.iloc[peak2]['high']
+            peak1_price = df['high'].values[peak1]
+            peak2_price = df['high'].values[peak2]
             price_diff = abs(peak1_price - peak2_price) / peak1_price
             confidence += max(0, 0.3 - price_diff * 6)
             
             # Volume confirmation (if available)
             if 'volume' in df.columns:
-                vol1 = df.iloc[peak1]['volume']
-                vol2 = df.iloc[peak2]['volume']
+                vol1 = df['volume'].values[peak1]
+                vol2 = df['volume'].values[peak2]
                 if vol1 > 0 and vol2 > 0:
                     vol_ratio = min(vol1, vol2) / max(vol1, vol2)
                     confidence += vol_ratio * 0.2
@@ -655,15 +698,15 @@ class PatternRecognitionService:
             confidence = 0.5  # Base confidence
             
             # Price similarity
-            trough1_price = df.iloc[trough1]['low']
-            trough2_price = df.iloc[trough2]['low']
+            trough1_price = df['low'].values[trough1]
+            trough2_price = df['low'].values[trough2]
             price_diff = abs(trough1_price - trough2_price) / trough1_price
             confidence += max(0, 0.3 - price_diff * 6)
             
             # Volume confirmation (if available)
             if 'volume' in df.columns:
-                vol1 = df.iloc[trough1]['volume']
-                vol2 = df.iloc[trough2]['volume']
+                vol1 = df['volume'].values[trough1]
+                vol2 = df['volume'].values[trough2]
                 if vol1 > 0 and vol2 > 0:
                     vol_ratio = min(vol1, vol2) / max(vol1, vol2)
                     confidence += vol_ratio * 0.2
@@ -673,35 +716,212 @@ class PatternRecognitionService:
         except:
             return 0.0
     
-    # Additional helper methods would be implemented here
-    # (Support/resistance detection, trend analysis, etc.)
+    # Extrema-based helpers (pakai shared extrema dari _compute_extrema)
+    def _point(self, df: pd.DataFrame, index: int, column: str) -> Dict:
+        return {
+            'index': int(index),
+            'price': float(df[column].values[index]),
+            'date': df.index[index].isoformat()
+        }
+    
+    def _find_trough_between_peaks(self, df: pd.DataFrame, peak1: int, peak2: int) -> Dict:
+        """Lowest low between two peaks"""
+        return self._point(df, peak1 + int(np.argmin(df['low'].values[peak1:peak2 + 1])), 'low')
+    
+    def _find_peak_between_troughs(self, df: pd.DataFrame, trough1: int, trough2: int) -> Dict:
+        """Highest high between two troughs"""
+        return self._point(df, trough1 + int(np.argmax(df['high'].values[trough1:trough2 + 1])), 'high')
+    
+    def _calculate_neckline(self, df: pd.DataFrame, left_shoulder: int, right_shoulder: int) -> Dict:
+        """Neckline dari lowest low di kiri dan kanan head"""
+        head = left_shoulder + int(np.argmax(df['high'].values[left_shoulder:right_shoulder + 1]))
+        left = self._find_trough_between_peaks(df, left_shoulder, head)
+        right = self._find_trough_between_peaks(df, head, right_shoulder)
+        return {
+            'left': left,
+            'right': right,
+            'price': (left['price'] + right['price']) / 2
+        }
+    
+    def _calculate_hs_target(self, df: pd.DataFrame, left_shoulder: int, head: int, right_shoulder: int) -> float:
+        """Neckline minus head height"""
+        neckline = self._calculate_neckline(df, left_shoulder, right_shoulder)['price']
+        return float(neckline - (df['high'].values[head] - neckline))
+    
+    def _calculate_double_top_target(self, df: pd.DataFrame, peak1: int, peak2: int) -> float:
+        """Trough minus pattern height"""
+        trough = self._find_trough_between_peaks(df, peak1, peak2)['price']
+        top = (df['high'].values[peak1] + df['high'].values[peak2]) / 2
+        return float(trough - (top - trough))
+    
+    def _calculate_double_bottom_target(self, df: pd.DataFrame, trough1: int, trough2: int) -> float:
+        """Peak plus pattern height"""
+        peak = self._find_peak_between_troughs(df, trough1, trough2)['price']
+        bottom = (df['low'].values[trough1] + df['low'].values[trough2]) / 2
+        return float(peak + (peak - bottom))
+    
+    def _find_horizontal_level(self, df: pd.DataFrame, points: List[int], column: str,
+                               tolerance: float = 0.02) -> Optional[Dict]:
+        """Horizontal level jika extrema terakhir berada dalam tolerance satu sama lain"""
+        recent = points[-5:]
+        if len(recent) < 2:
+            return None
+        prices = df[column].values[recent]
+        level = float(prices.mean())
+        if (prices.max() - prices.min()) / level > tolerance:
+            return None
+        return {
+            'price': level,
+            'touches': len(recent),
+            'first_date': df.index[recent[0]].isoformat(),
+            'last_date': df.index[recent[-1]].isoformat()
+        }
+    
+    def _find_resistance_level(self, df: pd.DataFrame, extrema: Dict) -> Optional[Dict]:
+        return self._find_horizontal_level(df, extrema['peaks'], 'high')
+    
+    def _find_support_level(self, df: pd.DataFrame, extrema: Dict) -> Optional[Dict]:
+        return self._find_horizontal_level(df, extrema['troughs'], 'low')
+    
+    def _fit_trend(self, df: pd.DataFrame, points: List[int], column: str) -> Optional[Dict]:
+        """Trend line (linregress) lewat extrema terakhir"""
+        recent = points[-5:]
+        if len(recent) < 3:
+            return None
+        result = linregress(recent, df[column].values[recent])
+        return {
+            'slope': float(result.slope),
+            'intercept': float(result.intercept),
+            'r_squared': float(result.rvalue ** 2),
+            'start_index': int(recent[0]),
+            'end_index': int(recent[-1])
+        }
+    
+    def _find_support_trend(self, df: pd.DataFrame, extrema: Dict) -> Optional[Dict]:
+        return self._fit_trend(df, extrema['troughs'], 'low')
+    
+    def _find_resistance_trend(self, df: pd.DataFrame, extrema: Dict) -> Optional[Dict]:
+        return self._fit_trend(df, extrema['peaks'], 'high')
+    
+    @staticmethod
+    def _trend_value(trend: Dict, index: int) -> float:
+        return trend['slope'] * index + trend['intercept']
+    
+    def _calculate_triangle_confidence(self, df: pd.DataFrame, level: Dict, trend: Dict) -> float:
+        """Base + level touches + trend line fit"""
+        try:
+            confidence = 0.4
+            confidence += min(level['touches'], 5) * 0.04
+            confidence += trend['r_squared'] * 0.4
+            return min(confidence, 1.0)
+        except:
+            return 0.0
+    
+    def _calculate_triangle_breakout_target(self, df: pd.DataFrame, level: Dict, trend: Dict) -> float:
+        """Level plus/minus tinggi triangle di awal trend line"""
+        height = abs(level['price'] - self._trend_value(trend, trend['start_index']))
+        return float(level['price'] + height if trend['slope'] > 0 else level['price'] - height)
     
-    def get_support_resistance_levels(self, symbol: str, timeframe: str = '1D') -> Dict:
-        """Get support and resistance levels for a symbol"""
+    def _calculate_wedge_confidence(self, df: pd.DataFrame, support_trend: Dict, resistance_trend: Dict) -> float:
+        """Base + trend line fit + convergence"""
         try:
-            # Get historical data
-            historical_data = self.data_service.get_historical_candlestick_data(
-                symbol, timeframe, datetime.now() - timedelta(days=365), datetime.now()
-            )
-            
-            if not historical_data or len(historical_data) < 50:
-                return {"error": "Insufficient data"}
-            
-            df = pd.DataFrame(historical_data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.set_index('timestamp')
-            
-            # Find support and resistance levels
-            support_levels = self._find_support_levels(df)
-            resistance_levels = self._find_resistance_levels(df)
-            
-            return {
-                'symbol': symbol,
-                'timeframe': timeframe,
-                'support_levels': support_levels,
-                'resistance_levels': resistance_levels,
-                'analysis_date': datetime.now().isoformat()
-            }
+            confidence = 0.4
+            confidence += (support_trend['r_squared'] + resistance_trend['r_squared']) / 2 * 0.4
+            start = min(support_trend['start_index'], resistance_trend['start_index'])
+            end = len(df) - 1
+            width_start = self._trend_value(resistance_trend, start) - self._trend_value(support_trend, start)
+            width_end = self._trend_value(resistance_trend, end) - self._trend_value(support_trend, end)
+            if 0 < width_end < width_start:
+                confidence += 0.2
+            return min(confidence, 1.0)
+        except:
+            return 0.0
+    
+    def _calculate_wedge_target(self, df: pd.DataFrame, support_trend: Dict, resistance_trend: Dict) -> float:
+        """Rising wedge kembali ke awal support, falling wedge ke awal resistance"""
+        start = min(support_trend['start_index'], resistance_trend['start_index'])
+        if support_trend['slope'] > 0:
+            return float(self._trend_value(support_trend, start))
+        return float(self._trend_value(resistance_trend, start))
+    
+    def _detect_trend(self, data: pd.DataFrame, direction: int, min_change: float = 0.03) -> Optional[Dict]:
+        """Linear trend on close (direction 1 = up, -1 = down)"""
+        close = data['close'].to_numpy(dtype=float)
+        if len(close) < 5 or close[0] <= 0:
+            return None
+        result = linregress(np.arange(len(close)), close)
+        change = close[-1] / close[0] - 1
+        if direction * change < min_change or direction * result.slope <= 0 or result.rvalue ** 2 < 0.5:
+            return None
+        return {
+            'slope': float(result.slope),
+            'r_squared': float(result.rvalue ** 2),
+            'change_pct': float(change),
+            'start_price': float(close[0]),
+            'end_price': float(close[-1])
+        }
+    
+    def _detect_uptrend(self, data: pd.DataFrame) -> Optional[Dict]:
+        return self._detect_trend(data, 1)
+    
+    def _detect_downtrend(self, data: pd.DataFrame) -> Optional[Dict]:
+        return self._detect_trend(data, -1)
+    
+    def _detect_consolidation(self, data: pd.DataFrame, max_range: float = 0.05) -> Optional[Dict]:
+        """Tight range: (max high - min low) / mean close <= max_range"""
+        high = float(data['high'].max())
+        low = float(data['low'].min())
+        mean_close = float(data['close'].mean())
+        if mean_close <= 0:
+            return None
+        range_pct = (high - low) / mean_close
+        if range_pct > max_range:
+            return None
+        return {'high': high, 'low': low, 'range_pct': range_pct}
+    
+    def _calculate_flag_confidence(self, data: pd.DataFrame, trend: Dict, consolidation: Dict) -> float:
+        """Base + pole strength + flag tightness"""
+        try:
+            confidence = 0.4
+            confidence += min(abs(trend['change_pct']) / 0.1, 1.0) * 0.3
+            confidence += max(0.0, 0.05 - consolidation['range_pct']) / 0.05 * 0.3
+            return min(confidence, 1.0)
+        except:
+            return 0.0
+    
+    def _calculate_flag_target(self, data: pd.DataFrame, trend: Dict, consolidation: Dict) -> float:
+        """Last close plus flag pole"""
+        return float(data['close'].values[-1] + (trend['end_price'] - trend['start_price']))
+    
+    def get_support_resistance_levels(self, symbol: str, timeframe: str = '1D', volume_weighted: bool = False) -> Dict:
+        """Get support and resistance levels for a symbol (incremental per symbol/timeframe)"""
+        try:
+            symbol = symbol.upper()
+            engine = _get_level_engine(symbol, timeframe, volume_weighted)
+            
+            store = get_bar_store()
+            with engine.lock:
+                # Hanya bars setelah bar terakhir yang sudah ada di engine
+                if engine.last_timestamp is not None:
+                    start = engine.last_timestamp + pd.Timedelta(1, 'ns')
+                else:
+                    start = datetime.now() - SR_LOOKBACK
+                bars = store.load_bars([symbol], timeframe, start=start).get(symbol)
+                if bars is not None:
+                    engine.update(store.to_frame(bars))
+                
+                if len(engine) < 50:
+                    return {"error": "Insufficient data"}
+                
+                return {
+                    'symbol': symbol,
+                    'timeframe': timeframe,
+                    'support_levels': engine.support_levels(),
+                    'resistance_levels': engine.resistance_levels(),
+                    'volume_weighted': volume_weighted,
+                    'last_bar': engine.last_timestamp.isoformat(),
+                    'analysis_date': datetime.now().isoformat()
+                }
             
         except Exception as e:
             logger.error(f"Error getting support/resistance levels: {e}")
@@ -710,29 +930,7 @@ class PatternRecognitionService:
     def _find_support_levels(self, df: pd.DataFrame) -> List[Dict]:
         """Find support levels"""
         try:
-            # Find significant lows
-            lows = self._find_troughs(df['low'].values)
-            support_levels = []
-            
-            for low in lows:
-                price = df.iloc[low]['low']
-                date = df.index[low]
-                
-                # Check if this level has been tested multiple times
-                touches = self._count_level_touches(df, price, 'support')
-                
-                if touches >= 2:  # At least 2 touches
-                    support_levels.append({
-                        'price': price,
-                        'date': date.isoformat(),
-                        'touches': touches,
-                        'strength': min(touches / 5, 1.0)  # Strength based on touches
-                    })
-            
-            # Sort by strength
-            support_levels.sort(key=lambda x: x['strength'], reverse=True)
-            return support_levels[:5]  # Top 5 support levels
-            
+            return SupportResistanceEngine().fit(df).support_levels()
         except Exception as e:
             logger.error(f"Error finding support levels: {e}")
             return []
@@ -740,29 +938,7 @@ class PatternRecognitionService:
     def _find_resistance_levels(self, df: pd.DataFrame) -> List[Dict]:
         """Find resistance levels"""
         try:
-            # Find significant highs
-            highs = self._find_peaks(df['high'].values)
-            resistance_levels = []
-            
-            for high in highs:
-                price = df.iloc[high]['high']
-                date = df.index[high]
-                
-                # Check if this level has been tested multiple times
-                touches = self._count_level_touches(df, price, 'resistance')
-                
-                if touches >= 2:  # At least 2 touches
-                    resistance_levels.append({
-                        'price': price,
-                        'date': date.isoformat(),
-                        'touches': touches,
-                        'strength': min(touches / 5, 1.0)  # Strength based on touches
-                    })
-            
-            # Sort by strength
-            resistance_levels.sort(key=lambda x: x['strength'], reverse=True)
-            return resistance_levels[:5]  # Top 5 resistance levels
-            
+            return SupportResistanceEngine().fit(df).resistance_levels()
         except Exception as e:
             logger.error(f"Error finding resistance levels: {e}")
             return []
@@ -770,19 +946,118 @@ class PatternRecognitionService:
     def _count_level_touches(self, df: pd.DataFrame, level: float, level_type: str) -> int:
         """Count how many times a price level has been touched"""
         try:
-            touches = 0
-            tolerance = level * 0.02  # 2% tolerance
-            
-            if level_type == 'support':
-                for low in df['low']:
-                    if abs(low - level) <= tolerance:
-                        touches += 1
-            else:  # resistance
-                for high in df['high']:
-                    if abs(high - level) <= tolerance:
-                        touches += 1
-            
-            return touches
-            
+            values = df['low'].values if level_type == 'support' else df['high'].values
+            return int(np.count_nonzero(np.abs(values - level) <= level * 0.02))
         except:
             return 0
+    
+    def scan_symbols(self,
+                     symbols: Optional[Iterable[str]] = None,
+                     timeframes: Optional[List[str]] = None,
+                     pattern_types: Optional[List[str]] = None,
+                     lookback_days: int = 365,
+                     max_workers: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Universe-wide pattern scan dari columnar bar store.
+        
+        Symbols di-scan paralel di worker processes; hasil per symbol di-yield
+        segera setelah symbol itu selesai (urutan = urutan selesai). Jumlah
+        task in-flight dibatasi, jadi berhenti iterasi membatalkan sisa scan.
+        symbols=None berarti semua symbols di bar store untuk timeframes.
+        """
+        timeframes = timeframes or ['1D', '1W', '1M']
+        if symbols is None:
+            store = get_bar_store()
+            symbols = sorted({symbol for timeframe in timeframes for symbol in store.symbols(timeframe)})
+        symbols = [symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()]
+        args = (timeframes, pattern_types, lookback_days)
+        
+        max_workers = max_workers or settings.PATTERN_SCAN_MAX_WORKERS or os.cpu_count() or 1
+        if max_workers <= 1 or len(symbols) <= 1:
+            for symbol in symbols:
+                yield scan_symbol(symbol, *args)
+            return
+        
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_scan_worker) as executor:
+            pending = iter(symbols)
+            in_flight = set()
+            try:
+                while True:
+                    while len(in_flight) < max_workers * 4:
+                        symbol = next(pending, None)
+                        if symbol is None:
+                            break
+                        in_flight.add(executor.submit(scan_symbol, symbol, *args))
+                    
+                    if not in_flight:
+                        break
+                    
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+# Level engines per (symbol, timeframe, volume_weighted), LRU-bounded
+SR_LOOKBACK = timedelta(days=365)
+MAX_LEVEL_ENGINES = 2048
+_level_engines: "OrderedDict[tuple, SupportResistanceEngine]" = OrderedDict()
+_level_engines_lock = threading.Lock()
+
+def _get_level_engine(symbol: str, timeframe: str, volume_weighted: bool) -> SupportResistanceEngine:
+    key = (symbol, timeframe, volume_weighted)
+    with _level_engines_lock:
+        engine = _level_engines.get(key)
+        if engine is None:
+            engine = _level_engines[key] = SupportResistanceEngine(
+                lookback=SR_LOOKBACK, volume_weighted=volume_weighted
+            )
+        _level_engines.move_to_end(key)
+        while len(_level_engines) > MAX_LEVEL_ENGINES:
+            _level_engines.popitem(last=False)
+        return engine
+
+# Worker process state (set by _init_scan_worker)
+_scan_service: Optional[PatternRecognitionService] = None
+
+def _init_scan_worker():
+    """One detector instance per worker process (tanpa DB session)"""
+    global _scan_service
+    _scan_service = PatternRecognitionService(None)
+
+def scan_symbol(symbol: str,
+                timeframes: List[str],
+                pattern_types: Optional[List[str]] = None,
+                lookback_days: int = 365) -> Dict:
+    """Detect patterns untuk satu symbol di semua timeframes (dijalankan di worker process)"""
+    global _scan_service
+    if _scan_service is None:
+        _init_scan_worker()
+    
+    started = time.perf_counter()
+    result = {'symbol': symbol, 'status': 'success', 'patterns_found': {}, 'last_bar': {}}
+    try:
+        store = get_bar_store()
+        start = datetime.now() - timedelta(days=lookback_days)
+        for timeframe in timeframes:
+            bars = store.load_bars([symbol], timeframe, start=start).get(symbol)
+            if bars is None or len(bars['close']) < 50:
+                continue
+            
+            df = store.to_frame(bars)
+            extrema = _scan_service.get_cached_extrema(symbol, timeframe, df)
+            result['patterns_found'][timeframe] = _scan_service._detect_patterns_for_timeframe(
+                df, timeframe, extrema, pattern_types
+            )
+            result['last_bar'][timeframe] = df.index[-1].isoformat()
+        
+        if not result['patterns_found']:
+            result['status'] = 'no_data'
+    except Exception as e:
+        logger.error(f"Error scanning patterns for {symbol}: {e}")
+        result.update({'status': 'error', 'error': str(e)})
+    
+    result['total_patterns'] = sum(len(patterns) for patterns in result['patterns_found'].values())
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
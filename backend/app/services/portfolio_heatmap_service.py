@@ -7,8 +7,8 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.models.trading import Portfolio, Position, Trade
-from app.models.market_data import HistoricalData
 from app.models.fundamental import CompanyProfile
+from app.core.returns_panel import ReturnsPanel, CORRELATION_MODES, correlation_to_dict
 import logging
 
 logger = logging.getLogger(__name__)
@@ -102,28 +102,20 @@ class PortfolioHeatMapService:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=252)  # 1 year
             
+            # Semua closes dalam satu query, aligned per date
+            panel = ReturnsPanel.load(self.db, symbols, start_date, end_date)
+            volatilities = panel.volatility()  # Annualized volatility
+            portfolio_value = sum([p.quantity * p.average_price for p in positions])
+            
             for position in positions:
-                # Get historical data
-                historical_data = self.db.query(HistoricalData).filter(
-                    HistoricalData.symbol == position.symbol,
-                    HistoricalData.date >= start_date,
-                    HistoricalData.date <= end_date
-                ).order_by(HistoricalData.date).all()
-                
-                if not historical_data:
+                returns = panel.symbol_returns(position.symbol)
+                if len(returns) < 1:
                     continue
                 
-                # Calculate volatility
-                prices = [data.close_price for data in historical_data if data.close_price]
-                if len(prices) < 2:
-                    continue
-                
-                returns = np.diff(np.log(prices))
-                volatility = np.std(returns) * np.sqrt(252)  # Annualized volatility
+                volatility = float(volatilities[position.symbol])
                 
                 # Calculate position metrics
                 position_value = position.quantity * position.average_price
-                portfolio_value = sum([p.quantity * p.average_price for p in positions])
                 weight = position_value / portfolio_value if portfolio_value > 0 else 0
                 
                 # Calculate VaR (simplified)
@@ -226,9 +218,18 @@ class PortfolioHeatMapService:
             logger.error(f"Error calculating performance heatmap: {e}")
             return {"error": str(e)}
     
-    def calculate_correlation_heatmap(self, portfolio_id: int, days: int = 90) -> Dict:
-        """Calculate correlation heatmap untuk portfolio positions"""
+    def calculate_correlation_heatmap(self, portfolio_id: int, days: int = 90, mode: str = 'full',
+                                      window: int = 60, halflife: float = 20.0) -> Dict:
+        """
+        Calculate correlation heatmap untuk portfolio positions.
+
+        mode: 'full' (seluruh periode), 'rolling' (last `window` days) atau
+        'ewma' (exponentially weighted, `halflife` days).
+        """
         try:
+            if mode not in CORRELATION_MODES:
+                return {"error": f"Unknown correlation mode: {mode}"}
+            
             # Get portfolio positions
             positions = self.db.query(Position).filter(
                 Position.portfolio_id == portfolio_id,
@@ -244,53 +245,19 @@ class PortfolioHeatMapService:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            # Get price data for all symbols
-            price_data = {}
-            for symbol in symbols:
-                historical_data = self.db.query(HistoricalData).filter(
-                    HistoricalData.symbol == symbol,
-                    HistoricalData.date >= start_date,
-                    HistoricalData.date <= end_date
-                ).order_by(HistoricalData.date).all()
-                
-                if historical_data:
-                    prices = [data.close_price for data in historical_data if data.close_price]
-                    if len(prices) > 1:
-                        # Calculate returns
-                        returns = np.diff(np.log(prices))
-                        price_data[symbol] = returns
-            
-            if len(price_data) < 2:
+            # Returns semua symbols, aligned ke satu date index
+            panel = ReturnsPanel.load(self.db, symbols, start_date, end_date)
+            if len(panel.symbols) < 2 or len(panel) < 2:
                 return {"error": "Insufficient data for correlation analysis"}
             
-            # Calculate correlation matrix
-            correlation_matrix = {}
-            for symbol1 in symbols:
-                if symbol1 not in price_data:
-                    continue
-                    
-                correlation_matrix[symbol1] = {}
-                for symbol2 in symbols:
-                    if symbol2 not in price_data:
-                        continue
-                    
-                    if symbol1 == symbol2:
-                        correlation_matrix[symbol1][symbol2] = 1.0
-                    else:
-                        # Calculate correlation
-                        min_length = min(len(price_data[symbol1]), len(price_data[symbol2]))
-                        if min_length > 1:
-                            corr = np.corrcoef(
-                                price_data[symbol1][:min_length],
-                                price_data[symbol2][:min_length]
-                            )[0, 1]
-                            correlation_matrix[symbol1][symbol2] = round(corr, 4)
-                        else:
-                            correlation_matrix[symbol1][symbol2] = 0.0
+            # Calculate correlation matrix (pairwise-complete, satu matrix op)
+            correlation = panel.correlation(mode, window=window, halflife=halflife)
+            correlation_matrix = correlation_to_dict(correlation)
             
             return {
                 "portfolio_id": portfolio_id,
                 "period_days": days,
+                "mode": mode,
                 "correlation_matrix": correlation_matrix,
                 "high_correlation_pairs": self._find_high_correlation_pairs(correlation_matrix),
                 "diversification_analysis": self._analyze_diversification(correlation_matrix)
@@ -0,0 +1,100 @@
+"""
+Sentiment Rollup Service
+Scheduled incremental refresh untuk sentiment_rollup, sehingga sentiment
+read paths tidak pernah lock sentiment_rollup_state atau commit
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import settings
+from app.core.sentiment_rollup import SentimentRollups
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class SentimentRollupJob:
+    """
+    Periodic SentimentRollups.refresh() di background (thread pool executor,
+    session sendiri per run). Rollups tertinggal paling lama interval +
+    COMMIT_LAG dari source rows.
+    """
+
+    def __init__(self, interval: float = 60.0):
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, int]] = None
+        self.runs = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, interval: Optional[float] = None):
+        if interval is not None:
+            self.interval = interval
+        if self.interval <= 0:
+            raise ValueError("Refresh interval must be positive")
+        if not self.running:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def run_once(self) -> Dict[str, int]:
+        """Satu refresh (blocking); concurrent runs di-serialize"""
+        with self._run_lock:
+            db = SessionLocal()
+            try:
+                result = SentimentRollups(db).refresh()
+                self.last_run = datetime.now()
+                self.last_result = result
+                self.runs += 1
+                return result
+            finally:
+                db.close()
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                result = await loop.run_in_executor(None, self.run_once)
+                if any(result.values()):
+                    logger.info(f"Sentiment rollup refresh: {result}")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error refreshing sentiment rollups: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    def get_status(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result
+        }
+
+_rollup_job: Optional[SentimentRollupJob] = None
+_rollup_job_lock = threading.Lock()
+
+def get_sentiment_rollup_job() -> SentimentRollupJob:
+    """Process-wide sentiment rollup job"""
+    global _rollup_job
+    with _rollup_job_lock:
+        if _rollup_job is None:
+            _rollup_job = SentimentRollupJob(settings.SENTIMENT_ROLLUP_REFRESH_INTERVAL)
+        return _rollup_job
@@ -0,0 +1,412 @@
+"""
+Strategy Optimization Service untuk parallel parameter sweeps
+"""
+from sqlalchemy.orm import Session
+from app.models.backtesting import StrategyOptimization, StrategyType, BacktestStatus
+from app.database import SessionLocal
+from app.services.backtesting_service import BacktestingService
+from app.core.backtest_engine import VectorizedBacktestEngine
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+from datetime import datetime, date
+import itertools
+import threading
+import uuid
+import time
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Metrics where a lower value is better
+LOWER_IS_BETTER = {'max_drawdown'}
+
+# Running sweeps in this process: optimization_id -> state
+_running_optimizations: Dict[str, Dict] = {}
+_registry_lock = threading.Lock()
+
+# Worker process state (set by _init_worker)
+_worker_state: Dict = {}
+
+def _init_worker(shm_name: str, length: int, strategy_value: str,
+                 initial_capital: float, commission_rate: float, slippage_rate: float):
+    """Attach the shared close buffer once per worker process"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    close = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    close.flags.writeable = False
+
+    _worker_state.update({
+        'shm': shm,
+        'close': close,
+        'strategy_type': StrategyType(strategy_value),
+        'initial_capital': initial_capital,
+        'engine': VectorizedBacktestEngine(commission_rate, slippage_rate)
+    })
+
+def _evaluate_combination(params: Dict) -> Dict:
+    """Backtest one parameter combination against the shared close buffer"""
+    results = _worker_state['engine'].simulate(
+        _worker_state['close'],
+        _worker_state['initial_capital'],
+        _worker_state['strategy_type'],
+        params
+    )
+    return {
+        'parameters': params,
+        'final_capital': results['final_capital'],
+        'metrics': results['metrics']
+    }
+
+class StrategyOptimizationService:
+    """Service untuk strategy parameter optimization (grid/random search)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def build_combinations(self, parameter_space: Dict, search_type: str = "grid",
+                           num_samples: int = 100, seed: Optional[int] = None) -> List[Dict]:
+        """
+        Expand a search space into parameter combinations.
+
+        grid: {"period": [10, 20, 30], "std_dev": [1.5, 2.0]}
+        random: values are lists (choice) or {"min", "max", "type": "int"|"float"} ranges
+        """
+        names = list(parameter_space.keys())
+
+        if search_type == "grid":
+            values = [v if isinstance(v, list) else [v] for v in parameter_space.values()]
+            return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+        if search_type == "random":
+            rng = np.random.default_rng(seed)
+            combinations = []
+            for _ in range(num_samples):
+                combo = {}
+                for name, spec in parameter_space.items():
+                    if isinstance(spec, list):
+                        combo[name] = spec[int(rng.integers(len(spec)))]
+                    elif isinstance(spec, dict):
+                        if spec.get('type', 'float') == 'int':
+                            combo[name] = int(rng.integers(spec['min'], spec['max'] + 1))
+                        else:
+                            combo[name] = float(rng.uniform(spec['min'], spec['max']))
+                    else:
+                        combo[name] = spec
+                combinations.append(combo)
+            return combinations
+
+        raise ValueError(f"Unknown search type: {search_type}")
+
+    def start_optimization(self,
+                           strategy_type: StrategyType,
+                           symbol: str,
+                           timeframe: str,
+                           start_date: date,
+                           end_date: date,
+                           parameter_space: Dict,
+                           search_type: str = "grid",
+                           num_samples: int = 100,
+                           optimization_metric: str = "sharpe_ratio",
+                           initial_capital: float = 100000000.0,
+                           commission_rate: float = 0.001,
+                           slippage_rate: float = 0.0005,
+                           max_workers: Optional[int] = None,
+                           seed: Optional[int] = None) -> Dict:
+        """Create an optimization record and start the sweep in the background"""
+        try:
+            combinations = self.build_combinations(parameter_space, search_type, num_samples, seed)
+            if not combinations:
+                return {"error": "Parameter space is empty"}
+
+            # Load price history once for every combination
+            historical_data = BacktestingService(self.db)._load_historical_data(
+                symbol.upper(), timeframe, start_date, end_date
+            )
+            if not historical_data:
+                return {"error": "No historical data available"}
+            close = np.array([bar['close'] for bar in historical_data], dtype=np.float64)
+
+            optimization_id = f"OPT_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+            optimization = StrategyOptimization(
+                optimization_id=optimization_id,
+                strategy_id=f"{strategy_type.value}:{symbol.upper()}:{timeframe}",
+                optimization_type=f"{search_type}_search",
+                parameter_ranges=parameter_space,
+                optimization_metric=optimization_metric,
+                total_combinations=len(combinations),
+                tested_combinations=0,
+                status=BacktestStatus.RUNNING,
+                started_at=datetime.now()
+            )
+            self.db.add(optimization)
+            self.db.commit()
+
+            state = {
+                "optimization_id": optimization_id,
+                "total_combinations": len(combinations),
+                "tested_combinations": 0,
+                "failed_combinations": 0,
+                "best_parameters": None,
+                "best_score": None,
+                "best_value": None,
+                "status": BacktestStatus.RUNNING.value,
+                "started_at": datetime.now(),
+                "cancel_event": threading.Event()
+            }
+            with _registry_lock:
+                _running_optimizations[optimization_id] = state
+
+            worker = threading.Thread(
+                target=self._run_sweep,
+                args=(state, close, strategy_type, combinations, optimization_metric,
+                      initial_capital, commission_rate, slippage_rate, max_workers),
+                name=f"optimization-{optimization_id}",
+                daemon=True
+            )
+            worker.start()
+
+            return {
+                "optimization_id": optimization_id,
+                "status": "running",
+                "total_combinations": len(combinations),
+                "message": "Optimization started successfully"
+            }
+
+        except Exception as e:
+            logger.error(f"Error starting optimization: {e}")
+            self.db.rollback()
+            return {"error": str(e)}
+
+    def _score(self, result: Dict, optimization_metric: str) -> float:
+        """Score used for ranking (higher is better)"""
+        value = result['metrics'].get(optimization_metric, 0) or 0
+        return -value if optimization_metric in LOWER_IS_BETTER else value
+
+    def _run_sweep(self, state: Dict, close: np.ndarray, strategy_type: StrategyType,
+                   combinations: List[Dict], optimization_metric: str,
+                   initial_capital: float, commission_rate: float, slippage_rate: float,
+                   max_workers: Optional[int]):
+        """Run all combinations across worker processes (background thread)"""
+        optimization_id = state["optimization_id"]
+        cancel_event = state["cancel_event"]
+        max_workers = max_workers or os.cpu_count() or 1
+        results = []
+        failed = []
+        status = BacktestStatus.COMPLETED
+
+        # Read-only price buffer shared with every worker process
+        shm = shared_memory.SharedMemory(create=True, size=max(close.nbytes, 1))
+        try:
+            np.ndarray(close.shape, dtype=np.float64, buffer=shm.buf)[:] = close
+
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(shm.name, len(close), strategy_type.value,
+                          initial_capital, commission_rate, slippage_rate)
+            ) as executor:
+                pending = iter(combinations)
+                in_flight = set()
+                submitted = {}
+                last_persist = time.monotonic()
+
+                while True:
+                    # Keep a bounded number of tasks queued so cancellation is quick
+                    while not cancel_event.is_set() and len(in_flight) < max_workers * 2:
+                        params = next(pending, None)
+                        if params is None:
+                            break
+                        future = executor.submit(_evaluate_combination, params)
+                        submitted[future] = params
+                        in_flight.add(future)
+
+                    if not in_flight:
+                        break
+
+                    done, in_flight = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        params = submitted.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # Satu combination yang gagal tidak menghentikan sweep
+                            logger.warning(f"Optimization {optimization_id}: combination {params} failed: {e}")
+                            failed.append({'parameters': params, 'error': str(e)})
+                            continue
+                        result['score'] = self._score(result, optimization_metric)
+                        results.append(result)
+
+                        if state["best_score"] is None or result['score'] > state["best_score"]:
+                            state["best_score"] = result['score']
+                            state["best_value"] = result['metrics'].get(optimization_metric, 0)
+                            state["best_parameters"] = result['parameters']
+                    state["tested_combinations"] = len(results) + len(failed)
+                    state["failed_combinations"] = len(failed)
+
+                    if cancel_event.is_set():
+                        status = BacktestStatus.CANCELLED
+                        for future in in_flight:
+                            future.cancel()
+                        in_flight = {f for f in in_flight if not f.cancelled()}
+
+                    if time.monotonic() - last_persist >= 2.0:
+                        self._persist_progress(state)
+                        last_persist = time.monotonic()
+
+                if cancel_event.is_set():
+                    status = BacktestStatus.CANCELLED
+
+        except Exception as e:
+            logger.error(f"Error running optimization {optimization_id}: {e}")
+            status = BacktestStatus.FAILED
+        finally:
+            shm.close()
+            shm.unlink()
+
+        state["status"] = status.value
+        self._persist_results(state, results, failed, optimization_metric, status)
+
+        with _registry_lock:
+            _running_optimizations.pop(optimization_id, None)
+
+    def _persist_progress(self, state: Dict):
+        """Write tested_combinations and current best to the optimization record"""
+        db = SessionLocal()
+        try:
+            optimization = db.query(StrategyOptimization).filter(
+                StrategyOptimization.optimization_id == state["optimization_id"]
+            ).first()
+            if optimization:
+                optimization.tested_combinations = state["tested_combinations"]
+                optimization.best_parameters = state["best_parameters"]
+                optimization.best_score = state["best_value"]
+                db.commit()
+        except Exception as e:
+            logger.error(f"Error persisting optimization progress: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _persist_results(self, state: Dict, results: List[Dict], failed: List[Dict],
+                         optimization_metric: str, status: BacktestStatus):
+        """Write ranked results (failed combinations after them, rank None) and final status"""
+        ranked = sorted(results, key=lambda r: r['score'], reverse=True)
+        for rank, result in enumerate(ranked, start=1):
+            result['rank'] = rank
+            result['metrics'] = {
+                k: v.item() if isinstance(v, np.generic) else v
+                for k, v in result['metrics'].items()
+            }
+            result['score'] = float(result['score'])
+
+        db = SessionLocal()
+        try:
+            optimization = db.query(StrategyOptimization).filter(
+                StrategyOptimization.optimization_id == state["optimization_id"]
+            ).first()
+            if optimization:
+                optimization.status = status
+                optimization.tested_combinations = len(ranked) + len(failed)
+                optimization.optimization_results = ranked + [dict(entry, rank=None) for entry in failed]
+                if ranked:
+                    optimization.best_parameters = ranked[0]['parameters']
+                    optimization.best_score = ranked[0]['metrics'].get(optimization_metric, 0)
+                optimization.completed_at = datetime.now()
+                db.commit()
+        except Exception as e:
+            logger.error(f"Error persisting optimization results: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def get_optimization_status(self, optimization_id: str) -> Dict:
+        """Get live progress (running) or stored results (finished)"""
+        try:
+            with _registry_lock:
+                state = _running_optimizations.get(optimization_id)
+
+            if state:
+                total = state["total_combinations"]
+                tested = state["tested_combinations"]
+                elapsed = (datetime.now() - state["started_at"]).total_seconds()
+                return {
+                    "optimization_id": optimization_id,
+                    "status": "cancelling" if state["cancel_event"].is_set() else state["status"],
+                    "total_combinations": total,
+                    "tested_combinations": tested,
+                    "failed_combinations": state["failed_combinations"],
+                    "progress": tested / total if total else 0,
+                    "best_parameters": state["best_parameters"],
+                    "best_score": state["best_value"],
+                    "elapsed_seconds": elapsed
+                }
+
+            optimization = self.db.query(StrategyOptimization).filter(
+                StrategyOptimization.optimization_id == optimization_id
+            ).first()
+            if not optimization:
+                return {"error": "Optimization not found"}
+
+            total = optimization.total_combinations or 0
+            tested = optimization.tested_combinations or 0
+            return {
+                "optimization_id": optimization_id,
+                "status": optimization.status.value,
+                "optimization_type": optimization.optimization_type,
+                "optimization_metric": optimization.optimization_metric,
+                "total_combinations": total,
+                "tested_combinations": tested,
+                "progress": tested / total if total else 0,
+                "best_parameters": optimization.best_parameters,
+                "best_score": optimization.best_score,
+                "started_at": optimization.started_at.isoformat() if optimization.started_at else None,
+                "completed_at": optimization.completed_at.isoformat() if optimization.completed_at else None
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting optimization status: {e}")
+            return {"error": str(e)}
+
+    def get_optimization_results(self, optimization_id: str, limit: int = 50) -> Dict:
+        """Get ranked parameter combinations"""
+        try:
+            optimization = self.db.query(StrategyOptimization).filter(
+                StrategyOptimization.optimization_id == optimization_id
+            ).first()
+            if not optimization:
+                return {"error": "Optimization not found"}
+
+            results = optimization.optimization_results or []
+            failed = [result for result in results if 'error' in result]
+            return {
+                "optimization_id": optimization_id,
+                "status": optimization.status.value,
+                "optimization_metric": optimization.optimization_metric,
+                "tested_combinations": optimization.tested_combinations,
+                "results": [result for result in results if 'error' not in result][:limit],
+                "failed_combinations": len(failed),
+                "failures": failed[:limit]
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting optimization results: {e}")
+            return {"error": str(e)}
+
+    def cancel_optimization(self, optimization_id: str) -> Dict:
+        """Request cancellation of a running sweep"""
+        with _registry_lock:
+            state = _running_optimizations.get(optimization_id)
+
+        if not state:
+            return {"error": "Optimization is not running"}
+
+        state["cancel_event"].set()
+        return {
+            "optimization_id": optimization_id,
+            "status": "cancelling",
+            "tested_combinations": state["tested_combinations"],
+            "message": "Cancellation requested"
+        }
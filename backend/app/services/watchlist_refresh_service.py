@@ -0,0 +1,266 @@
+"""
+Watchlist Refresh Service
+Scheduled batch refresh untuk semua watchlists: unique symbols, satu bulk
+price/history fetch, vectorized indicators dan satu bulk update
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.returns_panel import ReturnsPanel
+from app.database import SessionLocal
+from app.models.watchlist import Watchlist, WatchlistItem
+from app.services.data_service import DataService
+
+logger = logging.getLogger(__name__)
+
+# Minimal bars sebelum indicators di-update (sama dengan per-item refresh lama)
+MIN_HISTORY_BARS = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW = 12, 26
+SMA_PERIODS = (20, 50, 200)
+
+def right_aligned(closes: pd.DataFrame, length: int) -> Tuple[List[str], np.ndarray]:
+    """
+    (symbols x length) matrix dari date x symbol closes: setiap row berisi
+    `length` closes terakhir symbol itu (gaps dibuang), left-padded NaN.
+    """
+    symbols = list(closes.columns)
+    history = np.full((len(symbols), length), np.nan)
+    values = closes.to_numpy(dtype=float)
+    for row, column in enumerate(values.T):
+        column = column[~np.isnan(column)][-length:]
+        if len(column):
+            history[row, length - len(column):] = column
+    return symbols, history
+
+def _ema_last(history: np.ndarray, period: int) -> np.ndarray:
+    """EMA terakhir per row, di-seed dari close pertama row (vectorized antar symbols)"""
+    alpha = 2 / (period + 1)
+    ema = np.full(history.shape[0], np.nan)
+    for column in history.T:
+        valid = ~np.isnan(column)
+        ema = np.where(valid & np.isnan(ema), column, ema)
+        ema = np.where(valid, alpha * column + (1 - alpha) * ema, ema)
+    return ema
+
+def snapshot_indicators(history: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Latest RSI/MACD/SMA untuk setiap row dari right-aligned close matrix.
+
+    Semantics mengikuti WatchlistService: RSI = mean gains/losses periode
+    terakhir (50 jika history kurang), MACD = EMA12 - EMA26 (0 jika kurang
+    dari 26 bars), SMA = 0 jika history lebih pendek dari periode.
+    """
+    rows, length = history.shape
+    counts = (~np.isnan(history)).sum(axis=1)
+    out: Dict[str, np.ndarray] = {'bars': counts}
+    if rows == 0 or length == 0:
+        for name in ('rsi', 'macd', *(f"sma_{period}" for period in SMA_PERIODS)):
+            out[name] = np.zeros(rows)
+        return out
+
+    diffs = np.diff(history, axis=1)[:, -RSI_PERIOD:]
+    avg_gain = np.clip(diffs, 0, None).sum(axis=1) / RSI_PERIOD
+    avg_loss = np.clip(-diffs, 0, None).sum(axis=1) / RSI_PERIOD
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    out['rsi'] = np.where(counts >= RSI_PERIOD + 1, rsi, 50.0)
+
+    macd = _ema_last(history, MACD_FAST) - _ema_last(history, MACD_SLOW)
+    out['macd'] = np.where(counts >= MACD_SLOW, macd, 0.0)
+
+    for period in SMA_PERIODS:
+        if period > length:
+            out[f"sma_{period}"] = np.zeros(rows)
+            continue
+        sma = history[:, -period:].mean(axis=1)
+        out[f"sma_{period}"] = np.where(counts >= period, sma, 0.0)
+    return out
+
+def _number(value) -> Optional[float]:
+    return float(value) if value is not None and np.isfinite(value) else None
+
+def refresh_watchlist_items(db: Session,
+                            watchlist_ids: Optional[Iterable[str]] = None,
+                            item_ids: Optional[Iterable[str]] = None,
+                            history_days: Optional[int] = None,
+                            price_chunk: int = 100) -> Dict:
+    """
+    Refresh active items (semua auto-update watchlists, atau hanya
+    watchlist_ids / item_ids).
+
+    Setiap unique symbol di-fetch sekali: prices lewat multi-ticker request
+    per price_chunk symbols, history lewat ReturnsPanel.load (bar store
+    atau satu historical_data query). Semua items ditulis dengan satu bulk
+    update dan satu commit.
+    """
+    started = time.perf_counter()
+    history_days = history_days or settings.WATCHLIST_HISTORY_DAYS
+
+    query = db.query(WatchlistItem.id, WatchlistItem.symbol, WatchlistItem.watchlist_id).filter(
+        WatchlistItem.is_active == True
+    )
+    if item_ids is not None:
+        query = query.filter(WatchlistItem.item_id.in_(list(item_ids)))
+    elif watchlist_ids is not None:
+        query = query.filter(WatchlistItem.watchlist_id.in_(list(watchlist_ids)))
+    else:
+        query = query.join(Watchlist, Watchlist.watchlist_id == WatchlistItem.watchlist_id).filter(
+            Watchlist.auto_update == True
+        )
+    items = query.all()
+    if not items:
+        return {"items": 0, "symbols": 0, "watchlists": 0, "seconds": round(time.perf_counter() - started, 3)}
+
+    symbols = sorted({item.symbol.upper() for item in items if item.symbol})
+
+    # Prices: satu request per chunk, bukan satu rate-limited request per item
+    data_service = DataService(db)
+    prices: Dict[str, Dict] = {}
+    for offset in range(0, len(symbols), price_chunk):
+        prices.update(data_service.get_real_time_prices(symbols[offset:offset + price_chunk]))
+
+    # History + indicators untuk semua symbols sekaligus
+    now = datetime.now()
+    panel = ReturnsPanel.load(db, symbols, now - timedelta(days=history_days), now)
+    panel_symbols, history = right_aligned(panel.closes, max(SMA_PERIODS) + 1)
+    indicators = snapshot_indicators(history)
+    row_of = {symbol.upper(): row for row, symbol in enumerate(panel_symbols)}
+
+    per_symbol: Dict[str, Dict] = {}
+    for symbol in symbols:
+        values: Dict = {"last_updated": now}
+        price = prices.get(symbol)
+        if price:
+            values.update({
+                "current_price": price.get("price"),
+                "price_change": price.get("change"),
+                "price_change_percent": price.get("change_percent"),
+                "volume": price.get("volume")
+            })
+        row = row_of.get(symbol)
+        if row is not None and indicators['bars'][row] >= MIN_HISTORY_BARS:
+            values.update({
+                name: _number(indicators[name][row])
+                for name in ('rsi', 'macd', *(f"sma_{period}" for period in SMA_PERIODS))
+            })
+        per_symbol[symbol] = values
+
+    mappings = [dict(per_symbol[item.symbol.upper()], id=item.id) for item in items if item.symbol]
+    db.bulk_update_mappings(WatchlistItem, mappings)
+
+    refreshed = sorted({item.watchlist_id for item in items})
+    if item_ids is None:
+        db.query(Watchlist).filter(Watchlist.watchlist_id.in_(refreshed)).update(
+            {Watchlist.last_updated: now}, synchronize_session=False
+        )
+    db.commit()
+
+    return {
+        "items": len(mappings),
+        "symbols": len(symbols),
+        "watchlists": len(refreshed),
+        "priced": len(prices),
+        "with_history": int((indicators['bars'] >= MIN_HISTORY_BARS).sum()),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+class WatchlistRefreshJob:
+    """
+    Periodic refresh_watchlist_items() di background (thread pool executor,
+    session sendiri per run). Interval bisa diubah saat berjalan.
+    """
+
+    def __init__(self, interval: float = 60.0):
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Dict] = None
+        self.runs = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, interval: Optional[float] = None):
+        if interval is not None:
+            self.interval = interval
+        if self.interval <= 0:
+            raise ValueError("Refresh interval must be positive")
+        if not self.running:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def run_once(self, watchlist_ids: Optional[Iterable[str]] = None) -> Dict:
+        """Satu refresh (blocking); concurrent runs di-serialize"""
+        with self._run_lock:
+            db = SessionLocal()
+            try:
+                result = refresh_watchlist_items(db, watchlist_ids)
+                if watchlist_ids is None:
+                    self.last_run = datetime.now()
+                    self.last_result = result
+                    self.runs += 1
+                return result
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                result = await loop.run_in_executor(None, self.run_once)
+                logger.info(f"Watchlist refresh: {result}")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error refreshing watchlists: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    def is_fresh(self, last_updated: Optional[datetime]) -> bool:
+        """True jika job aktif dan last_updated masih dalam satu interval"""
+        return (self.running and last_updated is not None
+                and (datetime.now() - last_updated).total_seconds() < self.interval)
+
+    def get_status(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result
+        }
+
+_refresh_job: Optional[WatchlistRefreshJob] = None
+_refresh_job_lock = threading.Lock()
+
+def get_watchlist_refresh_job() -> WatchlistRefreshJob:
+    """Process-wide watchlist refresh job"""
+    global _refresh_job
+    with _refresh_job_lock:
+        if _refresh_job is None:
+            _refresh_job = WatchlistRefreshJob(settings.WATCHLIST_REFRESH_INTERVAL)
+        return _refresh_job
@@ -7,14 +7,68 @@ from app.models.watchlist import (
     WatchlistColumn, WatchlistFilter, WatchlistQuickAction, WatchlistType
 )
 from app.services.data_service import DataService
+from app.services.watchlist_refresh_service import get_watchlist_refresh_job, refresh_watchlist_items
+from app.core.alert_index import AlertEntry, AlertIndex, AlertIndexSync
+from app.config import settings
+from sqlalchemy import func
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
+import threading
 import uuid
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+# Kombinasi yang didukung watchlist alerts (volume hanya "above")
+WATCHLIST_ALERT_CONDITIONS = {
+    "price": ("above", "below"),
+    "volume": ("above",),
+    "rsi": ("above", "below")
+}
+
+def _watchlist_alert_entry(row) -> Optional[AlertEntry]:
+    """(WatchlistAlert, symbol) -> one-shot index entry; owner = item_id"""
+    alert, symbol = row
+    if (not alert.is_active or alert.is_triggered or not symbol
+            or alert.condition not in WATCHLIST_ALERT_CONDITIONS.get(alert.alert_type, ())):
+        return None
+    return AlertEntry(
+        key=alert.alert_id,
+        symbol=symbol.upper(),
+        metric=alert.alert_type,
+        condition=alert.condition,
+        threshold=alert.threshold_value,
+        cooldown=timedelta(minutes=alert.cooldown_minutes or 0),
+        one_shot=True,
+        owner=alert.item_id,
+        last_triggered=alert.last_triggered
+    )
+
+_watchlist_alert_sync: Optional[AlertIndexSync] = None
+_watchlist_alert_sync_lock = threading.Lock()
+
+def get_watchlist_alert_sync() -> AlertIndexSync:
+    """Process-wide watchlist alert index"""
+    global _watchlist_alert_sync
+    with _watchlist_alert_sync_lock:
+        if _watchlist_alert_sync is None:
+            _watchlist_alert_sync = AlertIndexSync(
+                AlertIndex(),
+                WatchlistAlert,
+                query=lambda db: db.query(WatchlistAlert, WatchlistItem.symbol).join(
+                    WatchlistItem, WatchlistItem.item_id == WatchlistAlert.item_id
+                ),
+                active=lambda: (WatchlistAlert.is_active == True) & (WatchlistAlert.is_triggered == False),
+                key=lambda row: row[0].alert_id,
+                to_entry=_watchlist_alert_entry,
+                record=lambda row: row[0],
+                refresh_interval=settings.ALERT_INDEX_REFRESH_SECONDS,
+                full_reload_interval=settings.ALERT_INDEX_FULL_RELOAD_SECONDS,
+                commit_lag=settings.ALERT_INDEX_COMMIT_LAG_SECONDS
+            )
+        return _watchlist_alert_sync
+
 class WatchlistService:
     """Service untuk watchlist operations"""
     
@@ -106,7 +160,7 @@ class WatchlistService:
             self.db.commit()
             
             # Fetch initial data
-            self._update_watchlist_item_data(item_id)
+            refresh_watchlist_items(self.db, item_ids=[item_id])
             
             return {
                 "item_id": item_id,
@@ -173,8 +227,8 @@ class WatchlistService:
                 WatchlistItem.is_active == True
             ).all()
             
-            # Update data for all items
-            if watchlist.auto_update:
+            # Update data for all items (kecuali scheduled refresh baru saja jalan)
+            if watchlist.auto_update and not get_watchlist_refresh_job().is_fresh(watchlist.last_updated):
                 self._update_watchlist_data(watchlist_id)
             
             # Format items data
@@ -222,121 +276,11 @@ class WatchlistService:
     def _update_watchlist_data(self, watchlist_id: str):
         """Update all watchlist items with latest data"""
         try:
-            items = self.db.query(WatchlistItem).filter(
-                WatchlistItem.watchlist_id == watchlist_id,
-                WatchlistItem.is_active == True
-            ).all()
-            
-            for item in items:
-                self._update_watchlist_item_data(item.item_id)
-            
-            # Update watchlist last_updated
-            watchlist = self.db.query(Watchlist).filter(Watchlist.watchlist_id == watchlist_id).first()
-            if watchlist:
-                watchlist.last_updated = datetime.now()
-                self.db.commit()
+            refresh_watchlist_items(self.db, watchlist_ids=[watchlist_id])
             
         except Exception as e:
             logger.error(f"Error updating watchlist data: {e}")
-    
-    def _update_watchlist_item_data(self, item_id: str):
-        """Update individual watchlist item data"""
-        try:
-            item = self.db.query(WatchlistItem).filter(WatchlistItem.item_id == item_id).first()
-            if not item:
-                return
-            
-            # Get real-time data
-            price_data = self.data_service.get_real_time_price(item.symbol)
-            if price_data:
-                item.current_price = price_data.get('price')
-                item.price_change = price_data.get('change')
-                item.price_change_percent = price_data.get('change_percent')
-                item.volume = price_data.get('volume')
-            
-            # Calculate technical indicators
-            historical_data = self.data_service.get_historical_candlestick_data(
-                item.symbol, '1D', datetime.now() - timedelta(days=200), datetime.now()
-            )
-            
-            if historical_data and len(historical_data) >= 20:
-                prices = [bar['close'] for bar in historical_data]
-                
-                # Calculate RSI
-                item.rsi = self._calculate_rsi(prices, 14)
-                
-                # Calculate MACD
-                macd_data = self._calculate_macd(prices, 12, 26, 9)
-                item.macd = macd_data.get('macd')
-                
-                # Calculate SMAs
-                item.sma_20 = self._calculate_sma(prices, 20)
-                item.sma_50 = self._calculate_sma(prices, 50)
-                item.sma_200 = self._calculate_sma(prices, 200)
-            
-            item.last_updated = datetime.now()
-            self.db.commit()
-            
-        except Exception as e:
-            logger.error(f"Error updating watchlist item data: {e}")
-    
-    def _calculate_rsi(self, prices: List[float], period: int) -> float:
-        """Calculate RSI"""
-        if len(prices) < period + 1:
-            return 50
-        
-        gains = []
-        losses = []
-        
-        for i in range(1, len(prices)):
-            change = prices[i] - prices[i-1]
-            gains.append(max(change, 0))
-            losses.append(max(-change, 0))
-        
-        if len(gains) < period:
-            return 50
-        
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
-    
-    def _calculate_macd(self, prices: List[float], fast: int, slow: int, signal: int) -> Dict:
-        """Calculate MACD"""
-        if len(prices) < slow:
-            return {"macd": 0}
-        
-        fast_ema = self._calculate_ema(prices, fast)
-        slow_ema = self._calculate_ema(prices, slow)
-        
-        macd = fast_ema - slow_ema
-        
-        return {"macd": macd}
-    
-    def _calculate_ema(self, prices: List[float], period: int) -> float:
-        """Calculate EMA"""
-        if len(prices) < period:
-            return prices[-1] if prices else 0
-        
-        multiplier = 2 / (period + 1)
-        ema = prices[0]
-        
-        for price in prices[1:]:
-            ema = (price * multiplier) + (ema * (1 - multiplier))
-        
-        return ema
-    
-    def _calculate_sma(self, prices: List[float], period: int) -> float:
-        """Calculate SMA"""
-        if len(prices) < period:
-            return 0
-        return sum(prices[-period:]) / period
+            self.db.rollback()
     
     def create_watchlist_alert(self,
                               watchlist_id: str,
@@ -366,6 +310,11 @@ class WatchlistService:
             self.db.add(alert)
             self.db.commit()
             
+            symbol = self.db.query(WatchlistItem.symbol).filter(WatchlistItem.item_id == item_id).scalar()
+            entry = _watchlist_alert_entry((alert, symbol))
+            if entry is not None:
+                get_watchlist_alert_sync().index.upsert(entry)
+            
             return {
                 "alert_id": alert_id,
                 "status": "created",
@@ -380,70 +329,64 @@ class WatchlistService:
     def check_watchlist_alerts(self, watchlist_id: str) -> List[Dict]:
         """Check and trigger watchlist alerts"""
         try:
-            alerts = self.db.query(WatchlistAlert).filter(
-                WatchlistAlert.watchlist_id == watchlist_id,
-                WatchlistAlert.is_active == True,
-                WatchlistAlert.is_triggered == False
-            ).all()
-            
-            triggered_alerts = []
-            
-            for alert in alerts:
-                # Get current item data
-                item = self.db.query(WatchlistItem).filter(WatchlistItem.item_id == alert.item_id).first()
-                if not item:
-                    continue
-                
-                # Check alert conditions
-                should_trigger = False
-                current_value = None
-                
-                if alert.alert_type == "price":
-                    current_value = item.current_price
-                    if alert.condition == "above" and current_value > alert.threshold_value:
-                        should_trigger = True
-                    elif alert.condition == "below" and current_value < alert.threshold_value:
-                        should_trigger = True
-                
-                elif alert.alert_type == "volume":
-                    current_value = item.volume
-                    if alert.condition == "above" and current_value > alert.threshold_value:
-                        should_trigger = True
-                
-                elif alert.alert_type == "rsi":
-                    current_value = item.rsi
-                    if alert.condition == "above" and current_value > alert.threshold_value:
-                        should_trigger = True
-                    elif alert.condition == "below" and current_value < alert.threshold_value:
-                        should_trigger = True
-                
-                if should_trigger:
-                    # Check cooldown
-                    if alert.last_triggered:
-                        time_since_last = datetime.now() - alert.last_triggered
-                        if time_since_last.total_seconds() < (alert.cooldown_minutes * 60):
-                            continue
-                    
-                    # Trigger alert
-                    alert.is_triggered = True
-                    alert.trigger_count += 1
-                    alert.last_triggered = datetime.now()
-                    
-                    triggered_alerts.append({
-                        "alert_id": alert.alert_id,
-                        "symbol": item.symbol,
-                        "alert_type": alert.alert_type,
-                        "condition": alert.condition,
-                        "threshold_value": alert.threshold_value,
-                        "current_value": current_value,
-                        "triggered_at": datetime.now().isoformat()
-                    })
+            items = self.db.query(
+                WatchlistItem.item_id, WatchlistItem.symbol, WatchlistItem.current_price,
+                WatchlistItem.volume, WatchlistItem.rsi
+            ).filter(WatchlistItem.watchlist_id == watchlist_id).all()
+            
+            # Setiap item punya data sendiri; rules hanya boleh match tick dari item-nya
+            ticks = [{
+                "symbol": item.symbol.upper(),
+                "item_id": item.item_id,
+                "price": item.current_price,
+                "volume": item.volume,
+                "rsi": item.rsi
+            } for item in items if item.symbol]
+            return self._trigger_alerts(ticks, watchlist_id)
             
+        except Exception as e:
+            logger.error(f"Error checking watchlist alerts: {e}")
+            return []
+    
+    def _trigger_alerts(self, ticks: List[Dict], watchlist_id: str) -> List[Dict]:
+        """Match ticks di watchlist alert index; satu bulk UPDATE + commit"""
+        sync = get_watchlist_alert_sync()
+        try:
+            sync.refresh(self.db)
+            # Satu item per symbol dalam watchlist, jadi owner check cukup
+            item_ids = {tick["item_id"] for tick in ticks}
+            matches = sync.index.match(ticks, accept=lambda entry: entry.owner in item_ids)
+            if not matches:
+                return []
+            
+            now = datetime.now()
+            self.db.query(WatchlistAlert).filter(
+                WatchlistAlert.alert_id.in_([match.entry.key for match in matches])
+            ).update({
+                WatchlistAlert.is_triggered: True,
+                WatchlistAlert.trigger_count: func.coalesce(WatchlistAlert.trigger_count, 0) + 1,
+                WatchlistAlert.last_triggered: now
+            }, synchronize_session=False)
             self.db.commit()
-            return triggered_alerts
+            
+            return [{
+                "alert_id": match.entry.key,
+                "symbol": match.entry.symbol,
+                "alert_type": match.entry.metric,
+                "condition": match.entry.condition,
+                "threshold_value": match.entry.threshold,
+                "current_value": match.value,
+                "triggered_at": now.isoformat()
+            } for match in matches]
             
         except Exception as e:
-            logger.error(f"Error checking watchlist alerts: {e}")
+            logger.error(f"Error triggering watchlist alerts for {watchlist_id}: {e}")
+            self.db.rollback()
+            # Index sudah membuang one-shot entries; sync ulang dari database
+            try:
+                sync.refresh(self.db, force=True)
+            except Exception as refresh_error:
+                logger.error(f"Error reloading watchlist alert index: {refresh_error}")
             return []
     
     def get_watchlist_performance(self, watchlist_id: str, days: int = 30) -> Dict:
@@ -0,0 +1,216 @@
+"""
+Fan-out Price Broadcaster untuk Socket.IO
+Batched price fetch di thread pool, coalescing per symbol, satu emit per room
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+def symbol_room(symbol: str) -> str:
+    """Socket.IO room name for a symbol's price updates"""
+    return f"price:{symbol}"
+
+class PriceBroadcaster:
+    """
+    Coalescing price fan-out.
+
+    publish() hanya menyimpan tick terbaru per symbol; flush loop mengirim
+    setiap symbol yang berubah satu kali ke room-nya. Client yang outgoing
+    queue-nya melebihi max_backlog di-skip, dan setelah queue-nya kosong
+    hanya menerima tick terbaru (tick lama di-drop).
+    """
+
+    def __init__(self,
+                 sio,
+                 fetch_prices: Callable[[List[str]], Dict[str, Dict]],
+                 poll_interval: float = 5.0,
+                 flush_interval: float = 0.1,
+                 batch_size: int = 50,
+                 max_concurrent_batches: int = 4,
+                 max_backlog: int = 64):
+        self.sio = sio
+        self.fetch_prices = fetch_prices
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backlog = max_backlog
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="price-fetch")
+
+        self.latest: Dict[str, Dict] = {}
+        self.dirty: Set[str] = set()
+        self.symbol_clients: Dict[str, Set[str]] = {}
+        self.client_symbols: Dict[str, Set[str]] = {}
+        self.missed: Dict[str, Set[str]] = {}  # slow sid -> symbols with dropped ticks
+        self.stats = {"published": 0, "emitted": 0, "coalesced": 0, "dropped": 0, "fetch_errors": 0}
+
+        self.running = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    async def subscribe(self, sid: str, symbol: str):
+        await self.sio.enter_room(sid, symbol_room(symbol))
+        self.symbol_clients.setdefault(symbol, set()).add(sid)
+        self.client_symbols.setdefault(sid, set()).add(symbol)
+
+    async def unsubscribe(self, sid: str, symbol: str):
+        await self.sio.leave_room(sid, symbol_room(symbol))
+        self._forget(sid, symbol)
+
+    def remove_client(self, sid: str):
+        """Drop bookkeeping for a disconnected client (Socket.IO clears its rooms)"""
+        for symbol in self.client_symbols.pop(sid, set()):
+            self._forget(sid, symbol)
+        self.missed.pop(sid, None)
+
+    def _forget(self, sid: str, symbol: str):
+        clients = self.symbol_clients.get(symbol)
+        if clients is not None:
+            clients.discard(sid)
+            if not clients:
+                del self.symbol_clients[symbol]
+                self.latest.pop(symbol, None)
+                self.dirty.discard(symbol)
+        self.client_symbols.get(sid, set()).discard(symbol)
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.symbol_clients.keys())
+
+    # ------------------------------------------------------------------
+    # Publish / flush
+    # ------------------------------------------------------------------
+
+    def publish(self, symbol: str, price_data: Dict) -> bool:
+        """Record the latest tick for a symbol (non-blocking, coalesced); False if nobody subscribes"""
+        if symbol not in self.symbol_clients:
+            return False
+        if symbol in self.dirty:
+            self.stats["coalesced"] += 1
+        self.latest[symbol] = price_data
+        self.dirty.add(symbol)
+        self.stats["published"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _client_backlog(self, sid: str) -> int:
+        """Packets waiting in the client's Engine.IO outgoing queue"""
+        try:
+            eio_sid = self.sio.manager.eio_sid_from_sid(sid, '/')
+            return self.sio.eio.sockets[eio_sid].queue.qsize()
+        except (AttributeError, KeyError):
+            return 0
+
+    async def flush(self):
+        """Emit every dirty symbol once to its room"""
+        if not self.dirty and not self.missed:
+            return
+
+        symbols, self.dirty = self.dirty, set()
+
+        # Slow clients skip this round; catch up with the latest tick later
+        slow = [sid for sid in self.client_symbols if self._client_backlog(sid) > self.max_backlog]
+        slow_set = set(slow)
+        emits = []
+
+        for sid in [sid for sid in self.missed if sid not in slow_set]:
+            for symbol in self.missed.pop(sid):
+                if symbol in self.latest and symbol not in symbols:
+                    emits.append(self.sio.emit('price_update', self.latest[symbol], room=sid))
+
+        for symbol in symbols:
+            price_data = self.latest.get(symbol)
+            if price_data is None:
+                continue
+
+            skipped = [sid for sid in slow if sid in self.symbol_clients.get(symbol, ())]
+            for sid in skipped:
+                self.missed.setdefault(sid, set()).add(symbol)
+            self.stats["dropped"] += len(skipped)
+
+            emits.append(self.sio.emit('price_update', price_data, room=symbol_room(symbol),
+                                       skip_sid=skipped or None))
+
+        # Semua room di-emit bersamaan: satu event loop pass, bukan satu per symbol
+        await asyncio.gather(*emits)
+        self.stats["emitted"] += len(emits)
+
+    async def _flush_loop(self):
+        while self.running:
+            try:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                await self.flush()
+                # Rate-limit emits so bursts of ticks coalesce
+                await asyncio.sleep(self.flush_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error flushing price updates: {e}")
+
+    # ------------------------------------------------------------------
+    # Polling
+    # ------------------------------------------------------------------
+
+    async def fetch_batch(self, symbols: List[str]):
+        """Fetch one batch in the thread pool and publish the results"""
+        loop = asyncio.get_running_loop()
+        try:
+            prices = await loop.run_in_executor(self.executor, self.fetch_prices, symbols)
+        except Exception as e:
+            self.stats["fetch_errors"] += 1
+            logger.error(f"Error fetching prices for {len(symbols)} symbols: {e}")
+            return
+        for symbol, price_data in prices.items():
+            if price_data:
+                self.publish(symbol, price_data)
+
+    async def poll_once(self):
+        """Fetch all subscribed symbols in concurrent batches"""
+        symbols = self.symbols
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        await asyncio.gather(*(self.fetch_batch(batch) for batch in batches))
+
+    async def _poll_loop(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error polling prices: {e}")
+            await asyncio.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    async def start(self, poll: bool = True):
+        """Start flush loop (and polling unless prices are pushed externally)"""
+        if self.running:
+            return
+        self.running = True
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+        if poll:
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def stop(self):
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def get_price(self, symbol: str) -> Optional[Dict]:
+        """Latest known price, or a one-off fetch off the event loop"""
+        if symbol in self.latest:
+            return self.latest[symbol]
+        loop = asyncio.get_running_loop()
+        prices = await loop.run_in_executor(self.executor, self.fetch_prices, [symbol])
+        return prices.get(symbol)
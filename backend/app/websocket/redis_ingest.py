@@ -0,0 +1,242 @@
+"""
+Redis Pub/Sub Tick Ingestion
+Async subscriber yang meneruskan external ticks ke PriceBroadcaster
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Legacy channel: payload membawa 'symbol'
+DEFAULT_CHANNELS = ('market_data_updates',)
+
+# Per-symbol channels: ticks:<SYMBOL>
+TICK_CHANNEL_PREFIX = 'ticks:'
+DEFAULT_PATTERNS = (f'{TICK_CHANNEL_PREFIX}*',)
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class RedisTickSubscriber:
+    """
+    asyncio Redis pub/sub reader dengan batched decoding dan backpressure.
+
+    Reader task hanya memindahkan raw messages ke buffer; processor task
+    men-decode per batch (satu json.loads per batch) lalu publish ke
+    broadcaster. Jika buffer penuh, reader berhenti membaca sampai buffer
+    turun ke setengahnya (paling lama max_pause detik); setelah itu tick
+    paling lama di-drop agar Redis tidak memutus koneksi karena output buffer.
+    """
+
+    def __init__(self,
+                 redis_client,
+                 broadcaster,
+                 channels: Sequence[str] = DEFAULT_CHANNELS,
+                 patterns: Sequence[str] = DEFAULT_PATTERNS,
+                 batch_size: int = 500,
+                 max_pending: int = 10000,
+                 max_pause: float = 0.5,
+                 reconnect_delay: float = 1.0):
+        self.redis = redis_client
+        self.broadcaster = broadcaster
+        self.channels = list(channels)
+        self.patterns = list(patterns)
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_pause = max_pause
+        self.reconnect_delay = reconnect_delay
+
+        self.buffer: deque = deque()
+        self.metrics = {
+            "received": 0,
+            "decoded": 0,
+            "invalid": 0,
+            "dropped": 0,
+            "broadcast": 0,
+            "ignored": 0,
+            "batches": 0,
+            "reader_pauses": 0,
+            "max_buffered": 0,
+            "reconnects": 0,
+        }
+        self.running = False
+        self.connected = False
+        self._pubsub = None
+        self._data_ready = asyncio.Event()
+        self._space_ready = asyncio.Event()
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    async def add_pattern(self, pattern: str):
+        """Subscribe an extra pattern (e.g. ticks:BB* untuk subset symbols)"""
+        if pattern not in self.patterns:
+            self.patterns.append(pattern)
+            if self._pubsub is not None:
+                await self._pubsub.psubscribe(pattern)
+
+    async def remove_pattern(self, pattern: str):
+        if pattern in self.patterns:
+            self.patterns.remove(pattern)
+            if self._pubsub is not None:
+                await self._pubsub.punsubscribe(pattern)
+
+    # ------------------------------------------------------------------
+    # Reader
+    # ------------------------------------------------------------------
+
+    async def _wait_for_space(self):
+        """Backpressure: pause reading while the buffer is full"""
+        self.metrics["reader_pauses"] += 1
+        self._space_ready.clear()
+        try:
+            await asyncio.wait_for(self._space_ready.wait(), timeout=self.max_pause)
+        except asyncio.TimeoutError:
+            pass
+
+    def _enqueue(self, message: Dict):
+        if len(self.buffer) >= self.max_pending:
+            self.buffer.popleft()
+            self.metrics["dropped"] += 1
+        self.buffer.append((_text(message.get('channel')), message.get('data')))
+        self.metrics["received"] += 1
+        self.metrics["max_buffered"] = max(self.metrics["max_buffered"], len(self.buffer))
+        self._data_ready.set()
+
+    async def _read(self, pubsub):
+        while self.running:
+            if len(self.buffer) >= self.max_pending:
+                await self._wait_for_space()
+
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is None:
+                continue
+            if message.get('type') not in ('message', 'pmessage'):
+                continue
+            self._enqueue(message)
+
+            # Drain yang sudah ada di socket tanpa menunggu
+            for _ in range(self.batch_size - 1):
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+                if message is None:
+                    break
+                if message.get('type') in ('message', 'pmessage'):
+                    self._enqueue(message)
+
+    async def _reader_loop(self):
+        while self.running:
+            pubsub = self.redis.pubsub()
+            try:
+                if self.channels:
+                    await pubsub.subscribe(*self.channels)
+                if self.patterns:
+                    await pubsub.psubscribe(*self.patterns)
+                self._pubsub = pubsub
+                self.connected = True
+                logger.info(f"Redis tick subscriber listening on {self.channels + self.patterns}")
+                await self._read(pubsub)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics["reconnects"] += 1
+                logger.error(f"Redis tick subscriber error: {e}; reconnecting in {self.reconnect_delay}s")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                self.connected = False
+                self._pubsub = None
+                try:
+                    await pubsub.aclose() if hasattr(pubsub, 'aclose') else await pubsub.close()
+                except Exception:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Processor
+    # ------------------------------------------------------------------
+
+    def _decode_batch(self, batch: List[Tuple[str, object]]) -> List[Tuple[str, Optional[Dict]]]:
+        """Decode payloads with one json.loads; fall back per message on bad input"""
+        payloads = [_text(data) for _, data in batch]
+        try:
+            decoded = json.loads('[' + ','.join(payloads) + ']')
+            if len(decoded) != len(batch):
+                raise ValueError("payload count mismatch")
+        except (ValueError, TypeError):
+            decoded = []
+            for payload in payloads:
+                try:
+                    decoded.append(json.loads(payload))
+                except (ValueError, TypeError):
+                    decoded.append(None)
+        return [(channel, data) for (channel, _), data in zip(batch, decoded)]
+
+    def _publish(self, channel: str, data) -> bool:
+        if not isinstance(data, dict):
+            self.metrics["invalid"] += 1
+            return False
+
+        symbol = data.get('symbol')
+        if not symbol and channel and channel.startswith(TICK_CHANNEL_PREFIX):
+            symbol = channel[len(TICK_CHANNEL_PREFIX):]
+        if not symbol:
+            self.metrics["invalid"] += 1
+            return False
+
+        symbol = symbol.upper()
+        data['symbol'] = symbol
+        self.metrics["decoded"] += 1
+        if self.broadcaster.publish(symbol, data):
+            self.metrics["broadcast"] += 1
+        else:
+            self.metrics["ignored"] += 1
+        return True
+
+    async def _process_loop(self):
+        while self.running:
+            await self._data_ready.wait()
+            self._data_ready.clear()
+
+            while self.buffer:
+                batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                for channel, data in self._decode_batch(batch):
+                    self._publish(channel, data)
+                self.metrics["batches"] += 1
+
+                if len(self.buffer) <= self.max_pending // 2:
+                    self._space_ready.set()
+                # Beri kesempatan flush loop broadcaster berjalan di antara batch
+                await asyncio.sleep(0)
+
+            self._space_ready.set()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def run(self):
+        """Run reader and processor until stopped"""
+        self.running = True
+        tasks = [asyncio.create_task(self._reader_loop()), asyncio.create_task(self._process_loop())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self.running = False
+        self._data_ready.set()
+
+    def get_metrics(self) -> Dict:
+        """Ingestion counters plus broadcaster fan-out counters"""
+        return {
+            **self.metrics,
+            "buffered": len(self.buffer),
+            "connected": self.connected,
+            "subscriptions": self.channels + self.patterns,
+            "broadcaster": dict(self.broadcaster.stats)
+        }
@@ -9,15 +9,17 @@ from typing import Dict, List, Set
 import socketio
 from fastapi import FastAPI
 from app.services.data_service import DataService
+from app.websocket.price_broadcaster import PriceBroadcaster
+from app.websocket.redis_ingest import RedisTickSubscriber
 from app.database import get_db
 from sqlalchemy.orm import Session
-import redis
+import redis.asyncio as aioredis
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Redis client untuk pub/sub
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+# Async Redis client untuk pub/sub (sync client tidak bisa di-await)
+redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
 
 # SocketIO server
 sio = socketio.AsyncServer(
@@ -39,6 +41,12 @@ class WebSocketManager:
         db = next(get_db())
         self.data_service = DataService(db)
     
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Batched price fetch (runs in the broadcaster thread pool)"""
+        if not self.data_service:
+            return {}
+        return self.data_service.get_real_time_prices(symbols)
+    
     async def add_client(self, client_id: str):
         """Add new client connection"""
         self.connected_clients.add(client_id)
@@ -51,6 +59,7 @@ class WebSocketManager:
         # Remove from all symbol subscriptions
         for symbol, clients in self.subscribed_symbols.items():
             clients.discard(client_id)
+        price_broadcaster.remove_client(client_id)
         
         logger.info(f"Client {client_id} disconnected. Total clients: {len(self.connected_clients)}")
     
@@ -60,11 +69,12 @@ class WebSocketManager:
             self.subscribed_symbols[symbol] = set()
         
         self.subscribed_symbols[symbol].add(client_id)
+        await price_broadcaster.subscribe(client_id, symbol)
         logger.info(f"Client {client_id} subscribed to {symbol}")
         
-        # Send current price immediately
+        # Send current price immediately (cached tick atau fetch di thread pool)
         if self.data_service:
-            price_data = self.data_service.get_real_time_price(symbol)
+            price_data = await price_broadcaster.get_price(symbol)
             if price_data:
                 await sio.emit('price_update', price_data, room=client_id)
     
@@ -72,15 +82,12 @@ class WebSocketManager:
         """Unsubscribe client from symbol updates"""
         if symbol in self.subscribed_symbols:
             self.subscribed_symbols[symbol].discard(client_id)
+            await price_broadcaster.unsubscribe(client_id, symbol)
             logger.info(f"Client {client_id} unsubscribed from {symbol}")
     
     async def broadcast_price_update(self, symbol: str, price_data: Dict):
-        """Broadcast price update to all subscribed clients"""
-        if symbol in self.subscribed_symbols:
-            subscribed_clients = self.subscribed_symbols[symbol]
-            if subscribed_clients:
-                await sio.emit('price_update', price_data, room=list(subscribed_clients))
-                logger.debug(f"Broadcasted price update for {symbol} to {len(subscribed_clients)} clients")
+        """Queue price update for subscribed clients (coalesced, one emit per symbol room)"""
+        price_broadcaster.publish(symbol, price_data)
     
     async def broadcast_market_update(self, market_data: Dict):
         """Broadcast market-wide updates"""
@@ -90,6 +97,12 @@ class WebSocketManager:
 # Global WebSocket manager
 ws_manager = WebSocketManager()
 
+# Global price fan-out
+price_broadcaster = PriceBroadcaster(sio, ws_manager.fetch_prices)
+
+# External ticks via Redis pub/sub -> price_broadcaster
+tick_subscriber = RedisTickSubscriber(redis_client, price_broadcaster)
+
 # SocketIO event handlers
 @sio.event
 async def connect(sid, environ):
@@ -152,7 +165,7 @@ async def get_real_time_price(sid, data):
         symbol = data.get('symbol', '').upper()
         
         if symbol and ws_manager.data_service:
-            price_data = ws_manager.data_service.get_real_time_price(symbol)
+            price_data = await price_broadcaster.get_price(symbol)
             if price_data:
                 await sio.emit('price_update', price_data, room=sid)
     except Exception as e:
@@ -170,6 +183,7 @@ class RealTimeDataUpdater:
         """Start real-time data updater"""
         self.running = True
         await ws_manager.initialize()
+        await price_broadcaster.start(poll=False)
         
         while self.running:
             try:
@@ -182,19 +196,14 @@ class RealTimeDataUpdater:
     async def stop(self):
         """Stop real-time data updater"""
         self.running = False
+        await price_broadcaster.stop()
     
     async def _update_all_subscribed_symbols(self):
-        """Update all subscribed symbols"""
+        """Update all subscribed symbols (batched fetch off the event loop)"""
         if not ws_manager.data_service:
             return
         
-        for symbol in ws_manager.subscribed_symbols.keys():
-            try:
-                price_data = ws_manager.data_service.get_real_time_price(symbol)
-                if price_data:
-                    await ws_manager.broadcast_price_update(symbol, price_data)
-            except Exception as e:
-                logger.error(f"Error updating {symbol}: {e}")
+        await price_broadcaster.poll_once()
 
 # Global real-time updater
 realtime_updater = RealTimeDataUpdater()
@@ -207,28 +216,29 @@ async def start_websocket_server(app: FastAPI):
     # Start real-time data updater
     asyncio.create_task(realtime_updater.start())
     
+    # Start Redis tick ingestion
+    asyncio.create_task(redis_subscriber())
+    
     logger.info("WebSocket server started")
 
 async def stop_websocket_server():
     """Stop WebSocket server"""
     await realtime_updater.stop()
+    tick_subscriber.stop()
     logger.info("WebSocket server stopped")
 
 # Redis pub/sub untuk external data updates
 async def redis_subscriber():
-    """Redis subscriber untuk external data updates"""
-    pubsub = redis_client.pubsub()
-    await pubsub.subscribe('market_data_updates')
-    
-    async for message in pubsub.listen():
-        if message['type'] == 'message':
-            try:
-                data = json.loads(message['data'])
-                symbol = data.get('symbol')
-                if symbol:
-                    await ws_manager.broadcast_price_update(symbol, data)
-            except Exception as e:
-                logger.error(f"Error processing Redis message: {e}")
+    """Redis subscriber untuk external data updates (market_data_updates dan ticks:<SYMBOL>)"""
+    await tick_subscriber.run()
+
+def get_realtime_metrics() -> Dict:
+    """Tick ingestion and broadcast counters"""
+    return {
+        **tick_subscriber.get_metrics(),
+        "connected_clients": len(ws_manager.connected_clients),
+        "subscribed_symbols": len(price_broadcaster.symbols)
+    }
 
 # Export untuk use di main app
-__all__ = ['sio', 'ws_manager', 'start_websocket_server', 'stop_websocket_server', 'redis_subscriber']
+__all__ = ['sio', 'ws_manager', 'price_broadcaster', 'tick_subscriber', 'get_realtime_metrics', 'start_websocket_server', 'stop_websocket_server', 'redis_subscriber']
@@ -10,13 +10,23 @@ import uvicorn
 from app.api import fundamental, sentiment, market_data, trading, notifications, security, tax, backup, cache, backtesting, watchlist, pattern, dashboard, earnings, sentiment_scraping, economic_calendar, web_scraping, educational, two_factor, performance_analytics, portfolio_heatmap, strategy_builder, algorithmic_trading, technical, ai_ml, risk_management, portfolio_optimization, kulamagi_strategy
 from app.database import engine, Base
 from app.config import settings
-from app.websocket.websocket_server import sio, start_websocket_server, stop_websocket_server
+from app.websocket.websocket_server import sio, start_websocket_server, stop_websocket_server, get_realtime_metrics
+from app.services.watchlist_refresh_service import get_watchlist_refresh_job
+from app.services.sentiment_rollup_service import get_sentiment_rollup_job
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _notification_delivery_pool():
+    """Delivery pool dari enhanced notifications service (None jika service tidak ter-deploy)"""
+    try:
+        from app.services.enhanced_notifications_service import get_delivery_pool
+    except ImportError:
+        return None
+    return get_delivery_pool()
+
 # Lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -30,6 +40,22 @@ async def lifespan(app: FastAPI):
         # Start WebSocket server
         await start_websocket_server(app)
         logger.info("WebSocket server started")
+        
+        # Scheduled batch watchlist refresh
+        if settings.WATCHLIST_REFRESH_INTERVAL > 0:
+            get_watchlist_refresh_job().start()
+            logger.info(f"Watchlist refresh scheduled every {settings.WATCHLIST_REFRESH_INTERVAL}s")
+        
+        # Sentiment rollups di-refresh di background; read paths hanya membaca
+        if settings.SENTIMENT_ROLLUP_REFRESH_INTERVAL > 0:
+            get_sentiment_rollup_job().start()
+            logger.info(f"Sentiment rollup refresh scheduled every {settings.SENTIMENT_ROLLUP_REFRESH_INTERVAL}s")
+        
+        # Notification delivery workers: drain pending streams/retries dari run sebelumnya
+        delivery_pool = _notification_delivery_pool()
+        if delivery_pool is not None:
+            await delivery_pool.start()
+            logger.info("Notification delivery workers started")
     except Exception as e:
         logger.error(f"Startup error: {e}")
     
@@ -39,6 +65,13 @@ async def lifespan(app: FastAPI):
     try:
         await stop_websocket_server()
         logger.info("WebSocket server stopped")
+        
+        await get_watchlist_refresh_job().stop()
+        await get_sentiment_rollup_job().stop()
+        
+        delivery_pool = _notification_delivery_pool()
+        if delivery_pool is not None and delivery_pool.running:
+            await delivery_pool.stop()
     except Exception as e:
         logger.error(f"Shutdown error: {e}")
 
@@ -117,6 +150,12 @@ async def health_check():
         ]
     }
 
+# Real-time pipeline metrics
+@app.get("/health/realtime")
+async def realtime_health():
+    """Redis tick ingestion and WebSocket broadcast metrics"""
+    return get_realtime_metrics()
+
 # Root endpoint
 @app.get("/", response_class=HTMLResponse)
 async def root():
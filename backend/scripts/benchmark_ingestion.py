@@ -0,0 +1,84 @@
+"""
+Benchmark Ingestion Scheduler
+Membandingkan sequential per-symbol download dengan concurrent batched scheduler
+memakai FakeMarketDataSource dan SQLite in-memory (tanpa network/MySQL)
+"""
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.market_data import HistoricalData, DataUpdateLog
+from app.services.ingestion_service import IngestionScheduler, FakeMarketDataSource
+
+def make_session():
+    """Fresh in-memory database with the market data tables"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # Tables only: SQLite index names are global and the MySQL models reuse them
+    with engine.begin() as conn:
+        for table in (HistoricalData.__table__, DataUpdateLog.__table__):
+            conn.execute(CreateTable(table))
+    return sessionmaker(bind=engine)()
+
+def run_scenario(label: str, symbols, timeframes, days_back: int, **options) -> dict:
+    db = make_session()
+    source = FakeMarketDataSource(
+        latency=options.pop("latency"),
+        failure_rate=options.pop("failure_rate"),
+        max_batch_size=options.pop("max_batch_size"),
+        rate_per_second=options.pop("rate_per_second"),
+        burst=options.pop("burst"),
+        seed=42
+    )
+    scheduler = IngestionScheduler(db, source=source, backoff_base=0.01, materialize_indicators=False, **options)
+
+    start = time.perf_counter()
+    run = scheduler.run(symbols, timeframes, days_back=days_back)
+    seconds = time.perf_counter() - start
+
+    # Second pass resumes: every pair already logged, no requests expected
+    resumed = scheduler.run(symbols, timeframes, days_back=days_back,
+                            resume_from=datetime.now().replace(hour=0, minute=0, second=0))
+    db.close()
+
+    summary = run["summary"]
+    print(f"{label:<24}{seconds:>10.2f}{source.requests:>10}{summary['success']:>9}"
+          f"{summary['errors']:>8}{summary['records_saved']:>10}{resumed['summary']['requests']:>9}")
+    return {"seconds": seconds, "summary": summary}
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingestion Scheduler Benchmark")
+    parser.add_argument("--symbols", type=int, default=32, help="Number of symbols")
+    parser.add_argument("--timeframes", nargs="+", default=['1D', '1W', '1M'])
+    parser.add_argument("--days-back", type=int, default=730)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=10.0, help="Source requests per second")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=8)
+
+    args = parser.parse_args()
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    common = {"latency": args.latency, "failure_rate": args.failure_rate, "rate_per_second": args.rate}
+
+    print(f"{'mode':<24}{'time (s)':>10}{'requests':>10}{'success':>9}{'errors':>8}{'records':>10}{'resumed':>9}")
+    sequential = run_scenario("sequential", symbols, args.timeframes, args.days_back,
+                              max_batch_size=1, burst=1, max_workers=1, **common)
+    concurrent = run_scenario("concurrent+batched", symbols, args.timeframes, args.days_back,
+                              max_batch_size=args.batch_size, burst=args.workers,
+                              max_workers=args.workers, **common)
+
+    print(f"\nspeedup: {sequential['seconds'] / concurrent['seconds']:.1f}x "
+          f"(sequential excludes the old 1.5s/pair sleeps)")
+
+if __name__ == "__main__":
+    main()
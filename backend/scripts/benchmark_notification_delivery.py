@@ -0,0 +1,144 @@
+"""
+Benchmark Notification Delivery
+Unbounded create_task per notification (cara lama, satu send per channel per
+notification) vs DeliveryWorkerPool (Redis streams, per-channel workers,
+micro-batching, retry + dead-letter).
+
+Channels adalah stub sinks dengan latency per call dan connection limit
+(seperti SMTP/HTTP provider); --fail-rate membuat sebagian calls gagal untuk
+menguji retry. Default memakai fakeredis
+(in-process); --redis-url untuk Redis asli.
+"""
+import sys
+import time
+import random
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.delivery_queue import DeliveryChannel, DeliveryQueue, DeliveryWorkerPool
+
+CHANNELS = {
+    'email': {'batch_size': 50, 'concurrency': 4},
+    'push': {'batch_size': 100, 'concurrency': 4},
+    'webhook': {'batch_size': 200, 'concurrency': 2},
+}
+
+class StubSink:
+    """Fixed latency per call (+ kecil per event), gagal dengan probabilitas fail_rate"""
+
+    def __init__(self, call_latency: float, event_latency: float, fail_rate: float, connections: int, seed: int):
+        self.connections = asyncio.Semaphore(connections)
+        self.call_latency = call_latency
+        self.event_latency = event_latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.events = 0
+
+    async def send(self, events):
+        async with self.connections:
+            self.calls += 1
+            await asyncio.sleep(self.call_latency + self.event_latency * len(events))
+        if self.rng.random() < self.fail_rate:
+            raise ConnectionError("stub sink unavailable")
+        self.events += len(events)
+
+def make_client(args):
+    if args.redis_url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(args.redis_url, decode_responses=True)
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+def make_sinks(args):
+    return {name: StubSink(args.call_latency, args.event_latency, args.fail_rate, args.sink_connections, seed=i)
+            for i, name in enumerate(CHANNELS)}
+
+async def run_legacy(args):
+    """Satu task per notification, channels dikirim berurutan, tanpa retry"""
+    sinks = make_sinks(args)
+
+    async def process(notification):
+        for name, sink in sinks.items():
+            try:
+                await sink.send([notification])
+            except Exception:
+                continue
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(process({'notification_id': i})) for i in range(args.notifications)]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    delivered = sum(sink.events for sink in sinks.values())
+    calls = sum(sink.calls for sink in sinks.values())
+    print(f"  legacy tasks  {elapsed:8.2f}s  {delivered / elapsed:9.1f} events/s  "
+          f"calls {calls}  delivered {delivered}/{args.notifications * len(sinks)}  peak tasks {len(tasks)}")
+
+async def run_pool(args):
+    client = make_client(args)
+    await client.delete(*[f"bench:delivery:{name}" for name in CHANNELS], "bench:delivery:retry", "bench:delivery:dead")
+    sinks = make_sinks(args)
+    channels = [DeliveryChannel(name, sinks[name].send, **options) for name, options in CHANNELS.items()]
+    pool = DeliveryWorkerPool(
+        DeliveryQueue(client, prefix="bench:delivery"),
+        channels,
+        max_attempts=args.max_attempts,
+        backoff_base=args.backoff,
+        backoff_max=args.backoff * 4,
+        block_ms=50,
+        retry_poll_interval=0.05
+    )
+
+    started = time.perf_counter()
+    for offset in range(0, args.notifications, 1000):
+        items = [(name, {'notification_id': i})
+                 for i in range(offset, min(offset + 1000, args.notifications)) for name in CHANNELS]
+        await pool.enqueue_many(items)
+    enqueued = time.perf_counter() - started
+
+    expected = args.notifications * len(CHANNELS)
+    deadline = time.perf_counter() + args.timeout
+    settled = lambda: sum(m.delivered + m.dead for m in pool.metrics.values())
+    while settled() < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.02)
+    elapsed = time.perf_counter() - started
+    stats = await pool.get_stats()
+    await pool.stop()
+
+    delivered = sum(m.delivered for m in pool.metrics.values())
+    calls = sum(sink.calls for sink in sinks.values())
+    print(f"  worker pool   {elapsed:8.2f}s  {delivered / elapsed:9.1f} events/s  "
+          f"calls {calls}  delivered {delivered}/{expected}  enqueue {enqueued:.2f}s  "
+          f"dead {stats['queue'].get('dead', '?')}")
+    for name, channel in stats['channels'].items():
+        print(f"    {name:8s} batches {channel['batches']:6d}  avg batch {channel['avg_batch_size']:7.1f}  "
+              f"retried {channel['retried']:5d}  p50 {channel['latency_p50_ms']:9.1f}ms  "
+              f"p99 {channel['latency_p99_ms']:9.1f}ms")
+
+async def main_async(args):
+    print(f"{args.notifications} notifications x {len(CHANNELS)} channels, "
+          f"call {args.call_latency * 1000:.0f}ms + {args.event_latency * 1000:.2f}ms/event, "
+          f"fail rate {args.fail_rate:.0%}, {args.sink_connections} connections per sink")
+    await run_legacy(args)
+    await run_pool(args)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Notification Delivery Benchmark")
+    parser.add_argument("--notifications", type=int, default=10000)
+    parser.add_argument("--call-latency", type=float, default=0.05, help="Simulated seconds per send call")
+    parser.add_argument("--event-latency", type=float, default=0.0001, help="Simulated seconds per event in a call")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--sink-connections", type=int, default=8, help="Concurrent calls allowed per sink")
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--backoff", type=float, default=0.1, help="Retry backoff base seconds")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--redis-url", default=None)
+
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
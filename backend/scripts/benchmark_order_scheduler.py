@@ -0,0 +1,109 @@
+"""
+Benchmark Order Scheduler
+10k pending orders: list + sort per order + pop(0) + sleep(0.1) (cara lama)
+vs OrderScheduler (priority heap, per-symbol queues, batched flush per tick).
+
+Execution dan DB flush disimulasikan dengan asyncio.sleep (tanpa MySQL).
+"""
+import sys
+import time
+import asyncio
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.order_scheduler import OrderScheduler
+
+ORDER_TYPES = {'market': 100, 'stop': 80, 'limit': 60}
+
+def make_orders(count: int, symbols: int, seed: int = 42):
+    rng = random.Random(seed)
+    orders = []
+    for i in range(count):
+        order_type = rng.choice(list(ORDER_TYPES))
+        quantity = rng.choice([100, 500, 2000])
+        priority = ORDER_TYPES[order_type] + (20 if quantity > 1000 else 10 if quantity > 100 else 0)
+        orders.append({'order_id': i, 'symbol': f"SYM{rng.randrange(symbols):03d}",
+                       'order_type': order_type, 'quantity': quantity, 'priority': priority})
+    return orders
+
+async def run_legacy(orders, drain_count: int, execute_latency: float, flush_latency: float):
+    """Enqueue semua dengan sort per order, lalu drain drain_count orders serial (pop(0) + sleep(0.1))"""
+    queue = []
+    started = time.perf_counter()
+    for order in orders:
+        queue.append(dict(order, enqueued_at=time.perf_counter()))
+        queue.sort(key=lambda x: x['priority'], reverse=True)
+    enqueue_seconds = time.perf_counter() - started
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(min(drain_count, len(queue))):
+        order = queue.pop(0)
+        latencies.append(time.perf_counter() - order['enqueued_at'])
+        await asyncio.sleep(execute_latency)
+        await asyncio.sleep(flush_latency)  # commit per order
+        await asyncio.sleep(0.1)
+    return enqueue_seconds, time.perf_counter() - started, latencies
+
+async def run_scheduler(orders, execute_latency: float, flush_latency: float, concurrency: int, tick: float):
+    flushes = []
+
+    async def execute(task):
+        await asyncio.sleep(execute_latency)
+        return {'success': True}
+
+    async def flush(batch):
+        flushes.append(len(batch))
+        await asyncio.sleep(flush_latency)  # satu commit per tick
+
+    scheduler = OrderScheduler(execute, flush, max_concurrency=concurrency, tick_interval=tick)
+    started = time.perf_counter()
+    for order in orders:
+        scheduler.submit(order['order_id'], order['symbol'], order, order['priority'])
+    enqueue_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await scheduler.drain()
+    return enqueue_seconds, time.perf_counter() - started, scheduler.get_stats(), flushes
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+async def main_async(args):
+    orders = make_orders(args.orders, args.symbols)
+    print(f"{args.orders} pending orders, {args.symbols} symbols, "
+          f"execute {args.execute_latency * 1000:.1f}ms, flush {args.flush_latency * 1000:.1f}ms")
+
+    enqueue, seconds, latencies = await run_legacy(orders, args.legacy_orders, args.execute_latency, args.flush_latency)
+    rate = len(latencies) / seconds
+    print(f"  legacy list   enqueue {enqueue:8.3f}s  drain {seconds:8.2f}s  {rate:8.1f} orders/s  "
+          f"(first {len(latencies)} orders; full drain ~{args.orders / rate:.0f}s)")
+
+    for concurrency in sorted({1, args.concurrency}):
+        enqueue, seconds, stats, flushes = await run_scheduler(
+            orders, args.execute_latency, args.flush_latency, concurrency, args.tick
+        )
+        print(f"  scheduler c={concurrency:<2d} enqueue {enqueue:8.3f}s  drain {seconds:8.2f}s  "
+              f"{args.orders / seconds:8.1f} orders/s  "
+              f"p50 {stats['queue_latency_p50_ms']:9.1f}ms  p99 {stats['queue_latency_p99_ms']:9.1f}ms  "
+              f"flushes {len(flushes)} (avg {stats['avg_flush_size']})")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Order Scheduler Benchmark")
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tick", type=float, default=0.05)
+    parser.add_argument("--execute-latency", type=float, default=0.002, help="Simulated execution seconds")
+    parser.add_argument("--flush-latency", type=float, default=0.005, help="Simulated commit seconds")
+    parser.add_argument("--legacy-orders", type=int, default=50, help="Orders drained by the legacy loop")
+
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
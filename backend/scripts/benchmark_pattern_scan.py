@@ -0,0 +1,88 @@
+"""
+Benchmark Pattern Scan
+Universe scan symbols x timeframes dari bar store: per-detector find_peaks
+(cara lama) vs shared extrema, lalu 1 worker vs process pool.
+
+Default membuat synthetic bar store di temp directory; --path untuk store asli.
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from app.core.bar_store import BarStore
+from app.services import pattern_service
+from app.services.pattern_service import PatternRecognitionService
+
+def build_store(path: str, symbols: int, bars: int) -> BarStore:
+    store = BarStore(path)
+    rng = np.random.default_rng(42)
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=bars, name='timestamp')
+    for i in range(symbols):
+        close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        store.write(f"SYM{i:03d}", '1D', pd.DataFrame({
+            'timestamp': index,
+            'open': close,
+            'high': close * (1 + rng.uniform(0, 0.02, bars)),
+            'low': close * (1 - rng.uniform(0, 0.02, bars)),
+            'close': close,
+            'volume': rng.integers(100000, 1000000, bars).astype(float)
+        }))
+    return store
+
+def run(args, path: str):
+    if args.path is None:
+        build_store(path, args.symbols, args.bars)
+    pattern_service.get_bar_store = lambda: BarStore(path)
+
+    service = PatternRecognitionService(None)
+    store = BarStore(path)
+    symbols = store.symbols('1D')
+    frames = [store.to_frame(b) for b in store.load_bars(symbols, '1D').values()]
+
+    # Per-detector extrema (setiap detector memanggil find_peaks sendiri)
+    started = time.perf_counter()
+    for df in frames:
+        for pattern_type, pattern_info in service.patterns.items():
+            service._detect_specific_pattern(df, pattern_type, pattern_info)
+    per_detector = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for df in frames:
+        service._detect_patterns_for_timeframe(df, '1D')
+    shared = time.perf_counter() - started
+
+    print(f"{len(frames)} symbols x {args.bars} bars")
+    print(f"  per-detector extrema  {per_detector:8.2f}s")
+    print(f"  shared extrema        {shared:8.2f}s")
+
+    for workers in (1, args.workers):
+        started = time.perf_counter()
+        results = list(service.scan_symbols(symbols, ['1D'], max_workers=workers))
+        elapsed = time.perf_counter() - started
+        patterns = sum(r['total_patterns'] for r in results)
+        print(f"  scan_symbols workers={workers:<3d} {elapsed:8.2f}s  ({len(results)} symbols, {patterns} patterns)")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pattern Scan Benchmark")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=260)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--path", help="Existing bar store (default: synthetic temp store)")
+
+    args = parser.parse_args()
+    if args.path:
+        run(args, args.path)
+    else:
+        with tempfile.TemporaryDirectory() as path:
+            run(args, path)
+
+if __name__ == "__main__":
+    main()
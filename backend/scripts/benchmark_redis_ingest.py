@@ -0,0 +1,110 @@
+"""
+Benchmark Redis Tick Ingestion
+Publish ticks ke ticks:<SYMBOL> dan market_data_updates, lalu ukur
+throughput RedisTickSubscriber -> PriceBroadcaster.
+
+Default memakai fakeredis (in-process); --redis-url untuk Redis asli.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.websocket.price_broadcaster import PriceBroadcaster
+from app.websocket.redis_ingest import RedisTickSubscriber, TICK_CHANNEL_PREFIX
+
+class CountingServer:
+    """Stand-in Socket.IO server: counts emits, no transport"""
+
+    def __init__(self):
+        self.emits = 0
+
+    async def enter_room(self, sid, room):
+        pass
+
+    async def leave_room(self, sid, room):
+        pass
+
+    async def emit(self, event, data, room=None, skip_sid=None):
+        self.emits += 1
+
+def make_client(args):
+    if args.redis_url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(args.redis_url, decode_responses=True)
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+async def run(args):
+    client = make_client(args)
+    sio = CountingServer()
+    broadcaster = PriceBroadcaster(sio, fetch_prices=lambda symbols: {}, flush_interval=args.flush_interval)
+    subscriber = RedisTickSubscriber(client, broadcaster, batch_size=args.batch_size, max_pending=args.max_pending)
+
+    rng = random.Random(42)
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    for i, symbol in enumerate(symbols):
+        await broadcaster.subscribe(f"client-{i}", symbol)
+
+    await broadcaster.start(poll=False)
+    task = asyncio.create_task(subscriber.run())
+    while not subscriber.connected:
+        await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    pipe = client.pipeline(transaction=False)
+    for i in range(args.ticks):
+        symbol = rng.choice(symbols)
+        tick = {"price": 1000 + rng.random(), "volume": rng.randint(1, 1000)}
+        if i % 10 == 0:
+            # Legacy channel: symbol ada di payload
+            pipe.publish('market_data_updates', json.dumps({"symbol": symbol, **tick}))
+        else:
+            pipe.publish(f"{TICK_CHANNEL_PREFIX}{symbol}", json.dumps(tick))
+        if (i + 1) % 1000 == 0:
+            await pipe.execute()
+            pipe = client.pipeline(transaction=False)
+    await pipe.execute()
+    published = time.perf_counter() - started
+
+    handled = lambda: subscriber.metrics["decoded"] + subscriber.metrics["invalid"] + subscriber.metrics["dropped"]
+    deadline = time.perf_counter() + args.timeout
+    while handled() < args.ticks and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(args.flush_interval * 2)
+
+    subscriber.stop()
+    await task
+    await broadcaster.stop()
+
+    metrics = subscriber.get_metrics()
+    print(f"{args.ticks} ticks over {args.symbols} symbols (batch_size={args.batch_size}, max_pending={args.max_pending})")
+    print(f"  publish time      {published:8.2f}s")
+    print(f"  ingest time       {elapsed:8.2f}s  ({metrics['decoded'] / elapsed:,.0f} ticks/s)")
+    print(f"  socket.io emits   {sio.emits:8d}")
+    for key in ("received", "decoded", "invalid", "dropped", "broadcast", "batches", "reader_pauses", "max_buffered"):
+        print(f"  {key:<17} {metrics[key]:8d}")
+    print(f"  coalesced         {metrics['broadcaster']['coalesced']:8d}")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Redis Tick Ingestion Benchmark")
+    parser.add_argument("--ticks", type=int, default=50000)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-pending", type=int, default=10000)
+    parser.add_argument("--flush-interval", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--redis-url", help="Use a real Redis server instead of fakeredis")
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark Sentiment Models
+Per-text inference (cara lama, satu pipeline call per text per symbol) vs
+SentimentModelRegistry (micro-batched inference + score cache per text hash).
+
+Default memakai stub model dengan fixed overhead per call + cost per text
+(seperti CPU forward pass); --model-path untuk local transformers weights
+(mis. ProsusAI/finbert). Headlines di-share antar symbols seperti market
+news yang menyebut banyak tickers.
+"""
+import sys
+import time
+import random
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.sentiment_models import MicroBatcher, SentimentModelRegistry
+
+LABELS = ('positive', 'negative', 'neutral')
+
+class StubModel:
+    """Blocking batch call: call_latency + text_latency per text"""
+
+    def __init__(self, call_latency: float, text_latency: float):
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self.calls = 0
+        self.texts = 0
+
+    def predict(self, texts):
+        time.sleep(self.call_latency + self.text_latency * len(texts))
+        return [{'label': LABELS[hash(text) % 3], 'score': 0.9} for text in texts]
+
+    def __call__(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return self.predict(texts)
+
+class PipelineModel(StubModel):
+    """Local transformers weights, dihitung sama seperti StubModel"""
+
+    def __init__(self, path: str, batch_size: int):
+        super().__init__(0.0, 0.0)
+        from transformers import pipeline
+        self.pipe = pipeline("sentiment-analysis", model=path, tokenizer=path, device=-1)
+        self.batch_size = batch_size
+
+    def predict(self, texts):
+        outputs = self.pipe([text[:512] for text in texts], batch_size=self.batch_size, truncation=True)
+        return [{'label': output['label'], 'score': float(output['score'])} for output in outputs]
+
+def make_workload(args):
+    rng = random.Random(args.seed)
+    headlines = [f"Headline {i}: sector update mentions several listed companies" for i in range(args.headlines)]
+    return {
+        f"SYM{s:03d}": rng.sample(headlines, min(args.articles, len(headlines)))
+        for s in range(args.symbols)
+    }
+
+def make_model(args) -> StubModel:
+    if args.model_path:
+        return PipelineModel(args.model_path, args.batch_size)
+    return StubModel(args.call_latency, args.text_latency)
+
+async def run_legacy(args, workload):
+    """Satu call per text, symbols diproses concurrent tetapi model dipanggil per text"""
+    model = make_model(args)
+    loop = asyncio.get_running_loop()
+
+    async def analyze(texts):
+        return [(await loop.run_in_executor(None, model, [text]))[0] for text in texts]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(analyze(texts) for texts in workload.values()))
+    elapsed = time.perf_counter() - started
+    total = sum(len(texts) for texts in workload.values())
+    print(f"  per-text      {elapsed:8.2f}s  {total / elapsed:9.1f} texts/s  "
+          f"model calls {model.calls}  texts scored {model.texts}")
+
+async def run_registry(args, workload):
+    model = make_model(args)
+    registry = SentimentModelRegistry({}, batch_size=args.batch_size,
+                                      batch_wait=args.batch_wait_ms / 1000.0, cache_size=100000)
+    registry._models['finbert'] = MicroBatcher(model, args.batch_size, args.batch_wait_ms / 1000.0,
+                                               executor=registry._executor)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(registry.predict('finbert', texts) for texts in workload.values()))
+    elapsed = time.perf_counter() - started
+    total = sum(len(texts) for texts in workload.values())
+    batcher = registry.get_stats()['batchers']['finbert']
+    print(f"  registry      {elapsed:8.2f}s  {total / elapsed:9.1f} texts/s  "
+          f"model calls {model.calls}  texts scored {model.texts}  "
+          f"avg batch {batcher['avg_batch_size']:.1f}  cache {registry.cache.get_stats()}")
+
+async def main_async(args):
+    workload = make_workload(args)
+    total = sum(len(texts) for texts in workload.values())
+    print(f"{args.symbols} symbols x {args.articles} articles ({total} texts, "
+          f"{args.headlines} unique headlines), batch {args.batch_size}")
+    await run_legacy(args, workload)
+    await run_registry(args, workload)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sentiment Model Benchmark")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--articles", type=int, default=20, help="Articles per symbol")
+    parser.add_argument("--headlines", type=int, default=500, help="Unique headlines shared across symbols")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-wait-ms", type=float, default=10.0)
+    parser.add_argument("--call-latency", type=float, default=0.02, help="Stub seconds per model call")
+    parser.add_argument("--text-latency", type=float, default=0.002, help="Stub seconds per text in a call")
+    parser.add_argument("--model-path", default=None, help="Local transformers weights instead of the stub")
+    parser.add_argument("--seed", type=int, default=7)
+
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Load Test Price Broadcaster
+Simulasi ribuan Socket.IO clients terhadap PriceBroadcaster.
+
+Memakai socketio.AsyncServer asli (rooms, packet encoding, emit) dengan
+Engine.IO layer in-memory: setiap client punya outgoing queue seperti
+engineio AsyncSocket. Emit latency = jadwal tick -> packet masuk ke queue
+client. Fast clients langsung men-drain queue; slow clients men-drain satu
+packet per slow_delay sehingga backlog mereka tumbuh.
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import socketio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.websocket.price_broadcaster import PriceBroadcaster
+
+class SimulatedClient:
+    """Client transport: outgoing queue plus latency log"""
+
+    def __init__(self, delay: float):
+        self.queue = asyncio.Queue()
+        self.delay = delay
+        self.latencies: List[float] = []
+
+    def receive(self, published_at: float):
+        self.latencies.append(time.perf_counter() - published_at)
+
+    async def drain(self):
+        """Slow client: take one packet per delay"""
+        while True:
+            await self.queue.get()
+            await asyncio.sleep(self.delay)
+
+class FakeEngineIO:
+    """Minimal Engine.IO server: per-client outgoing queues, no transport"""
+
+    def __init__(self):
+        self.sockets: Dict[str, SimulatedClient] = {}
+        self._decoded = {}
+
+    def generate_id(self) -> str:
+        return uuid.uuid4().hex
+
+    async def send_packet(self, eio_sid: str, pkt):
+        client = self.sockets.get(eio_sid)
+        if client is None:
+            return
+        # Packet yang sama di-share ke semua recipients satu emit: decode sekali
+        published_at = self._decoded.get(id(pkt))
+        if published_at is None:
+            published_at = json.loads(pkt.data[1:])[1]['published_at']
+            self._decoded = {id(pkt): published_at}
+        client.receive(published_at)
+        if client.delay:
+            await client.queue.put(pkt)
+
+async def run_scenario(mode: str, args) -> Dict:
+    sio = socketio.AsyncServer(async_mode='asgi', logger=False, engineio_logger=False)
+    sio.eio = FakeEngineIO()
+    broadcaster = PriceBroadcaster(sio, fetch_prices=lambda symbols: {},
+                                   flush_interval=args.flush_interval, max_backlog=args.max_backlog)
+
+    rng = random.Random(42)
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    weights = [1 / (i + 1) for i in range(args.symbols)]  # popular symbols punya banyak subscriber
+
+    clients = []
+    for i in range(args.clients):
+        eio_sid = sio.eio.generate_id()
+        client = SimulatedClient(args.slow_delay if i < args.clients * args.slow_fraction else 0.0)
+        sio.eio.sockets[eio_sid] = client
+        clients.append(client)
+        sid = await sio.manager.connect(eio_sid, '/')
+        for symbol in set(rng.choices(symbols, weights=weights, k=args.subscriptions)):
+            await broadcaster.subscribe(sid, symbol)
+
+    consumers = [asyncio.create_task(client.drain()) for client in clients if client.delay]
+    if mode == "broadcaster":
+        await broadcaster.start(poll=False)
+
+    # Producer: ticks spread over the run, bursty per symbol
+    ticks = int(args.tick_rate * args.duration)
+    started = time.perf_counter()
+    for i in range(ticks):
+        symbol = rng.choices(symbols, weights=weights)[0]
+        # Latency dihitung dari jadwal tick, jadi producer yang tertahan ikut terukur
+        scheduled = started + i / args.tick_rate
+        payload = {"symbol": symbol, "price": 1000 + rng.random(), "published_at": scheduled}
+        if mode == "broadcaster":
+            broadcaster.publish(symbol, payload)
+        else:
+            # Legacy: setiap tick langsung di-emit ke list sid subscriber
+            sids = list(broadcaster.symbol_clients.get(symbol, ()))
+            if sids:
+                await sio.emit('price_update', payload, room=sids)
+        await asyncio.sleep(max(0.0, started + (i + 1) / args.tick_rate - time.perf_counter()))
+
+    # Let the last flush go out
+    await asyncio.sleep(args.flush_interval * 2)
+    elapsed = time.perf_counter() - started
+
+    await broadcaster.stop()
+    for task in consumers:
+        task.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+    fast = np.array([l for c in clients if not c.delay for l in c.latencies]) * 1000
+    slow = np.array([l for c in clients if c.delay for l in c.latencies]) * 1000
+    return {
+        "mode": mode,
+        "ticks": ticks,
+        "emits": broadcaster.stats["emitted"] if mode == "broadcaster" else ticks,
+        "deliveries": len(fast) + len(slow),
+        "dropped": broadcaster.stats["dropped"],
+        "coalesced": broadcaster.stats["coalesced"],
+        "fast": fast,
+        "slow": slow,
+        "max_backlog": max(c.queue.qsize() for c in clients),
+        "elapsed": elapsed
+    }
+
+def percentiles(values: np.ndarray) -> str:
+    if not len(values):
+        return "-"
+    p50, p99 = np.percentile(values, [50, 99])
+    return f"{p50:8.1f} {p99:9.1f}"
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Price Broadcaster Load Test")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--subscriptions", type=int, default=5, help="Symbols per client")
+    parser.add_argument("--tick-rate", type=float, default=500.0, help="Ticks per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of ticks")
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="Seconds a slow client spends per message")
+    parser.add_argument("--flush-interval", type=float, default=0.1)
+    parser.add_argument("--max-backlog", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "broadcaster"])
+
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.symbols} symbols, {args.subscriptions} subs/client, "
+          f"{args.tick_rate:.0f} ticks/s for {args.duration:.0f}s, {args.slow_fraction:.0%} slow clients\n")
+    print(f"{'mode':<12}{'ticks':>7}{'emits':>8}{'delivered':>11}{'dropped':>9}{'backlog':>9}"
+          f"{'fast p50':>10}{'p99 (ms)':>10}{'slow p50':>10}{'p99 (ms)':>10}{'time (s)':>10}")
+    for mode in args.modes:
+        r = asyncio.run(run_scenario(mode, args))
+        print(f"{r['mode']:<12}{r['ticks']:>7}{r['emits']:>8}{r['deliveries']:>11}{r['dropped']:>9}"
+              f"{r['max_backlog']:>9}  {percentiles(r['fast'])}  {percentiles(r['slow'])}{r['elapsed']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Migrate Sentiment Rollups
+Base.metadata.create_all tidak mengubah tabel yang sudah ada: script ini
+menambahkan sentiment_rollup_state.last_created_at (created_at watermark),
+membuang kolom last_id lama, membuat created_at indexes di news_sentiment /
+social_sentiment, lalu rebuild rollups dari raw rows. Idempotent.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import inspect, text
+
+from app.database import SessionLocal, engine
+from app.core.sentiment_rollup import SentimentRollups
+from app.models.sentiment import NewsSentiment, SocialSentiment, SentimentRollupState
+
+def migrate_schema() -> list:
+    """Apply missing DDL; returns statements/actions yang dijalankan"""
+    applied = []
+    inspector = inspect(engine)
+    state_table = SentimentRollupState.__table__
+
+    if inspector.has_table(state_table.name):
+        columns = {column['name'] for column in inspector.get_columns(state_table.name)}
+        with engine.begin() as connection:
+            if 'last_created_at' not in columns:
+                column_type = state_table.c.last_created_at.type.compile(dialect=engine.dialect)
+                statement = f"ALTER TABLE {state_table.name} ADD COLUMN last_created_at {column_type} NULL"
+                connection.execute(text(statement))
+                applied.append(statement)
+            if 'last_id' in columns:
+                statement = f"ALTER TABLE {state_table.name} DROP COLUMN last_id"
+                connection.execute(text(statement))
+                applied.append(statement)
+    else:
+        state_table.create(engine)
+        applied.append(f"CREATE TABLE {state_table.name}")
+
+    for model in (NewsSentiment, SocialSentiment):
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            continue  # create_all membuat tabel baru lengkap dengan indexes
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if 'created_at' in index.columns and index.name not in existing:
+                index.create(engine, checkfirst=True)
+                applied.append(f"CREATE INDEX {index.name} ON {table.name} (created_at)")
+    return applied
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sentiment Rollup Schema Migration")
+    parser.add_argument("--no-rebuild", action="store_true",
+                        help="Skip rebuilding rollups (only safe on an empty sentiment_rollup)")
+    args = parser.parse_args()
+
+    for action in migrate_schema():
+        print(action)
+
+    if not args.no_rebuild:
+        # State tanpa last_created_at berarti rollup dari awal: rebuild agar
+        # rollup rows yang sudah ada tidak dihitung dua kali
+        db = SessionLocal()
+        try:
+            print(f"rebuild: {SentimentRollups(db).rebuild()}")
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Sync Bar Store
+Mengisi columnar bar store secara incremental dari historical_data
+(dan opsional historical_ohlcv_daily), lalu mengukur load_bars
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import SessionLocal
+from app.config import settings
+from app.core.bar_store import BarStore
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Columnar Bar Store Sync")
+    parser.add_argument("--timeframes", nargs="+", default=['1D', '1W', '1M'])
+    parser.add_argument("--symbols", nargs="+", default=None, help="Default: every symbol in the table")
+    parser.add_argument("--path", default=settings.BAR_STORE_PATH)
+    parser.add_argument("--ohlcv-daily", action="store_true",
+                        help="Also sync historical_ohlcv_daily into timeframe 1D")
+
+    args = parser.parse_args()
+    store = BarStore(args.path)
+
+    db = SessionLocal()
+    try:
+        for timeframe in args.timeframes:
+            start = time.perf_counter()
+            result = store.sync_from_db(db, timeframe, args.symbols)
+            print(f"historical_data {timeframe}: {result['rows']} rows for {result['symbols']} symbols "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+        if args.ohlcv_daily:
+            start = time.perf_counter()
+            result = store.sync_from_ohlcv_daily(db.connection().connection, args.symbols)
+            print(f"historical_ohlcv_daily: {result['rows']} rows for {result['symbols']} symbols "
+                  f"in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+    for timeframe in args.timeframes:
+        symbols = store.symbols(timeframe)
+        start = time.perf_counter()
+        bars = store.load_bars(symbols, timeframe)
+        rows = sum(len(b['close']) for b in bars.values())
+        print(f"load_bars {timeframe}: {len(bars)} symbols, {rows} bars in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Indonesia Kulamagi Strategy - Momentum Panel Screener
+Cross-sectional momentum screening di atas satu date x symbol close matrix
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bars back untuk 1M/3M/6M performance (sama dengan iloc[-30], iloc[-90], iloc[-180])
+LOOKBACKS = {'1m': 30, '3m': 90, '6m': 180}
+
+# EMA spans yang dipakai market condition dan breakout analysis
+EMA_SPANS = (10, 20)
+
+class MomentumPanel:
+    """
+    Momentum panel untuk seluruh universe.
+
+    Semua symbol di-align ke satu date index (union dari trading dates).
+    Row untuk date D berisi bar terakhir setiap symbol dengan date <= D,
+    jadi hasilnya sama dengan df[df['date'] <= D] per symbol. 1M/3M/6M
+    performance dihitung sekali sebagai shifted array ops per symbol;
+    screen(D) hanya melakukan satu row lookup (O(symbols)).
+
+    Panel yang sama juga menjawab "data sampai D" untuk time-lapse tests:
+    bars[row, j] adalah integer offset (searchsorted) ke frame symbol,
+    sehingga frame_upto() cukup iloc[:n] tanpa boolean mask. EMA columns
+    dihitung sekali di full series; EWM kausal, jadi nilainya sama dengan
+    menghitung ulang di setiap prefix.
+    """
+
+    def __init__(self, symbols_data: Dict[str, pd.DataFrame], ema_spans=EMA_SPANS):
+        frames = {
+            symbol: df.sort_values('date').reset_index(drop=True)
+            for symbol, df in symbols_data.items()
+            if df is not None and len(df) > 0
+        }
+        self.source = symbols_data
+        self.symbols = list(frames.keys())
+        self.columns = {symbol: j for j, symbol in enumerate(self.symbols)}
+        self.frames = frames
+
+        symbol_dates = {
+            symbol: pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+            for symbol, df in frames.items()
+        }
+        if symbol_dates:
+            self.dates = np.unique(np.concatenate(list(symbol_dates.values())))
+        else:
+            self.dates = np.array([], dtype='datetime64[ns]')
+
+        shape = (len(self.dates), len(self.symbols))
+        self.close = np.full(shape, np.nan)
+        self.bars = np.zeros(shape, dtype=np.int64)  # jumlah bar tersedia sampai date
+        self.bar_dates = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.performance = {name: np.zeros(shape) for name in LOOKBACKS}
+        self.ema = {span: np.full(shape, np.nan) for span in ema_spans}
+
+        for j, (symbol, df) in enumerate(frames.items()):
+            dates = symbol_dates[symbol]
+            df['close'] = pd.to_numeric(df['close'], errors='coerce').astype(float)
+            close = df['close'].to_numpy()
+            performance = self._symbol_performance(close)
+            for span in ema_spans:
+                df[f'ema_{span}'] = df['close'].ewm(span=span).mean()
+
+            # Bar index per panel date: bar terakhir dengan date <= panel date
+            position = np.searchsorted(dates, self.dates, side='right') - 1
+            valid = position >= 0
+            rows = position[valid]
+
+            self.close[valid, j] = close[rows]
+            self.bars[:, j] = position + 1
+            self.bar_dates[valid, j] = dates[rows]
+            for name, values in performance.items():
+                self.performance[name][valid, j] = values[rows]
+            for span in ema_spans:
+                self.ema[span][valid, j] = df[f'ema_{span}'].to_numpy()[rows]
+
+        logger.info(f"📊 Momentum panel: {len(self.symbols)} symbols x {len(self.dates)} dates")
+
+    @staticmethod
+    def _symbol_performance(close: np.ndarray) -> Dict[str, np.ndarray]:
+        """Performance per bar; 0 jika history kurang atau harga lama <= 0"""
+        n = len(close)
+        performance = {}
+        for name, lookback in LOOKBACKS.items():
+            values = np.zeros(n)
+            if n >= lookback:
+                current = close[lookback - 1:]
+                previous = close[:n - lookback + 1]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values[lookback - 1:] = np.where(previous > 0, current / previous - 1, 0.0)
+            performance[name] = values
+        return performance
+
+    def row_index(self, date: Optional[Union[str, pd.Timestamp]] = None) -> int:
+        """Panel row untuk as-of date (None = latest); -1 jika sebelum data pertama"""
+        if date is None:
+            return len(self.dates) - 1
+        return int(np.searchsorted(self.dates, pd.Timestamp(date).to_datetime64(), side='right')) - 1
+
+    def sessions(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DatetimeIndex:
+        """Trading sessions (dates dengan minimal satu bar) dalam [start, end]"""
+        lo = 0 if start is None else np.searchsorted(self.dates, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, pd.Timestamp(end).to_datetime64(), side='right')
+        return pd.DatetimeIndex(self.dates[lo:hi])
+
+    def bars_upto(self, symbol: str, date: Optional[Union[str, pd.Timestamp]] = None) -> int:
+        """Jumlah bar symbol dengan date <= date (0 jika symbol tidak ada)"""
+        j = self.columns.get(symbol)
+        row = self.row_index(date)
+        if j is None or row < 0:
+            return 0
+        return int(self.bars[row, j])
+
+    def frame_upto(self, symbol: str, date: Optional[Union[str, pd.Timestamp]] = None) -> pd.DataFrame:
+        """Frame symbol sampai date (positional slice, setara df[df['date'] <= date])"""
+        return self.frames[symbol].iloc[:self.bars_upto(symbol, date)]
+
+    def close_upto(self, symbol: str, date: Optional[Union[str, pd.Timestamp]] = None) -> Optional[float]:
+        """Close terakhir symbol sampai date (None jika belum ada bar)"""
+        if not self.bars_upto(symbol, date):
+            return None
+        return float(self.close[self.row_index(date), self.columns[symbol]])
+
+    def above_ema(self, date: Optional[Union[str, pd.Timestamp]] = None, span: int = 20, min_bars: int = 20) -> Dict:
+        """Jumlah symbols dengan close > EMA(span) as of date (symbols dengan >= min_bars)"""
+        row = self.row_index(date)
+        if row < 0:
+            return {"favorable_count": 0, "total_count": 0}
+        eligible = self.bars[row] >= min_bars
+        above = eligible & (self.close[row] > self.ema[span][row])
+        return {"favorable_count": int(above.sum()), "total_count": int(eligible.sum())}
+
+    def snapshot(self, date: Optional[Union[str, pd.Timestamp]] = None) -> pd.DataFrame:
+        """Close, bars dan 1M/3M/6M performance semua symbols as of date"""
+        row = self.row_index(date)
+        if row < 0:
+            return pd.DataFrame(columns=['close', 'bars'] + [f'performance_{name}' for name in LOOKBACKS])
+        return pd.DataFrame({
+            'close': self.close[row],
+            'bars': self.bars[row],
+            **{f'performance_{name}': values[row] for name, values in self.performance.items()}
+        }, index=pd.Index(self.symbols, name='symbol'))
+
+    def screen(self,
+               date: Optional[Union[str, pd.Timestamp]] = None,
+               min_performance_1m: float = 0.10,
+               min_performance_3m: float = 0.20,
+               min_performance_6m: float = 0.30,
+               min_total_performance: Optional[float] = None,
+               min_bars: int = 30,
+               limit: Optional[int] = None) -> List[Dict]:
+        """
+        Momentum candidates as of date (None = bar terakhir setiap symbol),
+        diurutkan berdasarkan total_performance (1m + 3m + 6m, opsional
+        minimum min_total_performance).
+        """
+        row = self.row_index(date)
+        if row < 0 or not self.symbols:
+            return []
+
+        p1m = self.performance['1m'][row]
+        p3m = self.performance['3m'][row]
+        p6m = self.performance['6m'][row]
+        selected = np.flatnonzero(
+            (self.bars[row] >= min_bars) &
+            (p1m >= min_performance_1m) &
+            (p3m >= min_performance_3m) &
+            (p6m >= min_performance_6m)
+        )
+
+        total = p1m + p3m + p6m
+        if min_total_performance is not None:
+            selected = selected[total[selected] >= min_total_performance]
+        selected = selected[np.argsort(-total[selected], kind='stable')]
+        if limit is not None:
+            selected = selected[:limit]
+
+        as_of = pd.Timestamp(date).strftime('%Y-%m-%d') if date is not None else None
+        return [
+            {
+                "symbol": self.symbols[j],
+                "current_price": float(self.close[row, j]),
+                "performance_1m": float(p1m[j]),
+                "performance_3m": float(p3m[j]),
+                "performance_6m": float(p6m[j]),
+                "total_performance": float(total[j]),
+                "date": as_of or pd.Timestamp(self.bar_dates[row, j]).strftime('%Y-%m-%d')
+            }
+            for j in selected
+        ]
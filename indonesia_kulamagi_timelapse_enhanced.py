@@ -9,17 +9,36 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 import json
+from indonesia_kulamagi_momentum_panel import MomentumPanel
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Default (relaxed) criteria; criteria variants override subsets of these keys
+DEFAULT_CRITERIA = {
+    'favorable_threshold': 0.6,       # 60% of symbols above EMA 20
+    'momentum_1m_min': 0.05,          # 5% for 1 month
+    'momentum_3m_min': 0.10,          # 10% for 3 months
+    'momentum_6m_min': 0.15,          # 15% for 6 months
+    'total_performance_min': None,    # 1m + 3m + 6m minimum (None = no extra filter)
+    'momentum_leg_min': 10,           # % move over 10 bars
+    'momentum_leg_max': 50,
+    'consolidation_range_max': 30,    # % high-low range
+    'volume_decline_max': 0.9,        # last 5 / first 5 volume ratio
+    'breakout_volume_min': 1.1,
+    'breakout_confirmation_days': 5,
+    'risk_per_trade': 0.01,           # 1% risk per trade
+    'max_position_size': 0.1          # 10% max position
+}
+
 class IndonesiaKulamagiTimeLapseEnhanced:
     """
     Enhanced Time Lapse Testing untuk strategi Christian Kulamagi
     """
     
-    def __init__(self, host='localhost', user='root', password='', database='scalper'):
+    def __init__(self, host='localhost', user='root', password='', database='scalper',
+                 criteria: Optional[Dict[str, Any]] = None):
         self.host = host
         self.user = user
         self.password = password
@@ -27,8 +46,9 @@ class IndonesiaKulamagiTimeLapseEnhanced:
         self.connection = None
         
         # Strategy parameters
-        self.risk_per_trade = 0.01  # 1% risk per trade
-        self.max_position_size = 0.1  # 10% max position
+        self.criteria = {**DEFAULT_CRITERIA, **(criteria or {})}
+        self.risk_per_trade = self.criteria['risk_per_trade']
+        self.max_position_size = self.criteria['max_position_size']
         self.initial_capital = 1000000  # 1M IDR
         
         # Time lapse parameters
@@ -48,6 +68,9 @@ class IndonesiaKulamagiTimeLapseEnhanced:
         self.max_drawdown = 0
         self.peak_value = self.initial_capital
         
+        # Momentum panel (date x symbol) untuk screening dan as-of lookups per tanggal
+        self.momentum_panel = None
+        
     def connect_database(self):
         """Connect to MySQL database"""
         try:
@@ -131,25 +154,14 @@ class IndonesiaKulamagiTimeLapseEnhanced:
         try:
             # Use a simple market condition based on available symbols
             # If most symbols are above their EMA 20, market is favorable
-            favorable_count = 0
-            total_count = 0
-            
-            for symbol, df in symbols_data.items():
-                if df is not None and len(df) >= 20:
-                    df_filtered = df[df['date'] <= date]
-                    if len(df_filtered) >= 20:
-                        df_filtered = self.calculate_emas(df_filtered, [20])
-                        current_price = df_filtered['close'].iloc[-1]
-                        ema_20 = df_filtered['ema_20'].iloc[-1]
-                        
-                        if current_price > ema_20:
-                            favorable_count += 1
-                        total_count += 1
+            counts = self.get_momentum_panel(symbols_data).above_ema(date, span=20, min_bars=20)
+            favorable_count = counts['favorable_count']
+            total_count = counts['total_count']
             
             if total_count > 0:
                 favorable_ratio = favorable_count / total_count
                 return {
-                    "market_favorable": favorable_ratio >= 0.6,  # 60% of symbols above EMA 20
+                    "market_favorable": favorable_ratio >= self.criteria['favorable_threshold'],
                     "favorable_ratio": favorable_ratio,
                     "favorable_count": favorable_count,
                     "total_count": total_count
@@ -161,79 +173,35 @@ class IndonesiaKulamagiTimeLapseEnhanced:
             logger.error(f"❌ Error checking market condition: {e}")
             return {"market_favorable": False, "reason": f"Error: {str(e)}"}
     
+    def get_momentum_panel(self, symbols_data: Dict[str, pd.DataFrame]) -> MomentumPanel:
+        """Momentum panel untuk symbols_data (dibangun sekali, dipakai ulang setiap tanggal)"""
+        if self.momentum_panel is None or self.momentum_panel.source is not symbols_data:
+            self.momentum_panel = MomentumPanel(symbols_data)
+        return self.momentum_panel
+    
     def screen_momentum_stocks_at_date(self, symbols_data: Dict[str, pd.DataFrame], date: str):
         """Screen momentum stocks at specific date"""
-        momentum_stocks = []
-        
-        for symbol, df in symbols_data.items():
-            if df is None or len(df) < 30:
-                continue
-            
-            try:
-                # Filter data up to the date
-                df_filtered = df[df['date'] <= date]
-                if len(df_filtered) < 30:
-                    continue
-                
-                # Calculate performance
-                current_price = df_filtered['close'].iloc[-1]
-                
-                # 1 month performance
-                if len(df_filtered) >= 30:
-                    price_1m_ago = df_filtered['close'].iloc[-30]
-                    performance_1m = (current_price / price_1m_ago - 1) if price_1m_ago > 0 else 0
-                else:
-                    performance_1m = 0
-                
-                # 3 months performance
-                if len(df_filtered) >= 90:
-                    price_3m_ago = df_filtered['close'].iloc[-90]
-                    performance_3m = (current_price / price_3m_ago - 1) if price_3m_ago > 0 else 0
-                else:
-                    performance_3m = 0
-                
-                # 6 months performance
-                if len(df_filtered) >= 180:
-                    price_6m_ago = df_filtered['close'].iloc[-180]
-                    performance_6m = (current_price / price_6m_ago - 1) if price_6m_ago > 0 else 0
-                else:
-                    performance_6m = 0
-                
-                # Check if meets momentum criteria (relaxed for testing)
-                if (performance_1m >= 0.05 and  # 5% for 1 month
-                    performance_3m >= 0.10 and  # 10% for 3 months
-                    performance_6m >= 0.15):    # 15% for 6 months
-                    
-                    momentum_stocks.append({
-                        "symbol": symbol,
-                        "current_price": current_price,
-                        "performance_1m": performance_1m,
-                        "performance_3m": performance_3m,
-                        "performance_6m": performance_6m,
-                        "total_performance": performance_1m + performance_3m + performance_6m,
-                        "date": date
-                    })
-                
-            except Exception as e:
-                logger.error(f"❌ Error processing {symbol} at {date}: {e}")
-                continue
-        
-        # Sort by total performance
-        momentum_stocks.sort(key=lambda x: x['total_performance'], reverse=True)
-        return momentum_stocks
+        return self.get_momentum_panel(symbols_data).screen(
+            date,
+            min_performance_1m=self.criteria['momentum_1m_min'],
+            min_performance_3m=self.criteria['momentum_3m_min'],
+            min_performance_6m=self.criteria['momentum_6m_min'],
+            min_total_performance=self.criteria['total_performance_min']
+        )
     
     def analyze_breakout_setup_at_date(self, symbol: str, df: pd.DataFrame, date: str):
         """Analyze breakout setup at specific date"""
         try:
-            # Filter data up to the date
-            df_filtered = df[df['date'] <= date]
+            # Data up to the date (integer offset; EMA columns sudah dihitung di panel)
+            panel = self.momentum_panel
+            if panel is not None and symbol in panel.columns and panel.source.get(symbol) is df:
+                df_filtered = panel.frame_upto(symbol, date)
+            else:
+                df_filtered = self.calculate_emas(df[df['date'] <= date].copy(), [10, 20])
             
             if len(df_filtered) < 50:
                 return {"setup_found": False, "reason": "Insufficient data"}
             
-            # Calculate EMAs
-            df_filtered = self.calculate_emas(df_filtered, [10, 20])
-            
             # Find momentum leg (recent strong move)
             recent_30_days = df_filtered.tail(30)
             momentum_leg = self._find_momentum_leg(recent_30_days)
@@ -277,7 +245,7 @@ class IndonesiaKulamagiTimeLapseEnhanced:
             end_price = df['close'].iloc[i]
             move_percent = (end_price / start_price - 1) * 100
             
-            if 10 <= move_percent <= 50:  # Relaxed criteria for testing
+            if self.criteria['momentum_leg_min'] <= move_percent <= self.criteria['momentum_leg_max']:
                 return {
                     "start_date": df['date'].iloc[i-10].strftime('%Y-%m-%d'),
                     "end_date": df['date'].iloc[i].strftime('%Y-%m-%d'),
@@ -305,13 +273,13 @@ class IndonesiaKulamagiTimeLapseEnhanced:
         range_percent = (high_price - low_price) / low_price * 100
         
         # Consolidation should be tight (relaxed for testing)
-        if range_percent > 30:
+        if range_percent > self.criteria['consolidation_range_max']:
             return None
         
         # Volume should be declining
         volume_trend = consolidation_data['volume'].iloc[-5:].mean() / consolidation_data['volume'].iloc[:5].mean()
         
-        if volume_trend > 0.9:  # Volume not declining enough
+        if volume_trend > self.criteria['volume_decline_max']:  # Volume not declining enough
             return None
         
         return {
@@ -329,7 +297,7 @@ class IndonesiaKulamagiTimeLapseEnhanced:
         consolidation_end_idx = df[df['date'] == consolidation_end_date].index[0]
         
         # Check next 5 days for breakout
-        breakout_data = df.iloc[consolidation_end_idx:consolidation_end_idx+5]
+        breakout_data = df.iloc[consolidation_end_idx:consolidation_end_idx+self.criteria['breakout_confirmation_days']]
         
         if len(breakout_data) < 2:
             return None
@@ -342,7 +310,7 @@ class IndonesiaKulamagiTimeLapseEnhanced:
             
             # Breakout: price above consolidation high + volume spike
             if (current_price > consolidation['high'] and 
-                current_volume > avg_volume * 1.1):  # Relaxed volume requirement
+                current_volume > avg_volume * self.criteria['breakout_volume_min']):
                 
                 return {
                     "date": breakout_data['date'].iloc[i].strftime('%Y-%m-%d'),
@@ -418,13 +386,11 @@ class IndonesiaKulamagiTimeLapseEnhanced:
     
     def update_positions(self, symbols_data: Dict[str, pd.DataFrame], date: str):
         """Update current prices of positions"""
+        panel = self.get_momentum_panel(symbols_data)
         for pos in self.positions:
-            if pos['symbol'] in symbols_data:
-                df = symbols_data[pos['symbol']]
-                if df is not None:
-                    df_filtered = df[df['date'] <= date]
-                    if len(df_filtered) > 0:
-                        pos['current_price'] = df_filtered['close'].iloc[-1]
+            current_price = panel.close_upto(pos['symbol'], date)
+            if current_price is not None:
+                pos['current_price'] = current_price
     
     def calculate_portfolio_value(self, symbols_data: Dict[str, pd.DataFrame], date: str):
         """Calculate total portfolio value"""
@@ -474,17 +440,19 @@ class IndonesiaKulamagiTimeLapseEnhanced:
             logger.error("❌ No data available for testing")
             return None
         
+        return self.simulate(symbols_data, start_date, end_date)
+    
+    def simulate(self, symbols_data: Dict[str, pd.DataFrame], start_date: str, end_date: str):
+        """Time lapse simulation over symbols_data (tanpa database; dipakai juga oleh process pool runner)"""
         self.start_date = start_date
         self.end_date = end_date
         
-        # Get date range
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        date_range = pd.date_range(start, end, freq='D')
+        # Hanya trading sessions (tanggal dengan bar), bukan setiap calendar day
+        date_range = self.get_momentum_panel(symbols_data).sessions(start_date, end_date)
         
         logger.info(f"📅 Testing period: {start_date} to {end_date}")
         logger.info(f"💰 Initial capital: {self.initial_capital:,.0f} IDR")
-        logger.info(f"📊 Processing {len(date_range)} days...")
+        logger.info(f"📊 Processing {len(date_range)} trading sessions...")
         
         # Time lapse simulation
         for i, current_date in enumerate(date_range):
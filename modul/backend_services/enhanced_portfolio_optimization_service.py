@@ -15,11 +15,12 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 import pandas as pd
 import numpy as np
-from scipy.optimize import minimize
 from scipy import stats
 import quantlib as ql
 from app.models.trading import Portfolio, Position
 from app.models.market_data import MarketData
+from app.core.portfolio_optimizer import METHODS, get_portfolio_optimizer
+from app.core.returns_panel import ReturnsPanel
 from app.services.enhanced_risk_management_service import EnhancedRiskManagementService
 
 logger = logging.getLogger(__name__)
@@ -63,39 +64,31 @@ class EnhancedPortfolioOptimizationService:
             if not positions:
                 return {'error': 'No positions found in portfolio'}
             
+            if optimization_method not in METHODS:
+                return {'error': f'Unknown optimization method: {optimization_method}'}
+            
             # Get symbols
             symbols = [pos.symbol for pos in positions]
             
-            # Get historical data
-            historical_data = await self._get_historical_data(symbols, days=252)  # 1 year
-            
-            if historical_data.empty:
+            # Covariance estimate (cached per symbol set dan hari) dan solver
+            # berjalan di worker pool, bukan di event loop
+            optimizer = get_portfolio_optimizer()
+            try:
+                estimate = await optimizer.run(
+                    optimizer.estimate, symbols, lambda: self._load_returns(symbols, days=252),  # 1 year
+                    lookback_days=252
+                )
+            except ValueError:
                 return {'error': 'Insufficient historical data'}
             
-            # Calculate returns and covariance matrix
-            returns_data = await self._calculate_returns(historical_data)
-            covariance_matrix = await self._calculate_covariance_matrix(returns_data)
-            expected_returns = await self._calculate_expected_returns(returns_data)
+            symbols = estimate.symbols
+            expected_returns = estimate.expected_returns
+            covariance_matrix = estimate.covariance
             
-            # Run optimization based on method
-            if optimization_method == 'markowitz':
-                optimization_result = await self._markowitz_optimization(
-                    expected_returns, covariance_matrix, risk_tolerance, target_return
-                )
-            elif optimization_method == 'black_litterman':
-                optimization_result = await self._black_litterman_optimization(
-                    expected_returns, covariance_matrix, risk_tolerance, target_return
-                )
-            elif optimization_method == 'risk_parity':
-                optimization_result = await self._risk_parity_optimization(
-                    covariance_matrix, risk_tolerance
-                )
-            elif optimization_method == 'minimum_variance':
-                optimization_result = await self._minimum_variance_optimization(
-                    covariance_matrix, risk_tolerance
-                )
-            else:
-                return {'error': f'Unknown optimization method: {optimization_method}'}
+            optimization_result = await optimizer.run(
+                optimizer.optimize, estimate, optimization_method, risk_tolerance, target_return,
+                self.min_weight, self.max_weight
+            )
             
             # Apply constraints if provided
             if constraints:
@@ -129,283 +122,59 @@ class EnhancedPortfolioOptimizationService:
             logger.error(f"Error optimizing portfolio: {e}")
             return {'error': str(e)}
     
-    async def _get_historical_data(self, symbols: List[str], days: int) -> pd.DataFrame:
-        """Get historical data untuk symbols"""
-        try:
-            start_date = datetime.now() - timedelta(days=days)
-            
-            market_data = self.db.query(MarketData).filter(
-                MarketData.symbol.in_(symbols),
-                MarketData.timestamp >= start_date
-            ).order_by(MarketData.timestamp).all()
-            
-            # Convert to DataFrame
-            data = []
-            for record in market_data:
-                data.append({
-                    'timestamp': record.timestamp,
-                    'symbol': record.symbol,
-                    'close': record.close_price
-                })
-            
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df = df.set_index('timestamp')
-            
-            return df
-            
-        except Exception as e:
-            logger.error(f"Error getting historical data: {e}")
-            return pd.DataFrame()
-    
-    async def _calculate_returns(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Calculate returns untuk each symbol"""
-        try:
-            returns_data = {}
-            
-            for symbol in data['symbol'].unique():
-                symbol_data = data[data['symbol'] == symbol]['close']
-                if len(symbol_data) > 1:
-                    returns = symbol_data.pct_change().dropna()
-                    returns_data[symbol] = returns
-            
-            return pd.DataFrame(returns_data)
-            
-        except Exception as e:
-            logger.error(f"Error calculating returns: {e}")
-            return pd.DataFrame()
-    
-    async def _calculate_covariance_matrix(self, returns_data: pd.DataFrame) -> np.ndarray:
-        """Calculate covariance matrix"""
-        try:
-            if returns_data.empty:
-                return np.array([])
-            
-            # Calculate covariance matrix
-            covariance_matrix = returns_data.cov().values
-            
-            # Handle NaN values
-            covariance_matrix = np.nan_to_num(covariance_matrix, nan=0.0)
-            
-            return covariance_matrix
-            
-        except Exception as e:
-            logger.error(f"Error calculating covariance matrix: {e}")
-            return np.array([])
-    
-    async def _calculate_expected_returns(self, returns_data: pd.DataFrame) -> np.ndarray:
-        """Calculate expected returns"""
-        try:
-            if returns_data.empty:
-                return np.array([])
-            
-            # Calculate mean returns
-            expected_returns = returns_data.mean().values
-            
-            # Annualize returns
-            expected_returns = expected_returns * 252
-            
-            return expected_returns
-            
-        except Exception as e:
-            logger.error(f"Error calculating expected returns: {e}")
-            return np.array([])
-    
-    async def _markowitz_optimization(
-        self, 
-        expected_returns: np.ndarray, 
-        covariance_matrix: np.ndarray, 
-        risk_tolerance: float,
-        target_return: Optional[float]
-    ) -> Dict[str, Any]:
-        """Markowitz mean-variance optimization"""
-        try:
-            n_assets = len(expected_returns)
-            
-            # Objective function: minimize portfolio variance
-            def objective(weights):
-                return np.dot(weights.T, np.dot(covariance_matrix, weights))
-            
-            # Constraints
-            constraints = [
-                {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}  # Weights sum to 1
-            ]
-            
-            # Add target return constraint if specified
-            if target_return is not None:
-                constraints.append({
-                    'type': 'eq', 
-                    'fun': lambda w: np.dot(w, expected_returns) - target_return
-                })
-            
-            # Bounds: 0 <= weight <= max_weight
-            bounds = [(0, self.max_weight) for _ in range(n_assets)]
-            
-            # Initial guess: equal weights
-            x0 = np.array([1/n_assets] * n_assets)
-            
-            # Optimize
-            result = minimize(
-                objective, x0, method='SLSQP', 
-                bounds=bounds, constraints=constraints
-            )
-            
-            if not result.success:
-                return {'error': f'Optimization failed: {result.message}'}
-            
-            optimal_weights = result.x
-            portfolio_return = np.dot(optimal_weights, expected_returns)
-            portfolio_variance = np.dot(optimal_weights.T, np.dot(covariance_matrix, optimal_weights))
-            portfolio_volatility = np.sqrt(portfolio_variance)
-            sharpe_ratio = (portfolio_return - self.risk_free_rate) / portfolio_volatility
-            
-            return {
-                'weights': optimal_weights,
-                'expected_return': portfolio_return,
-                'expected_volatility': portfolio_volatility,
-                'sharpe_ratio': sharpe_ratio,
-                'method': 'markowitz'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in Markowitz optimization: {e}")
-            return {'error': str(e)}
-    
-    async def _black_litterman_optimization(
-        self, 
-        expected_returns: np.ndarray, 
-        covariance_matrix: np.ndarray, 
-        risk_tolerance: float,
-        target_return: Optional[float]
-    ) -> Dict[str, Any]:
-        """Black-Litterman optimization dengan views"""
-        try:
-            n_assets = len(expected_returns)
-            
-            # Black-Litterman parameters
-            tau = 0.05  # Confidence level
-            P = np.eye(n_assets)  # Pick matrix (identity for simplicity)
-            Q = expected_returns  # Views (using historical returns as views)
-            Omega = np.diag(np.diag(covariance_matrix)) * tau  # Uncertainty matrix
-            
-            # Calculate Black-Litterman expected returns
-            M1 = np.linalg.inv(tau * covariance_matrix)
-            M2 = np.dot(P.T, np.dot(np.linalg.inv(Omega), P))
-            M3 = np.dot(P.T, np.dot(np.linalg.inv(Omega), Q))
-            
-            bl_expected_returns = np.dot(
-                np.linalg.inv(M1 + M2),
-                np.dot(M1, expected_returns) + M3
-            )
-            
-            # Use Markowitz optimization with BL expected returns
-            return await self._markowitz_optimization(
-                bl_expected_returns, covariance_matrix, risk_tolerance, target_return
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in Black-Litterman optimization: {e}")
-            return {'error': str(e)}
+    def _load_returns(self, symbols: List[str], days: int) -> pd.DataFrame:
+        """Daily simple returns untuk symbols, aligned per date (dipanggil hanya saat cache miss)"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        panel = ReturnsPanel.load(self.db, symbols, start_date, end_date)
+        return np.expm1(panel.returns)
     
-    async def _risk_parity_optimization(
-        self, 
-        covariance_matrix: np.ndarray, 
-        risk_tolerance: float
-    ) -> Dict[str, Any]:
-        """Risk parity optimization"""
+    async def calculate_efficient_frontier(self, portfolio_id: int, points: int = 20) -> Dict[str, Any]:
+        """Efficient frontier untuk portfolio symbols dalam satu batched call"""
         try:
-            n_assets = covariance_matrix.shape[0]
-            
-            # Risk parity objective: minimize sum of squared risk contributions
-            def objective(weights):
-                portfolio_variance = np.dot(weights.T, np.dot(covariance_matrix, weights))
-                risk_contributions = (weights * np.dot(covariance_matrix, weights)) / portfolio_variance
-                return np.sum((risk_contributions - 1/n_assets) ** 2)
-            
-            # Constraints
-            constraints = [
-                {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}  # Weights sum to 1
-            ]
+            positions = self.db.query(Position).filter(
+                Position.portfolio_id == portfolio_id,
+                Position.quantity > 0
+            ).all()
             
-            # Bounds
-            bounds = [(0, self.max_weight) for _ in range(n_assets)]
+            if not positions:
+                return {'error': 'No positions found in portfolio'}
             
-            # Initial guess
-            x0 = np.array([1/n_assets] * n_assets)
+            symbols = [pos.symbol for pos in positions]
+            optimizer = get_portfolio_optimizer()
+            try:
+                estimate = await optimizer.run(
+                    optimizer.estimate, symbols, lambda: self._load_returns(symbols, days=252),
+                    lookback_days=252
+                )
+            except ValueError:
+                return {'error': 'Insufficient historical data'}
             
-            # Optimize
-            result = minimize(
-                objective, x0, method='SLSQP',
-                bounds=bounds, constraints=constraints
+            frontier = await optimizer.run(
+                optimizer.efficient_frontier, estimate, points, self.min_weight, self.max_weight
             )
             
-            if not result.success:
-                return {'error': f'Risk parity optimization failed: {result.message}'}
-            
-            optimal_weights = result.x
-            portfolio_variance = np.dot(optimal_weights.T, np.dot(covariance_matrix, optimal_weights))
-            portfolio_volatility = np.sqrt(portfolio_variance)
-            
-            return {
-                'weights': optimal_weights,
-                'expected_return': 0,  # Risk parity doesn't optimize for return
-                'expected_volatility': portfolio_volatility,
-                'sharpe_ratio': 0,
-                'method': 'risk_parity'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in risk parity optimization: {e}")
-            return {'error': str(e)}
-    
-    async def _minimum_variance_optimization(
-        self, 
-        covariance_matrix: np.ndarray, 
-        risk_tolerance: float
-    ) -> Dict[str, Any]:
-        """Minimum variance optimization"""
-        try:
-            n_assets = covariance_matrix.shape[0]
-            
-            # Objective: minimize portfolio variance
-            def objective(weights):
-                return np.dot(weights.T, np.dot(covariance_matrix, weights))
-            
-            # Constraints
-            constraints = [
-                {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}  # Weights sum to 1
+            frontier_points = [
+                {
+                    'expected_return': float(frontier['returns'][i]),
+                    'expected_volatility': float(frontier['volatilities'][i]),
+                    'sharpe_ratio': float(frontier['sharpe_ratios'][i]),
+                    'weights': dict(zip(estimate.symbols, frontier['weights'][i].tolist()))
+                }
+                for i in range(len(frontier['returns']))
             ]
             
-            # Bounds
-            bounds = [(0, self.max_weight) for _ in range(n_assets)]
-            
-            # Initial guess
-            x0 = np.array([1/n_assets] * n_assets)
-            
-            # Optimize
-            result = minimize(
-                objective, x0, method='SLSQP',
-                bounds=bounds, constraints=constraints
-            )
-            
-            if not result.success:
-                return {'error': f'Minimum variance optimization failed: {result.message}'}
-            
-            optimal_weights = result.x
-            portfolio_variance = np.dot(optimal_weights.T, np.dot(covariance_matrix, optimal_weights))
-            portfolio_volatility = np.sqrt(portfolio_variance)
-            
             return {
-                'weights': optimal_weights,
-                'expected_return': 0,  # Minimum variance doesn't optimize for return
-                'expected_volatility': portfolio_volatility,
-                'sharpe_ratio': 0,
-                'method': 'minimum_variance'
+                'success': True,
+                'symbols': estimate.symbols,
+                'frontier': frontier_points,
+                'max_sharpe_portfolio': frontier_points[frontier['max_sharpe_index']],
+                'covariance_shrinkage': estimate.shrinkage,
+                'calculation_timestamp': datetime.now()
             }
             
         except Exception as e:
-            logger.error(f"Error in minimum variance optimization: {e}")
+            logger.error(f"Error calculating efficient frontier: {e}")
             return {'error': str(e)}
     
     async def _apply_constraints(
@@ -575,7 +344,7 @@ class EnhancedPortfolioOptimizationService:
                     current_weight = current_weights.get(symbol, 0)
                     weight_diff = optimal_weight - current_weight
                     
-                    if abs(weight_diff) > self.rebalancing_threshold:
+                    if abs(weight_diff) > self.rebalance_threshold:
                         action = 'buy' if weight_diff > 0 else 'sell'
                         amount = abs(weight_diff) * total_value
                         
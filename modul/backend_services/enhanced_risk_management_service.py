@@ -19,6 +19,7 @@ import quantlib as ql
 from scipy import stats
 from app.models.trading import Portfolio, Position, Order
 from app.models.market_data import MarketData
+from app.core.returns_panel import ReturnsPanel
 
 logger = logging.getLogger(__name__)
 
@@ -168,7 +169,7 @@ class EnhancedRiskManagementService:
             symbols = [pos.symbol for pos in positions] + [symbol]
             historical_data = await self._get_historical_data_for_correlation(symbols)
             
-            if historical_data.empty:
+            if len(historical_data) < 2:
                 return {'allowed': True, 'reason': 'Insufficient data for correlation analysis'}
             
             # Calculate correlations
@@ -189,55 +190,27 @@ class EnhancedRiskManagementService:
             logger.error(f"Error checking correlation risk: {e}")
             return {'allowed': False, 'reason': f'Error: {str(e)}'}
     
-    async def _get_historical_data_for_correlation(self, symbols: List[str]) -> pd.DataFrame:
-        """Get historical data untuk correlation analysis"""
+    async def _get_historical_data_for_correlation(self, symbols: List[str]) -> ReturnsPanel:
+        """Get aligned returns panel untuk correlation analysis"""
         try:
-            # Get 30 days of historical data
-            start_date = datetime.now() - timedelta(days=30)
-            
-            market_data = self.db.query(MarketData).filter(
-                MarketData.symbol.in_(symbols),
-                MarketData.timestamp >= start_date
-            ).order_by(MarketData.timestamp).all()
-            
-            # Convert to DataFrame
-            data = []
-            for record in market_data:
-                data.append({
-                    'timestamp': record.timestamp,
-                    'symbol': record.symbol,
-                    'close': record.close_price
-                })
-            
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                # Pivot to get symbols as columns
-                pivot_df = df.pivot(index='timestamp', columns='symbol', values='close')
-                return pivot_df
-            
-            return pd.DataFrame()
+            # Get 30 days of historical data (satu query untuk semua symbols)
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=30)
+            return ReturnsPanel.load(self.db, symbols, start_date, end_date)
             
         except Exception as e:
             logger.error(f"Error getting historical data for correlation: {e}")
-            return pd.DataFrame()
+            return ReturnsPanel(pd.DataFrame())
     
-    async def _calculate_correlations(self, data: pd.DataFrame, new_symbol: str) -> Dict[str, float]:
-        """Calculate correlations dengan new symbol"""
+    async def _calculate_correlations(self, panel: ReturnsPanel, new_symbol: str) -> Dict[str, float]:
+        """Calculate return correlations dengan new symbol"""
         try:
-            correlations = {}
-            
-            if new_symbol not in data.columns:
-                return correlations
-            
-            for symbol in data.columns:
-                if symbol != new_symbol and not data[symbol].isna().all():
-                    # Calculate correlation
-                    correlation = data[new_symbol].corr(data[symbol])
-                    if not np.isnan(correlation):
-                        correlations[symbol] = abs(correlation)
+            if new_symbol not in panel.symbols:
+                return {}
             
-            return correlations
+            # Satu vectorized correlation matrix, ambil row new_symbol
+            correlation = panel.correlation().loc[new_symbol].drop(new_symbol).dropna()
+            return {symbol: abs(float(value)) for symbol, value in correlation.items()}
             
         except Exception as e:
             logger.error(f"Error calculating correlations: {e}")
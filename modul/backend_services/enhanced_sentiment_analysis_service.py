@@ -17,15 +17,15 @@ import pandas as pd
 import numpy as np
 import requests
 import json
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from nltk.sentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
-import nltk
+from app.core.sentiment_models import get_sentiment_registry
 from app.models.sentiment import NewsSentiment, SocialSentiment, MarketSentiment
 from app.models.market_data import MarketData
 
 logger = logging.getLogger(__name__)
 
+NEWS_MODELS = ('vader', 'finbert', 'roberta', 'textblob')
+SOCIAL_MODELS = ('vader', 'roberta', 'textblob')
+
 class EnhancedSentimentAnalysisService:
     """
     Enhanced Sentiment Analysis Service dengan algoritma terbukti
@@ -33,41 +33,8 @@ class EnhancedSentimentAnalysisService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.sentiment_models = {}
-        self._initialize_models()
-        
-        # Download required NLTK data
-        try:
-            nltk.download('vader_lexicon', quiet=True)
-            nltk.download('punkt', quiet=True)
-        except:
-            pass
-    
-    def _initialize_models(self):
-        """Initialize proven sentiment analysis models"""
-        try:
-            # Initialize VADER sentiment analyzer
-            self.sentiment_models['vader'] = SentimentIntensityAnalyzer()
-            
-            # Initialize transformer models
-            self.sentiment_models['finbert'] = pipeline(
-                "sentiment-analysis",
-                model="ProsusAI/finbert",
-                tokenizer="ProsusAI/finbert"
-            )
-            
-            # Initialize RoBERTa for general sentiment
-            self.sentiment_models['roberta'] = pipeline(
-                "sentiment-analysis",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-            )
-            
-            logger.info("Sentiment analysis models initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Error initializing sentiment models: {e}")
-            # Fallback to basic models
-            self.sentiment_models['vader'] = SentimentIntensityAnalyzer()
+        # Models di-share per process dan baru di-load saat pertama dipakai
+        self.models = get_sentiment_registry()
     
     async def analyze_news_sentiment(self, symbol: str, days: int = 7) -> Dict[str, Any]:
         """Analyze news sentiment untuk symbol dengan multiple algorithms"""
@@ -78,42 +45,20 @@ class EnhancedSentimentAnalysisService:
             if not news_data:
                 return {'error': 'No news data available'}
             
-            # Analyze sentiment dengan multiple models
+            # Analyze sentiment dengan multiple models (semua articles dalam satu batch)
+            texts = [article.get('content', '') + ' ' + article.get('title', '') for article in news_data]
+            scores = await self._analyze_texts(texts, NEWS_MODELS)
             sentiment_results = {}
             
-            for article in news_data:
-                text = article.get('content', '') + ' ' + article.get('title', '')
-                
-                # VADER sentiment
-                vader_scores = self._analyze_vader_sentiment(text)
-                
-                # FinBERT sentiment
-                finbert_scores = self._analyze_finbert_sentiment(text)
-                
-                # RoBERTa sentiment
-                roberta_scores = self._analyze_roberta_sentiment(text)
-                
-                # TextBlob sentiment
-                textblob_scores = self._analyze_textblob_sentiment(text)
-                
+            for article, individual_scores in zip(news_data, scores):
                 # Combine results
-                combined_sentiment = self._combine_sentiment_scores({
-                    'vader': vader_scores,
-                    'finbert': finbert_scores,
-                    'roberta': roberta_scores,
-                    'textblob': textblob_scores
-                })
+                combined_sentiment = self._combine_sentiment_scores(individual_scores)
                 
                 sentiment_results[article['id']] = {
                     'title': article.get('title', ''),
                     'content': article.get('content', ''),
                     'published_at': article.get('published_at', ''),
-                    'individual_scores': {
-                        'vader': vader_scores,
-                        'finbert': finbert_scores,
-                        'roberta': roberta_scores,
-                        'textblob': textblob_scores
-                    },
+                    'individual_scores': individual_scores,
                     'combined_sentiment': combined_sentiment
                 }
             
@@ -135,13 +80,26 @@ class EnhancedSentimentAnalysisService:
             logger.error(f"Error analyzing news sentiment: {e}")
             return {'error': str(e)}
     
-    def _analyze_vader_sentiment(self, text: str) -> Dict[str, float]:
-        """Analyze sentiment menggunakan VADER"""
+    async def _analyze_texts(self, texts: List[str], models: Tuple[str, ...]) -> List[Dict[str, Dict]]:
+        """Scores per text per model; texts di-batch dan di-cache oleh model registry"""
+        formatters = {
+            'vader': self._analyze_vader_sentiment,
+            'finbert': self._analyze_finbert_sentiment,
+            'roberta': self._analyze_roberta_sentiment,
+            'textblob': self._analyze_textblob_sentiment
+        }
+        raw = await self.models.predict_many(models, texts)
+        return [
+            {name: formatters[name](raw[name][i]) for name in models}
+            for i in range(len(texts))
+        ]
+    
+    def _analyze_vader_sentiment(self, scores: Optional[Dict[str, float]]) -> Dict[str, float]:
+        """Format VADER polarity scores"""
         try:
-            if 'vader' not in self.sentiment_models:
+            if scores is None:
                 return {'compound': 0.0, 'positive': 0.0, 'negative': 0.0, 'neutral': 0.0}
             
-            scores = self.sentiment_models['vader'].polarity_scores(text)
             return {
                 'compound': scores['compound'],
                 'positive': scores['pos'],
@@ -153,21 +111,15 @@ class EnhancedSentimentAnalysisService:
             logger.error(f"Error in VADER sentiment analysis: {e}")
             return {'compound': 0.0, 'positive': 0.0, 'negative': 0.0, 'neutral': 0.0}
     
-    def _analyze_finbert_sentiment(self, text: str) -> Dict[str, float]:
-        """Analyze sentiment menggunakan FinBERT"""
+    def _analyze_finbert_sentiment(self, result: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """Format FinBERT prediction"""
         try:
-            if 'finbert' not in self.sentiment_models:
+            if result is None:
                 return {'label': 'NEUTRAL', 'score': 0.5}
             
-            # Truncate text if too long
-            if len(text) > 512:
-                text = text[:512]
-            
-            result = self.sentiment_models['finbert'](text)
-            
-            # Convert to standardized format
-            label = result[0]['label']
-            score = result[0]['score']
+            # Convert to standardized format (FinBERT labels: positive/negative/neutral)
+            label = result['label'].upper()
+            score = result['score']
             
             # Map FinBERT labels to sentiment scores
             if label == 'POSITIVE':
@@ -181,21 +133,15 @@ class EnhancedSentimentAnalysisService:
             logger.error(f"Error in FinBERT sentiment analysis: {e}")
             return {'label': 'NEUTRAL', 'score': 0.5, 'sentiment_score': 0.0}
     
-    def _analyze_roberta_sentiment(self, text: str) -> Dict[str, float]:
-        """Analyze sentiment menggunakan RoBERTa"""
+    def _analyze_roberta_sentiment(self, result: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """Format RoBERTa prediction"""
         try:
-            if 'roberta' not in self.sentiment_models:
+            if result is None:
                 return {'label': 'NEUTRAL', 'score': 0.5}
             
-            # Truncate text if too long
-            if len(text) > 512:
-                text = text[:512]
-            
-            result = self.sentiment_models['roberta'](text)
-            
             # Convert to standardized format
-            label = result[0]['label']
-            score = result[0]['score']
+            label = result['label'].upper()
+            score = result['score']
             
             # Map RoBERTa labels to sentiment scores
             if 'POSITIVE' in label or 'LABEL_2' in label:
@@ -209,12 +155,12 @@ class EnhancedSentimentAnalysisService:
             logger.error(f"Error in RoBERTa sentiment analysis: {e}")
             return {'label': 'NEUTRAL', 'score': 0.5, 'sentiment_score': 0.0}
     
-    def _analyze_textblob_sentiment(self, text: str) -> Dict[str, float]:
-        """Analyze sentiment menggunakan TextBlob"""
+    def _analyze_textblob_sentiment(self, result: Optional[Tuple[float, float]]) -> Dict[str, float]:
+        """Format TextBlob (polarity, subjectivity)"""
         try:
-            blob = TextBlob(text)
-            polarity = blob.sentiment.polarity
-            subjectivity = blob.sentiment.subjectivity
+            if result is None:
+                return {'label': 'NEUTRAL', 'polarity': 0.0, 'subjectivity': 0.0, 'sentiment_score': 0.0}
+            polarity, subjectivity = result
             
             # Convert polarity to sentiment scores
             if polarity > 0.1:
@@ -429,23 +375,14 @@ class EnhancedSentimentAnalysisService:
             if not social_data:
                 return {'error': 'No social media data available'}
             
-            # Analyze sentiment untuk each post
+            # Analyze sentiment untuk semua posts dalam satu batch
+            texts = [post.get('content', '') for post in social_data]
+            scores = await self._analyze_texts(texts, SOCIAL_MODELS)
             sentiment_results = {}
             
-            for post in social_data:
-                text = post.get('content', '')
-                
-                # Analyze dengan multiple models
-                vader_scores = self._analyze_vader_sentiment(text)
-                roberta_scores = self._analyze_roberta_sentiment(text)
-                textblob_scores = self._analyze_textblob_sentiment(text)
-                
+            for post, text, individual_scores in zip(social_data, texts, scores):
                 # Combine results
-                combined_sentiment = self._combine_sentiment_scores({
-                    'vader': vader_scores,
-                    'roberta': roberta_scores,
-                    'textblob': textblob_scores
-                })
+                combined_sentiment = self._combine_sentiment_scores(individual_scores)
                 
                 sentiment_results[post['id']] = {
                     'content': text,
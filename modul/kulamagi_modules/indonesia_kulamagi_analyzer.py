@@ -11,6 +11,7 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
+from indonesia_kulamagi_momentum_panel import MomentumPanel
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -235,7 +236,7 @@ class IndonesiaKulamagiAnalyzer:
     def screen_indonesia_momentum_stocks(self, symbols: List[str], min_performance_1m: float = 0.15, 
                                        min_performance_3m: float = 0.25, min_performance_6m: float = 0.40):
         """Screen Indonesia stocks with momentum"""
-        momentum_stocks = []
+        symbols_data = {}
         
         logger.info(f"🔍 Screening {len(symbols)} Indonesia stocks for momentum...")
         
@@ -251,53 +252,22 @@ class IndonesiaKulamagiAnalyzer:
                 if df is None or len(df) < 30:
                     continue
                 
-                # Calculate performance
-                current_price = df['close'].iloc[-1]
-                
-                # 1 month performance
-                if len(df) >= 30:
-                    price_1m_ago = df['close'].iloc[-30]
-                    performance_1m = (current_price / price_1m_ago - 1) if price_1m_ago > 0 else 0
-                else:
-                    performance_1m = 0
-                
-                # 3 months performance
-                if len(df) >= 90:
-                    price_3m_ago = df['close'].iloc[-90]
-                    performance_3m = (current_price / price_3m_ago - 1) if price_3m_ago > 0 else 0
-                else:
-                    performance_3m = 0
-                
-                # 6 months performance
-                if len(df) >= 180:
-                    price_6m_ago = df['close'].iloc[-180]
-                    performance_6m = (current_price / price_6m_ago - 1) if price_6m_ago > 0 else 0
-                else:
-                    performance_6m = 0
-                
-                # Check if meets momentum criteria
-                if (performance_1m >= min_performance_1m and 
-                    performance_3m >= min_performance_3m and 
-                    performance_6m >= min_performance_6m):
-                    
-                    momentum_stocks.append({
-                        "symbol": symbol,
-                        "current_price": current_price,
-                        "performance_1m": performance_1m,
-                        "performance_3m": performance_3m,
-                        "performance_6m": performance_6m,
-                        "total_performance": performance_1m + performance_3m + performance_6m,
-                        "date": df['date'].iloc[-1].strftime('%Y-%m-%d')
-                    })
-                    
-                    logger.info(f"  ✅ {symbol}: 1M={performance_1m:.1%}, 3M={performance_3m:.1%}, 6M={performance_6m:.1%}")
+                symbols_data[symbol] = df
                 
             except Exception as e:
                 logger.error(f"❌ Error processing {symbol}: {e}")
                 continue
         
-        # Sort by total performance
-        momentum_stocks.sort(key=lambda x: x['total_performance'], reverse=True)
+        # Performance 1M/3M/6M dihitung sekali untuk semua symbols (bar terakhir setiap symbol)
+        momentum_stocks = MomentumPanel(symbols_data).screen(
+            min_performance_1m=min_performance_1m,
+            min_performance_3m=min_performance_3m,
+            min_performance_6m=min_performance_6m
+        )
+        
+        for stock in momentum_stocks:
+            logger.info(f"  ✅ {stock['symbol']}: 1M={stock['performance_1m']:.1%}, "
+                        f"3M={stock['performance_3m']:.1%}, 6M={stock['performance_6m']:.1%}")
         
         logger.info(f"🎯 Found {len(momentum_stocks)} momentum stocks")
         return momentum_stocks
@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 import json
+from indonesia_kulamagi_momentum_panel import MomentumPanel
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -62,6 +63,9 @@ class IndonesiaKulamagiPerformanceTesting:
             'cvar_95': 0
         }
         
+        # Momentum panel untuk symbols_data simulasi yang sedang berjalan
+        self.momentum_panel = None
+        
     def connect_database(self):
         """Connect to MySQL database"""
         try:
@@ -142,10 +146,9 @@ class IndonesiaKulamagiPerformanceTesting:
             logger.error("❌ No data available for simulation")
             return None
         
-        # Get date range
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        date_range = pd.date_range(start, end, freq='D')
+        # Trading sessions only; "data up to D" via panel integer offsets
+        panel = self._get_momentum_panel(symbols_data)
+        date_range = panel.sessions(start_date, end_date)
         
         # Simulation loop
         for i, current_date in enumerate(date_range):
@@ -211,12 +214,9 @@ class IndonesiaKulamagiPerformanceTesting:
             # Update portfolio value
             total_value = portfolio_value
             for pos in positions:
-                if pos['symbol'] in symbols_data:
-                    df = symbols_data[pos['symbol']]
-                    df_filtered = df[df['date'] <= date_str]
-                    if len(df_filtered) > 0:
-                        current_price = df_filtered['close'].iloc[-1]
-                        total_value += pos['shares'] * current_price
+                current_price = panel.close_upto(pos['symbol'], date_str)
+                if current_price is not None:
+                    total_value += pos['shares'] * current_price
             
             equity_curve.append({
                 'date': date_str,
@@ -247,77 +247,31 @@ class IndonesiaKulamagiPerformanceTesting:
             'metrics': metrics
         }
     
+    def _get_momentum_panel(self, symbols_data: Dict) -> MomentumPanel:
+        """Panel untuk symbols_data simulasi (dibangun sekali per simulasi)"""
+        if self.momentum_panel is None or self.momentum_panel.source is not symbols_data:
+            self.momentum_panel = MomentumPanel(symbols_data)
+        return self.momentum_panel
+    
     def _check_market_condition_simple(self, symbols_data: Dict, date: str):
         """Simple market condition check"""
-        favorable_count = 0
-        total_count = 0
-        
-        for symbol, df in symbols_data.items():
-            if df is None or len(df) < 20:
-                continue
-            
-            df_filtered = df[df['date'] <= date]
-            if len(df_filtered) < 20:
-                continue
-            
-            df_filtered = self.calculate_emas(df_filtered, [20])
-            current_price = df_filtered['close'].iloc[-1]
-            ema_20 = df_filtered['ema_20'].iloc[-1]
-            
-            if current_price > ema_20:
-                favorable_count += 1
-            total_count += 1
-        
-        return favorable_count / total_count >= 0.4 if total_count > 0 else False
+        counts = self._get_momentum_panel(symbols_data).above_ema(date, span=20, min_bars=20)
+        total_count = counts['total_count']
+        return counts['favorable_count'] / total_count >= 0.4 if total_count > 0 else False
     
     def _screen_momentum_stocks(self, symbols_data: Dict, date: str):
         """Screen momentum stocks"""
-        momentum_stocks = []
-        
-        for symbol, df in symbols_data.items():
-            if df is None or len(df) < 30:
-                continue
-            
-            df_filtered = df[df['date'] <= date]
-            if len(df_filtered) < 30:
-                continue
-            
-            current_price = df_filtered['close'].iloc[-1]
-            
-            # Calculate performance
-            performance_1m = 0
-            performance_3m = 0
-            performance_6m = 0
-            
-            if len(df_filtered) >= 30:
-                price_1m_ago = df_filtered['close'].iloc[-30]
-                performance_1m = (current_price / price_1m_ago - 1) if price_1m_ago > 0 else 0
-            
-            if len(df_filtered) >= 90:
-                price_3m_ago = df_filtered['close'].iloc[-90]
-                performance_3m = (current_price / price_3m_ago - 1) if price_3m_ago > 0 else 0
-            
-            if len(df_filtered) >= 180:
-                price_6m_ago = df_filtered['close'].iloc[-180]
-                performance_6m = (current_price / price_6m_ago - 1) if price_6m_ago > 0 else 0
-            
-            # Check momentum criteria
-            if (performance_1m >= 0.03 and performance_3m >= 0.08 and performance_6m >= 0.12):
-                momentum_stocks.append({
-                    'symbol': symbol,
-                    'current_price': current_price,
-                    'performance_1m': performance_1m,
-                    'performance_3m': performance_3m,
-                    'performance_6m': performance_6m,
-                    'total_performance': performance_1m + performance_3m + performance_6m
-                })
-        
-        return sorted(momentum_stocks, key=lambda x: x['total_performance'], reverse=True)
+        return self._get_momentum_panel(symbols_data).screen(
+            date, min_performance_1m=0.03, min_performance_3m=0.08, min_performance_6m=0.12)
     
     def _analyze_breakout_setup(self, symbol: str, df: pd.DataFrame, date: str):
         """Analyze breakout setup"""
         try:
-            df_filtered = df[df['date'] <= date]
+            panel = self.momentum_panel
+            if panel is not None and symbol in panel.columns and panel.source.get(symbol) is df:
+                df_filtered = panel.frame_upto(symbol, date)
+            else:
+                df_filtered = df[df['date'] <= date]
             if len(df_filtered) < 50:
                 return {"setup_found": False, "reason": "Insufficient data"}
             
@@ -0,0 +1,191 @@
+"""
+Indonesia Kulamagi Strategy - Parallel Time Lapse Runner
+Menjalankan test windows x criteria variants di process pool dan membandingkan hasilnya
+"""
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any
+
+from indonesia_kulamagi_timelapse_enhanced import IndonesiaKulamagiTimeLapseEnhanced
+from indonesia_kulamagi_criteria_adjustment import IndonesiaKulamagiCriteriaAdjustment
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def adjusted_criteria() -> Dict[str, Any]:
+    """Criteria dari IndonesiaKulamagiCriteriaAdjustment dalam format time lapse criteria"""
+    criteria = IndonesiaKulamagiCriteriaAdjustment().criteria
+    momentum = criteria['momentum_screening']
+    breakout = criteria['breakout_analysis']
+    return {
+        'favorable_threshold': criteria['market_condition']['favorable_threshold'],
+        'momentum_1m_min': momentum['1_month_min'],
+        'momentum_3m_min': momentum['3_month_min'],
+        'momentum_6m_min': momentum['6_month_min'],
+        'total_performance_min': momentum['total_performance_min'],
+        'momentum_leg_min': breakout['momentum_leg_min'] * 100,
+        'momentum_leg_max': breakout['momentum_leg_max'] * 100,
+        'consolidation_range_max': breakout['consolidation_range_max'] * 100,
+        'volume_decline_max': breakout['volume_decline_min'],
+        'breakout_volume_min': breakout['breakout_volume_min'],
+        'breakout_confirmation_days': breakout['breakout_confirmation_days'],
+        'risk_per_trade': criteria['risk_management']['risk_per_trade'],
+        'max_position_size': criteria['risk_management']['max_position_size']
+    }
+
+# Criteria variants (override DEFAULT_CRITERIA time lapse enhanced)
+CRITERIA_VARIANTS = {
+    'enhanced': {},
+    'adjusted': adjusted_criteria()
+}
+
+def yearly_windows(years: List[int]) -> List[Dict[str, str]]:
+    return [{'name': str(year), 'start': f'{year}-01-01', 'end': f'{year}-12-31'} for year in years]
+
+def slice_window(symbols_data: Dict[str, pd.DataFrame], start_date: str, end_date: str,
+                 min_records: int = 50) -> Dict[str, pd.DataFrame]:
+    """Data per symbol dalam [start, end] via searchsorted offsets (sama dengan query per window)"""
+    start = pd.Timestamp(start_date).to_datetime64()
+    end = pd.Timestamp(end_date).to_datetime64()
+    window = {}
+    for symbol, df in symbols_data.items():
+        dates = df['date'].to_numpy(dtype='datetime64[ns]')
+        lo, hi = np.searchsorted(dates, start, side='left'), np.searchsorted(dates, end, side='right')
+        if hi - lo > min_records:
+            window[symbol] = df.iloc[lo:hi].reset_index(drop=True)
+    return window
+
+# Symbols data per worker process (dikirim sekali lewat initializer, bukan per run)
+_worker_data: Dict[str, pd.DataFrame] = {}
+
+def _init_worker(symbols_data: Dict[str, pd.DataFrame]):
+    global _worker_data
+    _worker_data = symbols_data
+    logging.getLogger().setLevel(logging.WARNING)
+
+def run_single(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Satu time lapse run (window x variant); dijalankan di worker process"""
+    started = time.perf_counter()
+    row = {
+        'window': spec['window'],
+        'variant': spec['variant'],
+        'start': spec['start'],
+        'end': spec['end']
+    }
+    try:
+        data = slice_window(_worker_data, spec['start'], spec['end'])
+        if not data:
+            return {**row, 'error': 'No data available', 'wall_clock_s': time.perf_counter() - started}
+
+        tester = IndonesiaKulamagiTimeLapseEnhanced(criteria=spec['criteria'])
+        result = tester.simulate(data, spec['start'], spec['end'])
+        return {
+            **row,
+            'symbols': len(data),
+            'sessions': len(result['equity_curve']),
+            'total_trades': result['total_trades'],
+            'win_rate': result['win_rate'],
+            'total_return': result['total_return'],
+            'max_drawdown': result['max_drawdown'],
+            'sharpe_ratio': result['sharpe_ratio'],
+            'final_value': result['final_value'],
+            'wall_clock_s': time.perf_counter() - started,
+            'pid': os.getpid()
+        }
+    except Exception as e:
+        return {**row, 'error': str(e), 'wall_clock_s': time.perf_counter() - started}
+
+class KulamagiTimeLapseRunner:
+    """
+    Fan-out time lapse tests ke process pool.
+
+    Data dimuat sekali untuk span semua windows; setiap worker menerima
+    data itu sekali lalu memotong window-nya sendiri dengan searchsorted.
+    Hasil: satu comparison table dengan wall-clock per run.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, **db_kwargs):
+        self.max_workers = max_workers or os.cpu_count()
+        self.db_kwargs = db_kwargs
+
+    def load_data(self, start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        """Load symbol data dari database untuk seluruh span"""
+        loader = IndonesiaKulamagiTimeLapseEnhanced(**self.db_kwargs)
+        if not loader.connect_database():
+            return {}
+
+        symbols_data = {}
+        for symbol in loader.get_available_symbols():
+            df = loader.get_historical_data(symbol, start_date, end_date)
+            if df is not None and len(df) > 0:
+                symbols_data[symbol] = df.sort_values('date').reset_index(drop=True)
+
+        logger.info(f"✅ Loaded {len(symbols_data)} symbols ({start_date} to {end_date})")
+        return symbols_data
+
+    def run(self,
+            windows: List[Dict[str, str]],
+            variants: Optional[Dict[str, Dict]] = None,
+            symbols_data: Optional[Dict[str, pd.DataFrame]] = None) -> pd.DataFrame:
+        """Run every window x variant; returns the comparison table"""
+        variants = variants if variants is not None else CRITERIA_VARIANTS
+        if symbols_data is None:
+            symbols_data = self.load_data(min(w['start'] for w in windows), max(w['end'] for w in windows))
+        if not symbols_data:
+            logger.error("❌ No data available for testing")
+            return pd.DataFrame()
+
+        specs = [
+            {'window': w['name'], 'start': w['start'], 'end': w['end'], 'variant': name, 'criteria': criteria}
+            for w in windows
+            for name, criteria in variants.items()
+        ]
+        logger.info(f"🚀 Running {len(specs)} time lapse runs on {self.max_workers} workers")
+
+        started = time.perf_counter()
+        rows = []
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(symbols_data,)) as executor:
+            futures = [executor.submit(run_single, spec) for spec in specs]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                logger.info(f"  ✅ {row['window']} / {row['variant']}: {row['wall_clock_s']:.2f}s")
+        elapsed = time.perf_counter() - started
+
+        table = pd.DataFrame(rows).sort_values(['window', 'variant']).reset_index(drop=True)
+        table.attrs['wall_clock_s'] = elapsed
+        table.attrs['cpu_time_s'] = float(table['wall_clock_s'].sum())
+        logger.info(f"⏱️ {len(specs)} runs in {elapsed:.2f}s wall-clock "
+                    f"(sum of run times {table.attrs['cpu_time_s']:.2f}s)")
+        return table
+
+def main():
+    """Main function to run the time lapse comparison"""
+    parser = argparse.ArgumentParser(description="Kulamagi Time Lapse Runner")
+    parser.add_argument("--years", type=int, nargs="+", default=[2020, 2021, 2022, 2023, 2024])
+    parser.add_argument("--variants", nargs="+", default=list(CRITERIA_VARIANTS.keys()),
+                        choices=list(CRITERIA_VARIANTS.keys()))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    runner = KulamagiTimeLapseRunner(max_workers=args.workers)
+    table = runner.run(yearly_windows(args.years), {name: CRITERIA_VARIANTS[name] for name in args.variants})
+
+    if table.empty:
+        logger.error("\n❌ Time lapse runs failed!")
+        return None
+
+    columns = [c for c in ['window', 'variant', 'symbols', 'sessions', 'total_trades', 'win_rate',
+                           'total_return', 'max_drawdown', 'sharpe_ratio', 'wall_clock_s', 'error'] if c in table]
+    logger.info("\n📊 TIME LAPSE COMPARISON\n" + table[columns].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return table
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,11 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from app.core.bulk_upsert import frame_to_records, bulk_upsert
+
 class YahooFinanceDataFetcherOptimized:
     """Yahoo Finance Data Fetcher Optimized for Indonesian Stocks"""
     
@@ -37,6 +42,7 @@ class YahooFinanceDataFetcherOptimized:
         self.batch_delay = 10.0   # 10 seconds between batches
         self.max_retries = 3
         self.timeout = 30
+        self.chunk_size = 1000    # rows per multi-row INSERT
         
         # Valid Indonesian stock symbols (IDX) - Tested and verified
         self.valid_indonesian_stocks = [
@@ -159,34 +165,26 @@ class YahooFinanceDataFetcherOptimized:
             symbol = data['symbol'].iloc[0]
             print(f"   Populating historical data for {symbol}...")
             
-            # Prepare data for insertion
-            records = []
-            for _, row in data.iterrows():
-                records.append((
-                    symbol,
-                    row['date'],
-                    float(row['Open']) if pd.notna(row['Open']) else None,
-                    float(row['High']) if pd.notna(row['High']) else None,
-                    float(row['Low']) if pd.notna(row['Low']) else None,
-                    float(row['Close']) if pd.notna(row['Close']) else None,
-                    int(row['Volume']) if pd.notna(row['Volume']) else None,
-                    datetime.now()
-                ))
-            
-            # Insert into historical_ohlcv_daily
-            insert_query = """
-                INSERT INTO historical_ohlcv_daily (symbol, date, open, high, low, close, volume, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                open = VALUES(open),
-                high = VALUES(high),
-                low = VALUES(low),
-                close = VALUES(close),
-                volume = VALUES(volume),
-                created_at = VALUES(created_at)
-            """
-            
-            self.cursor.executemany(insert_query, records)
+            # Prepare data for insertion (vectorized, NaN -> None)
+            frame = pd.DataFrame({
+                'symbol': symbol,
+                'date': data['date'],
+                'open': data['Open'],
+                'high': data['High'],
+                'low': data['Low'],
+                'close': data['Close'],
+                'volume': data['Volume'],
+                'created_at': datetime.now()
+            })
+            columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume', 'created_at']
+            records = frame_to_records(frame, columns)
+            
+            # Insert into historical_ohlcv_daily (chunked multi-row upsert)
+            bulk_upsert(
+                self.cursor, 'historical_ohlcv_daily', columns, records,
+                update_columns=['open', 'high', 'low', 'close', 'volume', 'created_at'],
+                chunk_size=self.chunk_size
+            )
             self.connection.commit()
             
             print(f"     [PASS] Inserted {len(records)} historical records for {symbol}")
@@ -205,37 +203,28 @@ class YahooFinanceDataFetcherOptimized:
             symbol = data['symbol'].iloc[0]
             print(f"   Populating market data for {symbol}...")
             
-            # Prepare data for insertion
-            records = []
-            for _, row in data.iterrows():
-                records.append((
-                    symbol,
-                    row.name,  # timestamp
-                    row['date'],  # date
-                    float(row['Close']) if pd.notna(row['Close']) else None,
-                    int(row['Volume']) if pd.notna(row['Volume']) else None,
-                    float(row['High']) if pd.notna(row['High']) else None,
-                    float(row['Low']) if pd.notna(row['Low']) else None,
-                    float(row['Open']) if pd.notna(row['Open']) else None,
-                    float(row['Close']) if pd.notna(row['Close']) else None,
-                    datetime.now()
-                ))
-            
-            # Insert into market_data
-            insert_query = """
-                INSERT INTO market_data (symbol, timestamp, date, price, volume, high, low, open, close, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                price = VALUES(price),
-                volume = VALUES(volume),
-                high = VALUES(high),
-                low = VALUES(low),
-                open = VALUES(open),
-                close = VALUES(close),
-                created_at = VALUES(created_at)
-            """
-            
-            self.cursor.executemany(insert_query, records)
+            # Prepare data for insertion (vectorized, NaN -> None)
+            frame = pd.DataFrame({
+                'symbol': symbol,
+                'timestamp': data.index,
+                'date': data['date'],
+                'price': data['Close'],
+                'volume': data['Volume'],
+                'high': data['High'],
+                'low': data['Low'],
+                'open': data['Open'],
+                'close': data['Close'],
+                'created_at': datetime.now()
+            })
+            columns = ['symbol', 'timestamp', 'date', 'price', 'volume', 'high', 'low', 'open', 'close', 'created_at']
+            records = frame_to_records(frame, columns)
+            
+            # Insert into market_data (chunked multi-row upsert)
+            bulk_upsert(
+                self.cursor, 'market_data', columns, records,
+                update_columns=['price', 'volume', 'high', 'low', 'open', 'close', 'created_at'],
+                chunk_size=self.chunk_size
+            )
             self.connection.commit()
             
             print(f"     [PASS] Inserted {len(records)} market data records for {symbol}")
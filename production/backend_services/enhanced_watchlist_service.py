@@ -18,6 +18,7 @@ import numpy as np
 import yfinance as yf
 from app.models.watchlist import Watchlist, WatchlistItem, WatchlistCategory
 from app.models.market_data import MarketData
+from app.core.returns_panel import ReturnsPanel
 from app.services.enhanced_market_data_service_v2 import EnhancedMarketDataServiceV2
 from app.services.enhanced_fundamental_analysis_service import EnhancedFundamentalAnalysisService
 from app.services.enhanced_notifications_service import EnhancedNotificationsService
@@ -473,21 +474,13 @@ class EnhancedWatchlistService:
             if historical_data.empty:
                 return {}
             
-            # Calculate returns
-            returns_data = {}
-            for symbol in symbols:
-                symbol_data = historical_data[historical_data['symbol'] == symbol]
-                if not symbol_data.empty:
-                    symbol_data = symbol_data.sort_values('date')
-                    returns = symbol_data['close'].pct_change().dropna()
-                    returns_data[symbol] = returns
-            
-            if len(returns_data) < 2:
+            # Returns aligned per date (gap tidak digeser ke tanggal lain)
+            panel = ReturnsPanel.from_frame(historical_data)
+            if len(panel.symbols) < 2:
                 return {}
             
-            # Calculate correlation matrix
-            returns_df = pd.DataFrame(returns_data)
-            correlation_matrix = returns_df.corr()
+            # Calculate correlation matrix (pairwise-complete, satu matrix op)
+            correlation_matrix = panel.correlation()
             
             # Find high correlation pairs
             high_correlation_pairs = []
@@ -495,7 +488,7 @@ class EnhancedWatchlistService:
                 for j, symbol2 in enumerate(symbols):
                     if i < j and symbol1 in correlation_matrix.columns and symbol2 in correlation_matrix.columns:
                         correlation = correlation_matrix.loc[symbol1, symbol2]
-                        if abs(correlation) > 0.7:  # High correlation threshold
+                        if not np.isnan(correlation) and abs(correlation) > 0.7:  # High correlation threshold
                             high_correlation_pairs.append({
                                 'symbol1': symbol1,
                                 'symbol2': symbol2,
@@ -505,7 +498,7 @@ class EnhancedWatchlistService:
             # Calculate average correlation
             correlations = correlation_matrix.values
             correlations = correlations[np.triu_indices_from(correlations, k=1)]
-            average_correlation = np.mean(correlations)
+            average_correlation = float(np.nanmean(correlations)) if not np.isnan(correlations).all() else 0.0
             
             return {
                 'correlation_matrix': correlation_matrix.to_dict(),
@@ -17,11 +17,135 @@ import pandas as pd
 import numpy as np
 import asyncio
 import json
+import threading
+import time
+import redis.asyncio as aioredis
+from app.config import settings
+from app.core.delivery_queue import DeliveryChannel, DeliveryQueue, DeliveryWorkerPool
+from app.core.rate_counter import ContentDeduper, RateCounterStore, content_hash
+from app.database import SessionLocal
 from app.models.notifications import Notification, NotificationType, NotificationPriority, NotificationChannel
 from app.services.cache_service import CacheService
 
 logger = logging.getLogger(__name__)
 
+_notification_counters: Optional[Tuple[RateCounterStore, ContentDeduper]] = None
+_notification_counters_lock = threading.Lock()
+
+def get_notification_counters() -> Tuple[RateCounterStore, ContentDeduper]:
+    """Process-wide (user, type) frequency counters + content dedup"""
+    global _notification_counters
+    with _notification_counters_lock:
+        if _notification_counters is None:
+            _notification_counters = (
+                RateCounterStore(
+                    {'hour': 3600, 'day': 86400},
+                    buckets=settings.NOTIFICATION_COUNTER_BUCKETS,
+                    max_keys=settings.NOTIFICATION_COUNTER_MAX_KEYS
+                ),
+                ContentDeduper(settings.NOTIFICATION_CONTENT_DEDUP_SECONDS)
+            )
+        return _notification_counters
+
+# Per-channel delivery tuning: micro-batch size dan jumlah workers
+DELIVERY_CHANNELS = {
+    'email': {'batch_size': 50, 'concurrency': 4},
+    'sms': {'batch_size': 20, 'concurrency': 2},
+    'push': {'batch_size': 100, 'concurrency': 4},
+    'webhook': {'batch_size': 200, 'concurrency': 2},
+    'in_app': {'batch_size': 200, 'concurrency': 2}
+}
+
+async def _deliver_email_batch(events: List[Dict[str, Any]]):
+    """Deliver email notifications"""
+    # This would implement actual email delivery (satu SMTP session per batch)
+    logger.info(f"Email notifications delivered: {len(events)}")
+
+async def _deliver_sms_batch(events: List[Dict[str, Any]]):
+    """Deliver SMS notifications"""
+    # This would implement actual SMS delivery (bulk send API)
+    logger.info(f"SMS notifications delivered: {len(events)}")
+
+async def _deliver_push_batch(events: List[Dict[str, Any]]):
+    """Deliver push notifications"""
+    # This would implement actual push notification delivery (multicast)
+    logger.info(f"Push notifications delivered: {len(events)}")
+
+async def _deliver_webhook_batch(events: List[Dict[str, Any]]):
+    """Deliver webhook notifications"""
+    # This would implement actual webhook delivery (satu POST membawa semua events)
+    logger.info(f"Webhook notifications delivered: {len(events)}")
+
+async def _deliver_in_app_batch(events: List[Dict[str, Any]]):
+    """Deliver in-app notifications"""
+    # This would implement actual in-app notification delivery
+    logger.info(f"In-app notifications delivered: {len(events)}")
+
+DELIVERY_SENDERS = {
+    'email': _deliver_email_batch,
+    'sms': _deliver_sms_batch,
+    'push': _deliver_push_batch,
+    'webhook': _deliver_webhook_batch,
+    'in_app': _deliver_in_app_batch
+}
+
+def _update_delivery_status(notification_ids: List[int], status: str, stamp_column: str,
+                            from_statuses: Tuple[str, ...] = ('pending',)):
+    """Bulk status update untuk notifications yang status-nya masih di from_statuses"""
+    db = SessionLocal()
+    try:
+        db.query(Notification).filter(
+            Notification.id.in_(notification_ids),
+            Notification.status.in_(from_statuses)
+        ).update({
+            Notification.status: status,
+            getattr(Notification, stamp_column): datetime.now()
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+async def _mark_delivered(events: List[Dict[str, Any]]):
+    ids = list({event['notification_id'] for event in events})
+    await asyncio.get_running_loop().run_in_executor(None, _update_delivery_status, ids, 'delivered', 'delivered_at')
+
+async def _mark_failed(events: List[Dict[str, Any]]):
+    # Dead-letter di channel mana pun menang atas delivery channel lain yang lebih dulu sukses
+    ids = list({event['notification_id'] for event in events if 'notification_id' in event})
+    if ids:
+        await asyncio.get_running_loop().run_in_executor(
+            None, _update_delivery_status, ids, 'failed', 'failed_at', ('pending', 'delivered')
+        )
+
+_delivery_pool: Optional[DeliveryWorkerPool] = None
+_delivery_pool_lock = threading.Lock()
+
+def get_delivery_pool() -> DeliveryWorkerPool:
+    """
+    Process-wide delivery worker pool.
+
+    Workers di-start oleh app lifespan sehingga streams dan retries dari run
+    sebelumnya langsung di-drain (fallback: saat enqueue pertama).
+    """
+    global _delivery_pool
+    with _delivery_pool_lock:
+        if _delivery_pool is None:
+            channels = [
+                DeliveryChannel(name, DELIVERY_SENDERS[name], **options)
+                for name, options in DELIVERY_CHANNELS.items()
+            ]
+            _delivery_pool = DeliveryWorkerPool(
+                DeliveryQueue(aioredis.from_url(settings.NOTIFICATION_DELIVERY_REDIS_URL, decode_responses=True)),
+                channels,
+                max_attempts=settings.NOTIFICATION_DELIVERY_MAX_ATTEMPTS,
+                backoff_base=settings.NOTIFICATION_DELIVERY_BACKOFF_BASE,
+                backoff_max=settings.NOTIFICATION_DELIVERY_BACKOFF_MAX,
+                claim_idle_ms=settings.NOTIFICATION_DELIVERY_CLAIM_IDLE_MS,
+                on_delivered=_mark_delivered,
+                on_dead=_mark_failed
+            )
+        return _delivery_pool
+
 class EnhancedNotificationsService:
     """
     Enhanced Notifications Service dengan algoritma terbukti
@@ -30,6 +154,7 @@ class EnhancedNotificationsService:
     def __init__(self, db: Session):
         self.db = db
         self.cache_service = CacheService(db)
+        self.counters, self.deduper = get_notification_counters()
         
         # Notification channels
         self.channels = {
@@ -98,7 +223,7 @@ class EnhancedNotificationsService:
                 return {'error': f'Invalid notification type: {notification_type}'}
             
             # Apply smart filtering
-            filter_result = await self._apply_smart_filtering(user_id, notification_type, priority)
+            filter_result = await self._apply_smart_filtering(user_id, notification_type, priority, title, message)
             if not filter_result['allowed']:
                 return {'error': f'Notification filtered: {filter_result["reason"]}'}
             
@@ -126,9 +251,23 @@ class EnhancedNotificationsService:
             
             self.db.add(notification)
             self.db.flush()  # Get the ID
+            self._record_notification(user_id, notification_type, title, message)
+            # Commit sebelum enqueue: workers meng-update status dari session lain
+            self.db.commit()
             
-            # Queue for delivery
-            await self._queue_notification_delivery(notification)
+            # Queue for delivery; gagal enqueue (mis. Redis down) -> row 'failed' dan error ke caller
+            try:
+                await self._queue_notification_delivery(notification)
+            except Exception as e:
+                logger.error(f"Error queuing notification {notification.id} for delivery: {e}")
+                notification.status = 'failed'
+                notification.failed_at = datetime.now()
+                self.db.commit()
+                return {
+                    'error': f'Notification could not be queued for delivery: {e}',
+                    'notification_id': notification.id,
+                    'status': 'failed'
+                }
             
             return {
                 'success': True,
@@ -143,9 +282,17 @@ class EnhancedNotificationsService:
             logger.error(f"Error creating notification: {e}")
             return {'error': str(e)}
     
-    async def _apply_smart_filtering(self, user_id: int, notification_type: str, priority: str) -> Dict[str, Any]:
+    async def _apply_smart_filtering(self,
+                                     user_id: int,
+                                     notification_type: str,
+                                     priority: str,
+                                     title: Optional[str] = None,
+                                     message: Optional[str] = None) -> Dict[str, Any]:
         """Apply smart filtering rules"""
         try:
+            # Counters in-memory; database hanya dibaca sekali per key per process
+            self._warm_counters(user_id, notification_type)
+            
             # Check frequency limits
             frequency_check = await self._check_frequency_limits(user_id, notification_type)
             if not frequency_check['allowed']:
@@ -162,7 +309,7 @@ class EnhancedNotificationsService:
                 return {'allowed': False, 'reason': preferences_check['reason']}
             
             # Check duplicate filtering
-            duplicate_check = await self._check_duplicate_filtering(user_id, notification_type)
+            duplicate_check = await self._check_duplicate_filtering(user_id, notification_type, title, message)
             if not duplicate_check['allowed']:
                 return {'allowed': False, 'reason': duplicate_check['reason']}
             
@@ -172,6 +319,34 @@ class EnhancedNotificationsService:
             logger.error(f"Error applying smart filtering: {e}")
             return {'allowed': False, 'reason': f'Filtering error: {str(e)}'}
     
+    def _warm_counters(self, user_id: int, notification_type: str):
+        """Rebuild counters dari Notification table (setelah restart / eviction)"""
+        key = (user_id, notification_type)
+        if key in self.counters:
+            return
+        since = datetime.now() - timedelta(seconds=max(self.counters.windows.values()))
+        rows = self.db.query(Notification.created_at, Notification.title, Notification.message).filter(
+            Notification.user_id == user_id,
+            Notification.notification_type == notification_type,
+            Notification.created_at >= since
+        ).all()
+        
+        stamps = [(row.created_at.timestamp(), row) for row in rows if row.created_at]
+        self.counters.warm(key, [stamp for stamp, _ in stamps])
+        dedup_since = time.time() - self.deduper.window
+        for stamp, row in sorted(stamps, key=lambda item: item[0]):
+            if stamp >= dedup_since:
+                self.deduper.add(self._content_key(user_id, notification_type, row.title, row.message), stamp)
+    
+    def _content_key(self, user_id: int, notification_type: str, title: Optional[str], message: Optional[str]) -> Tuple:
+        return (user_id, notification_type, content_hash(title, message))
+    
+    def _record_notification(self, user_id: int, notification_type: str, title: str, message: str):
+        """Catat notification yang lolos filter ke counters"""
+        now = time.time()
+        self.counters.add((user_id, notification_type), now)
+        self.deduper.add(self._content_key(user_id, notification_type, title, message), now)
+    
     async def _check_frequency_limits(self, user_id: int, notification_type: str) -> Dict[str, Any]:
         """Check frequency limits untuk notification type"""
         try:
@@ -179,25 +354,15 @@ class EnhancedNotificationsService:
             if not limits:
                 return {'allowed': True, 'reason': 'No frequency limits'}
             
-            # Check hourly limit
-            hour_ago = datetime.now() - timedelta(hours=1)
-            hourly_count = self.db.query(Notification).filter(
-                Notification.user_id == user_id,
-                Notification.notification_type == notification_type,
-                Notification.created_at >= hour_ago
-            ).count()
+            counts = self.counters.counts((user_id, notification_type))
             
+            # Check hourly limit
+            hourly_count = counts['hour']
             if hourly_count >= limits.get('max_per_hour', 10):
                 return {'allowed': False, 'reason': f'Hourly limit exceeded: {hourly_count}/{limits.get("max_per_hour", 10)}'}
             
             # Check daily limit
-            day_ago = datetime.now() - timedelta(days=1)
-            daily_count = self.db.query(Notification).filter(
-                Notification.user_id == user_id,
-                Notification.notification_type == notification_type,
-                Notification.created_at >= day_ago
-            ).count()
-            
+            daily_count = counts['day']
             if daily_count >= limits.get('max_per_day', 50):
                 return {'allowed': False, 'reason': f'Daily limit exceeded: {daily_count}/{limits.get("max_per_day", 50)}'}
             
@@ -252,19 +417,23 @@ class EnhancedNotificationsService:
             logger.error(f"Error checking user preferences: {e}")
             return {'allowed': True, 'reason': 'User preferences error - allowing'}
     
-    async def _check_duplicate_filtering(self, user_id: int, notification_type: str) -> Dict[str, Any]:
+    async def _check_duplicate_filtering(self,
+                                         user_id: int,
+                                         notification_type: str,
+                                         title: Optional[str] = None,
+                                         message: Optional[str] = None) -> Dict[str, Any]:
         """Check for duplicate notifications"""
         try:
-            # Check for recent duplicate notifications
-            recent_time = datetime.now() - timedelta(minutes=5)
-            recent_duplicates = self.db.query(Notification).filter(
-                Notification.user_id == user_id,
-                Notification.notification_type == notification_type,
-                Notification.created_at >= recent_time
-            ).count()
+            # Notification type yang sama dalam duplicate window
+            window = settings.NOTIFICATION_DUPLICATE_WINDOW_SECONDS
+            last_seen = self.counters.last_seen((user_id, notification_type))
+            if last_seen is not None and time.time() - last_seen < window:
+                return {'allowed': False, 'reason': f'Duplicate notification within {window / 60:g} minutes'}
             
-            if recent_duplicates > 0:
-                return {'allowed': False, 'reason': f'Duplicate notification within 5 minutes: {recent_duplicates}'}
+            # Content yang sama (title + message) dalam content dedup window
+            if (title is not None or message is not None) and \
+                    self.deduper.seen(self._content_key(user_id, notification_type, title, message)):
+                return {'allowed': False, 'reason': f'Duplicate content within {self.deduper.window / 60:g} minutes'}
             
             return {'allowed': True, 'reason': 'No duplicates found'}
             
@@ -272,6 +441,13 @@ class EnhancedNotificationsService:
             logger.error(f"Error checking duplicate filtering: {e}")
             return {'allowed': True, 'reason': 'Duplicate check error - allowing'}
     
+    def get_filter_stats(self) -> Dict[str, Any]:
+        """Stats untuk frequency counters dan content dedup"""
+        return {
+            'counters': self.counters.get_stats(),
+            'content_dedup': self.deduper.get_stats()
+        }
+    
     def _determine_priority(self, notification_type: str, metadata: Optional[Dict[str, Any]]) -> str:
         """Determine notification priority"""
         try:
@@ -328,109 +504,31 @@ class EnhancedNotificationsService:
             return ['email', 'in_app']
     
     async def _queue_notification_delivery(self, notification: Notification):
-        """Queue notification for delivery"""
-        try:
-            # Add to delivery queue
-            delivery_task = {
-                'notification_id': notification.id,
-                'user_id': notification.user_id,
-                'channels': json.loads(notification.channels),
-                'priority': notification.priority,
-                'scheduled_time': notification.scheduled_time,
-                'created_at': notification.created_at
-            }
-            
-            # Store in cache for processing
-            await self.cache_service.set(
-                f"notification_queue_{notification.id}",
-                delivery_task,
-                ttl=3600  # 1 hour
-            )
-            
-            # Start delivery process
-            asyncio.create_task(self._process_notification_delivery(notification))
-            
-        except Exception as e:
-            logger.error(f"Error queuing notification delivery: {e}")
-    
-    async def _process_notification_delivery(self, notification: Notification):
-        """Process notification delivery"""
-        try:
-            channels = json.loads(notification.channels)
-            
-            # Deliver to each channel
-            for channel in channels:
-                try:
-                    if channel == 'email':
-                        await self._deliver_email_notification(notification)
-                    elif channel == 'sms':
-                        await self._deliver_sms_notification(notification)
-                    elif channel == 'push':
-                        await self._deliver_push_notification(notification)
-                    elif channel == 'webhook':
-                        await self._deliver_webhook_notification(notification)
-                    elif channel == 'in_app':
-                        await self._deliver_in_app_notification(notification)
-                    
-                except Exception as e:
-                    logger.error(f"Error delivering to {channel}: {e}")
-                    continue
-            
-            # Update notification status
-            notification.status = 'delivered'
-            notification.delivered_at = datetime.now()
-            self.db.commit()
-            
-        except Exception as e:
-            logger.error(f"Error processing notification delivery: {e}")
-            notification.status = 'failed'
-            notification.failed_at = datetime.now()
-            self.db.commit()
-    
-    async def _deliver_email_notification(self, notification: Notification):
-        """Deliver email notification"""
-        try:
-            # This would implement actual email delivery
-            logger.info(f"Email notification delivered: {notification.title}")
-            
-        except Exception as e:
-            logger.error(f"Error delivering email notification: {e}")
-    
-    async def _deliver_sms_notification(self, notification: Notification):
-        """Deliver SMS notification"""
-        try:
-            # This would implement actual SMS delivery
-            logger.info(f"SMS notification delivered: {notification.title}")
-            
-        except Exception as e:
-            logger.error(f"Error delivering SMS notification: {e}")
-    
-    async def _deliver_push_notification(self, notification: Notification):
-        """Deliver push notification"""
-        try:
-            # This would implement actual push notification delivery
-            logger.info(f"Push notification delivered: {notification.title}")
-            
-        except Exception as e:
-            logger.error(f"Error delivering push notification: {e}")
-    
-    async def _deliver_webhook_notification(self, notification: Notification):
-        """Deliver webhook notification"""
-        try:
-            # This would implement actual webhook delivery
-            logger.info(f"Webhook notification delivered: {notification.title}")
-            
-        except Exception as e:
-            logger.error(f"Error delivering webhook notification: {e}")
+        """Queue notification for delivery (satu stream entry per channel); raises jika enqueue gagal"""
+        event = {
+            'notification_id': notification.id,
+            'user_id': notification.user_id,
+            'notification_type': notification.notification_type,
+            'title': notification.title,
+            'message': notification.message,
+            'priority': notification.priority,
+            'created_at': notification.created_at
+        }
+        channels = [channel for channel in json.loads(notification.channels)
+                    if self.channels.get(channel, {}).get('enabled') and channel in DELIVERY_CHANNELS]
+        deliver_at = notification.scheduled_time.timestamp() if notification.scheduled_time else None
+        
+        await get_delivery_pool().enqueue_many(
+            [(channel, dict(event, channel=channel)) for channel in channels], deliver_at
+        )
     
-    async def _deliver_in_app_notification(self, notification: Notification):
-        """Deliver in-app notification"""
+    async def get_delivery_stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput dan latency per delivery channel"""
         try:
-            # This would implement actual in-app notification delivery
-            logger.info(f"In-app notification delivered: {notification.title}")
-            
+            return await get_delivery_pool().get_stats()
         except Exception as e:
-            logger.error(f"Error delivering in-app notification: {e}")
+            logger.error(f"Error getting delivery stats: {e}")
+            return {'error': str(e)}
     
     async def get_user_notifications(
         self, 
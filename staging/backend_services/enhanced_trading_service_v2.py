@@ -16,6 +16,9 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 import pandas as pd
 import numpy as np
+import time
+from app.config import settings
+from app.core.order_scheduler import OrderScheduler
 from app.models.trading import Order, OrderType, OrderSide, TradingMode, Trade, Position, Portfolio
 from app.models.market_data import MarketData
 from app.services.risk_management_service import RiskManagementService
@@ -33,7 +36,16 @@ class EnhancedTradingServiceV2:
     def __init__(self, db: Session):
         self.db = db
         self.risk_service = EnhancedRiskManagementService(db)
-        self.order_queue = []
+        self.scheduler = OrderScheduler(
+            self._execute_single_order,
+            self._flush_execution_results,
+            max_concurrency=settings.ORDER_EXECUTION_MAX_CONCURRENCY,
+            tick_interval=settings.ORDER_EXECUTION_TICK,
+            aging_rate=settings.ORDER_PRIORITY_AGING_RATE,
+            max_batch=settings.ORDER_EXECUTION_MAX_BATCH
+        )
+        self._execution_market_data = {}
+        self._unrecorded_fills: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []  # executed, write gagal; di-retry tiap flush
         self.execution_engine = {}
         self.performance_tracker = {}
         
@@ -274,33 +286,35 @@ class EnhancedTradingServiceV2:
             return 0.001
     
     async def _add_to_execution_queue(self, order: Order):
-        """Add order to execution queue"""
+        """Add order to execution scheduler (priority heap per symbol)"""
         try:
             execution_task = {
                 'order_id': order.id,
+                'portfolio_id': order.portfolio_id,
                 'symbol': order.symbol,
                 'side': order.side,
                 'quantity': order.quantity,
                 'price': order.price,
+                'stop_price': order.stop_price,
                 'order_type': order.order_type,
-                'created_at': order.created_at,
-                'priority': await self._calculate_order_priority(order)
+                'created_at': order.created_at
             }
             
-            self.order_queue.append(execution_task)
-            
-            # Sort by priority
-            self.order_queue.sort(key=lambda x: x['priority'], reverse=True)
-            
-            # Start execution if not already running
-            if not hasattr(self, '_execution_running') or not self._execution_running:
-                asyncio.create_task(self._execute_orders())
+            self.scheduler.submit(
+                order.id, order.symbol, execution_task,
+                priority=await self._calculate_order_priority(order)
+            )
             
         except Exception as e:
             logger.error(f"Error adding to execution queue: {e}")
     
     async def _calculate_order_priority(self, order: Order) -> int:
-        """Calculate order priority untuk execution"""
+        """
+        Base priority untuk execution.
+
+        Age tidak dihitung di sini: scheduler menambah aging secara kontinu
+        (ORDER_PRIORITY_AGING_RATE per detik menunggu).
+        """
         try:
             priority = 0
             
@@ -322,66 +336,37 @@ class EnhancedTradingServiceV2:
             elif order.quantity > 100:
                 priority += 10
             
-            # Recent orders have higher priority
-            age_minutes = (datetime.now() - order.created_at).total_seconds() / 60
-            if age_minutes < 1:
-                priority += 30
-            elif age_minutes < 5:
-                priority += 20
-            elif age_minutes < 15:
-                priority += 10
-            
             return priority
             
         except Exception as e:
             logger.error(f"Error calculating order priority: {e}")
             return 50
     
-    async def _execute_orders(self):
-        """Execute orders dari queue dengan advanced algorithms"""
-        try:
-            self._execution_running = True
-            
-            while self.order_queue:
-                # Get highest priority order
-                order_task = self.order_queue.pop(0)
-                
-                # Execute order
-                execution_result = await self._execute_single_order(order_task)
-                
-                if execution_result['success']:
-                    # Update order status
-                    await self._update_order_status(
-                        order_task['order_id'], 'filled', execution_result
-                    )
-                    
-                    # Create trade record
-                    await self._create_trade_record(order_task, execution_result)
-                    
-                    # Update position
-                    await self._update_position(order_task, execution_result)
-                    
-                    logger.info(f"Order {order_task['order_id']} executed successfully")
-                else:
-                    # Handle execution failure
-                    await self._handle_execution_failure(order_task, execution_result)
-                    
-                    logger.warning(f"Order {order_task['order_id']} execution failed: {execution_result['reason']}")
-                
-                # Small delay between executions
-                await asyncio.sleep(0.1)
-            
-            self._execution_running = False
-            
-        except Exception as e:
-            logger.error(f"Error executing orders: {e}")
-            self._execution_running = False
+    def get_execution_stats(self) -> Dict[str, Any]:
+        """Scheduler throughput, queue depth dan queue latency"""
+        stats = self.scheduler.get_stats()
+        stats['unrecorded_executions'] = len(self._unrecorded_fills)
+        return stats
+    
+    def set_execution_concurrency(self, max_concurrency: int):
+        """Adjust jumlah symbols yang dieksekusi concurrent"""
+        self.scheduler.set_concurrency(max_concurrency)
+    
+    async def _get_execution_market_data(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Market data untuk execution; di-reuse dalam satu scheduler tick per symbol"""
+        cached = self._execution_market_data.get(symbol)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.scheduler.tick_interval:
+            return cached[1]
+        market_data = await self._get_current_market_data(symbol)
+        self._execution_market_data[symbol] = (now, market_data)
+        return market_data
     
     async def _execute_single_order(self, order_task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute single order dengan market simulation"""
         try:
             # Get current market data
-            market_data = await self._get_current_market_data(order_task['symbol'])
+            market_data = await self._get_execution_market_data(order_task['symbol'])
             if not market_data:
                 return {'success': False, 'reason': 'No market data available'}
             
@@ -410,7 +395,7 @@ class EnhancedTradingServiceV2:
             
             elif order_type == 'stop':
                 # Stop orders execute when stop price is hit
-                stop_price = order_task.get('stop_price', order_price)
+                stop_price = order_task.get('stop_price') or order_price
                 if side == 'buy' and current_price >= stop_price:
                     execution_price = current_price
                 elif side == 'sell' and current_price <= stop_price:
@@ -437,63 +422,109 @@ class EnhancedTradingServiceV2:
             logger.error(f"Error executing single order: {e}")
             return {'success': False, 'reason': str(e)}
     
-    async def _update_order_status(self, order_id: int, status: str, execution_result: Dict[str, Any]):
-        """Update order status setelah execution"""
-        try:
-            order = self.db.query(Order).filter(Order.id == order_id).first()
-            if order:
-                order.status = status
-                if status == 'filled':
-                    order.executed_at = execution_result.get('executed_at', datetime.now())
-                    order.executed_price = execution_result.get('execution_price', order.price)
-                
-                self.db.commit()
-                
-        except Exception as e:
-            logger.error(f"Error updating order status: {e}")
-    
-    async def _create_trade_record(self, order_task: Dict[str, Any], execution_result: Dict[str, Any]):
-        """Create trade record setelah successful execution"""
+    async def _flush_execution_results(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """
+        Tulis hasil execution satu tick dalam satu transaction: order status,
+        trade records dan positions (satu query per tabel, satu commit).
+
+        Jika batch commit gagal, setiap order ditulis dalam commit sendiri
+        sehingga satu row yang gagal tidak membatalkan fills lain. Executions
+        yang tetap gagal ditulis disimpan dan di-retry pada flush berikutnya
+        (tidak di-execute ulang).
+        """
+        batch = self._unrecorded_fills + list(batch)
+        self._unrecorded_fills = []
         try:
-            trade = Trade(
-                order_id=order_task['order_id'],
-                symbol=order_task['symbol'],
-                side=order_task['side'],
-                quantity=execution_result['quantity'],
-                price=execution_result['execution_price'],
-                commission=execution_result['commission'],
-                total_value=execution_result['total_value'],
-                executed_at=execution_result['executed_at'],
-                created_at=datetime.now()
-            )
-            
-            self.db.add(trade)
+            fills = self._write_execution_results(batch)
             self.db.commit()
-            
+            logger.info(f"Flushed {len(batch)} order executions ({fills} filled)")
         except Exception as e:
-            logger.error(f"Error creating trade record: {e}")
+            logger.error(f"Error flushing execution results, writing orders individually: {e}")
+            self.db.rollback()
+            for item in batch:
+                try:
+                    self._write_execution_results([item])
+                    self.db.commit()
+                except Exception as item_error:
+                    self.db.rollback()
+                    self._unrecorded_fills.append(item)
+                    order_task, execution_result = item
+                    logger.error(f"Execution of order {order_task['order_id']} not recorded, will retry: "
+                                 f"{item_error} (result: {execution_result})")
     
-    async def _update_position(self, order_task: Dict[str, Any], execution_result: Dict[str, Any]):
-        """Update position setelah trade execution"""
-        try:
-            # Get or create position
-            position = self.db.query(Position).filter(
-                Position.portfolio_id=order_task.get('portfolio_id', 0),
-                Position.symbol=order_task['symbol']
-            ).first()
-            
-            if not position:
+    def _write_execution_results(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> int:
+        """Order status, trade records dan positions untuk batch (commit oleh caller); returns fills"""
+        order_ids = [order_task['order_id'] for order_task, _ in batch]
+        orders = {
+            order.id: order
+            for order in self.db.query(Order).filter(Order.id.in_(order_ids)).all()
+        }
+        
+        fills = []
+        for order_task, execution_result in batch:
+            order = orders.get(order_task['order_id'])
+            # Cancelled, atau sudah ditulis (retry) -> skip
+            if order is None or order.status != 'pending':
+                continue
+            
+            if execution_result['success']:
+                self._apply_order_status(order, 'filled', execution_result)
+                self.db.add(self._build_trade_record(order_task, execution_result))
+                fills.append((order_task, execution_result))
+            else:
+                self._apply_order_status(order, 'failed', execution_result)
+                logger.warning(f"Order {order_task['order_id']} failed: {execution_result.get('reason', 'Unknown error')}")
+        
+        if fills:
+            self._apply_position_fills(fills)
+        return len(fills)
+    
+    def _apply_order_status(self, order: Order, status: str, execution_result: Dict[str, Any]):
+        """Update order status setelah execution (commit oleh caller)"""
+        order.status = status
+        if status == 'filled':
+            order.executed_at = execution_result.get('executed_at', datetime.now())
+            order.executed_price = execution_result.get('execution_price', order.price)
+    
+    def _build_trade_record(self, order_task: Dict[str, Any], execution_result: Dict[str, Any]) -> Trade:
+        """Trade record untuk successful execution"""
+        return Trade(
+            order_id=order_task['order_id'],
+            symbol=order_task['symbol'],
+            side=order_task['side'],
+            quantity=execution_result['quantity'],
+            price=execution_result['execution_price'],
+            commission=execution_result['commission'],
+            total_value=execution_result['total_value'],
+            executed_at=execution_result['executed_at'],
+            created_at=datetime.now()
+        )
+    
+    def _apply_position_fills(self, fills: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Update positions untuk fills (urut execution) dengan satu positions query"""
+        keys = {(order_task.get('portfolio_id', 0), order_task['symbol']) for order_task, _ in fills}
+        positions = {
+            (position.portfolio_id, position.symbol): position
+            for position in self.db.query(Position).filter(
+                Position.portfolio_id.in_({key[0] for key in keys}),
+                Position.symbol.in_({key[1] for key in keys})
+            ).all()
+        }
+        
+        for order_task, execution_result in fills:
+            key = (order_task.get('portfolio_id', 0), order_task['symbol'])
+            position = positions.get(key)
+            if position is None:
                 # Create new position
-                position = Position(
-                    portfolio_id=order_task.get('portfolio_id', 0),
-                    symbol=order_task['symbol'],
+                position = positions[key] = Position(
+                    portfolio_id=key[0],
+                    symbol=key[1],
                     quantity=0,
                     average_price=0,
                     created_at=datetime.now()
                 )
                 self.db.add(position)
             
-            # Update position
             if order_task['side'] == 'buy':
                 # Add to position
                 new_quantity = position.quantity + execution_result['quantity']
@@ -514,24 +545,6 @@ class EnhancedTradingServiceV2:
                     position.quantity = 0  # Cannot have negative position
             
             position.updated_at = datetime.now()
-            self.db.commit()
-            
-        except Exception as e:
-            logger.error(f"Error updating position: {e}")
-    
-    async def _handle_execution_failure(self, order_task: Dict[str, Any], execution_result: Dict[str, Any]):
-        """Handle execution failure"""
-        try:
-            # Update order status to failed
-            await self._update_order_status(
-                order_task['order_id'], 'failed', execution_result
-            )
-            
-            # Log failure reason
-            logger.warning(f"Order {order_task['order_id']} failed: {execution_result.get('reason', 'Unknown error')}")
-            
-        except Exception as e:
-            logger.error(f"Error handling execution failure: {e}")
     
     async def _get_daily_order_count(self, portfolio_id: int) -> int:
         """Get daily order count untuk portfolio"""
@@ -618,7 +631,7 @@ class EnhancedTradingServiceV2:
             self.db.commit()
             
             # Remove from execution queue if present
-            self.order_queue = [o for o in self.order_queue if o['order_id'] != order_id]
+            self.scheduler.cancel(order_id)
             
             return {
                 'success': True,